@@ -3,6 +3,11 @@
 import argparse
 import sys
 from pathlib import Path
+from random_file_picker.core.cache_manager import (
+    format_cache_diagnostics,
+    get_last_cache_diagnostics,
+    wait_for_background_refreshes,
+)
 from random_file_picker.core.file_picker import pick_random_file, open_folder
 from random_file_picker.core.sequential_selector import select_file_with_sequence_logic
 
@@ -32,6 +37,17 @@ def main():
         action="store_true",
         help="Desativa seleção sequencial",
     )
+    parser.add_argument(
+        "--no-repeat",
+        action="store_true",
+        help="No modo aleatório, não repete arquivos até todos terem sido sorteados",
+    )
+    parser.add_argument(
+        "--folder-weighting",
+        choices=["uniform", "sqrt", "unread"],
+        default=None,
+        help="No modo aleatório, sorteia primeiro a pasta com este peso e depois o arquivo dentro dela",
+    )
     parser.add_argument(
         "--open-folder",
         action="store_true",
@@ -42,6 +58,39 @@ def main():
         action="store_true",
         help="Não processa arquivos ZIP",
     )
+    parser.add_argument(
+        "--index-archives",
+        action="store_true",
+        help="Indexa o conteúdo de ZIP/RAR (busca, sorteio e sequências sem extrair)",
+    )
+    parser.add_argument(
+        "--tracker-backend",
+        choices=["json", "sqlite"],
+        default="json",
+        help="Armazenamento dos arquivos lidos (sqlite é seguro para GUI e CLI simultâneos; padrão: json)",
+    )
+    parser.add_argument(
+        "--extraction-cache-mb",
+        type=int,
+        default=None,
+        help="Limite do cache de membros extraídos de ZIP/RAR em MB (0 desativa; padrão: 1024)",
+    )
+    parser.add_argument(
+        "--cache-backend",
+        choices=["pickle", "sqlite"],
+        default="pickle",
+        help="Armazenamento do cache de arquivos (sqlite busca keywords por FTS sem carregar tudo; padrão: pickle)",
+    )
+    parser.add_argument(
+        "--stale-cache",
+        action="store_true",
+        help="Responde na hora com o último cache gravado e revalida o cache em segundo plano",
+    )
+    parser.add_argument(
+        "--cache-diagnostics",
+        action="store_true",
+        help="Mostra o resultado do cache por pasta (válida, atualizada ou motivo da falha)",
+    )
     
     args = parser.parse_args()
     
@@ -76,6 +125,13 @@ def main():
                 args.exclude_prefix,
                 keywords=keywords,
                 process_zip=not args.no_zip,
+                index_archives=args.index_archives,
+                extraction_cache_mb=args.extraction_cache_mb,
+                cache_backend=args.cache_backend,
+                no_repeat=args.no_repeat,
+                tracker_backend=args.tracker_backend,
+                folder_weighting=args.folder_weighting,
+                stale_cache=args.stale_cache,
             )
             selected_file = result['file_path']
             
@@ -91,6 +147,11 @@ def main():
                 use_sequence=True,
                 keywords=keywords,
                 process_zip=not args.no_zip,
+                tracker_backend=args.tracker_backend,
+                index_archives=args.index_archives,
+                extraction_cache_mb=args.extraction_cache_mb,
+                cache_backend=args.cache_backend,
+                stale_cache=args.stale_cache,
             )
             
             if not result or not result['file_path']:
@@ -108,6 +169,11 @@ def main():
                 print(f"  Método: Sequencial")
                 print(f"  Coleção: {info['sequence_info']['collection']}")
         
+        if args.cache_diagnostics:
+            print()
+            for line in format_cache_diagnostics(get_last_cache_diagnostics()):
+                print(line)
+        
         print(f"\n{'='*70}")
         print("Arquivo selecionado:")
         print(f"  {selected_file}")
@@ -118,6 +184,9 @@ def main():
             open_folder(folder_to_open)
             print("Pasta aberta no explorador.")
         
+        # Com --stale-cache, termina de gravar o cache revalidado antes de sair
+        wait_for_background_refreshes()
+        
     except ValueError as e:
         print(f"\nErro: {e}", file=sys.stderr)
         sys.exit(1)
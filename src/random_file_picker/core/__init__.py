@@ -4,15 +4,19 @@ from random_file_picker.core.file_picker import (
     pick_random_file,
     pick_random_file_with_zip_support,
     collect_files,
+    collect_files_by_folder,
     open_folder,
     is_file_accessible,
     list_files_in_zip,
     extract_file_from_zip,
+    select_archive_member,
+    open_archive_member_path,
     get_temp_extraction_dir,
     cleanup_temp_dir,
 )
 from random_file_picker.core.sequential_selector import (
     SequentialFileTracker,
+    create_tracker,
     select_file_with_sequence_logic,
     analyze_folder_sequence,
     get_next_unread_file,
@@ -24,13 +28,17 @@ __all__ = [
     "pick_random_file",
     "pick_random_file_with_zip_support",
     "collect_files",
+    "collect_files_by_folder",
     "open_folder",
     "is_file_accessible",
     "list_files_in_zip",
     "extract_file_from_zip",
+    "select_archive_member",
+    "open_archive_member_path",
     "get_temp_extraction_dir",
     "cleanup_temp_dir",
     "SequentialFileTracker",
+    "create_tracker",
     "select_file_with_sequence_logic",
     "analyze_folder_sequence",
     "get_next_unread_file",
@@ -1,11 +1,39 @@
 """Gerenciador de cache otimizado para busca de arquivos."""
 
+import os
 import pickle
 import hashlib
+import threading
+import time
+from array import array
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Set
+from typing import Callable, Dict, Iterable, List, Optional, Any, Set, Tuple, Union
 from datetime import datetime
 from collections import defaultdict
+from contextlib import contextmanager
+
+from .cache_storage import FileLock, atomic_write, get_default_cache_dir
+from .file_scanner import find_changed_directories, flatten_tree, refresh_tree
+from .file_table import FileTable
+from .path_store import PathStore, open_path_store, write_path_store
+
+# Motivos de falha na consulta ao cache (campo 'reason' dos diagnósticos)
+CACHE_MISS_REASONS = {
+    'missing_shard': "sem cache para a pasta",
+    'unreadable_shard': "cache ilegível",
+    'config_changed': "configuração alterada",
+    'legacy_shard': "cache sem árvore de pastas (formato antigo)",
+    'folder_changed': "pastas alteradas desde a gravação",
+    'folder_missing': "pasta não encontrada",
+    'missing_path_store': "arquivo de caminhos ausente ou desatualizado",
+}
+
+# Diagnósticos da última consulta ao cache (de qualquer gerenciador)
+_last_diagnostics: List[Dict[str, Any]] = []
+
+# Revalidações em segundo plano em andamento, por (diretório, backend, pastas)
+_background_refreshes: Dict[tuple, threading.Thread] = {}
+_background_lock = threading.Lock()
 
 
 class CacheManager:
@@ -14,21 +42,89 @@ class CacheManager:
     - Índices de keywords para busca instantânea
     - Pickle para serialização rápida
     - Lazy loading de dados
+    - Shards com cabeçalho separado: validação sem desserializar os arquivos
+    - Arquivos em tabela colunar (FileTable), sem um dicionário por arquivo
+    - Arquivo de caminhos mapeável (mmap) por shard: sorteio sem desserializar
+    - Visão combinada só das pastas configuradas (shards carregados sob demanda)
+    - Chave de cache versionada e diagnóstico de acerto/falha por pasta
+    - Diretório por usuário, escrita atômica e um único processo reconstruindo por vez
+    - Retenção: manifesto com tamanho e último acesso por shard, remoção de shards
+      de pastas fora da configuração e limite de tamanho do cache
+    - Modo stale-while-revalidate: responde com os shards gravados e revalida
+      em segundo plano (use_stale_cache + revalidate_in_background)
     """
     
-    def __init__(self, cache_dir: str = ".file_cache"):
+    # Versão do esquema da chave de cache (_get_cache_key): mude quando os campos
+    # ou o que a varredura grava mudarem, para invalidar os caches antigos
+    CACHE_KEY_VERSION = 2
+    
+    # Formato do shard: pickle(cabeçalho) seguido de pickle(FileTable + árvore sem arquivos)
+    # (4: cabeçalho com as posições de cada pasta, ver get_dir_counts)
+    SHARD_FORMAT = 4
+    
+    # Formato do keyword_index.pkl (palavras -> IDs de arquivos + trigramas)
+    KEYWORD_INDEX_FORMAT = 3
+    NGRAM_SIZE = 3
+    
+    # Sorteios descartados (ex: extensão ignorada) antes de desistir do sorteio direto
+    MAX_PICK_ATTEMPTS = 32
+    
+    # Retenção: limite de tamanho dos shards e idade máxima dos que estão fora da configuração
+    MAX_CACHE_MB = 1024
+    UNREFERENCED_MAX_AGE_DAYS = 30
+    RETENTION_INTERVAL = 24 * 3600
+    # Último acesso só é regravado no manifesto se mudou mais que isso (e shards acessados
+    # há menos que isso não são removidos pelo limite de tamanho: podem estar em uso)
+    ACCESS_RESOLUTION = 3600
+    # Temporários mais antigos que isso são de gravações interrompidas
+    STALE_TEMP_SECONDS = 3600
+    MANIFEST_VERSION = 2
+    
+    def __init__(self, cache_dir: Optional[str] = None, max_cache_mb: Optional[int] = None):
         """Inicializa o gerenciador de cache.
         
         Args:
-            cache_dir: Diretório para armazenar arquivos de cache.
+            cache_dir: Diretório para armazenar arquivos de cache (relativo à pasta
+                       atual; padrão: diretório de cache do usuário, ver get_default_cache_dir).
+            max_cache_mb: Limite de tamanho dos shards em MB (padrão: MAX_CACHE_MB).
         """
-        self.cache_dir = Path.cwd() / cache_dir
-        self.cache_dir.mkdir(exist_ok=True)
+        self.cache_dir = Path.cwd() / cache_dir if cache_dir else get_default_cache_dir()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = (self.MAX_CACHE_MB if max_cache_mb is None else max_cache_mb) * 1024 * 1024
+        
+        # Manifesto (tamanho e último acesso por shard), lido sob demanda
+        self._manifest: Optional[Dict[str, Any]] = None
+        # Quando este processo registrou acesso no manifesto pela última vez (sorteios não releem a cada chamada)
+        self._access_recorded_at = 0.0
         
         # Cache em memória (lazy loading)
         self._folder_caches: Dict[str, Dict[str, Any]] = {}
-        self._keyword_index: Optional[Dict[str, List[str]]] = None
+        self._keyword_index: Optional[Dict[str, array]] = None
+        self._vocabulary: List[str] = []
+        self._trigram_index: Dict[str, array] = {}
+        
+        # Pastas da visão combinada (None: todos os shards em disco)
+        self._scope: Optional[List[str]] = None
+        
+        # Arquivos dos shards da visão combinada; o ID de um arquivo é sua posição
+        self._all_files: Optional[FileTable] = None
         self._loaded = False
+        
+        # Arquivos de caminhos abertos por get_dir_counts (fechados em close)
+        self._dir_stores: List[PathStore] = []
+        self._dir_runs: Dict[str, List[Tuple[PathStore, int, int]]] = {}
+        self._header_stamps: Dict[str, Optional[str]] = {}
+        
+        # Listagens de arquivos compactados (lazy loading)
+        self._archive_index: Optional[Dict[str, Dict[str, Any]]] = None
+        self._archive_index_dirty = False
+        
+        # Resultado por pasta da última consulta (ver get_diagnostics)
+        self._diagnostics: List[Dict[str, Any]] = []
+        
+        # Gerenciador de uma revalidação em segundo plano (ver revalidate_in_background):
+        # não publica diagnósticos e grava a hora exata da verificação no manifesto
+        self._background = False
     
     def _get_folder_hash(self, folder: str) -> str:
         """Gera hash único para uma pasta.
@@ -54,6 +150,18 @@ class CacheManager:
         folder_hash = self._get_folder_hash(folder)
         return self.cache_dir / f"folder_{folder_hash}.pkl"
     
+    def _get_paths_file(self, folder: str) -> Path:
+        """Obtém caminho do arquivo de caminhos (mmap) de uma pasta.
+        
+        Args:
+            folder: Caminho da pasta.
+            
+        Returns:
+            Path do arquivo de caminhos.
+        """
+        folder_hash = self._get_folder_hash(folder)
+        return self.cache_dir / f"folder_{folder_hash}.paths"
+    
     def _get_index_file(self) -> Path:
         """Obtém caminho do arquivo de índice de keywords.
         
@@ -62,9 +170,68 @@ class CacheManager:
         """
         return self.cache_dir / "keyword_index.pkl"
     
+    def _get_archive_index_file(self) -> Path:
+        """Obtém caminho do arquivo com as listagens de arquivos compactados.
+        
+        Returns:
+            Path do arquivo de índice de arquivos compactados.
+        """
+        return self.cache_dir / "archive_index.pkl"
+    
+    def _get_cache_key(self, read_prefix: str, ignore_prefix: str,
+                       process_zip: bool) -> Dict[str, Any]:
+        """Monta a chave de cache: tudo o que muda o conteúdo gravado nos shards.
+        
+        Arquivos ZIP/RAR são gravados como arquivos comuns (as listagens ficam
+        no archive_index.pkl) e keywords/extensões são aplicadas na consulta;
+        por isso process_zip, keywords e extensões ignoradas não mudam a chave,
+        e a seleção sequencial (sem ZIP) e a aleatória (com ZIP) usam o mesmo cache.
+        
+        Args:
+            read_prefix: Prefixo de arquivos lidos.
+            ignore_prefix: Prefixo de pastas a ignorar.
+            process_zip: Se processa arquivos ZIP (não afeta a chave).
+            
+        Returns:
+            Dicionário com os campos da chave.
+        """
+        return {
+            'version': self.CACHE_KEY_VERSION,
+            'exclude_prefix': read_prefix,
+            'ignored_dir_prefix': ignore_prefix,
+            'archive_mode': "files",
+            'filters': "query",
+        }
+    
+    @contextmanager
+    def writer_lock(self):
+        """Trava de escrita do cache: um único processo reconstrói o cache por vez.
+        
+        Se outro processo já está reconstruindo, espera ele terminar; o
+        chamador deve então revalidar (refresh_cache) antes de varrer de novo,
+        para reaproveitar o cache gravado pelo outro processo.
+        
+        Yields:
+            True se precisou esperar por outro processo, False caso contrário.
+        """
+        lock = FileLock(self.cache_dir / "writer.lock")
+        try:
+            waited = not lock.acquire(blocking=False)
+            if waited:
+                print("⏳ Outro processo está atualizando o cache, aguardando...")
+                lock.acquire()
+        except OSError:
+            # Sem suporte a travas (ex: sistema de arquivos somente leitura): segue sem coordenação
+            waited = False
+        
+        try:
+            yield waited
+        finally:
+            lock.release()
+    
     def _get_config_hash(self, read_prefix: str, ignore_prefix: str, 
                         process_zip: bool) -> str:
-        """Gera hash das configurações de busca (sem keywords).
+        """Gera hash da chave de cache (sem keywords).
         
         Args:
             read_prefix: Prefixo de arquivos lidos.
@@ -72,10 +239,75 @@ class CacheManager:
             process_zip: Se processa arquivos ZIP.
             
         Returns:
-            Hash MD5 das configurações.
+            Hash MD5 da chave de cache.
         """
-        config_str = f"{read_prefix}|{ignore_prefix}|{process_zip}"
-        return hashlib.md5(config_str.encode()).hexdigest()
+        return self._hash_cache_key(self._get_cache_key(read_prefix, ignore_prefix, process_zip))
+    
+    @staticmethod
+    def _hash_cache_key(config_key: Dict[str, Any]) -> str:
+        """Gera o hash MD5 de uma chave de cache."""
+        return hashlib.md5(repr(sorted(config_key.items())).encode()).hexdigest()
+    
+    @staticmethod
+    def _describe_key_change(stored_key: Optional[Dict[str, Any]], config_key: Dict[str, Any]) -> str:
+        """Descreve os campos da chave de cache que mudaram.
+        
+        Args:
+            stored_key: Chave gravada no cache (None em caches anteriores ao esquema).
+            config_key: Chave atual.
+            
+        Returns:
+            Texto como "exclude_prefix: '_L_' → '_R_'".
+        """
+        if not isinstance(stored_key, dict) or stored_key.get('version') != config_key['version']:
+            return "chave de cache de versão anterior"
+        changes = [
+            f"{field}: {stored_key.get(field)!r} → {value!r}"
+            for field, value in config_key.items() if stored_key.get(field) != value
+        ]
+        return ", ".join(changes)
+    
+    def _start_lookup(self):
+        """Inicia os diagnósticos de uma nova consulta ao cache."""
+        global _last_diagnostics
+        self._diagnostics = []
+        if not self._background:
+            _last_diagnostics = self._diagnostics
+    
+    def _record_lookup(self, folder: str, status: str, reason: Optional[str] = None,
+                       detail: Optional[str] = None, age: Optional[float] = None):
+        """Registra o resultado da consulta de uma pasta.
+        
+        Args:
+            folder: Pasta consultada.
+            status: "hit" (cache usado), "refreshed" (atualizado no lugar), "stale"
+                    (usado sem revalidar) ou "miss".
+            reason: Motivo da falha (chave de CACHE_MISS_REASONS).
+            detail: Informação adicional (ex: campos da chave que mudaram).
+            age: Segundos desde a última verificação do shard (só em "stale").
+        """
+        self._diagnostics.append({'folder': folder, 'status': status, 'reason': reason,
+                                  'detail': detail, 'age': age})
+    
+    def _record_stale(self, folder: str, shards: Dict[str, Dict[str, Any]], now: float):
+        """Registra uma pasta usada sem revalidação, com a idade da última verificação.
+        
+        Args:
+            folder: Pasta consultada.
+            shards: Entradas do manifesto.
+            now: Timestamp atual.
+        """
+        entry = shards.get(folder)
+        age = max(0.0, now - entry['validated_at']) if entry else None
+        self._record_lookup(folder, "stale", age=age)
+    
+    def get_diagnostics(self) -> List[Dict[str, Any]]:
+        """Obtém o resultado por pasta da última consulta deste gerenciador.
+        
+        Returns:
+            Lista de {'folder', 'status', 'reason', 'detail', 'age'} (ver format_cache_diagnostics).
+        """
+        return list(self._diagnostics)
     
     def _get_folder_mtime(self, folder: str) -> float:
         """Obtém timestamp de última modificação de uma pasta.
@@ -96,38 +328,325 @@ class CacheManager:
         except (OSError, PermissionError):
             return 0.0
     
-    def _build_keyword_index(self, all_files: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    def _build_keyword_index(self, all_files: FileTable) -> Dict[str, array]:
         """Constrói índice reverso de keywords para busca rápida.
         
         Args:
-            all_files: Lista de todos os arquivos de todas as pastas.
+            all_files: Tabela com os arquivos de todas as pastas (posição = ID).
             
         Returns:
-            Dicionário {keyword: [lista de paths que contêm a keyword]}.
+            Dicionário {keyword: array('I') com os IDs, em ordem crescente, dos
+            arquivos que contêm a keyword}.
         """
-        index = defaultdict(list)
+        index = defaultdict(lambda: array('I'))
         
-        for file_info in all_files:
-            file_path = file_info['path']
-            file_name_lower = Path(file_path).name.lower()
+        for file_id, file_name in enumerate(all_files.names):
+            file_name_lower = file_name.lower()
             
             # Tokeniza o nome do arquivo em palavras
             # Remove extensões e caracteres especiais
-            words = file_name_lower.replace('.', ' ').replace('_', ' ').replace('-', ' ').split()
+            words = set(file_name_lower.replace('.', ' ').replace('_', ' ').replace('-', ' ').split())
             
             # Adiciona cada palavra ao índice
             for word in words:
                 if len(word) >= 2:  # Ignora palavras muito curtas
-                    index[word].append(file_path)
+                    index[word].append(file_id)
+        
+        return dict(index)
+    
+    def _build_trigram_index(self, vocabulary: List[str]) -> Dict[str, array]:
+        """Constrói o índice de trigramas das palavras indexadas.
+        
+        Args:
+            vocabulary: Palavras do índice de keywords.
+            
+        Returns:
+            Dicionário {trigrama: array('I') com as posições em vocabulary, em ordem crescente}.
+        """
+        n = self.NGRAM_SIZE
+        index = defaultdict(lambda: array('I'))
+        
+        for word_id, word in enumerate(vocabulary):
+            for gram in {word[i:i + n] for i in range(len(word) - n + 1)}:
+                index[gram].append(word_id)
         
         return dict(index)
     
+    def _set_keyword_index(self, keyword_index: Optional[Dict[str, array]],
+                           trigram_index: Optional[Dict[str, array]] = None):
+        """Define o índice de keywords e o índice de trigramas do seu vocabulário.
+        
+        Args:
+            keyword_index: Índice {palavra: IDs de arquivos} (None limpa os índices).
+            trigram_index: Índice de trigramas já construído (ex: lido do disco).
+        """
+        self._keyword_index = keyword_index
+        self._vocabulary = list(keyword_index) if keyword_index else []
+        if trigram_index is None:
+            trigram_index = self._build_trigram_index(self._vocabulary)
+        self._trigram_index = trigram_index
+    
+    def _set_scope(self, folders: List[str]):
+        """Define as pastas da visão combinada (tabela de arquivos e índice de keywords).
+        
+        Args:
+            folders: Pastas configuradas.
+        """
+        scope = sorted(set(folders))
+        if scope != self._scope:
+            self._scope = scope
+            self._all_files = None
+            self._set_keyword_index(None)
+            self._loaded = False
+    
+    def _get_scope(self) -> List[str]:
+        """Obtém as pastas da visão combinada.
+        
+        Sem pastas definidas (refresh_cache, save_cache ou load_cache com
+        folders), usa todos os shards em disco, lendo só o cabeçalho de cada um.
+        
+        Returns:
+            Pastas em ordem.
+        """
+        if self._scope is None:
+            folders = set(self._folder_caches)
+            for cache_file in self.cache_dir.glob("folder_*.pkl"):
+                try:
+                    header = self._read_shard(cache_file, header_only=True)
+                    folders.add(header['metadata']['folder_path'])
+                except (pickle.PickleError, OSError, KeyError, EOFError):
+                    continue
+            self._scope = sorted(folders)
+        return self._scope
+    
+    def _get_folder_cache(self, folder: str) -> Optional[Dict[str, Any]]:
+        """Obtém o shard de uma pasta, lendo do disco no primeiro uso.
+        
+        Args:
+            folder: Pasta raiz do shard.
+            
+        Returns:
+            Shard completo ou None se não existe ou não pode ser lido.
+        """
+        cache_data = self._folder_caches.get(folder)
+        if cache_data is None:
+            cache_file = self._get_cache_file(folder)
+            if not cache_file.exists():
+                return None
+            try:
+                cache_data = self._read_shard(cache_file)
+            except (pickle.PickleError, OSError, KeyError, EOFError):
+                return None
+            self._folder_caches[folder] = cache_data
+        return cache_data
+    
+    def _get_scoped_caches(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Obtém os shards das pastas da visão combinada (carregados sob demanda).
+        
+        Returns:
+            Lista de (pasta, shard) em ordem de pasta; pastas sem shard ficam de fora.
+        """
+        scoped = []
+        for folder in self._get_scope():
+            cache_data = self._get_folder_cache(folder)
+            if cache_data is not None:
+                scoped.append((folder, cache_data))
+        return scoped
+    
+    def _get_all_files(self) -> FileTable:
+        """Obtém os arquivos dos shards da visão combinada, em ordem de pasta.
+        
+        A posição de cada arquivo nesta tabela é o seu ID no índice de keywords.
+        
+        Returns:
+            Tabela de arquivos (compartilhada: não deve ser modificada).
+        """
+        if self._all_files is None:
+            tables = [cache_data['files'] for _, cache_data in self._get_scoped_caches()]
+            # Com uma única pasta, usa a própria tabela do shard
+            self._all_files = tables[0] if len(tables) == 1 else FileTable.concat(tables)
+        return self._all_files
+    
+    def _get_loaded_stamp(self) -> tuple:
+        """Identifica os shards da visão combinada (pasta, created_at) para validar o índice persistido.
+        
+        Segue a mesma ordem de _get_all_files: o mesmo carimbo implica os mesmos IDs.
+        """
+        return tuple(
+            (folder, cache_data['metadata'].get('created_at'))
+            for folder, cache_data in self._get_scoped_caches()
+        )
+    
+    def _save_keyword_index(self) -> bool:
+        """Persiste o índice de keywords e o de trigramas junto com o cache.
+        
+        Returns:
+            True se salvou, False em caso de erro.
+        """
+        data = {
+            'format': self.KEYWORD_INDEX_FORMAT,
+            'stamp': self._get_loaded_stamp(),
+            'words': self._keyword_index,
+            'trigrams': self._trigram_index,
+        }
+        try:
+            with atomic_write(self._get_index_file()) as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except (OSError, pickle.PickleError):
+            return False
+        return True
+    
+    def _load_keyword_index(self) -> bool:
+        """Carrega o índice persistido se corresponder aos shards em memória.
+        
+        Returns:
+            True se carregou, False se não existe, é de outro formato ou está desatualizado.
+        """
+        try:
+            with open(self._get_index_file(), 'rb') as f:
+                data = pickle.load(f)
+        except (pickle.PickleError, OSError, EOFError):
+            return False
+        
+        if not isinstance(data, dict) or data.get('format') != self.KEYWORD_INDEX_FORMAT:
+            return False
+        if data.get('stamp') != self._get_loaded_stamp():
+            return False
+        
+        self._set_keyword_index(data['words'], data['trigrams'])
+        return True
+    
+    def _find_keyword_ids(self, keyword: str) -> set:
+        """Obtém os IDs dos arquivos com alguma palavra que contém a keyword.
+        
+        Args:
+            keyword: Palavra-chave em minúsculas.
+            
+        Returns:
+            Conjunto de IDs (união das listas das palavras encontradas).
+        """
+        file_ids = set()
+        for indexed_word in self._find_matching_words(keyword):
+            file_ids.update(self._keyword_index[indexed_word])
+        return file_ids
+    
+    def _find_matching_words(self, keyword: str) -> List[str]:
+        """Encontra as palavras do índice que contêm a keyword (busca parcial).
+        
+        Com 3+ caracteres, intersecta as listas dos trigramas da keyword e só
+        confere as palavras candidatas; keywords menores percorrem o vocabulário.
+        
+        Args:
+            keyword: Palavra-chave em minúsculas.
+            
+        Returns:
+            Palavras indexadas que contêm a keyword.
+        """
+        n = self.NGRAM_SIZE
+        if len(keyword) < n:
+            return [word for word in self._vocabulary if keyword in word]
+        
+        grams = {keyword[i:i + n] for i in range(len(keyword) - n + 1)}
+        postings = []
+        for gram in grams:
+            posting = self._trigram_index.get(gram)
+            if not posting:
+                return []
+            postings.append(posting)
+        
+        # Começa pela lista mais curta
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+        
+        return [self._vocabulary[word_id] for word_id in sorted(candidates)
+                if keyword in self._vocabulary[word_id]]
+    
+    def _read_shard(self, cache_file: Path, header_only: bool = False) -> Dict[str, Any]:
+        """Lê um shard do disco.
+        
+        O cabeçalho ({'shard_format', 'metadata', 'dir_mtimes', 'dir_runs'}) é um pickle
+        pequeno gravado antes dos arquivos: com header_only, só ele é lido.
+        
+        Args:
+            cache_file: Caminho do shard.
+            header_only: Se True, lê apenas o cabeçalho.
+            
+        Returns:
+            Cabeçalho ou dicionário completo ({'metadata', 'files', 'tree'}).
+            Shards sem cabeçalho (um único dicionário) são sempre lidos inteiros;
+            shards completos de formatos anteriores são convertidos (_upgrade_shard).
+            
+        Raises:
+            OSError, pickle.PickleError, EOFError: Se o shard não puder ser lido.
+        """
+        with open(cache_file, 'rb') as f:
+            header = pickle.load(f)
+            if 'shard_format' not in header:
+                return header if header_only else self._upgrade_shard(header)
+            if header_only:
+                return header
+            payload = pickle.load(f)
+        
+        return self._upgrade_shard({'metadata': header['metadata'], **payload})
+    
+    def _upgrade_shard(self, cache_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Converte um shard de formato anterior (lista de dicionários) para FileTable.
+        
+        Os arquivos saem dos nós da árvore, que passam a guardar só mtime,
+        subpastas e índice de sequências (indexado antes, se faltar).
+        
+        Args:
+            cache_data: Shard completo (modificado no lugar).
+            
+        Returns:
+            O próprio shard.
+        """
+        if not isinstance(cache_data.get('files'), FileTable):
+            cache_data['files'] = FileTable.from_records(cache_data.get('files', []))
+        
+        tree = cache_data.get('tree')
+        if tree:
+            self._index_tree_sequences(tree)
+            cache_data['tree'] = self._strip_tree_files(tree)
+        
+        return cache_data
+    
+    @staticmethod
+    def _strip_tree_files(tree: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Retorna uma cópia da árvore sem as listas de arquivos dos nós."""
+        return {
+            path: {key: value for key, value in node.items() if key != 'files'}
+            for path, node in tree.items()
+        }
+    
+    @staticmethod
+    def _get_dir_mtimes(shard: Dict[str, Any]) -> Optional[Dict[str, Dict[str, float]]]:
+        """Obtém a árvore de mtimes (sem arquivos) de um cabeçalho ou shard completo.
+        
+        Returns:
+            Dicionário {pasta: {'mtime'}} aceito por find_changed_directories,
+            ou None se o shard não tem árvore.
+        """
+        if 'dir_mtimes' in shard:
+            dir_mtimes = shard['dir_mtimes']
+        else:
+            tree = shard.get('tree')
+            dir_mtimes = {path: node['mtime'] for path, node in tree.items()} if tree is not None else None
+        
+        if dir_mtimes is None:
+            return None
+        return {path: {'mtime': mtime} for path, mtime in dir_mtimes.items()}
+    
     def is_cache_valid(self, folders: List[str], read_prefix: str, 
                       ignore_prefix: str, keywords: List[str], 
                       process_zip: bool, keywords_match_all: bool = False) -> bool:
         """Verifica se o cache é válido para as configurações atuais.
         
-        OTIMIZADO: Validação granular por pasta + lazy loading.
+        OTIMIZADO: Validação granular por pasta lendo só o cabeçalho dos shards.
         
         Args:
             folders: Lista de pastas para buscar.
@@ -138,106 +657,658 @@ class CacheManager:
             keywords_match_all: Se deve aplicar AND ou OR (não afeta validação).
             
         Returns:
-            True se o cache é válido, False caso contrário.
+            True se o cache é válido, False caso contrário.
+        """
+        config_key = self._get_cache_key(read_prefix, ignore_prefix, process_zip)
+        valid = True
+        self._start_lookup()
+        
+        # Verifica cada pasta individualmente (todas, para o diagnóstico)
+        for folder in folders:
+            cache_file = self._get_cache_file(folder)
+            
+            if not cache_file.exists():
+                self._record_lookup(folder, "miss", 'missing_shard')
+                valid = False
+                continue
+            
+            try:
+                # Carrega apenas o cabeçalho (sem os arquivos)
+                header = self._read_shard(cache_file, header_only=True)
+                miss = self._check_header(header, folder, config_key)
+            except (pickle.PickleError, OSError, KeyError, EOFError):
+                miss = ('unreadable_shard', None)
+            
+            if miss is None:
+                self._record_lookup(folder, "hit")
+            else:
+                self._record_lookup(folder, "miss", *miss)
+                valid = False
+        
+        return valid
+    
+    def _check_header(self, header: Dict[str, Any], folder: str,
+                      config_key: Dict[str, Any], check_folders: bool = True) -> Optional[Tuple[str, Optional[str]]]:
+        """Verifica se o cabeçalho de um shard corresponde à configuração e ao disco.
+        
+        Args:
+            header: Cabeçalho (ou shard completo sem cabeçalho).
+            folder: Pasta raiz do shard.
+            config_key: Chave de cache atual (_get_cache_key).
+            check_folders: Se False, só confere a configuração e a árvore
+                           gravada, sem consultar as pastas no disco.
+            
+        Returns:
+            None se nenhuma pasta da árvore mudou desde a gravação, senão
+            (motivo, detalhe) da falha.
+        """
+        metadata = header.get('metadata', {})
+        
+        # Verifica hash de configuração
+        if metadata.get('config_hash') != self._hash_cache_key(config_key):
+            return 'config_changed', self._describe_key_change(metadata.get('config_key'), config_key)
+        
+        # Verifica timestamp de TODAS as pastas da árvore (não só a raiz)
+        dir_mtimes = self._get_dir_mtimes(header)
+        if dir_mtimes is not None:
+            if not dir_mtimes:
+                return 'legacy_shard', None
+            if not check_folders:
+                return None
+            changed = find_changed_directories(dir_mtimes)
+            if changed.get(folder, 0.0) is None:
+                return 'folder_missing', None
+            if changed:
+                return 'folder_changed', f"{len(changed)} pasta(s), ex: {min(changed)}"
+            return None
+        
+        if not check_folders:
+            return 'legacy_shard', None
+        current_mtime = self._get_folder_mtime(folder)
+        cached_mtime = metadata.get('folder_mtime', 0)
+        if current_mtime > cached_mtime:
+            return 'folder_changed', None
+        return None
+    
+    def refresh_cache(self, folders: List[str], read_prefix: str, 
+                      ignore_prefix: str, process_zip: bool) -> bool:
+        """Revalida o cache de forma incremental usando a árvore de mtimes.
+        
+        Relista apenas as pastas cujo mtime mudou e atualiza o shard no lugar,
+        sem varrer a biblioteca inteira novamente. A validação usa só o
+        cabeçalho; os arquivos de cada shard são desserializados uma única vez
+        e ficam em memória para get_cached_files.
+        
+        Args:
+            folders: Lista de pastas para buscar.
+            read_prefix: Prefixo de arquivos lidos.
+            ignore_prefix: Prefixo de pastas a ignorar.
+            process_zip: Se processa arquivos ZIP.
+            
+        Returns:
+            True se o cache pôde ser usado (atualizado ou não), False se é
+            necessária uma varredura completa.
+        """
+        config_key = self._get_cache_key(read_prefix, ignore_prefix, process_zip)
+        config_hash = self._hash_cache_key(config_key)
+        patched = False
+        written = {}
+        self._set_scope(folders)
+        self._start_lookup()
+        
+        for folder in folders:
+            cache_file = self._get_cache_file(folder)
+            
+            if not cache_file.exists():
+                self._record_lookup(folder, "miss", 'missing_shard')
+                return False
+            
+            try:
+                header = self._read_shard(cache_file, header_only=True)
+                metadata = header.get('metadata', {})
+                
+                # Shards antigos (sem árvore) ou com outra configuração exigem varredura completa
+                if metadata.get('config_hash') != config_hash:
+                    self._record_lookup(folder, "miss", 'config_changed',
+                                        self._describe_key_change(metadata.get('config_key'), config_key))
+                    return False
+                if not self._get_dir_mtimes(header):
+                    self._record_lookup(folder, "miss", 'legacy_shard')
+                    return False
+                
+                legacy = header.get('shard_format') != self.SHARD_FORMAT
+                cached = self._folder_caches.get(folder)
+                if 'shard_format' not in header:
+                    # Shard sem cabeçalho: o "cabeçalho" já é o shard inteiro
+                    cache_data = self._upgrade_shard(header)
+                elif cached is not None and cached['metadata'].get('created_at') == metadata.get('created_at'):
+                    # Shard já em memória e sem alterações no disco: não desserializa de novo
+                    cache_data = cached
+                else:
+                    cache_data = self._read_shard(cache_file)
+                    # Regravado por outro processo (ou em segundo plano): IDs do índice mudaram
+                    patched = patched or cached is not None
+                tree = cache_data['tree']
+                
+                if refresh_tree(tree, read_prefix):
+                    if not tree:
+                        # A própria pasta raiz sumiu
+                        self._record_lookup(folder, "miss", 'folder_missing')
+                        return False
+                    # Nós relistados trazem 'files'; os demais mantêm as linhas da tabela atual
+                    rescanned = [path for path, node in tree.items() if 'files' in node]
+                    files = cache_data['files'].keep_dirs(set(tree) - set(rescanned))
+                    for path in rescanned:
+                        files.extend(tree[path]['files'])
+                    cache_data = self._write_folder_cache(folder, files, config_key, tree)
+                    written[folder] = cache_data['metadata']
+                    patched = True
+                    self._record_lookup(folder, "refreshed", detail=f"{len(rescanned)} pasta(s) relistada(s)")
+                elif legacy:
+                    # Shard de formato anterior: grava uma vez no formato atual
+                    cache_data = self._write_folder_cache(folder, cache_data['files'], config_key, tree)
+                    written[folder] = cache_data['metadata']
+                    self._record_lookup(folder, "refreshed", detail="shard convertido para o formato atual")
+                else:
+                    # Shard gravado sem arquivo de caminhos (ou com um desatualizado)
+                    self._ensure_path_store(folder, cache_data)
+                    self._record_lookup(folder, "hit")
+                
+                self._folder_caches[folder] = cache_data
+                self._all_files = None
+                
+            except (pickle.PickleError, OSError, KeyError, EOFError):
+                self._record_lookup(folder, "miss", 'unreadable_shard')
+                return False
+        
+        if patched:
+            # Índice de keywords é reconstruído na próxima consulta
+            self._set_keyword_index(None)
+            self._loaded = False
+        
+        self._update_manifest(folders, written, validated=True)
+        return True
+    
+    def use_stale_cache(self, folders: List[str], read_prefix: str,
+                        ignore_prefix: str, process_zip: bool) -> bool:
+        """Usa os shards gravados sem revalidar as pastas (stale-while-revalidate).
+        
+        Só confere a configuração e o formato de cada shard; nenhuma pasta da
+        biblioteca é consultada. Cada pasta fica nos diagnósticos como "stale",
+        com a idade da última verificação. O chamador deve agendar a
+        revalidação (revalidate_in_background).
+        
+        Args:
+            Mesmos argumentos de refresh_cache.
+            
+        Returns:
+            True se todas as pastas têm shard utilizável, False se é preciso
+            revalidar antes de responder (refresh_cache).
+        """
+        config_key = self._get_cache_key(read_prefix, ignore_prefix, process_zip)
+        self._set_scope(folders)
+        self._start_lookup()
+        self._manifest = self._load_manifest()
+        shards = self._manifest['shards']
+        now = time.time()
+        replaced = False
+        
+        for folder in folders:
+            cache_file = self._get_cache_file(folder)
+            if not cache_file.exists():
+                self._record_lookup(folder, "miss", 'missing_shard')
+                return False
+            
+            try:
+                header = self._read_shard(cache_file, header_only=True)
+                # Shards de formato anterior são convertidos por refresh_cache
+                miss = ('legacy_shard', None) if header.get('shard_format') != self.SHARD_FORMAT else \
+                    self._check_header(header, folder, config_key, check_folders=False)
+                if miss is None:
+                    cached = self._folder_caches.get(folder)
+                    if cached is not None and \
+                            cached['metadata'].get('created_at') == header['metadata'].get('created_at'):
+                        cache_data = cached
+                    else:
+                        cache_data = self._read_shard(cache_file)
+                        replaced = True
+            except (pickle.PickleError, OSError, KeyError, EOFError):
+                miss = ('unreadable_shard', None)
+            if miss is not None:
+                self._record_lookup(folder, "miss", *miss)
+                return False
+            
+            self._folder_caches[folder] = cache_data
+            self._record_stale(folder, shards, now)
+        
+        self._all_files = None
+        if replaced:
+            self._set_keyword_index(None)
+            self._loaded = False
+        return True
+    
+    def revalidate_in_background(self, folders: List[str], read_prefix: str, ignore_prefix: str,
+                                 process_zip: bool,
+                                 on_miss: Optional[Callable[["CacheManager"], Any]] = None) -> threading.Thread:
+        """Agenda a revalidação das pastas em uma thread (stale-while-revalidate).
+        
+        A thread usa um gerenciador próprio: relista só as pastas alteradas
+        (refresh_cache) sob a trava de escrita e grava os shards com escrita
+        atômica, então as consultas seguintes passam a ler os novos shards
+        inteiros. Se o cache não puder ser atualizado no lugar, chama on_miss
+        (ex: varredura completa) com o gerenciador da thread. Só uma
+        revalidação por conjunto de pastas roda por vez.
+        
+        Programas que terminam logo após a consulta (ex: a CLI) devem chamar
+        wait_for_background_refreshes antes de sair: no encerramento do
+        interpretador, a varredura paralela das pastas não aceita novas tarefas.
+        
+        Args:
+            folders: Pastas configuradas.
+            read_prefix: Prefixo de arquivos lidos.
+            ignore_prefix: Prefixo de pastas a ignorar.
+            process_zip: Se processa arquivos ZIP.
+            on_miss: Chamado quando refresh_cache não consegue usar o cache.
+            
+        Returns:
+            Thread da revalidação (a já em andamento, se houver).
+        """
+        key = (str(self.cache_dir), type(self).__name__, tuple(sorted(folders)))
+        
+        def revalidate():
+            worker = type(self)(str(self.cache_dir), self.max_bytes // (1024 * 1024))
+            worker._background = True
+            try:
+                with worker.writer_lock():
+                    if not worker.refresh_cache(folders, read_prefix, ignore_prefix, process_zip) \
+                            and on_miss is not None:
+                        on_miss(worker)
+            except Exception as e:
+                # Falha na revalidação: o cache atual continua valendo até a próxima
+                print(f"⚠ Aviso: revalidação do cache em segundo plano falhou: {e}")
+            finally:
+                worker.close()
+                with _background_lock:
+                    _background_refreshes.pop(key, None)
+        
+        with _background_lock:
+            thread = _background_refreshes.get(key)
+            if thread is None:
+                thread = threading.Thread(target=revalidate, name="cache-revalidate")
+                _background_refreshes[key] = thread
+                thread.start()
+        return thread
+    
+    def load_cache(self, folders: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """Carrega o cache das pastas configuradas com lazy loading.
+        
+        OTIMIZADO: Lê só os shards das pastas da visão combinada (os demais
+        shards em disco são ignorados) e usa o índice de keywords persistido
+        (ou o reconstrói se os shards mudaram).
+        
+        Args:
+            folders: Pastas configuradas (padrão: as da última revalidação/gravação,
+                     ou todos os shards em disco se nenhuma foi definida).
+        
+        Returns:
+            Dicionário consolidado com todos os arquivos ou None se erro.
+        """
+        if folders is not None:
+            self._set_scope(folders)
+        
+        if self._loaded:
+            return self._get_consolidated_cache()
+        
+        # Shards já carregados (ex: por refresh_cache) não são lidos novamente
+        self._all_files = None
+        all_files = self._get_all_files()
+        
+        # Usa o índice persistido ou constrói índice de keywords (e de trigramas)
+        if all_files and not self._load_keyword_index():
+            self._set_keyword_index(self._build_keyword_index(all_files))
+            self._save_keyword_index()
+        
+        self._loaded = True
+        return self._get_consolidated_cache()
+    
+    def _get_consolidated_cache(self) -> Dict[str, Any]:
+        """Consolida todos os caches de pastas em um único dicionário.
+        
+        Returns:
+            Dicionário com metadados e arquivos consolidados ('files' é a
+            tabela compartilhada: registros só são montados ao iterar).
+        """
+        all_files = self._get_all_files()
+        scoped = self._get_scoped_caches()
+        
+        # Tamanho dos shards da visão combinada (do manifesto, sem stat por shard)
+        shards = self._get_manifest()['shards']
+        total_size = sum(shards[folder]['size'] for folder, _ in scoped if folder in shards)
+        
+        return {
+            'metadata': {
+                'folder_count': len(scoped),
+                'file_count': len(all_files),
+                'cache_size': total_size
+            },
+            'files': all_files
+        }
+    
+    def _index_tree_sequences(self, tree: Dict[str, Dict[str, Any]]) -> bool:
+        """Pré-processa a numeração dos arquivos de cada pasta da árvore.
+        
+        Guarda em cada nó 'sequence_entries': arquivos com numeração já
+        interpretada (número, tipo e coleção) e ordenados por coleção/número,
+        para que a seleção sequencial não precise aplicar regex a cada clique.
+        Só processa nós novos ou relistados (sem 'sequence_entries').
+        
+        Args:
+            tree: Árvore de pastas (modificada no lugar).
+            
+        Returns:
+            True se algum nó foi indexado, False se todos já estavam.
+        """
+        from .sequential_selector import extract_number_from_filename, extract_collection_name
+        
+        indexed = False
+        for node in tree.values():
+            # Nós já indexados ou sem arquivos (árvore de shard gravado)
+            if 'sequence_entries' in node or 'files' not in node:
+                continue
+            
+            entries = []
+            for file_info in node['files']:
+                filename = file_info['name']
+                result = extract_number_from_filename(filename)
+                if result:
+                    number, num_type = result
+                    entries.append({
+                        'filename': filename,
+                        'number': number,
+                        'type': num_type,
+                        'collection': extract_collection_name(filename)
+                    })
+            
+            entries.sort(key=lambda item: (item['collection'], item['number']))
+            node['sequence_entries'] = entries
+            indexed = True
+        
+        return indexed
+    
+    def get_sequence_entries(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Obtém o índice de sequências dos shards da visão combinada.
+        
+        Returns:
+            Dicionário {pasta: [entradas com 'filename', 'number', 'type', 'collection']}.
+            Pastas de shards sem árvore não aparecem.
+        """
+        entries_by_folder = {}
+        for _, cache_data in self._get_scoped_caches():
+            for dir_path, node in (cache_data.get('tree') or {}).items():
+                if 'sequence_entries' in node:
+                    entries_by_folder[dir_path] = node['sequence_entries']
+        return entries_by_folder
+    
+    def get_shard_stamp(self, folders: List[str]) -> Optional[tuple]:
+        """Identifica a versão atual dos shards das pastas informadas.
+        
+        Args:
+            folders: Lista de pastas configuradas.
+            
+        Returns:
+            Tupla ((pasta, created_at), ...) ou None se algum shard não está carregado
+            (nem teve o cabeçalho lido por get_dir_counts).
+        """
+        stamp = []
+        for folder in folders:
+            cache_data = self._folder_caches.get(folder)
+            if cache_data is not None:
+                stamp.append((folder, cache_data['metadata'].get('created_at')))
+            elif folder in self._header_stamps:
+                # Shard não carregado, mas com o cabeçalho lido por get_dir_counts
+                stamp.append((folder, self._header_stamps[folder]))
+            else:
+                return None
+        return tuple(stamp)
+    
+    def _write_folder_cache(self, folder: str, folder_files: Union[FileTable, List[Dict[str, Any]]], 
+                            config_key: Dict[str, Any], 
+                            tree: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Grava o shard de cache de uma pasta.
+        
+        Args:
+            folder: Pasta raiz do shard.
+            folder_files: Arquivos da pasta (FileTable ou registros).
+            config_key: Chave de cache (_get_cache_key), gravada junto com o seu hash.
+            tree: Árvore de pastas com mtimes (para revalidação incremental).
+                  Os arquivos dos nós não são gravados: ficam só na tabela.
+            
+        Returns:
+            Dicionário gravado no shard.
+        """
+        if not isinstance(folder_files, FileTable):
+            folder_files = FileTable.from_records(folder_files)
+        
+        cache_data = {
+            'metadata': {
+                'folder_path': folder,
+                'created_at': datetime.now().isoformat(),
+                'config_hash': self._hash_cache_key(config_key),
+                'config_key': config_key,
+                'folder_mtime': self._get_folder_mtime(folder),
+                'file_count': len(folder_files)
+            },
+            'files': folder_files
+        }
+        
+        if tree is not None:
+            self._index_tree_sequences(tree)
+            cache_data['tree'] = self._strip_tree_files(tree)
+        
+        header = {
+            'shard_format': self.SHARD_FORMAT,
+            'metadata': cache_data['metadata'],
+            'dir_mtimes': {path: node['mtime'] for path, node in tree.items()} if tree is not None else None,
+            # Posições de cada pasta no arquivo de caminhos (sorteio por pasta sem a tabela)
+            'dir_runs': folder_files.dir_runs()
+        }
+        payload = {key: value for key, value in cache_data.items() if key != 'metadata'}
+        
+        with atomic_write(self._get_cache_file(folder)) as f:
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        
+        self._write_path_store(folder, cache_data)
+        return cache_data
+    
+    def _write_path_store(self, folder: str, cache_data: Dict[str, Any]) -> bool:
+        """Grava o arquivo de caminhos de um shard (mesma ordem da tabela de arquivos).
+        
+        O created_at do shard identifica o arquivo: um arquivo de caminhos que
+        não corresponde ao shard atual é ignorado por pick_random_path.
+        
+        Returns:
+            True se gravou, False em caso de erro (o sorteio usa o shard).
+        """
+        try:
+            write_path_store(self._get_paths_file(folder), cache_data['files'].paths(),
+                             cache_data['metadata']['created_at'])
+        except OSError:
+            return False
+        return True
+    
+    def _ensure_path_store(self, folder: str, cache_data: Dict[str, Any]):
+        """Grava o arquivo de caminhos de um shard se estiver ausente ou desatualizado."""
+        store = open_path_store(self._get_paths_file(folder), cache_data['metadata'].get('created_at'))
+        if store is None:
+            self._write_path_store(folder, cache_data)
+        else:
+            store.close()
+    
+    def _open_path_stores(self, folders: List[str], read_prefix: str, ignore_prefix: str,
+                          process_zip: bool,
+                          stale: bool = False) -> Optional[List[Tuple[Dict[str, Any], PathStore]]]:
+        """Valida os cabeçalhos dos shards e abre os arquivos de caminhos (sem ler os arquivos).
+        
+        Args:
+            folders: Lista de pastas configuradas.
+            read_prefix: Prefixo de arquivos lidos.
+            ignore_prefix: Prefixo de pastas a ignorar.
+            process_zip: Se processa arquivos ZIP.
+            stale: Se True, não consulta as pastas no disco (ver use_stale_cache).
+            
+        Returns:
+            Lista de (cabeçalho, arquivo de caminhos) na ordem das pastas (o chamador
+            fecha os arquivos) ou None se algum shard não está válido.
+        """
+        config_key = self._get_cache_key(read_prefix, ignore_prefix, process_zip)
+        opened = []
+        self._start_lookup()
+        shards = self._load_manifest()['shards'] if stale else {}
+        now = time.time()
+        for folder in folders:
+            cache_file = self._get_cache_file(folder)
+            miss = None
+            if not cache_file.exists():
+                miss = ('missing_shard', None)
+            else:
+                try:
+                    header = self._read_shard(cache_file, header_only=True)
+                    miss = ('legacy_shard', None) if 'shard_format' not in header else \
+                        self._check_header(header, folder, config_key, check_folders=not stale)
+                except (pickle.PickleError, OSError, KeyError, EOFError):
+                    miss = ('unreadable_shard', None)
+            
+            store = None
+            if miss is None:
+                created_at = header['metadata'].get('created_at')
+                store = open_path_store(self._get_paths_file(folder), created_at)
+                if store is None:
+                    miss = ('missing_path_store', None)
+            if miss is not None:
+                self._record_lookup(folder, "miss", *miss)
+                for _, opened_store in opened:
+                    opened_store.close()
+                return None
+            
+            opened.append((header, store))
+            if stale:
+                self._record_stale(folder, shards, now)
+            else:
+                self._record_lookup(folder, "hit")
+        
+        self._update_manifest(folders)
+        return opened
+    
+    def pick_random_path(self, folders: List[str], read_prefix: str, ignore_prefix: str,
+                         process_zip: bool, rng, accept: Optional[Callable[[str], bool]] = None,
+                         stale: bool = False) -> Optional[str]:
+        """Sorteia um arquivo direto dos arquivos de caminhos, sem desserializar os shards.
+        
+        Lê só o cabeçalho de cada shard (validação) e a contagem de cada
+        arquivo de caminhos; o sorteio lê um único registro. Cada arquivo
+        das pastas tem a mesma chance, como em collect_files sem filtros.
+        
+        Args:
+            folders: Lista de pastas configuradas.
+            read_prefix: Prefixo de arquivos lidos.
+            ignore_prefix: Prefixo de pastas a ignorar.
+            process_zip: Se processa arquivos ZIP.
+            rng: Gerador com randrange (ex: random.SystemRandom()).
+            accept: Filtro opcional; caminhos recusados são sorteados de novo
+                    (até MAX_PICK_ATTEMPTS vezes).
+            stale: Se True, não consulta as pastas no disco (ver use_stale_cache);
+                   o chamador deve agendar a revalidação.
+            
+        Returns:
+            Caminho sorteado ou None se o cache não está válido, algum arquivo
+            de caminhos falta ou nenhum caminho foi aceito (use collect_files).
         """
-        config_hash = self._get_config_hash(read_prefix, ignore_prefix, process_zip)
-        
-        # Verifica cada pasta individualmente
-        for folder in folders:
-            cache_file = self._get_cache_file(folder)
-            
-            if not cache_file.exists():
-                return False
+        opened = self._open_path_stores(folders, read_prefix, ignore_prefix, process_zip, stale)
+        if opened is None:
+            return None
+        stores = [store for _, store in opened]
+        try:
+            total = sum(len(store) for store in stores)
+            if total == 0:
+                return None
             
-            try:
-                # Carrega apenas metadados (lazy loading)
-                with open(cache_file, 'rb') as f:
-                    cache_data = pickle.load(f)
-                
-                metadata = cache_data.get('metadata', {})
-                
-                # Verifica hash de configuração
-                if metadata.get('config_hash') != config_hash:
-                    return False
-                
-                # Verifica timestamp da pasta
-                current_mtime = self._get_folder_mtime(folder)
-                cached_mtime = metadata.get('folder_mtime', 0)
+            for _ in range(self.MAX_PICK_ATTEMPTS):
+                file_id = rng.randrange(total)
+                for store in stores:
+                    if file_id < len(store):
+                        break
+                    file_id -= len(store)
                 
-                if current_mtime > cached_mtime:
-                    return False
-                    
-            except (pickle.PickleError, OSError, KeyError):
-                return False
-        
-        return True
+                path = store[file_id]
+                if accept is None or accept(path):
+                    return path
+            return None
+        finally:
+            for store in stores:
+                store.close()
     
-    def load_cache(self) -> Optional[Dict[str, Any]]:
-        """Carrega o cache do disco com lazy loading.
+    def get_dir_counts(self, folders: List[str], read_prefix: str, ignore_prefix: str,
+                       process_zip: bool, stale: bool = False) -> Optional[Dict[str, int]]:
+        """Conta os arquivos de cada pasta pelos cabeçalhos dos shards, sem carregar a tabela.
         
-        OTIMIZADO: Carrega todas as pastas e constrói índice de keywords.
+        Deixa os arquivos de caminhos abertos para get_dir_path (até close)
+        e a versão dos shards disponível em get_shard_stamp.
         
+        Args:
+            Mesmos argumentos de pick_random_path (sem rng/accept).
+            
         Returns:
-            Dicionário consolidado com todos os arquivos ou None se erro.
+            Dicionário {pasta: quantidade de arquivos} (mesma chave de
+            FileTable.dirname) ou None se o cache não está válido ou algum
+            shard não guarda as posições das pastas.
         """
-        if self._loaded:
-            return self._get_consolidated_cache()
-        
-        all_files = []
-        
-        # Carrega cache de cada pasta
-        for cache_file in self.cache_dir.glob("folder_*.pkl"):
-            try:
-                with open(cache_file, 'rb') as f:
-                    cache_data = pickle.load(f)
-                
-                folder_path = cache_data['metadata']['folder_path']
-                files = cache_data.get('files', [])
-                
-                self._folder_caches[folder_path] = cache_data
-                all_files.extend(files)
-                
-            except (pickle.PickleError, OSError, KeyError):
-                continue
-        
-        # Constrói índice de keywords
-        if all_files:
-            self._keyword_index = self._build_keyword_index(all_files)
+        opened = self._open_path_stores(folders, read_prefix, ignore_prefix, process_zip, stale)
+        if opened is None:
+            return None
         
-        self._loaded = True
-        return self._get_consolidated_cache()
+        self._close_dir_stores()
+        self._dir_stores = [store for _, store in opened]
+        counts: Dict[str, int] = {}
+        for folder, (header, store) in zip(folders, opened):
+            if header.get('dir_runs') is None:
+                self._close_dir_stores()
+                return None
+            self._header_stamps[folder] = header['metadata'].get('created_at')
+            for dirname, runs in header['dir_runs'].items():
+                dir_runs = self._dir_runs.setdefault(dirname, [])
+                dir_runs.extend((store, start, count) for start, count in runs)
+                counts[dirname] = counts.get(dirname, 0) + sum(count for _, count in runs)
+        return counts
     
-    def _get_consolidated_cache(self) -> Dict[str, Any]:
-        """Consolida todos os caches de pastas em um único dicionário.
+    def get_dir_path(self, dirname: str, position: int) -> Optional[str]:
+        """Lê o caminho de um arquivo pela posição dentro da pasta (após get_dir_counts).
         
+        Args:
+            dirname: Pasta (chave de get_dir_counts).
+            position: Posição do arquivo na pasta (0 a quantidade - 1).
+            
         Returns:
-            Dicionário com metadados e arquivos consolidados.
+            Caminho do arquivo ou None se a posição não existe.
         """
-        all_files = []
-        total_size = 0
-        
-        for cache_data in self._folder_caches.values():
-            all_files.extend(cache_data.get('files', []))
-        
-        # Calcula tamanho total do cache
-        for cache_file in self.cache_dir.glob("folder_*.pkl"):
-            try:
-                total_size += cache_file.stat().st_size
-            except OSError:
-                continue
-        
-        return {
-            'metadata': {
-                'folder_count': len(self._folder_caches),
-                'file_count': len(all_files),
-                'cache_size': total_size
-            },
-            'files': all_files
-        }
+        for store, start, count in self._dir_runs.get(dirname, ()):
+            if position < count:
+                return store[start + position]
+            position -= count
+        return None
+    
+    def _close_dir_stores(self):
+        """Fecha os arquivos de caminhos abertos por get_dir_counts."""
+        for store in self._dir_stores:
+            store.close()
+        self._dir_stores = []
+        self._dir_runs = {}
+        self._header_stamps = {}
     
     def save_cache(self, files: List[Dict[str, Any]], folders: List[str], 
                    read_prefix: str, ignore_prefix: str, keywords: List[str], 
-                   process_zip: bool, keywords_match_all: bool = False) -> bool:
+                   process_zip: bool, keywords_match_all: bool = False,
+                   trees: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None) -> bool:
         """Salva o cache no disco com estrutura otimizada.
         
         OTIMIZADO: Cache granular por pasta + índice de keywords.
@@ -250,54 +1321,51 @@ class CacheManager:
             keywords: Lista de palavras-chave (não salvo, apenas para compatibilidade).
             process_zip: Se processa arquivos ZIP.
             keywords_match_all: AND ou OR (não salvo, apenas para compatibilidade).
+            trees: Árvores de pastas por pasta raiz (de file_scanner.scan_tree).
+                Quando fornecidas, permitem revalidação incremental via refresh_cache.
             
         Returns:
             True se salvou com sucesso, False caso contrário.
         """
         try:
-            config_hash = self._get_config_hash(read_prefix, ignore_prefix, process_zip)
+            config_key = self._get_cache_key(read_prefix, ignore_prefix, process_zip)
+            trees = trees or {}
+            self._set_scope(folders)
             
             # Agrupa arquivos por pasta de origem
             files_by_folder = defaultdict(list)
-            for file_info in files:
-                # Identifica pasta de origem pelo path
-                file_path = Path(file_info['path'])
-                
-                # Encontra qual pasta contém este arquivo
-                for folder in folders:
-                    try:
-                        file_path.relative_to(folder)
-                        files_by_folder[folder].append(file_info)
-                        break
-                    except ValueError:
-                        continue
+            if trees:
+                # Árvores já separam os arquivos por pasta raiz
+                for folder, tree in trees.items():
+                    files_by_folder[folder] = flatten_tree(tree)
+            else:
+                for file_info in files:
+                    # Identifica pasta de origem pelo path
+                    file_path = Path(file_info['path'])
+                    
+                    # Encontra qual pasta contém este arquivo
+                    for folder in folders:
+                        try:
+                            file_path.relative_to(folder)
+                            files_by_folder[folder].append(file_info)
+                            break
+                        except ValueError:
+                            continue
             
             # Salva cache para cada pasta individualmente
+            written = {}
             for folder, folder_files in files_by_folder.items():
-                cache_file = self._get_cache_file(folder)
-                
-                cache_data = {
-                    'metadata': {
-                        'folder_path': folder,
-                        'created_at': datetime.now().isoformat(),
-                        'config_hash': config_hash,
-                        'folder_mtime': self._get_folder_mtime(folder),
-                        'file_count': len(folder_files)
-                    },
-                    'files': folder_files
-                }
-                
-                with open(cache_file, 'wb') as f:
-                    pickle.dump(cache_data, f, protocol=pickle.HIGHEST_PROTOCOL)
-                
+                cache_data = self._write_folder_cache(
+                    folder, folder_files, config_key, trees.get(folder)
+                )
                 self._folder_caches[folder] = cache_data
+                written[folder] = cache_data['metadata']
+            self._update_manifest(folders, written)
             
-            # Constrói e salva índice de keywords
-            self._keyword_index = self._build_keyword_index(files)
-            index_file = self._get_index_file()
-            
-            with open(index_file, 'wb') as f:
-                pickle.dump(self._keyword_index, f, protocol=pickle.HIGHEST_PROTOCOL)
+            # Constrói e salva índice de keywords (e de trigramas) dos shards da visão combinada
+            self._all_files = None
+            self._set_keyword_index(self._build_keyword_index(self._get_all_files()))
+            self._save_keyword_index()
             
             self._loaded = True
             return True
@@ -306,24 +1374,46 @@ class CacheManager:
             return False
     
     def get_cached_files(self, keywords: Optional[List[str]] = None, 
-                        keywords_match_all: bool = False) -> List[Dict[str, Any]]:
+                        keywords_match_all: bool = False,
+                        folders: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """Obtém lista de arquivos do cache com busca otimizada por keywords.
         
-        OTIMIZADO: Usa índice de keywords para busca instantânea.
+        Visão de compatibilidade de get_cached_table: monta um dicionário por arquivo.
         
         Args:
             keywords: Lista de palavras-chave para filtrar (opcional).
             keywords_match_all: Se True usa AND, se False usa OR.
+            folders: Pastas configuradas (ver load_cache).
         
         Returns:
             Lista de arquivos ou lista vazia se cache inválido.
         """
+        return list(self.get_cached_table(keywords, keywords_match_all, folders))
+    
+    def get_cached_table(self, keywords: Optional[List[str]] = None, 
+                         keywords_match_all: bool = False,
+                         folders: Optional[List[str]] = None) -> FileTable:
+        """Obtém a tabela de arquivos do cache com busca otimizada por keywords.
+        
+        OTIMIZADO: Usa índice de keywords para busca instantânea.
+        
+        Args:
+            keywords: Lista de palavras-chave para filtrar (opcional).
+            keywords_match_all: Se True usa AND, se False usa OR.
+            folders: Pastas configuradas (padrão: as da última revalidação/gravação,
+                     ver load_cache). Só os shards dessas pastas são lidos.
+        
+        Returns:
+            Tabela de arquivos (vazia se cache inválido). Sem keywords, é a
+            tabela compartilhada do cache: não deve ser modificada.
+        """
+        if folders is not None:
+            self._set_scope(folders)
+        
         if not self._loaded:
             self.load_cache()
         
-        all_files = []
-        for cache_data in self._folder_caches.values():
-            all_files.extend(cache_data.get('files', []))
+        all_files = self._get_all_files()
         
         # Se não há keywords, retorna tudo
         if not keywords:
@@ -336,81 +1426,484 @@ class CacheManager:
         # Fallback: busca linear (se índice não disponível)
         return self._search_linear(all_files, keywords, keywords_match_all)
     
-    def _search_with_index(self, keywords: List[str], match_all: bool) -> List[Dict[str, Any]]:
+    def _search_with_index(self, keywords: List[str], match_all: bool) -> FileTable:
         """Busca usando índice de keywords (RÁPIDO).
         
+        Operações sobre IDs inteiros; os arquivos são obtidos por posição,
+        sem percorrer todos os arquivos.
+        
         Args:
             keywords: Lista de palavras-chave.
             match_all: Se True usa AND, se False usa OR.
             
         Returns:
-            Lista de arquivos que correspondem aos critérios.
+            Tabela com os arquivos que correspondem aos critérios.
         """
         keywords_lower = [kw.lower() for kw in keywords]
+        all_files = self._get_all_files()
         
         if match_all:
             # AND: arquivo deve estar em TODAS as listas de keywords
-            matching_paths = None
+            matching_ids = None
             
             for keyword in keywords_lower:
                 # Busca parcial: qualquer palavra do índice que contenha o keyword
-                keyword_paths = set()
-                for indexed_word, paths in self._keyword_index.items():
-                    if keyword in indexed_word:
-                        keyword_paths.update(paths)
+                keyword_ids = self._find_keyword_ids(keyword)
                 
-                if matching_paths is None:
-                    matching_paths = keyword_paths
+                if matching_ids is None:
+                    matching_ids = keyword_ids
                 else:
-                    matching_paths &= keyword_paths
+                    matching_ids &= keyword_ids
                 
-                if not matching_paths:
-                    return []
-            
-            result_paths = matching_paths if matching_paths else set()
+                if not matching_ids:
+                    return all_files.take([])
             
         else:
             # OR: arquivo deve estar em PELO MENOS UMA lista
-            result_paths = set()
+            matching_ids = set()
             
             for keyword in keywords_lower:
-                for indexed_word, paths in self._keyword_index.items():
-                    if keyword in indexed_word:
-                        result_paths.update(paths)
+                matching_ids |= self._find_keyword_ids(keyword)
         
-        # Recupera informações completas dos arquivos
-        all_files = []
-        for cache_data in self._folder_caches.values():
-            all_files.extend(cache_data.get('files', []))
-        
-        return [f for f in all_files if f['path'] in result_paths]
+        # Recupera os arquivos por posição (ID)
+        return all_files.take(sorted(matching_ids))
     
-    def _search_linear(self, files: List[Dict[str, Any]], 
-                      keywords: List[str], match_all: bool) -> List[Dict[str, Any]]:
+    def _search_linear(self, files: FileTable, 
+                      keywords: List[str], match_all: bool) -> FileTable:
         """Busca linear tradicional (LENTO - fallback).
         
         Args:
-            files: Lista de arquivos.
+            files: Tabela de arquivos.
             keywords: Lista de palavras-chave.
             match_all: Se True usa AND, se False usa OR.
             
         Returns:
-            Lista de arquivos filtrados.
+            Tabela com os arquivos filtrados.
         """
         keywords_lower = [kw.lower() for kw in keywords]
-        result = []
+        match = all if match_all else any
+        
+        return files.take([
+            file_id for file_id, file_name in enumerate(files.names)
+            if match(kw in file_name.lower() for kw in keywords_lower)
+        ])
+    
+    def get_archive_members(self, archive_path: str, size: Optional[int] = None,
+                            mtime: Optional[float] = None) -> Optional[List[str]]:
+        """Obtém os nomes dos membros de um ZIP/RAR a partir do diretório central.
+        
+        A listagem fica em cache, identificada pelo tamanho e mtime do arquivo;
+        só é relida quando o arquivo compactado muda.
         
-        for file_info in files:
-            file_name_lower = Path(file_info['path']).name.lower()
+        Args:
+            archive_path: Caminho do arquivo compactado.
+            size: Tamanho do arquivo (se None, obtido com stat).
+            mtime: mtime do arquivo (se None, obtido com stat).
             
-            if match_all:
-                if all(kw in file_name_lower for kw in keywords_lower):
-                    result.append(file_info)
-            else:
-                if any(kw in file_name_lower for kw in keywords_lower):
-                    result.append(file_info)
+        Returns:
+            Lista com os nomes dos membros (sem diretórios) ou None se não puder ser lido.
+        """
+        self._load_archive_index()
+        
+        if size is None or mtime is None:
+            try:
+                archive_stat = Path(archive_path).stat()
+            except OSError:
+                return None
+            size, mtime = archive_stat.st_size, archive_stat.st_mtime
+        
+        entry = self._archive_index.get(archive_path)
+        if entry and entry['size'] == size and entry['mtime'] == mtime:
+            return entry['members']
+        
+        from random_file_picker.core.file_picker import open_archive
+        
+        try:
+            with open_archive(archive_path) as archive:
+                members = [info.filename for info in archive.infolist() if not info.is_dir()]
+        except ImportError:
+            return None
+        except Exception as e:
+            # Arquivo corrompido ou inacessível: continua sendo tratado como arquivo comum
+            print(f"Aviso: Não foi possível listar '{archive_path}': {e}")
+            return None
+        
+        self._archive_index[archive_path] = {'size': size, 'mtime': mtime, 'members': members}
+        self._archive_index_dirty = True
+        return members
+    
+    def _load_archive_index(self):
+        """Carrega as listagens de arquivos compactados (uma vez por instância)."""
+        if self._archive_index is None:
+            self._archive_index = {}
+            archive_index_file = self._get_archive_index_file()
+            if archive_index_file.exists():
+                try:
+                    with open(archive_index_file, 'rb') as f:
+                        self._archive_index = pickle.load(f)
+                except (pickle.PickleError, OSError, EOFError):
+                    self._archive_index = {}
+    
+    def save_archive_index(self) -> bool:
+        """Salva as listagens de arquivos compactados se houve alterações.
+        
+        Returns:
+            True se salvou (ou não havia o que salvar), False em caso de erro.
+        """
+        if not self._archive_index_dirty:
+            return True
+        
+        try:
+            with atomic_write(self._get_archive_index_file()) as f:
+                pickle.dump(self._archive_index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except (OSError, pickle.PickleError):
+            return False
+        
+        self._archive_index_dirty = False
+        return True
+    
+    def _get_manifest_file(self) -> Path:
+        """Obtém caminho do manifesto de retenção.
+        
+        Returns:
+            Path do manifesto.
+        """
+        return self.cache_dir / "manifest.pkl"
+    
+    def _get_manifest(self) -> Dict[str, Any]:
+        """Obtém o manifesto (lido do disco no primeiro uso).
+        
+        Returns:
+            Dicionário {'version', 'shards': {pasta: entrada}, 'last_retention': {backend: timestamp}}.
+        """
+        if self._manifest is None:
+            self._manifest = self._load_manifest()
+        return self._manifest
+    
+    def _load_manifest(self) -> Dict[str, Any]:
+        """Lê o manifesto do disco ou o remonta se estiver ausente ou inválido.
+        
+        Returns:
+            Manifesto (ver _get_manifest).
+        """
+        try:
+            with open(self._get_manifest_file(), 'rb') as f:
+                manifest = pickle.load(f)
+        except (pickle.PickleError, OSError, EOFError):
+            manifest = None
+        
+        if not isinstance(manifest, dict) or manifest.get('version') != self.MANIFEST_VERSION:
+            manifest = self._rebuild_manifest()
+        return manifest
+    
+    def _rebuild_manifest(self) -> Dict[str, Any]:
+        """Monta o manifesto a partir dos cabeçalhos dos shards (único uso de glob fora da compactação).
+        
+        O último acesso de cada shard começa como o mtime do arquivo.
+        
+        Returns:
+            Manifesto (ver _get_manifest).
+        """
+        manifest = {'version': self.MANIFEST_VERSION, 'shards': {}, 'last_retention': {}}
+        self._adopt_shards(manifest)
+        return manifest
+    
+    def _adopt_shards(self, manifest: Dict[str, Any]) -> int:
+        """Registra no manifesto os shards em disco que não estão nele.
+        
+        Args:
+            manifest: Manifesto a completar.
+            
+        Returns:
+            Quantidade de shards registrados.
+        """
+        known = {self._get_cache_file(folder).name for folder in manifest['shards']}
+        adopted = 0
+        for cache_file in self.cache_dir.glob("folder_*.pkl"):
+            if cache_file.name in known:
+                continue
+            try:
+                metadata = self._read_shard(cache_file, header_only=True)['metadata']
+                last_access = cache_file.stat().st_mtime
+            except (pickle.PickleError, OSError, KeyError, EOFError):
+                continue
+            manifest['shards'][metadata['folder_path']] = self._manifest_entry(
+                metadata['folder_path'], metadata, last_access
+            )
+            adopted += 1
+        return adopted
+    
+    def _manifest_entry(self, folder: str, metadata: Dict[str, Any], last_access: float) -> Dict[str, Any]:
+        """Monta a entrada do manifesto de um shard.
+        
+        Args:
+            folder: Pasta raiz do shard.
+            metadata: Metadados do shard ('file_count', 'created_at').
+            last_access: Timestamp do último acesso.
+            
+        Returns:
+            Dicionário {'size', 'file_count', 'created_at', 'last_access', 'validated_at'}.
+        """
+        size = 0
+        for path in (self._get_cache_file(folder), self._get_paths_file(folder)):
+            try:
+                size += path.stat().st_size
+            except OSError:
+                continue
+        return {
+            'size': size,
+            'file_count': metadata.get('file_count', 0),
+            'created_at': metadata.get('created_at'),
+            'last_access': last_access,
+            'validated_at': last_access,
+        }
+    
+    @contextmanager
+    def _manifest_lock(self):
+        """Trava da leitura-alteração-gravação do manifesto entre processos.
+        
+        É separada de writer_lock (save_cache atualiza o manifesto com ela já
+        travada) e só fica travada enquanto o manifesto é atualizado.
+        """
+        manifest_file = self._get_manifest_file()
+        lock = FileLock(manifest_file.with_name(manifest_file.name + ".lock"))
+        try:
+            lock.acquire()
+        except OSError:
+            # Sem suporte a travas (ex: sistema de arquivos somente leitura): segue sem coordenação
+            pass
+        
+        try:
+            yield
+        finally:
+            lock.release()
+    
+    def _save_manifest(self, manifest: Dict[str, Any]) -> bool:
+        """Grava o manifesto.
+        
+        Returns:
+            True se salvou, False em caso de erro.
+        """
+        try:
+            with atomic_write(self._get_manifest_file()) as f:
+                pickle.dump(manifest, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except (OSError, pickle.PickleError):
+            return False
+        return True
+    
+    def _update_manifest(self, folders: Iterable[str],
+                         written: Optional[Dict[str, Dict[str, Any]]] = None, validated: bool = False):
+        """Registra o acesso às pastas configuradas e os shards gravados; roda a retenção quando está na hora.
+        
+        O manifesto é relido do disco sob _manifest_lock (pode ter sido
+        alterado por outro processo) e só é regravado se algo mudou. Um
+        registro só de acesso (sorteios) é ignorado se este processo já
+        registrou acesso há menos de ACCESS_RESOLUTION.
+        
+        Args:
+            folders: Pastas configuradas (usadas nesta consulta; as demais podem ser removidas).
+            written: Metadados dos shards gravados, por pasta.
+            validated: Se as pastas foram revalidadas no disco (idade dos diagnósticos "stale").
+        """
+        now = time.time()
+        if not written and not validated and now - self._access_recorded_at < self.ACCESS_RESOLUTION:
+            return
+        
+        with self._manifest_lock():
+            self._record_access(list(folders), written, validated, now)
+        self._access_recorded_at = now
+    
+    def _record_access(self, folders: List[str], written: Optional[Dict[str, Dict[str, Any]]],
+                       validated: bool, now: float):
+        """Corpo de _update_manifest (chamado com _manifest_lock travada)."""
+        manifest = self._load_manifest()
+        shards = manifest['shards']
+        changed = False
+        
+        for folder, metadata in (written or {}).items():
+            shards[folder] = self._manifest_entry(folder, metadata, now)
+            changed = True
+        
+        # Revalidação em segundo plano grava a hora exata (é a idade mostrada no modo stale)
+        resolution = 0 if self._background else self.ACCESS_RESOLUTION
+        for folder in folders:
+            entry = shards.get(folder)
+            if entry is None:
+                continue
+            if now - entry['last_access'] >= self.ACCESS_RESOLUTION:
+                entry['last_access'] = now
+                changed = True
+            if validated and now - entry['validated_at'] >= resolution:
+                entry['validated_at'] = now
+                changed = True
+        
+        # Acima do limite só adianta rodar se houver shards fora da configuração
+        referenced = set(folders)
+        over_budget = sum(entry['size'] for entry in shards.values()) > self.max_bytes and \
+            any(folder not in referenced for folder in shards)
+        last_retention = manifest['last_retention'].get(type(self).__name__, 0)
+        if now - last_retention >= self.RETENTION_INTERVAL or over_budget:
+            self._enforce_retention(manifest, now, folders)
+            changed = True
+        
+        if changed:
+            self._save_manifest(manifest)
+        self._manifest = manifest
+    
+    def enforce_retention(self, folders: Optional[List[str]] = None) -> Dict[str, int]:
+        """Aplica a retenção agora (normalmente roda sozinha, no máximo uma vez por RETENTION_INTERVAL).
+        
+        Args:
+            folders: Pastas configuradas (padrão: as da última revalidação/gravação;
+                     sem nenhuma definida, só compacta).
+        
+        Returns:
+            Dicionário {'evicted', 'freed_bytes', 'removed_files'}.
+        """
+        with self._manifest_lock():
+            manifest = self._load_manifest()
+            stats = self._enforce_retention(manifest, time.time(),
+                                            self._scope if folders is None else folders)
+            self._save_manifest(manifest)
+        self._manifest = manifest
+        return stats
+    
+    def _enforce_retention(self, manifest: Dict[str, Any], now: float,
+                           folders: Optional[List[str]]) -> Dict[str, int]:
+        """Remove shards de pastas fora da configuração e compacta o diretório.
+        
+        Só pastas fora da configuração podem ser removidas: as que estão
+        sem acesso há mais de UNREFERENCED_MAX_AGE_DAYS e, enquanto o cache
+        passar de max_bytes, as usadas há mais tempo.
+        
+        Args:
+            manifest: Manifesto (alterado no lugar).
+            now: Timestamp atual.
+            folders: Pastas configuradas (None: nenhuma pasta é removida, só compacta).
+            
+        Returns:
+            Dicionário {'evicted', 'freed_bytes', 'removed_files'}.
+        """
+        shards = manifest['shards']
+        stats = {'evicted': 0, 'freed_bytes': 0, 'removed_files': 0}
+        evicted = []
+        
+        if folders is not None:
+            referenced = set(folders)
+            total_size = sum(entry['size'] for entry in shards.values())
+            max_age = self.UNREFERENCED_MAX_AGE_DAYS * 24 * 3600
+            
+            # Do acesso mais antigo para o mais recente
+            candidates = sorted((folder for folder in shards if folder not in referenced),
+                                key=lambda folder: shards[folder]['last_access'])
+            for folder in candidates:
+                idle = now - shards[folder]['last_access']
+                if idle <= max_age and (total_size <= self.max_bytes or idle < self.ACCESS_RESOLUTION):
+                    continue
+                entry = shards.pop(folder)
+                self._evict_folder(folder)
+                evicted.append(folder)
+                total_size -= entry['size']
+                stats['freed_bytes'] += entry['size']
+            stats['evicted'] = len(evicted)
+        
+        stats['removed_files'] = self._compact_storage(manifest, evicted, now)
+        manifest['last_retention'][type(self).__name__] = now
         
-        return result
+        if evicted:
+            print(f"🧹 Cache: {len(evicted)} pasta(s) fora da configuração removida(s) "
+                  f"({stats['freed_bytes'] / 1024:.1f} KB)")
+        return stats
+    
+    def _evict_folder(self, folder: str):
+        """Remove o shard e o arquivo de caminhos de uma pasta.
+        
+        Args:
+            folder: Pasta raiz do shard.
+        """
+        for path in (self._get_cache_file(folder), self._get_paths_file(folder)):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                continue
+        self._folder_caches.pop(folder, None)
+    
+    def _remove_stale_temp_files(self, now: float) -> int:
+        """Remove temporários de gravações interrompidas (atomic_write).
+        
+        Args:
+            now: Timestamp atual (temporários recentes podem ser de outro processo gravando).
+            
+        Returns:
+            Quantidade de arquivos removidos.
+        """
+        removed = 0
+        for temp_file in self.cache_dir.glob("*.tmp"):
+            try:
+                if now - temp_file.stat().st_mtime > self.STALE_TEMP_SECONDS:
+                    temp_file.unlink()
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+    
+    def _compact_storage(self, manifest: Dict[str, Any], evicted: List[str], now: float) -> int:
+        """Compacta o diretório: temporários, arquivos órfãos e listagens de pastas removidas.
+        
+        Também alinha o manifesto ao disco (ver _sync_manifest): shards removidos
+        por fora saem dele e os que faltam nele (ex: gravados por outro processo) entram.
+        
+        Args:
+            manifest: Manifesto (alterado no lugar).
+            evicted: Pastas removidas nesta passada.
+            now: Timestamp atual.
+            
+        Returns:
+            Quantidade de arquivos removidos.
+        """
+        removed = self._remove_stale_temp_files(now)
+        self._sync_manifest(manifest)
+        
+        # Arquivos de caminhos sem shard
+        shard_names = {path.stem for path in self.cache_dir.glob("folder_*.pkl")}
+        for paths_file in self.cache_dir.glob("folder_*.paths"):
+            if paths_file.stem not in shard_names:
+                try:
+                    paths_file.unlink()
+                    removed += 1
+                except OSError:
+                    continue
+        
+        self._prune_archive_index(evicted)
+        return removed
+    
+    def _sync_manifest(self, manifest: Dict[str, Any]):
+        """Alinha o manifesto ao disco: tira shards que sumiram e inclui os que faltam.
+        
+        Args:
+            manifest: Manifesto (alterado no lugar).
+        """
+        shards = manifest['shards']
+        for folder in [folder for folder in shards if not self._get_cache_file(folder).exists()]:
+            del shards[folder]
+        self._adopt_shards(manifest)
+    
+    def _prune_archive_index(self, evicted: List[str]):
+        """Remove as listagens de arquivos compactados das pastas removidas.
+        
+        Args:
+            evicted: Pastas removidas.
+        """
+        if not evicted:
+            return
+        prefixes = tuple(str(Path(folder)) + os.sep for folder in evicted)
+        self._load_archive_index()
+        stale = [path for path in self._archive_index if path.startswith(prefixes)]
+        for path in stale:
+            del self._archive_index[path]
+        if stale:
+            self._archive_index_dirty = True
+            self.save_archive_index()
     
     def clear_cache(self) -> bool:
         """Remove todos os arquivos de cache.
@@ -422,11 +1915,22 @@ class CacheManager:
             # Remove todos os arquivos .pkl no diretório de cache
             for cache_file in self.cache_dir.glob("*.pkl"):
                 cache_file.unlink()
+            for paths_file in self.cache_dir.glob("*.paths"):
+                paths_file.unlink()
+            # Temporários de gravações interrompidas
+            for temp_file in self.cache_dir.glob("*.tmp"):
+                temp_file.unlink()
             
             # Limpa cache em memória
             self._folder_caches.clear()
-            self._keyword_index = None
+            self._scope = None
+            self._all_files = None
+            self._set_keyword_index(None)
             self._loaded = False
+            self._archive_index = None
+            self._archive_index_dirty = False
+            self._manifest = None
+            self._access_recorded_at = 0.0
             
             return True
         except OSError:
@@ -441,14 +1945,15 @@ class CacheManager:
         if not self._loaded:
             self.load_cache()
         
-        if not self._folder_caches:
+        scoped = self._get_scoped_caches()
+        if not scoped:
             return None
         
         total_files = 0
-        total_size = 0
         folder_info = []
+        shards = self._get_manifest()['shards']
         
-        for folder_path, cache_data in self._folder_caches.items():
+        for folder_path, cache_data in scoped:
             metadata = cache_data.get('metadata', {})
             file_count = metadata.get('file_count', 0)
             total_files += file_count
@@ -456,22 +1961,139 @@ class CacheManager:
             folder_info.append({
                 'folder': folder_path,
                 'files': file_count,
-                'updated': metadata.get('created_at', 'Unknown')
+                'updated': metadata.get('created_at', 'Unknown'),
+                'last_access': shards.get(folder_path, {}).get('last_access')
             })
         
-        # Calcula tamanho total
-        for cache_file in self.cache_dir.glob("*.pkl"):
+        # Tamanho total: shards pelo manifesto (sem listar o diretório) mais os índices
+        total_size = sum(entry['size'] for entry in shards.values())
+        for index_file in (self._get_index_file(), self._get_archive_index_file()):
             try:
-                total_size += cache_file.stat().st_size
+                total_size += index_file.stat().st_size
             except OSError:
                 continue
         
         return {
-            'folder_count': len(self._folder_caches),
+            'folder_count': len(scoped),
             'file_count': total_files,
             'file_size': total_size,
             'has_keyword_index': self._keyword_index is not None,
             'indexed_words': len(self._keyword_index) if self._keyword_index else 0,
+            'indexed_trigrams': len(self._trigram_index),
             'folders': folder_info
         }
+    
+    def close(self):
+        """Libera os recursos do gerenciador (arquivos de caminhos abertos por get_dir_counts)."""
+        self._close_dir_stores()
+    
+    def __enter__(self) -> 'CacheManager':
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+
+CACHE_BACKENDS = ("pickle", "sqlite")
+
+
+def create_cache_manager(backend: str = "pickle", cache_dir: Optional[str] = None,
+                         max_cache_mb: Optional[int] = None) -> CacheManager:
+    """Cria o gerenciador de cache do backend escolhido.
+    
+    Args:
+        backend: "pickle" (shards por pasta) ou "sqlite" (índice com FTS para keywords)
+        cache_dir: Diretório do cache (padrão: diretório de cache do usuário)
+        max_cache_mb: Limite de tamanho do cache em MB (padrão: CacheManager.MAX_CACHE_MB)
+        
+    Returns:
+        CacheManager ou SQLiteCacheManager
+        
+    Raises:
+        ValueError: Se o backend não for suportado
+    """
+    if backend == "sqlite":
+        from .sqlite_cache import SQLiteCacheManager
+        return SQLiteCacheManager(cache_dir, max_cache_mb)
+    if backend == "pickle":
+        return CacheManager(cache_dir, max_cache_mb)
+    raise ValueError(f"Backend de cache desconhecido: {backend}")
+
+
+def get_last_cache_diagnostics() -> List[Dict[str, Any]]:
+    """Obtém o resultado por pasta da última consulta ao cache (de qualquer gerenciador).
+    
+    Returns:
+        Lista de {'folder', 'status', 'reason', 'detail', 'age'} (vazia se não houve consulta).
+    """
+    return list(_last_diagnostics)
 
+
+def wait_for_background_refreshes(timeout: Optional[float] = None) -> bool:
+    """Espera as revalidações em segundo plano (CacheManager.revalidate_in_background) terminarem.
+    
+    Args:
+        timeout: Limite de espera em segundos por revalidação (None: sem limite).
+        
+    Returns:
+        True se todas terminaram, False se alguma ainda está em andamento.
+    """
+    with _background_lock:
+        threads = list(_background_refreshes.values())
+    for thread in threads:
+        thread.join(timeout)
+    return not any(thread.is_alive() for thread in threads)
+
+
+def format_cache_age(age: Optional[float]) -> str:
+    """Formata a idade de um shard (segundos desde a última verificação).
+    
+    Args:
+        age: Idade em segundos (None se desconhecida).
+        
+    Returns:
+        Texto como "há 5 min".
+    """
+    if age is None:
+        return "em data desconhecida"
+    if age < 60:
+        return "há menos de 1 min"
+    if age < 3600:
+        return f"há {int(age // 60)} min"
+    if age < 24 * 3600:
+        return f"há {int(age // 3600)} h"
+    return f"há {int(age // (24 * 3600))} dia(s)"
+
+
+def format_cache_diagnostics(diagnostics: List[Dict[str, Any]]) -> List[str]:
+    """Formata os diagnósticos de uma consulta ao cache para o log da GUI ou a CLI.
+    
+    Args:
+        diagnostics: Resultado de get_diagnostics ou get_last_cache_diagnostics.
+        
+    Returns:
+        Linha de resumo seguida de uma linha por pasta atualizada ou com falha.
+    """
+    if not diagnostics:
+        return []
+    
+    counts = defaultdict(int)
+    for entry in diagnostics:
+        counts[entry['status']] += 1
+    summary = (f"Cache: {counts['hit']} pasta(s) válida(s), {counts['refreshed']} atualizada(s), "
+               f"{counts['miss']} com falha")
+    if counts['stale']:
+        summary += f", {counts['stale']} sem revalidar (revalidando em segundo plano)"
+    lines = [summary]
+    
+    for entry in diagnostics:
+        if entry['status'] == "stale":
+            lines.append(f"  ⧗ {entry['folder']}: verificada {format_cache_age(entry.get('age'))}")
+        elif entry['status'] == "refreshed":
+            lines.append(f"  ↻ {entry['folder']}: {entry['detail']}")
+        elif entry['status'] == "miss":
+            reason = CACHE_MISS_REASONS.get(entry['reason'], entry['reason'])
+            detail = f" ({entry['detail']})" if entry.get('detail') else ""
+            lines.append(f"  ✗ {entry['folder']}: {reason}{detail}")
+    return lines
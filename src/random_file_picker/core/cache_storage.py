@@ -0,0 +1,167 @@
+"""Local do cache por usuário, escrita atômica e trava entre processos."""
+
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:  # POSIX
+    msvcrt = None
+
+# Variável de ambiente que substitui o diretório de cache padrão
+CACHE_DIR_ENV = "RANDOM_FILE_PICKER_CACHE_DIR"
+
+APP_NAME = "random_file_picker"
+
+
+def get_default_cache_dir() -> Path:
+    """Obtém o diretório de cache do usuário (independente da pasta atual).
+
+    Ordem: RANDOM_FILE_PICKER_CACHE_DIR; no Windows, %LOCALAPPDATA%; no macOS,
+    ~/Library/Caches; nos demais, $XDG_CACHE_HOME (ou ~/.cache).
+
+    Returns:
+        Caminho do diretório (pode ainda não existir).
+    """
+    override = os.environ.get(CACHE_DIR_ENV)
+    if override:
+        return Path(override).expanduser()
+
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or str(Path.home() / "AppData" / "Local")
+        return Path(base) / APP_NAME / "cache"
+
+    if sys.platform == "darwin":
+        return Path.home() / "Library" / "Caches" / APP_NAME
+
+    # A especificação XDG manda ignorar caminhos relativos
+    base = os.environ.get("XDG_CACHE_HOME")
+    if not base or not os.path.isabs(base):
+        base = str(Path.home() / ".cache")
+    return Path(base) / APP_NAME
+
+
+@contextmanager
+def atomic_write(target: Path, mode: str = 'wb'):
+    """Grava um arquivo por completo ou não o altera.
+
+    O conteúdo vai para um arquivo temporário na mesma pasta, que substitui
+    o destino com os.replace só depois de gravado: leitores (inclusive de
+    outros processos) veem o arquivo antigo ou o novo, nunca um pela metade.
+
+    Args:
+        target: Arquivo de destino.
+        mode: Modo de abertura ('wb' ou 'w').
+
+    Yields:
+        Arquivo temporário aberto para escrita.
+
+    Raises:
+        OSError: Se o arquivo não puder ser gravado (o destino fica intacto).
+    """
+    target = Path(target)
+    fd, temp_name = tempfile.mkstemp(prefix=target.name + ".", suffix=".tmp", dir=target.parent)
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_name, target)
+    except BaseException:
+        try:
+            os.unlink(temp_name)
+        except OSError:
+            pass
+        raise
+
+
+class FileLock:
+    """Trava exclusiva entre processos sobre um arquivo (consultiva).
+
+    Usa flock no POSIX e msvcrt.locking no Windows. O sistema libera a trava
+    se o processo terminar, então uma falha não deixa o cache travado.
+    """
+
+    # Intervalo entre tentativas no Windows (msvcrt não tem espera sem limite)
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, lock_file: Path):
+        """Inicializa a trava (sem adquiri-la).
+
+        Args:
+            lock_file: Arquivo usado como trava (criado se não existir).
+        """
+        self.lock_file = Path(lock_file)
+        self._fd: Optional[int] = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """Adquire a trava.
+
+        Args:
+            blocking: Se True, espera outro processo liberá-la.
+
+        Returns:
+            True se adquiriu, False se está com outro processo (só sem blocking).
+
+        Raises:
+            OSError: Se o arquivo de trava não puder ser aberto.
+        """
+        if self._fd is not None:
+            return True
+
+        fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+                fcntl.flock(fd, flags)
+            elif msvcrt is not None:
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        if not blocking:
+                            raise
+                        time.sleep(self.POLL_INTERVAL)
+        except OSError:
+            # Trava com outro processo (sem blocking) ou erro ao travar
+            os.close(fd)
+            if blocking:
+                raise
+            return False
+
+        self._fd = fd
+        return True
+
+    def release(self):
+        """Libera a trava (sem efeito se não estiver adquirida)."""
+        if self._fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
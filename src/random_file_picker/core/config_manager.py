@@ -106,6 +106,13 @@ class ConfigManager:
             "keywords_match_all": False,
             "process_zip": True,
             "tmdb_api_key": "",
+            "index_archives": False,
+            "tracker_backend": "json",
+            "extraction_cache_mb": 1024,
+            "cache_backend": "pickle",
+            "no_repeat": False,
+            "folder_weighting": None,
+            "stale_cache": False,
             "file_history": [],
             "last_opened_folder": None
         }
@@ -171,6 +178,35 @@ class ConfigManager:
         if not isinstance(validated['enable_cloud_hydration'], bool):
             validated['enable_cloud_hydration'] = False
         
+        validated['index_archives'] = config.get('index_archives', default['index_archives'])
+        if not isinstance(validated['index_archives'], bool):
+            validated['index_archives'] = default['index_archives']
+        
+        validated['tracker_backend'] = config.get('tracker_backend', default['tracker_backend'])
+        if validated['tracker_backend'] not in ("json", "sqlite"):
+            validated['tracker_backend'] = default['tracker_backend']
+        
+        validated['extraction_cache_mb'] = config.get('extraction_cache_mb', default['extraction_cache_mb'])
+        if (not isinstance(validated['extraction_cache_mb'], int) or isinstance(validated['extraction_cache_mb'], bool)
+                or validated['extraction_cache_mb'] < 0):
+            validated['extraction_cache_mb'] = default['extraction_cache_mb']
+        
+        validated['cache_backend'] = config.get('cache_backend', default['cache_backend'])
+        if validated['cache_backend'] not in ("pickle", "sqlite"):
+            validated['cache_backend'] = default['cache_backend']
+        
+        validated['no_repeat'] = config.get('no_repeat', default['no_repeat'])
+        if not isinstance(validated['no_repeat'], bool):
+            validated['no_repeat'] = default['no_repeat']
+        
+        validated['folder_weighting'] = config.get('folder_weighting', default['folder_weighting'])
+        if validated['folder_weighting'] not in (None, "uniform", "sqrt", "unread"):
+            validated['folder_weighting'] = default['folder_weighting']
+        
+        validated['stale_cache'] = config.get('stale_cache', default['stale_cache'])
+        if not isinstance(validated['stale_cache'], bool):
+            validated['stale_cache'] = default['stale_cache']
+        
         validated['file_history'] = config.get('file_history', default['file_history'])
         if not isinstance(validated['file_history'], list):
             validated['file_history'] = default['file_history']
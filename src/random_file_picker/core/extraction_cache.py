@@ -0,0 +1,272 @@
+"""Cache em disco de membros extraídos de arquivos compactados."""
+
+import hashlib
+import os
+import pickle
+import shutil
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from .cache_storage import FileLock, atomic_write, get_default_cache_dir
+
+# Limite padrão do cache de extração
+DEFAULT_EXTRACTION_CACHE_MB = 1024
+
+
+class ExtractionCache:
+    """Cache de extração com limite de bytes e remoção LRU:
+    - Cada membro fica em <cache_dir>/<chave>/<nome do arquivo>
+    - Chave: (arquivo compactado, tamanho, mtime, membro) - muda se o arquivo mudar
+    - Ao passar do limite, remove as entradas usadas há mais tempo
+    - O índice é relido e regravado sob a trava index.lock (vários processos
+      podem extrair ao mesmo tempo)
+    """
+
+    # Último uso só é regravado no índice se mudou mais que isso
+    ACCESS_RESOLUTION = 3600
+    # Pastas fora do índice mais novas que isso podem ser extrações de outro processo
+    ORPHAN_GRACE_SECONDS = 3600
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        """Inicializa o cache de extração.
+
+        Args:
+            cache_dir: Diretório do cache (relativo à pasta atual; padrão: "extracted"
+                       no diretório de cache do usuário).
+            max_bytes: Limite em bytes (padrão: DEFAULT_EXTRACTION_CACHE_MB).
+        """
+        if cache_dir:
+            self.cache_dir = Path.cwd() / cache_dir
+        else:
+            self.cache_dir = get_default_cache_dir() / "extracted"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        if max_bytes is None:
+            max_bytes = DEFAULT_EXTRACTION_CACHE_MB * 1024 * 1024
+        self.max_bytes = max_bytes
+
+        # Índice em memória (lazy loading): chave -> {'file', 'size', 'last_used'}
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        # Últimos usos deste processo ainda não gravados (ver ACCESS_RESOLUTION)
+        self._touched: Dict[str, float] = {}
+
+    @staticmethod
+    def make_key(archive_path: str, member: str, size: int, mtime: float) -> str:
+        """Gera a chave de um membro extraído.
+
+        Args:
+            archive_path: Caminho (real ou virtual) do arquivo compactado.
+            member: Nome do membro.
+            size: Tamanho do arquivo compactado em disco.
+            mtime: mtime do arquivo compactado em disco.
+
+        Returns:
+            Hash MD5 da combinação.
+        """
+        return hashlib.md5(f"{archive_path}|{size}|{mtime}|{member}".encode()).hexdigest()
+
+    def _get_index_file(self) -> Path:
+        """Obtém caminho do índice do cache de extração."""
+        return self.cache_dir / "index.pkl"
+
+    @contextmanager
+    def _lock(self):
+        """Trava a leitura-alteração-gravação do índice entre processos."""
+        lock = FileLock(self.cache_dir / "index.lock")
+        try:
+            lock.acquire()
+        except OSError:
+            # Sem suporte a travas (ex: sistema de arquivos somente leitura):
+            # segue sem coordenação
+            pass
+
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def _read_index(self) -> Dict[str, Dict[str, Any]]:
+        """Lê o índice do disco (vazio se ausente ou inválido)."""
+        try:
+            with open(self._get_index_file(), 'rb') as f:
+                return pickle.load(f)
+        except (pickle.PickleError, OSError, EOFError):
+            return {}
+
+    def _load(self):
+        """Carrega o índice e remove pastas que não estão nele (extrações interrompidas)."""
+        if self._entries is not None:
+            return
+
+        with self._lock():
+            self._entries = self._read_index()
+            now = time.time()
+            for entry_dir in self.cache_dir.iterdir():
+                if entry_dir.is_dir() and entry_dir.name not in self._entries and \
+                        now - self._last_modified(entry_dir) > self.ORPHAN_GRACE_SECONDS:
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+
+    @staticmethod
+    def _last_modified(entry_dir: Path) -> float:
+        """Retorna o mtime mais recente da pasta e dos arquivos (inclusive .part em gravação)."""
+        latest = 0.0
+        try:
+            paths = [entry_dir, *entry_dir.iterdir()]
+        except OSError:
+            return latest
+        for path in paths:
+            try:
+                latest = max(latest, path.stat().st_mtime)
+            except OSError:
+                continue
+        return latest
+
+    def _update(self, changed: Optional[Dict[str, Dict[str, Any]]] = None,
+                removed: Iterable[str] = (), keep: Optional[str] = None) -> bool:
+        """Aplica alterações sobre o índice atual do disco e o grava.
+
+        O índice é relido sob a trava, para não descartar entradas gravadas
+        por outros processos desde a última leitura.
+
+        Args:
+            changed: Entradas novas ou alteradas, por chave.
+            removed: Chaves a remover (índice e disco).
+            keep: Chave que nunca é removida pelo limite de bytes.
+
+        Returns:
+            True se salvou, False em caso de erro.
+        """
+        with self._lock():
+            self._entries = self._read_index()
+            self._entries.update(changed or {})
+            for key, last_used in self._touched.items():
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry['last_used'] = max(entry['last_used'], last_used)
+            self._touched = {}
+            for key in removed:
+                self._remove(key)
+            self._evict(keep=keep)
+            return self._save()
+
+    def _save(self) -> bool:
+        """Salva o índice (escrita atômica).
+
+        Returns:
+            True se salvou, False em caso de erro.
+        """
+        try:
+            with atomic_write(self._get_index_file()) as f:
+                pickle.dump(self._entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except (OSError, pickle.PickleError):
+            return False
+        return True
+
+    def _remove(self, key: str):
+        """Remove uma entrada do índice e do disco."""
+        self._entries.pop(key, None)
+        shutil.rmtree(self.cache_dir / key, ignore_errors=True)
+
+    def get(self, key: str) -> Optional[str]:
+        """Obtém o caminho de um membro já extraído.
+
+        Args:
+            key: Chave (make_key).
+
+        Returns:
+            Caminho do arquivo extraído ou None se não estiver no cache.
+        """
+        self._load()
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        file_path = self.cache_dir / key / entry['file']
+        if not file_path.exists():
+            # Removido por fora (ou por outro processo)
+            self._update(removed=[key])
+            return None
+
+        now = time.time()
+        if now - entry['last_used'] >= self.ACCESS_RESOLUTION:
+            entry['last_used'] = now
+            self._update({key: entry})
+        else:
+            # Conta para a remoção LRU deste processo; vai para o disco na próxima gravação
+            self._touched[key] = now
+        return str(file_path)
+
+    def put(self, key: str, filename: str, write_file: Callable[[str], None]) -> str:
+        """Extrai um membro para o cache e aplica o limite de bytes.
+
+        Args:
+            key: Chave (make_key).
+            filename: Nome do arquivo extraído (mantém a extensão original).
+            write_file: Função que grava o conteúdo no caminho recebido.
+
+        Returns:
+            Caminho do arquivo extraído.
+
+        Raises:
+            Exception: Erros de write_file (a entrada parcial é removida).
+        """
+        self._load()
+
+        entry_dir = self.cache_dir / key
+        entry_dir.mkdir(exist_ok=True)
+        target = entry_dir / filename
+        partial = entry_dir / (filename + ".part")
+
+        try:
+            write_file(str(partial))
+            os.replace(partial, target)
+        except Exception:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            raise
+
+        entry = {'file': filename, 'size': target.stat().st_size, 'last_used': time.time()}
+        self._update({key: entry}, keep=key)
+        return str(target)
+
+    def _evict(self, keep: Optional[str] = None):
+        """Remove as entradas usadas há mais tempo até caber no limite.
+
+        Args:
+            keep: Chave que nunca é removida (a recém-extraída).
+        """
+        total = sum(entry['size'] for entry in self._entries.values())
+        if total <= self.max_bytes:
+            return
+
+        def last_use(item):
+            return max(item[1]['last_used'], self._touched.get(item[0], 0))
+
+        by_last_use = sorted(self._entries.items(), key=last_use)
+        for key, entry in by_last_use:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self._remove(key)
+            total -= entry['size']
+
+    def get_total_size(self) -> int:
+        """Retorna o total de bytes ocupados pelos membros em cache."""
+        self._load()
+        return sum(entry['size'] for entry in self._entries.values())
+
+    def clear(self) -> bool:
+        """Remove todos os membros extraídos.
+
+        Returns:
+            True se removeu com sucesso, False caso contrário.
+        """
+        self._load()
+        with self._lock():
+            self._entries = self._read_index()
+            for key in list(self._entries):
+                self._remove(key)
+            self._touched = {}
+            return self._save()
@@ -1,15 +1,34 @@
+import io
 import os
 import random
 import subprocess
 import platform
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional
 import time
 import zipfile
 import tempfile
 import shutil
 
-from .cache_manager import CacheManager
+from .cache_manager import CacheManager, create_cache_manager, format_cache_diagnostics
+from .extraction_cache import ExtractionCache
+from .file_scanner import flatten_tree, scan_tree
+from .file_table import MISSING_SIZE, FileTable
+from .random_selection import choose_index, choose_streaming
+from .shuffle_bag import ShuffleBag
+from .weighted_selection import FOLDER_WEIGHTINGS, FolderSampler
+
+# Extensões tratadas como arquivos compactados navegáveis
+ARCHIVE_EXTENSIONS = ('.zip', '.rar')
+
+# Separador entre o arquivo compactado e o membro em caminhos virtuais (ex: "pack.zip!/dir/arquivo.jpg")
+ARCHIVE_MEMBER_SEPARATOR = "!/"
+
+# Limite de arquivos compactados aninhados
+MAX_ARCHIVE_RECURSION = 3
+
+# Arquivos compactados aninhados até este tamanho são lidos em memória
+NESTED_ARCHIVE_MEMORY_LIMIT = 256 * 1024 * 1024
 
 
 def is_file_accessible(file_path: Path) -> bool:
@@ -43,10 +62,12 @@ def is_file_accessible(file_path: Path) -> bool:
 
 def list_files_in_zip(zip_path: str, exclude_prefix: str = "_L_", keywords: List[str] = None, keywords_match_all: bool = False, ignored_extensions: List[str] = None) -> List[str]:
     """
-    Lista todos os arquivos dentro de um arquivo ZIP, aplicando filtros.
+    Lista todos os arquivos dentro de um arquivo ZIP (ou RAR), aplicando filtros.
+    
+    Lê apenas o diretório central do arquivo, sem extrair nada.
     
     Args:
-        zip_path: Caminho do arquivo ZIP
+        zip_path: Caminho do arquivo ZIP ou RAR
         exclude_prefix: Prefixos a serem excluídos dos resultados (separados por vírgula)
         keywords: Lista de palavras-chave para filtrar arquivos
         ignored_extensions: Lista de extensões a ignorar (ex: ['srt', 'sub'])
@@ -54,6 +75,36 @@ def list_files_in_zip(zip_path: str, exclude_prefix: str = "_L_", keywords: List
     Returns:
         Lista com os nomes dos arquivos válidos dentro do ZIP
     """
+    try:
+        with open_archive(zip_path) as zip_file:
+            # Ignora diretórios
+            members = [file_info.filename for file_info in zip_file.infolist() if not file_info.is_dir()]
+    
+    except ImportError:
+        print("Aviso: Biblioteca 'rarfile' não instalada. Instale com: pip install rarfile")
+        return []
+    except Exception as e:
+        # zipfile.BadZipFile, erros de acesso e erros do rarfile
+        print(f"Erro ao acessar ZIP '{zip_path}': {e}")
+        return []
+    
+    return filter_archive_members(members, exclude_prefix, keywords, keywords_match_all, ignored_extensions)
+
+
+def filter_archive_members(members: List[str], exclude_prefix: str = "_L_", keywords: List[str] = None, keywords_match_all: bool = False, ignored_extensions: List[str] = None) -> List[str]:
+    """
+    Aplica aos nomes de membros de um arquivo compactado os mesmos filtros de collect_files.
+    
+    Args:
+        members: Nomes dos membros (com '/', sem diretórios)
+        exclude_prefix: Prefixos a serem excluídos dos resultados (separados por vírgula)
+        keywords: Lista de palavras-chave para filtrar arquivos
+        keywords_match_all: Se True, todas as keywords devem estar presentes (AND)
+        ignored_extensions: Lista de extensões a ignorar (ex: ['srt', 'sub'])
+        
+    Returns:
+        Lista com os nomes dos membros válidos
+    """
     valid_files = []
     
     # Normaliza prefixos
@@ -64,64 +115,175 @@ def list_files_in_zip(zip_path: str, exclude_prefix: str = "_L_", keywords: List
     if ignored_extensions:
         ignored_ext_set = {ext.lower().lstrip('.') for ext in ignored_extensions}
     
-    try:
-        with zipfile.ZipFile(zip_path, 'r') as zip_file:
-            for file_info in zip_file.filelist:
-                # Ignora diretórios
-                if file_info.is_dir():
-                    continue
-                
-                file_name = os.path.basename(file_info.filename)
-                
-                # Verifica se o arquivo começa com '.'
-                if file_name.startswith('.'):
-                    continue
-                
-                # Verifica prefixos
-                if any(file_name.startswith(prefix) for prefix in exclude_prefixes):
+    keywords_lower = [kw.lower() for kw in keywords] if keywords else []
+    
+    for member in members:
+        file_name = os.path.basename(member)
+        
+        # Verifica se o arquivo começa com '.'
+        if file_name.startswith('.'):
+            continue
+        
+        # Verifica prefixos
+        if any(file_name.startswith(prefix) for prefix in exclude_prefixes):
+            continue
+        
+        # Filtra por extensões ignoradas
+        if ignored_ext_set:
+            file_ext = os.path.splitext(file_name)[1].lower().lstrip('.')
+            if file_ext in ignored_ext_set:
+                continue
+        
+        # Ignora pastas ocultas (com '.')
+        path_parts = member.split('/')
+        if any(part.startswith('.') for part in path_parts[:-1]):
+            continue
+        
+        # Filtra por palavras-chave se fornecidas
+        if keywords_lower:
+            file_name_lower = file_name.lower()
+            if keywords_match_all:
+                # Modo AND: todas as palavras devem estar presentes
+                if not all(keyword in file_name_lower for keyword in keywords_lower):
                     continue
-                
-                # Filtra por extensões ignoradas
-                if ignored_ext_set:
-                    file_ext = os.path.splitext(file_name)[1].lower().lstrip('.')
-                    if file_ext in ignored_ext_set:
-                        continue
-                
-                # Ignora pastas ocultas (com '.')
-                path_parts = file_info.filename.split('/')
-                if any(part.startswith('.') for part in path_parts[:-1]):
+            else:
+                # Modo OR: ao menos uma palavra deve estar presente
+                if not any(keyword in file_name_lower for keyword in keywords_lower):
                     continue
-                
-                # Filtra por palavras-chave se fornecidas
-                if keywords:
-                    file_name_lower = file_name.lower()
-                    keywords_lower = [kw.lower() for kw in keywords]
-                    if keywords_match_all:
-                        # Modo AND: todas as palavras devem estar presentes
-                        if not all(keyword in file_name_lower for keyword in keywords_lower):
-                            continue
-                    else:
-                        # Modo OR: ao menos uma palavra deve estar presente
-                        if not any(keyword in file_name_lower for keyword in keywords_lower):
-                            continue
-                
-                valid_files.append(file_info.filename)
-    
-    except (zipfile.BadZipFile, FileNotFoundError, PermissionError) as e:
-        print(f"Erro ao acessar ZIP '{zip_path}': {e}")
-        return []
+        
+        valid_files.append(member)
     
     return valid_files
 
 
-def extract_file_from_zip(zip_path: str, file_in_zip: str, temp_dir: str = None) -> str:
+def is_archive_file(file_path: str) -> bool:
+    """
+    Verifica se o caminho é de um arquivo compactado suportado (ZIP/RAR).
+    
+    Args:
+        file_path: Caminho ou nome do arquivo
+        
+    Returns:
+        True se a extensão for de arquivo compactado
+    """
+    return file_path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def open_archive(archive_path: str, archive_file=None):
+    """
+    Abre um arquivo ZIP ou RAR para leitura.
+    
+    Args:
+        archive_path: Caminho do arquivo compactado (define o formato pela extensão)
+        archive_file: Objeto de arquivo seekable com o conteúdo (ex: arquivo
+                      compactado aninhado lido em memória). Se None, abre archive_path.
+        
+    Returns:
+        zipfile.ZipFile ou rarfile.RarFile (ambos com infolist/open/extract)
+        
+    Raises:
+        ImportError: Se for RAR e a biblioteca 'rarfile' não estiver instalada
+    """
+    source = archive_file if archive_file is not None else archive_path
+    if archive_path.lower().endswith('.rar'):
+        import rarfile
+        return rarfile.RarFile(source, 'r')
+    return zipfile.ZipFile(source, 'r')
+
+
+def is_archive_member_path(file_path: str) -> bool:
+    """
+    Verifica se o caminho é virtual (membro de um arquivo compactado).
+    
+    Args:
+        file_path: Caminho a verificar
+        
+    Returns:
+        True se o caminho estiver no formato "arquivo.zip!/membro"
+    """
+    return split_archive_member_path(file_path) is not None
+
+
+def split_archive_member_path(file_path: str) -> Optional[Tuple[str, str]]:
+    """
+    Separa um caminho virtual em (arquivo compactado, membro).
+    
+    Args:
+        file_path: Caminho no formato "arquivo.zip!/pasta/membro"
+        
+    Returns:
+        Tupla (caminho do arquivo compactado, nome do membro) ou None se não for virtual
+    """
+    position = file_path.find(ARCHIVE_MEMBER_SEPARATOR)
+    while position != -1:
+        archive_path = file_path[:position]
+        if is_archive_file(archive_path):
+            return archive_path, file_path[position + len(ARCHIVE_MEMBER_SEPARATOR):]
+        position = file_path.find(ARCHIVE_MEMBER_SEPARATOR, position + 1)
+    return None
+
+
+def make_archive_member_path(archive_path: str, member: str) -> str:
     """
-    Extrai um arquivo específico de um ZIP para uma pasta temporária.
+    Monta o caminho virtual de um membro de arquivo compactado.
     
     Args:
-        zip_path: Caminho do arquivo ZIP
+        archive_path: Caminho do arquivo compactado
+        member: Nome do membro dentro do arquivo (com '/')
+        
+    Returns:
+        Caminho virtual no formato "arquivo.zip!/pasta/membro"
+    """
+    return f"{archive_path}{ARCHIVE_MEMBER_SEPARATOR}{member}"
+
+
+def _extract_to_cache(archive, archive_path: str, member: str,
+                      extraction_cache: ExtractionCache) -> Optional[str]:
+    """
+    Obtém um membro do cache de extração, extraindo-o apenas se ainda não estiver lá.
+    
+    A chave usa tamanho e mtime do arquivo compactado em disco (o mais externo,
+    para caminhos virtuais de arquivos aninhados).
+    
+    Args:
+        archive: Arquivo compactado já aberto
+        archive_path: Caminho (real ou virtual) do arquivo compactado
+        member: Nome do membro
+        extraction_cache: Cache de extração
+        
+    Returns:
+        Caminho do arquivo no cache ou None se o arquivo em disco não puder ser lido
+    """
+    split = split_archive_member_path(archive_path)
+    disk_path = split[0] if split else archive_path
+    try:
+        archive_stat = os.stat(disk_path)
+    except OSError:
+        return None
+    
+    key = ExtractionCache.make_key(archive_path, member, archive_stat.st_size, archive_stat.st_mtime)
+    cached_path = extraction_cache.get(key)
+    if cached_path:
+        print(f"✓ Servido do cache de extração: {member}")
+        return cached_path
+    
+    def write_member(target: str):
+        with archive.open(member) as member_file, open(target, 'wb') as output:
+            shutil.copyfileobj(member_file, output)
+    
+    return extraction_cache.put(key, os.path.basename(member), write_member)
+
+
+def extract_file_from_zip(zip_path: str, file_in_zip: str, temp_dir: str = None, extraction_cache: Optional[ExtractionCache] = None) -> str:
+    """
+    Extrai um arquivo específico de um ZIP (ou RAR) para uma pasta temporária.
+    
+    Args:
+        zip_path: Caminho do arquivo ZIP ou RAR
         file_in_zip: Nome do arquivo dentro do ZIP
         temp_dir: Diretório temporário (se None, cria um novo)
+        extraction_cache: Cache de extração; se informado, o arquivo é servido
+                          dele (e temp_dir é ignorado)
         
     Returns:
         Caminho completo do arquivo extraído
@@ -130,12 +292,18 @@ def extract_file_from_zip(zip_path: str, file_in_zip: str, temp_dir: str = None)
         Exception: Se houver erro na extração
     """
     try:
+        if extraction_cache is not None:
+            with open_archive(zip_path) as zip_file:
+                cached_path = _extract_to_cache(zip_file, zip_path, file_in_zip, extraction_cache)
+            if cached_path:
+                return cached_path
+        
         # Cria diretório temporário se não fornecido
         if temp_dir is None:
             temp_dir = tempfile.mkdtemp(prefix="zip_extract_")
         
         # Abre o ZIP e extrai o arquivo
-        with zipfile.ZipFile(zip_path, 'r') as zip_file:
+        with open_archive(zip_path) as zip_file:
             # Extrai o arquivo
             extracted_path = zip_file.extract(file_in_zip, temp_dir)
             return extracted_path
@@ -144,6 +312,23 @@ def extract_file_from_zip(zip_path: str, file_in_zip: str, temp_dir: str = None)
         raise Exception(f"Erro ao extrair arquivo do ZIP: {e}")
 
 
+def create_extraction_cache(extraction_cache_mb: Optional[int] = None) -> Optional[ExtractionCache]:
+    """
+    Cria o cache de extração com o limite configurado.
+    
+    Args:
+        extraction_cache_mb: Limite em MB (None usa DEFAULT_EXTRACTION_CACHE_MB, 0 desativa o cache)
+        
+    Returns:
+        ExtractionCache, ou None se desativado
+    """
+    if extraction_cache_mb == 0:
+        return None
+    
+    max_bytes = extraction_cache_mb * 1024 * 1024 if extraction_cache_mb is not None else None
+    return ExtractionCache(max_bytes=max_bytes)
+
+
 def get_temp_extraction_dir() -> str:
     """
     Cria e retorna o caminho de um diretório temporário para extração de ZIPs.
@@ -169,49 +354,64 @@ def cleanup_temp_dir(temp_dir: str):
 
 
 
-def collect_files(folders: List[str], exclude_prefix: str = "_L_", check_accessibility: bool = False, keywords: List[str] = None, use_cache: bool = True, process_zip: bool = False, keywords_match_all: bool = False, ignored_extensions: List[str] = None) -> List[str]:
+def _collect_file_table(folders: List[str], exclude_prefix: str = "_L_", check_accessibility: bool = False, keywords: List[str] = None, use_cache: bool = True, process_zip: bool = False, keywords_match_all: bool = False, ignored_extensions: List[str] = None, cache_manager: Optional[CacheManager] = None, index_archives: bool = False, cache_backend: str = "pickle", stale_cache: bool = False) -> FileTable:
     """
-    Coleta todos os arquivos das pastas e subpastas informadas,
-    excluindo arquivos que começam com os prefixos especificados.
-    Inclui arquivos em nuvem mesmo que não estejam sincronizados localmente.
-    Ignora pastas que começam com '.' (pastas ocultas).
+    Coleta os arquivos válidos em uma tabela colunar (FileTable).
+    Base de collect_files e collect_files_by_folder: uma única varredura (ou cache).
     
     Args:
-        folders: Lista de caminhos das pastas para buscar
-        exclude_prefix: Prefixos a serem excluídos dos resultados (separados por vírgula)
-        check_accessibility: Se True, verifica se arquivos estão acessíveis localmente
-        keywords: Lista de palavras-chave. Se fornecida, apenas arquivos que contenham
-                 ao menos uma palavra-chave no nome serão incluídos.
-        use_cache: Se True, usa cache para acelerar buscas (padrão: True)
-        ignored_extensions: Lista de extensões a ignorar (ex: ['srt', 'sub'])
+        Mesmos argumentos de collect_files.
+        cache_manager: Gerenciador de cache a usar (padrão: um novo do backend cache_backend).
+        index_archives: Se True, arquivos ZIP/RAR são substituídos por seus membros
+                        (caminhos virtuais "arquivo.zip!/membro", ver _merge_archive_members).
+        stale_cache: Se True, responde com o cache gravado sem revalidar as pastas
+                     e revalida em segundo plano (ver _revalidate_in_background).
         
     Returns:
-        Lista com os caminhos completos dos arquivos válidos
+        Tabela com os arquivos válidos
     """
-    cache_manager = CacheManager()
+    if cache_manager is None:
+        # Gerenciador próprio: fechado ao terminar (a tabela devolvida não depende dele)
+        with create_cache_manager(cache_backend) as cache_manager:
+            return _collect_file_table(folders, exclude_prefix, check_accessibility, keywords, use_cache,
+                                       process_zip, keywords_match_all, ignored_extensions, cache_manager,
+                                       index_archives, cache_backend, stale_cache)
     
     # Normaliza extensões ignoradas
     ignored_ext_set = set()
     if ignored_extensions:
         ignored_ext_set = {ext.lower().lstrip('.') for ext in ignored_extensions}
     
-    # Tenta usar cache se habilitado
-    if use_cache and cache_manager.is_cache_valid(
-        folders, exclude_prefix, ".", keywords or [], False, keywords_match_all
-    ):
+    # Modo stale-while-revalidate: usa o cache gravado e revalida em segundo plano
+    cache_hit = use_cache and stale_cache and cache_manager.use_stale_cache(folders, exclude_prefix, ".", process_zip)
+    if cache_hit:
+        _revalidate_in_background(cache_manager, folders, exclude_prefix, process_zip)
+    else:
+        # Tenta usar cache se habilitado (revalidação incremental: relista só pastas alteradas)
+        cache_hit = use_cache and cache_manager.refresh_cache(folders, exclude_prefix, ".", process_zip)
+    if use_cache:
+        # Pastas atualizadas no lugar ou motivo da falha (ver format_cache_diagnostics)
+        for line in format_cache_diagnostics(cache_manager.get_diagnostics())[1:]:
+            print(line)
+    
+    if use_cache and not cache_hit:
+        # Um único processo reconstrói o cache; os demais esperam e reaproveitam o resultado
+        with cache_manager.writer_lock() as waited:
+            if waited:
+                cache_hit = cache_manager.refresh_cache(folders, exclude_prefix, ".", process_zip)
+            if not cache_hit:
+                return _scan_file_table(folders, exclude_prefix, check_accessibility, keywords, use_cache,
+                                        process_zip, keywords_match_all, ignored_extensions, ignored_ext_set,
+                                        cache_manager, index_archives)
+    
+    if cache_hit:
         print("✓ Usando cache de arquivos (busca instantânea)...")
         
         # OTIMIZADO: Usa índice de keywords para busca instantânea
-        cached_files = cache_manager.get_cached_files(keywords, keywords_match_all)
+        cached_files = cache_manager.get_cached_table(keywords, keywords_match_all)
         
         # Filtra por extensões ignoradas
-        if ignored_ext_set:
-            cached_files = [
-                f for f in cached_files 
-                if Path(f['path']).suffix.lower().lstrip('.') not in ignored_ext_set
-            ]
-        
-        valid_files = [f['path'] for f in cached_files]
+        cached_files = cached_files.exclude_extensions(ignored_ext_set)
         
         cache_info = cache_manager.get_cache_info()
         if cache_info:
@@ -221,15 +421,113 @@ def collect_files(folders: List[str], exclude_prefix: str = "_L_", check_accessi
             if indexed_words > 0:
                 print(f"  Índice: {indexed_words} palavras indexadas")
         
-        return valid_files
+        if index_archives:
+            cached_files = _merge_archive_members(
+                cached_files, cache_manager.get_cached_table(), cache_manager, exclude_prefix,
+                keywords, keywords_match_all, ignored_extensions, check_accessibility
+            )
+            cache_manager.save_archive_index()
+        
+        return cached_files
+    
+    # Cache desativado: só varre
+    return _scan_file_table(folders, exclude_prefix, check_accessibility, keywords, use_cache,
+                            process_zip, keywords_match_all, ignored_extensions, ignored_ext_set,
+                            cache_manager, index_archives)
+
+
+def _revalidate_in_background(cache_manager: CacheManager, folders: List[str], exclude_prefix: str,
+                              process_zip: bool):
+    """
+    Agenda a revalidação do cache usado sem verificar as pastas (modo stale_cache).
+    Se o cache não puder ser atualizado no lugar, a thread varre as pastas de novo.
+    
+    Args:
+        cache_manager: Gerenciador que respondeu com o cache gravado
+        folders: Lista de caminhos das pastas
+        exclude_prefix: Prefixo excluído dos resultados
+        process_zip: Se processa arquivos ZIP (mesmo valor usado ao gravar o cache)
+        
+    Returns:
+        Thread da revalidação (ver CacheManager.revalidate_in_background)
+    """
+    def rescan(worker: CacheManager):
+        _scan_file_table(folders, exclude_prefix, False, None, True, process_zip, False, None, set(),
+                         worker, False)
+    
+    return cache_manager.revalidate_in_background(folders, exclude_prefix, ".", process_zip, rescan)
+
+
+def _scan_file_table(folders: List[str], exclude_prefix: str, check_accessibility: bool,
+                     keywords: Optional[List[str]], use_cache: bool, process_zip: bool,
+                     keywords_match_all: bool, ignored_extensions: Optional[List[str]], ignored_ext_set: set,
+                     cache_manager: CacheManager, index_archives: bool) -> FileTable:
+    """
+    Varre as pastas e monta a tabela de arquivos válidos, gravando o cache se habilitado.
     
+    Args:
+        Mesmos argumentos de _collect_file_table.
+        ignored_ext_set: Extensões ignoradas (minúsculas, sem ponto)
+        
+    Returns:
+        Tabela com os arquivos válidos
+    """
     # Busca normal se cache não disponível/inválido
     if use_cache:
         print("⏳ Criando novo cache (primeira busca pode demorar)...")
     
-    valid_files = []
     file_data = []  # Para salvar no cache
+    trees = {}  # Árvores de pastas com mtimes (revalidação incremental)
+    valid_files = FileTable.from_records(_scan_valid_records(
+        folders, exclude_prefix, check_accessibility, keywords, keywords_match_all, ignored_ext_set,
+        file_data, trees
+    ))
+    
+    if index_archives:
+        valid_files = _merge_archive_members(
+            valid_files, FileTable.from_records(file_data), cache_manager, exclude_prefix,
+            keywords, keywords_match_all, ignored_extensions, check_accessibility
+        )
+        if use_cache:
+            cache_manager.save_archive_index()
+    
+    # Salva cache se habilitado
+    if use_cache and trees:
+        success = cache_manager.save_cache(
+            file_data, folders, exclude_prefix, ".", keywords or [], process_zip, keywords_match_all,
+            trees=trees
+        )
+        
+        if success:
+            print(f"✓ Cache criado: {len(file_data)} arquivos indexados")
+        else:
+            print("⚠ Aviso: Não foi possível salvar o cache")
+    
+    return valid_files
+
+
+def _scan_valid_records(folders: List[str], exclude_prefix: str, check_accessibility: bool,
+                        keywords: Optional[List[str]], keywords_match_all: bool, ignored_ext_set: set,
+                        file_data: Optional[List[Dict[str, Any]]] = None,
+                        trees: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None):
+    """
+    Varre as pastas e gera os registros que passam pelos filtros, um a um.
+    
+    Args:
+        folders: Lista de caminhos das pastas
+        exclude_prefix: Prefixo a ser excluído dos resultados
+        check_accessibility: Se True, ignora arquivos não disponíveis localmente
+        keywords: Palavras-chave para filtrar (opcional)
+        keywords_match_all: Se True, todas as keywords devem estar presentes (AND)
+        ignored_ext_set: Extensões ignoradas (minúsculas, sem ponto)
+        file_data: Se fornecida, recebe todos os arquivos das pastas (para o cache)
+        trees: Se fornecido, recebe a árvore de cada pasta varrida
+        
+    Yields:
+        Registros {'path', 'size', 'mtime', 'name'} dos arquivos válidos
+    """
     files_skipped = 0
+    keywords_lower = [kw.lower() for kw in keywords] if keywords else []
     
     for folder in folders:
         folder_path = Path(folder)
@@ -244,94 +542,165 @@ def collect_files(folders: List[str], exclude_prefix: str = "_L_", check_accessi
         
         print(f"Escaneando: {folder}...")
         
-        # Percorre recursivamente todos os arquivos
+        # Percorre recursivamente com os.scandir em paralelo
         try:
-            for file_path in folder_path.rglob('*'):
-                try:
-                    # Verifica se é um arquivo (mesmo que esteja só na nuvem)
-                    if not file_path.is_file():
-                        continue
-                    
-                    # Verifica se alguma parte do caminho é uma pasta que começa com '.'
-                    if any(part.startswith('.') for part in file_path.relative_to(folder_path).parts[:-1]):
-                        continue
-                    
-                    # Verifica se o nome do arquivo começa com '.'
-                    if file_path.name.startswith('.'):
+            tree = scan_tree(folder, exclude_prefix)
+        except (OSError, PermissionError) as e:
+            print(f"Aviso: Erro ao acessar '{folder}': {e}")
+            continue
+        
+        # O cache guarda todos os arquivos da pasta; keywords e extensões
+        # são aplicadas sobre ele na consulta
+        folder_records = flatten_tree(tree)
+        if trees is not None:
+            trees[folder] = tree
+        if file_data is not None:
+            file_data.extend(folder_records)
+        
+        for file_info in folder_records:
+            file_name = file_info['name']
+            
+            # Filtra por extensões ignoradas
+            if ignored_ext_set:
+                file_ext = os.path.splitext(file_name)[1].lower().lstrip('.')
+                if file_ext in ignored_ext_set:
+                    continue
+            
+            # Filtra por palavras-chave se fornecidas
+            if keywords_lower:
+                file_name_lower = file_name.lower()
+                if keywords_match_all:
+                    # Modo AND: todas as palavras devem estar presentes
+                    if not all(keyword in file_name_lower for keyword in keywords_lower):
                         continue
-                    
-                    # Verifica se o nome do arquivo não começa com o prefixo
-                    if file_path.name.startswith(exclude_prefix):
+                else:
+                    # Modo OR: ao menos UMA palavra-chave está no nome do arquivo
+                    if not any(keyword in file_name_lower for keyword in keywords_lower):
                         continue
-                    
-                    # Filtra por extensões ignoradas
-                    if ignored_ext_set:
-                        file_ext = file_path.suffix.lower().lstrip('.')
-                        if file_ext in ignored_ext_set:
-                            continue
-                    
-                    # Filtra por palavras-chave se fornecidas
-                    if keywords:
-                        file_name_lower = file_path.name.lower()
-                        keywords_lower = [kw.lower() for kw in keywords]
-                        if keywords_match_all:
-                            # Modo AND: todas as palavras devem estar presentes
-                            if not all(keyword in file_name_lower for keyword in keywords_lower):
-                                continue
-                        else:
-                            # Modo OR: ao menos UMA palavra-chave está no nome do arquivo
-                            if not any(keyword in file_name_lower for keyword in keywords_lower):
-                                continue
-                    
-                    # Verifica acessibilidade apenas se solicitado
-                    if check_accessibility:
-                        if not is_file_accessible(file_path):
-                            files_skipped += 1
-                            continue
-                    
-                    file_str = str(file_path)
-                    valid_files.append(file_str)
-                    
-                    # Armazena dados para cache
-                    try:
-                        file_stat = file_path.stat()
-                        file_data.append({
-                            'path': file_str,
-                            'size': file_stat.st_size,
-                            'mtime': file_stat.st_mtime,
-                            'name': file_path.name
-                        })
-                    except (OSError, PermissionError):
-                        # Se não conseguir stat, adiciona só o path
-                        file_data.append({
-                            'path': file_str,
-                            'name': file_path.name
-                        })
-                    
-                except (OSError, PermissionError) as e:
-                    # Ignora arquivos inacessíveis silenciosamente
+            
+            # Verifica acessibilidade apenas se solicitado
+            if check_accessibility:
+                if not is_file_accessible(Path(file_info['path'])):
                     files_skipped += 1
                     continue
-                    
-        except (OSError, PermissionError) as e:
-            print(f"Aviso: Erro ao acessar '{folder}': {e}")
-            continue
+            
+            yield file_info
     
     if files_skipped > 0 and check_accessibility:
         print(f"\nAviso: {files_skipped} arquivo(s) ignorado(s) (não disponíveis localmente)")
+
+
+def _merge_archive_members(valid_files: FileTable, all_files: FileTable,
+                           cache_manager: CacheManager, exclude_prefix: str = "_L_",
+                           keywords: List[str] = None, keywords_match_all: bool = False,
+                           ignored_extensions: List[str] = None,
+                           check_accessibility: bool = False) -> FileTable:
+    """
+    Substitui os arquivos compactados pelos seus membros, como entradas virtuais.
     
-    # Salva cache se habilitado
-    if use_cache and len(file_data) > 0:
-        success = cache_manager.save_cache(
-            file_data, folders, exclude_prefix, ".", keywords or [], process_zip, keywords_match_all
-        )
+    As listagens vêm do diretório central (CacheManager.get_archive_members,
+    em cache por tamanho/mtime), sem extrair nada. Keywords, extensões e
+    prefixos são aplicados aos nomes dos membros, como em list_files_in_zip.
+    Arquivos compactados que não puderem ser listados continuam como arquivos comuns.
+    
+    Args:
+        valid_files: Arquivos que passaram pelos filtros
+        all_files: Todos os arquivos estruturais (para encontrar os arquivos compactados)
+        cache_manager: Gerenciador com o cache das listagens
+        Demais argumentos: mesmos de collect_files
         
-        if success:
-            print(f"✓ Cache criado: {len(file_data)} arquivos indexados")
-        else:
-            print("⚠ Aviso: Não foi possível salvar o cache")
+    Returns:
+        Tabela com os arquivos válidos e os membros como caminhos virtuais
+        ("arquivo.zip!/membro", sem tamanho/mtime)
+    """
+    expanded = set()
+    members_table = FileTable()
     
-    return valid_files
+    for file_id, file_name in enumerate(all_files.names):
+        if not is_archive_file(file_name):
+            continue
+        
+        archive_path = all_files.path(file_id)
+        size = all_files.sizes[file_id]
+        mtime = all_files.mtimes[file_id]
+        if size == MISSING_SIZE:
+            size = mtime = None
+        
+        members = cache_manager.get_archive_members(archive_path, size, mtime)
+        if members is None:
+            continue
+        expanded.add(archive_path)
+        
+        valid_members = filter_archive_members(members, exclude_prefix, keywords, keywords_match_all, ignored_extensions)
+        if valid_members and check_accessibility and not is_file_accessible(Path(archive_path)):
+            continue
+        
+        for member in valid_members:
+            members_table.append(make_archive_member_path(archive_path, member), os.path.basename(member))
+    
+    if not expanded:
+        return valid_files
+    
+    print(f"Arquivos compactados indexados: {len(expanded)} ({len(members_table)} membro(s) válido(s))")
+    
+    kept = valid_files.take([
+        file_id for file_id in range(len(valid_files))
+        if not is_archive_file(valid_files.names[file_id]) or valid_files.path(file_id) not in expanded
+    ])
+    return FileTable.concat([kept, members_table])
+
+
+def collect_files(folders: List[str], exclude_prefix: str = "_L_", check_accessibility: bool = False, keywords: List[str] = None, use_cache: bool = True, process_zip: bool = False, keywords_match_all: bool = False, ignored_extensions: List[str] = None, index_archives: bool = False, cache_backend: str = "pickle", stale_cache: bool = False) -> List[str]:
+    """
+    Coleta todos os arquivos das pastas e subpastas informadas,
+    excluindo arquivos que começam com os prefixos especificados.
+    Inclui arquivos em nuvem mesmo que não estejam sincronizados localmente.
+    Ignora pastas que começam com '.' (pastas ocultas).
+    
+    Args:
+        folders: Lista de caminhos das pastas para buscar
+        exclude_prefix: Prefixos a serem excluídos dos resultados (separados por vírgula)
+        check_accessibility: Se True, verifica se arquivos estão acessíveis localmente
+        keywords: Lista de palavras-chave. Se fornecida, apenas arquivos que contenham
+                 ao menos uma palavra-chave no nome serão incluídos.
+        use_cache: Se True, usa cache para acelerar buscas (padrão: True)
+        ignored_extensions: Lista de extensões a ignorar (ex: ['srt', 'sub'])
+        index_archives: Se True, inclui os membros de ZIP/RAR como caminhos virtuais
+                        ("arquivo.zip!/membro") no lugar dos próprios arquivos compactados
+        cache_backend: Backend do cache ("pickle" ou "sqlite", com busca de keywords por FTS)
+        stale_cache: Se True, responde na hora com o último cache gravado (sem
+                     verificar se as pastas mudaram) e revalida o cache em segundo plano
+        
+    Returns:
+        Lista com os caminhos completos dos arquivos válidos
+    """
+    files = _collect_file_table(folders, exclude_prefix, check_accessibility, keywords, use_cache, process_zip, keywords_match_all, ignored_extensions, index_archives=index_archives, cache_backend=cache_backend, stale_cache=stale_cache)
+    return files.paths()
+
+
+def collect_files_by_folder(folders: List[str], exclude_prefix: str = "_L_", check_accessibility: bool = False, keywords: List[str] = None, use_cache: bool = True, process_zip: bool = False, keywords_match_all: bool = False, ignored_extensions: List[str] = None, cache_manager: Optional[CacheManager] = None, index_archives: bool = False, cache_backend: str = "pickle", stale_cache: bool = False) -> Dict[str, List[str]]:
+    """
+    Coleta os arquivos válidos agrupados pela pasta que os contém.
+    Usa a mesma varredura (ou cache) de collect_files, permitindo que a análise
+    de sequências trabalhe sem listar as pastas novamente.
+    
+    Args:
+        Mesmos argumentos de collect_files.
+        cache_manager: Gerenciador de cache a usar; permite ao chamador consultar
+                       depois o índice de sequências dos shards carregados.
+        index_archives: Se True, membros de ZIP/RAR entram agrupados pela pasta
+                        virtual ("arquivo.zip!/pasta")
+        
+    Returns:
+        Dicionário {pasta: [caminhos completos dos arquivos válidos da pasta]}
+    """
+    files = _collect_file_table(folders, exclude_prefix, check_accessibility, keywords, use_cache, process_zip, keywords_match_all, ignored_extensions, cache_manager, index_archives, cache_backend, stale_cache)
+    
+    files_by_folder = {}
+    for file_id, file_path in enumerate(files.paths()):
+        files_by_folder.setdefault(files.dirname(file_id), []).append(file_path)
+    
+    return files_by_folder
 
 
 def open_folder(file_path: str):
@@ -387,13 +756,487 @@ def pick_random_file(folders: List[str], exclude_prefix: str = "_L_", check_acce
     return result['file_path']
 
 
+def _choose_archive_member(archive_path: str, members: List[str], exclude_prefix: str = "_L_",
+                           keywords: List[str] = None, keywords_match_all: bool = False,
+                           ignored_extensions: List[str] = None, use_sequence: bool = True,
+                           tracker_backend: str = "json", rng=None) -> str:
+    """
+    Escolhe um membro do arquivo compactado usando apenas os nomes da listagem.
+    
+    Cada pasta interna é tratada como uma pasta comum: se houver sequência, o
+    próximo não lido é escolhido (rastreado pelo caminho virtual
+    "arquivo.zip!/pasta/membro"); senão, a escolha é aleatória.
+    
+    Args:
+        archive_path: Caminho do arquivo compactado
+        members: Membros válidos (de list_files_in_zip)
+        exclude_prefix: Prefixos a serem excluídos (separados por vírgula)
+        keywords: Lista de palavras-chave para filtrar arquivos
+        keywords_match_all: Se True, todas as keywords devem estar presentes (AND)
+        ignored_extensions: Lista de extensões a ignorar
+        use_sequence: Se True, respeita sequências detectadas nos nomes
+        tracker_backend: Backend do rastreamento de lidos ("json" ou "sqlite")
+        rng: Gerador de números aleatórios (padrão: random.SystemRandom())
+        
+    Returns:
+        Nome do membro escolhido
+    """
+    rng = rng or random.SystemRandom()
+    
+    if use_sequence:
+        from random_file_picker.core.sequential_selector import (
+            analyze_folder_sequence,
+            create_tracker,
+            get_next_unread_file,
+        )
+        
+        members_by_path = {make_archive_member_path(archive_path, member): member for member in members}
+        paths_by_folder: Dict[str, List[str]] = {}
+        for virtual_path in members_by_path:
+            paths_by_folder.setdefault(os.path.dirname(virtual_path), []).append(virtual_path)
+        
+        folders = list(paths_by_folder)
+        rng.shuffle(folders)
+        tracker = None
+        
+        try:
+            for folder in folders:
+                sequences = analyze_folder_sequence(
+                    Path(folder), exclude_prefix, keywords, keywords_match_all, ignored_extensions,
+                    file_paths=paths_by_folder[folder]
+                )
+                if not sequences:
+                    continue
+            
+                tracker = tracker or create_tracker(tracker_backend)
+                seq_result = get_next_unread_file(sequences, tracker, keywords, keywords_match_all)
+                if seq_result:
+                    next_file, selected_sequence, file_info = seq_result
+                    print("✓ Sequência detectada dentro do arquivo compactado!")
+                    print(f"Selecionando próximo arquivo não lido: '{os.path.basename(next_file)}'")
+                    print(f"  Coleção: {selected_sequence['collection']}")
+                    print(f"  Tipo de ordenação: {selected_sequence['type']}")
+                    print(f"  Total de arquivos na sequência: {selected_sequence['count']}")
+                    if file_info['number']:
+                        print(f"  Número do arquivo: {file_info['number']}")
+                    tracker.mark_as_read(next_file)
+                    return members_by_path[next_file]
+        finally:
+            if tracker is not None:
+                tracker.close()
+    
+    print("Nenhuma sequência detectada - seleção aleatória dentro do arquivo compactado")
+    return rng.choice(members)
+
+
+def select_archive_member(archive_path: str, exclude_prefix: str = "_L_", keywords: List[str] = None,
+                          keywords_match_all: bool = False, ignored_extensions: List[str] = None,
+                          process_zip: bool = True, use_sequence: bool = True, zip_recursion_level: int = 0,
+                          temp_dir: Optional[str] = None, tracker_backend: str = "json",
+                          archive_file=None, extraction_cache: Optional[ExtractionCache] = None,
+                          rng=None) -> dict:
+    """
+    Seleciona um arquivo dentro de um ZIP/RAR extraindo apenas o membro escolhido.
+    
+    Filtros (prefixos, keywords, extensões) e detecção de sequência são aplicados
+    aos nomes da listagem do arquivo, sem extractall. Arquivos compactados
+    aninhados são lidos direto do membro pai em memória (ver _extract_selected_member)
+    até MAX_ARCHIVE_RECURSION níveis: só o arquivo final é gravado em disco.
+    
+    Args:
+        archive_path: Caminho do arquivo ZIP ou RAR (virtual se archive_file for informado)
+        exclude_prefix: Prefixos a serem excluídos (separados por vírgula)
+        keywords: Lista de palavras-chave para filtrar arquivos
+        keywords_match_all: Se True, todas as keywords devem estar presentes (AND)
+        ignored_extensions: Lista de extensões a ignorar
+        process_zip: Se True, processa arquivos compactados aninhados
+        use_sequence: Se True, respeita sequências detectadas nos nomes
+        zip_recursion_level: Nível atual de recursão
+        temp_dir: Pasta temporária para a extração (se None, cria uma nova)
+        tracker_backend: Backend do rastreamento de lidos ("json" ou "sqlite")
+        archive_file: Conteúdo do arquivo compactado já aberto (aninhado)
+        extraction_cache: Cache de extração para o arquivo final (se None, usa pasta temporária)
+        rng: Gerador de números aleatórios (padrão: random.SystemRandom())
+        
+    Returns:
+        Dicionário no formato de pick_random_file_with_zip_support. Se não houver
+        membro válido (ou em caso de erro), retorna o próprio arquivo compactado.
+    """
+    archive_result = {
+        'file_path': archive_path,
+        'is_from_zip': False,
+        'zip_path': None,
+        'file_in_zip': None,
+        'temp_dir': None
+    }
+    
+    # Verifica limite de recursão
+    if zip_recursion_level >= MAX_ARCHIVE_RECURSION:
+        print(f"Limite de recursão atingido ({MAX_ARCHIVE_RECURSION} níveis). Retornando arquivo: {os.path.basename(archive_path)}")
+        return archive_result
+    
+    archive_type = "RAR" if archive_path.lower().endswith('.rar') else "ZIP"
+    print(f"Arquivo {archive_type} detectado: {os.path.basename(archive_path)} (Nível de recursão: {zip_recursion_level + 1}/{MAX_ARCHIVE_RECURSION})")
+    print(f"Explorando conteúdo do {archive_type} (apenas listagem)...")
+    
+    try:
+        archive = open_archive(archive_path, archive_file)
+    except ImportError:
+        print("Aviso: Biblioteca 'rarfile' não instalada. Instale com: pip install rarfile")
+        return archive_result
+    except Exception as e:
+        print(f"Erro ao acessar {archive_type} '{archive_path}': {e}")
+        return archive_result
+    
+    with archive:
+        members = filter_archive_members(
+            [info.filename for info in archive.infolist() if not info.is_dir()],
+            exclude_prefix, keywords, keywords_match_all, ignored_extensions
+        )
+        if not members:
+            if keywords:
+                print(f"Nenhum arquivo válido encontrado no {archive_type} com as palavras-chave especificadas.")
+            else:
+                print(f"Nenhum arquivo válido encontrado no {archive_type}.")
+            return archive_result
+        
+        print(f"{len(members)} arquivo(s) válido(s) no {archive_type}")
+        member = _choose_archive_member(
+            archive_path, members, exclude_prefix, keywords, keywords_match_all,
+            ignored_extensions, use_sequence, tracker_backend, rng
+        )
+        
+        try:
+            return _extract_selected_member(
+                archive, archive_path, member, exclude_prefix, keywords, keywords_match_all,
+                ignored_extensions, process_zip, use_sequence, zip_recursion_level, temp_dir, tracker_backend,
+                extraction_cache, rng
+            )
+        except Exception as e:
+            print(f"Erro ao processar {archive_type}: {e}")
+            return archive_result
+
+
+def _open_nested_archive(archive, member: str):
+    """
+    Lê um arquivo compactado aninhado para um objeto seekable, sem pasta temporária.
+    
+    Até NESTED_ARCHIVE_MEMORY_LIMIT bytes o conteúdo fica em memória; acima
+    disso usa um arquivo temporário anônimo (removido ao fechar).
+    
+    Args:
+        archive: Arquivo compactado pai já aberto
+        member: Nome do membro (arquivo compactado aninhado)
+        
+    Returns:
+        Objeto de arquivo posicionado no início
+    """
+    if archive.getinfo(member).file_size <= NESTED_ARCHIVE_MEMORY_LIMIT:
+        nested_file = io.BytesIO()
+    else:
+        nested_file = tempfile.TemporaryFile()
+    
+    with archive.open(member) as member_file:
+        shutil.copyfileobj(member_file, nested_file)
+    nested_file.seek(0)
+    return nested_file
+
+
+def _extract_selected_member(archive, archive_path: str, member: str, exclude_prefix: str = "_L_",
+                             keywords: List[str] = None, keywords_match_all: bool = False,
+                             ignored_extensions: List[str] = None, process_zip: bool = True,
+                             use_sequence: bool = True, zip_recursion_level: int = 0,
+                             temp_dir: Optional[str] = None, tracker_backend: str = "json",
+                             extraction_cache: Optional[ExtractionCache] = None, rng=None) -> dict:
+    """
+    Extrai um membro já escolhido de um arquivo compactado aberto.
+    
+    Se o membro for outro arquivo compactado, a seleção continua nele a partir
+    de um stream (_open_nested_archive); ele só é gravado em disco se for o
+    resultado final (sem membros válidos ou limite de recursão).
+    
+    Args:
+        archive: Arquivo compactado já aberto (open_archive)
+        archive_path: Caminho (real ou virtual) do arquivo compactado
+        member: Nome do membro a extrair
+        Demais argumentos: mesmos de select_archive_member
+        
+    Returns:
+        Dicionário no formato de pick_random_file_with_zip_support
+        
+    Raises:
+        Exception: Se houver erro na extração (a pasta temporária criada é removida)
+    """
+    # Arquivo compactado dentro do arquivo compactado: continua em memória
+    if process_zip and is_archive_file(member) and zip_recursion_level + 1 < MAX_ARCHIVE_RECURSION:
+        with _open_nested_archive(archive, member) as nested_file:
+            nested = select_archive_member(
+                make_archive_member_path(archive_path, member),
+                exclude_prefix=exclude_prefix,
+                keywords=keywords,
+                keywords_match_all=keywords_match_all,
+                ignored_extensions=ignored_extensions,
+                process_zip=process_zip,
+                use_sequence=use_sequence,
+                zip_recursion_level=zip_recursion_level + 1,
+                temp_dir=temp_dir,
+                tracker_backend=tracker_backend,
+                archive_file=nested_file,
+                extraction_cache=extraction_cache,
+                rng=rng
+            )
+        if nested['is_from_zip']:
+            return {
+                'file_path': nested['file_path'],
+                'is_from_zip': True,
+                'zip_path': archive_path,  # Arquivo compactado original
+                'file_in_zip': make_archive_member_path(member, nested['file_in_zip']),
+                'temp_dir': nested['temp_dir']
+            }
+    
+    # Arquivo final: único membro gravado em disco (reaproveitado do cache de extração)
+    if extraction_cache is not None:
+        cached_path = _extract_to_cache(archive, archive_path, member, extraction_cache)
+        if cached_path:
+            return {
+                'file_path': cached_path,
+                'is_from_zip': True,
+                'zip_path': archive_path,
+                'file_in_zip': member,
+                'temp_dir': None  # Gerenciado pelo cache (não deve ser apagado pelo chamador)
+            }
+    
+    created_temp_dir = temp_dir is None
+    if created_temp_dir:
+        temp_dir = get_temp_extraction_dir()
+    
+    try:
+        extracted_path = archive.extract(member, temp_dir)
+    except Exception:
+        if created_temp_dir:
+            cleanup_temp_dir(temp_dir)
+        raise
+    
+    print(f"✓ Extraído apenas: {member}")
+    return {
+        'file_path': extracted_path,
+        'is_from_zip': True,
+        'zip_path': archive_path,
+        'file_in_zip': member,
+        'temp_dir': temp_dir
+    }
+
+
+def open_archive_member_path(virtual_path: str, exclude_prefix: str = "_L_", keywords: List[str] = None,
+                             keywords_match_all: bool = False, ignored_extensions: List[str] = None,
+                             process_zip: bool = True, zip_recursion_level: int = 0,
+                             tracker_backend: str = "json",
+                             extraction_cache: Optional[ExtractionCache] = None, rng=None) -> dict:
+    """
+    Extrai o membro indicado por um caminho virtual ("arquivo.zip!/pasta/membro").
+    
+    Usado quando o índice de arquivos já contém os membros dos arquivos
+    compactados (index_archives) e um deles é selecionado.
+    
+    Args:
+        virtual_path: Caminho virtual do membro
+        Demais argumentos: mesmos de select_archive_member
+        
+    Returns:
+        Dicionário no formato de pick_random_file_with_zip_support. Em caso de
+        erro, retorna o próprio arquivo compactado.
+    """
+    archive_path, member = split_archive_member_path(virtual_path)
+    try:
+        with open_archive(archive_path) as archive:
+            return _extract_selected_member(
+                archive, archive_path, member, exclude_prefix, keywords, keywords_match_all,
+                ignored_extensions, process_zip, True, zip_recursion_level, None, tracker_backend,
+                extraction_cache, rng
+            )
+    except Exception as e:
+        print(f"Erro ao extrair '{member}' de '{os.path.basename(archive_path)}': {e}")
+        return {
+            'file_path': archive_path,
+            'is_from_zip': False,
+            'zip_path': None,
+            'file_in_zip': None,
+            'temp_dir': None
+        }
+
+
+def _pick_from_cache(folders: List[str], exclude_prefix: str, check_accessibility: bool,
+                     process_zip: bool, ignored_extensions: Optional[List[str]], cache_backend: str,
+                     rng, stale_cache: bool = False) -> Optional[str]:
+    """
+    Sorteia um arquivo direto do cache (CacheManager.pick_random_path), sem
+    carregar a lista de arquivos. Extensões ignoradas e arquivos inacessíveis
+    são descartados e sorteados de novo.
+    
+    Args:
+        folders: Lista de caminhos das pastas
+        exclude_prefix: Prefixo excluído dos resultados
+        check_accessibility: Se True, descarta arquivos não disponíveis localmente
+        process_zip: Se processa arquivos ZIP (mesmo valor usado ao gravar o cache)
+        ignored_extensions: Lista de extensões a ignorar
+        cache_backend: Backend do cache de arquivos ("pickle" ou "sqlite")
+        rng: Gerador de números aleatórios
+        stale_cache: Se True, sorteia sem verificar as pastas e revalida em segundo plano
+        
+    Returns:
+        Caminho sorteado ou None se o cache não pode responder (usar collect_files)
+    """
+    ignored_ext_set = {ext.lower().lstrip('.') for ext in ignored_extensions or []}
+    
+    def accept(file_path: str) -> bool:
+        if ignored_ext_set and os.path.splitext(file_path)[1].lower().lstrip('.') in ignored_ext_set:
+            return False
+        return not check_accessibility or is_file_accessible(Path(file_path))
+    
+    with create_cache_manager(cache_backend) as cache_manager:
+        selected_file = cache_manager.pick_random_path(folders, exclude_prefix, ".", process_zip, rng,
+                                                       accept, stale=stale_cache)
+        if selected_file is not None:
+            print("✓ Sorteio direto do cache (sem carregar a lista de arquivos)")
+            if stale_cache:
+                _revalidate_in_background(cache_manager, folders, exclude_prefix, process_zip)
+    return selected_file
+
+
+def _pick_without_repeat(folders: List[str], exclude_prefix: str, check_accessibility: bool,
+                         keywords: Optional[List[str]], keywords_match_all: bool, use_cache: bool,
+                         process_zip: bool, ignored_extensions: Optional[List[str]], index_archives: bool,
+                         cache_backend: str, tracker_backend: str, rng,
+                         stale_cache: bool = False) -> Optional[str]:
+    """
+    Sorteia da sacola persistente (ShuffleBag) sobre a tabela de arquivos coletada.
+    
+    A sacola é guardada no diretório do cache e identificada pela versão dos
+    shards e pelos filtros; arquivos já marcados como lidos no rastreador são pulados.
+    
+    Args:
+        Mesmos argumentos de pick_random_file_with_zip_support.
+        rng: Gerador de números aleatórios
+        
+    Returns:
+        Caminho sorteado ou None se não houver arquivos válidos
+    """
+    from random_file_picker.core.sequential_selector import create_tracker
+    
+    with create_cache_manager(cache_backend) as cache_manager:
+        valid_files = _collect_file_table(folders, exclude_prefix, check_accessibility, keywords, use_cache, process_zip, keywords_match_all, ignored_extensions, cache_manager, index_archives, cache_backend, stale_cache)
+        if not valid_files:
+            return None
+    
+        # Sem cache não há versão dos shards: a sacola é refeita a partir dos caminhos
+        signature = None
+        shard_stamp = cache_manager.get_shard_stamp(folders) if use_cache else None
+        if shard_stamp is not None:
+            signature = ShuffleBag.make_signature(
+                folders, shard_stamp, exclude_prefix, keywords, keywords_match_all, ignored_extensions,
+                index_archives
+            )
+    
+        bag = ShuffleBag(cache_manager.cache_dir)
+        bag.load_or_build(signature, len(valid_files), valid_files.paths)
+        with create_tracker(tracker_backend) as tracker:
+            selected_file = bag.draw_path(valid_files.path, rng, tracker.is_read)
+        bag.save()
+    
+        print(f"✓ Sorteio sem repetição: {bag.remaining} de {bag.size} arquivo(s) restantes no ciclo")
+        return selected_file
+
+
+def _pick_weighted(folders: List[str], exclude_prefix: str, check_accessibility: bool,
+                   keywords: Optional[List[str]], keywords_match_all: bool, use_cache: bool,
+                   process_zip: bool, ignored_extensions: Optional[List[str]], index_archives: bool,
+                   cache_backend: str, tracker_backend: str, folder_weighting: str, rng,
+                   stale_cache: bool = False) -> Optional[str]:
+    """
+    Sorteia em dois níveis (FolderSampler): a pasta pelo peso, depois um arquivo dela.
+    
+    Sem filtros, os pesos vêm da contagem de arquivos por pasta guardada no
+    cache (CacheManager.get_dir_counts) e o arquivo é lido pela posição na
+    pasta, sem carregar a tabela; com filtros, agrupa a tabela coletada.
+    
+    Args:
+        Mesmos argumentos de pick_random_file_with_zip_support.
+        rng: Gerador de números aleatórios
+        
+    Returns:
+        Caminho sorteado ou None se não houver arquivos válidos
+    """
+    tracker = None
+    if folder_weighting == "unread":
+        from random_file_picker.core.sequential_selector import create_tracker
+        tracker = create_tracker(tracker_backend)
+    
+    try:
+        with create_cache_manager(cache_backend) as cache_manager:
+            dir_counts = None
+            if use_cache and not (keywords or ignored_extensions or index_archives or check_accessibility):
+                dir_counts = cache_manager.get_dir_counts(folders, exclude_prefix, ".", process_zip,
+                                                          stale=stale_cache)
+            
+            if dir_counts is not None:
+                if stale_cache:
+                    _revalidate_in_background(cache_manager, folders, exclude_prefix, process_zip)
+                
+                def get_groups():
+                    return {folder: range(count) for folder, count in dir_counts.items()}
+                get_path = cache_manager.get_dir_path
+            else:
+                valid_files = _collect_file_table(folders, exclude_prefix, check_accessibility, keywords,
+                                                  use_cache, process_zip, keywords_match_all,
+                                                  ignored_extensions, cache_manager, index_archives,
+                                                  cache_backend, stale_cache)
+                if not valid_files:
+                    return None
+                
+                get_groups = valid_files.group_by_dir
+                
+                def get_path(folder, file_id):
+                    return valid_files.path(file_id)
+            
+            # Grupos e pesos ficam no cache enquanto shards e filtros não mudarem
+            # (arquivos lidos depois só descontam o peso da própria pasta)
+            signature = None
+            shard_stamp = cache_manager.get_shard_stamp(folders) if use_cache else None
+            if shard_stamp is not None:
+                signature = FolderSampler.make_signature(
+                    folders, shard_stamp, exclude_prefix, keywords, keywords_match_all,
+                    ignored_extensions, index_archives, folder_weighting, dir_counts is not None
+                )
+            
+            sampler = FolderSampler(cache_manager.cache_dir)
+            sampler.load_or_build(signature, get_groups, folder_weighting,
+                                  tracker.get_read_files if tracker else None)
+            picked = sampler.pick(rng, get_path, tracker.is_read if tracker else None)
+            sampler.save()
+            if picked is None:
+                return None
+            
+            folder, selected_file = picked
+            print(f"✓ Sorteio por pasta ({folder_weighting}): {len(sampler.folders)} pasta(s) candidatas")
+            return selected_file
+    finally:
+        if tracker is not None:
+            tracker.close()
+
+
 def pick_random_file_with_zip_support(folders: List[str], exclude_prefix: str = "_L_", 
                                        check_accessibility: bool = False, 
                                        keywords: List[str] = None, keywords_match_all: bool = False, process_zip: bool = True,
-                                       use_cache: bool = True, ignored_extensions: List[str] = None, zip_recursion_level: int = 0) -> dict:
+                                       use_cache: bool = True, ignored_extensions: List[str] = None, zip_recursion_level: int = 0,
+                                       index_archives: bool = False, extraction_cache_mb: Optional[int] = None,
+                                       cache_backend: str = "pickle", no_repeat: bool = False,
+                                       tracker_backend: str = "json",
+                                       folder_weighting: Optional[str] = None,
+                                       stale_cache: bool = False) -> dict:
     """
     Seleciona aleatoriamente um arquivo das pastas informadas, com suporte a arquivos ZIP.
-    Se um arquivo ZIP for selecionado, continua a busca dentro do ZIP.
+    Se um arquivo ZIP for selecionado, continua a busca dentro do ZIP
+    (ver select_archive_member).
     
     Args:
         folders: Lista de caminhos das pastas para buscar
@@ -403,6 +1246,19 @@ def pick_random_file_with_zip_support(folders: List[str], exclude_prefix: str =
         process_zip: Se True, processa arquivos ZIP; se False, trata ZIPs como arquivos normais
         use_cache: Se True, usa cache para acelerar busca (padrão: True)
         ignored_extensions: Lista de extensões a ignorar (ex: ['srt', 'sub'])
+        index_archives: Se True (e process_zip), sorteia entre os membros dos ZIP/RAR
+                        indexados em vez de sortear o arquivo compactado inteiro
+        extraction_cache_mb: Limite do cache de extração em MB (padrão:
+                             DEFAULT_EXTRACTION_CACHE_MB). Só usado com use_cache.
+        cache_backend: Backend do cache de arquivos ("pickle" ou "sqlite")
+        no_repeat: Se True, sorteia de uma sacola persistente (ShuffleBag): nenhum
+                   arquivo se repete até todos terem saído
+        tracker_backend: Backend do rastreamento de lidos consultado pela sacola
+        folder_weighting: Se informado, sorteia primeiro a pasta e depois o arquivo;
+                          peso da pasta: "uniform" (iguais), "sqrt" (raiz da contagem)
+                          ou "unread" (arquivos não lidos). Ignorado com no_repeat.
+        stale_cache: Se True, sorteia na hora do último cache gravado (sem verificar
+                     se as pastas mudaram) e revalida o cache em segundo plano
         
     Returns:
         Dicionário com:
@@ -410,190 +1266,90 @@ def pick_random_file_with_zip_support(folders: List[str], exclude_prefix: str =
             - is_from_zip: True se o arquivo veio de um ZIP
             - zip_path: Caminho do ZIP original (se is_from_zip for True)
             - file_in_zip: Nome do arquivo dentro do ZIP (se is_from_zip for True)
-            - temp_dir: Diretório temporário usado (se is_from_zip for True)
+            - temp_dir: Diretório temporário usado (None se veio do cache de extração)
         
     Raises:
-        ValueError: Se nenhum arquivo válido for encontrado
+        ValueError: Se nenhum arquivo válido for encontrado ou folder_weighting for desconhecido
     """
-    valid_files = collect_files(folders, exclude_prefix, check_accessibility, keywords, use_cache, process_zip, keywords_match_all, ignored_extensions)
+    if folder_weighting is not None and folder_weighting not in FOLDER_WEIGHTINGS:
+        raise ValueError(f"Peso de pasta desconhecido: {folder_weighting}")
     
-    if not valid_files:
-        if keywords:
-            raise ValueError(f"Nenhum arquivo válido encontrado com as palavras-chave: {', '.join(keywords)}")
-        raise ValueError("Nenhum arquivo válido encontrado nas pastas informadas.")
+    extraction_cache = create_extraction_cache(extraction_cache_mb) if use_cache else None
     
     # Usa SystemRandom para maior aleatoriedade
     secure_random = random.SystemRandom()
     
-    # Embaralha a lista para aumentar a aleatoriedade
-    secure_random.shuffle(valid_files)
-    
-    # Seleciona um arquivo aleatório
-    selected_file = secure_random.choice(valid_files)
-    
-    # Verifica se é um arquivo ZIP/RAR e se deve processá-lo
-    file_ext = selected_file.lower()
-    is_archive = file_ext.endswith('.zip') or file_ext.endswith('.rar')
+    # Sem keywords nem membros indexados: sorteia direto do cache, sem montar a lista
+    selected_file = None
+    if no_repeat:
+        # Sacola persistente: sem repetição até esgotar os arquivos
+        selected_file = _pick_without_repeat(
+            folders, exclude_prefix, check_accessibility, keywords, keywords_match_all, use_cache,
+            process_zip, ignored_extensions, index_archives and process_zip, cache_backend,
+            tracker_backend, secure_random, stale_cache
+        )
+    elif folder_weighting:
+        # Dois níveis: pasta pelo peso, depois arquivo dentro dela
+        selected_file = _pick_weighted(
+            folders, exclude_prefix, check_accessibility, keywords, keywords_match_all, use_cache,
+            process_zip, ignored_extensions, index_archives and process_zip, cache_backend,
+            tracker_backend, folder_weighting, secure_random, stale_cache
+        )
+    elif use_cache and not keywords and not (index_archives and process_zip):
+        selected_file = _pick_from_cache(folders, exclude_prefix, check_accessibility, process_zip,
+                                         ignored_extensions, cache_backend, secure_random, stale_cache)
     
-    if process_zip and is_archive:
-        # Verifica limite de recursão (máximo 3 níveis)
-        if zip_recursion_level >= 3:
-            print(f"Limite de recursão atingido (3 níveis). Retornando arquivo: {os.path.basename(selected_file)}")
-            return {
-                'file_path': selected_file,
-                'is_from_zip': False,
-                'zip_path': None,
-                'file_in_zip': None,
-                'temp_dir': None
-            }
-        
-        archive_type = "ZIP" if file_ext.endswith('.zip') else "RAR"
-        print(f"Arquivo {archive_type} detectado: {os.path.basename(selected_file)} (Nível de recursão: {zip_recursion_level + 1}/3)")
-        print(f"Explorando conteúdo do {archive_type}...")
-        
-        # Cria diretório temporário e extrai TODO o conteúdo do ZIP
-        temp_dir = get_temp_extraction_dir()
-        
-        try:
-            print(f"Extraindo TODO o conteúdo do {archive_type} para pasta temporária...")
-            
-            # Extrai todos os arquivos do arquivo compactado
-            if file_ext.endswith('.zip'):
-                with zipfile.ZipFile(selected_file, 'r') as zip_file:
-                    zip_file.extractall(temp_dir)
-            else:  # .rar
-                try:
-                    import rarfile
-                    with rarfile.RarFile(selected_file, 'r') as rar_file:
-                        rar_file.extractall(temp_dir)
-                except ImportError:
-                    print("Aviso: Biblioteca 'rarfile' não instalada. Instale com: pip install rarfile")
-                    print("Tratando RAR como arquivo normal.")
-                    return {
-                        'file_path': selected_file,
-                        'is_from_zip': False,
-                        'zip_path': None,
-                        'file_in_zip': None,
-                        'temp_dir': None
-                    }
-            
-            print(f"✓ ZIP extraído completamente")
-            print(f"Iniciando busca recursiva dentro do ZIP (aplicando todas as regras)...")
-            
-            # BUSCA RECURSIVA COM ANÁLISE DE SEQUÊNCIA:
-            # Trata a pasta temporária como se fosse a única pasta configurada
-            # Isso garante que:
-            # 1. Sequências dentro do ZIP são detectadas
-            # 2. ZIPs dentro de ZIPs são processados recursivamente
-            # 3. Todas as regras (keywords, extensions, prefixo) são aplicadas
-            # 4. A seleção pode ser aleatória mas respeita sequências se detectadas
-            
-            # Primeiro, tenta detectar sequências na pasta extraída
-            from random_file_picker.core.sequential_selector import (
-                analyze_folder_sequence,
-                get_next_unread_file,
-                SequentialFileTracker
-            )
-            
-            # Analisa se há sequências dentro do ZIP extraído
-            sequences = analyze_folder_sequence(
-                Path(temp_dir), 
-                exclude_prefix, 
-                keywords, 
-                keywords_match_all, 
-                ignored_extensions
+    if selected_file is None and not no_repeat and not folder_weighting:
+        if not use_cache and not (index_archives and process_zip):
+            # Sem cache para gravar: sorteia durante a varredura (amostragem por reservatório)
+            ignored_ext_set = {ext.lower().lstrip('.') for ext in ignored_extensions or []}
+            selected_record = choose_streaming(
+                _scan_valid_records(folders, exclude_prefix, check_accessibility, keywords,
+                                    keywords_match_all, ignored_ext_set),
+                secure_random
             )
+            selected_file = selected_record['path'] if selected_record else None
+        else:
+            valid_files = _collect_file_table(folders, exclude_prefix, check_accessibility, keywords, use_cache, process_zip, keywords_match_all, ignored_extensions, index_archives=index_archives and process_zip, cache_backend=cache_backend, stale_cache=stale_cache)
             
-            file_from_sequence = None
-            
-            if sequences:
-                # Há sequências detectadas dentro do ZIP
-                print(f"✓ Sequência detectada dentro do ZIP!")
-                tracker = SequentialFileTracker()
-                seq_result = get_next_unread_file(sequences, tracker, keywords, keywords_match_all)
-                
-                if seq_result:
-                    # Encontrou próximo arquivo não lido na sequência
-                    next_file, selected_sequence, file_info = seq_result
-                    print(f"Selecionando próximo arquivo não lido: '{os.path.basename(next_file)}'")
-                    print(f"  Coleção: {selected_sequence['collection']}")
-                    print(f"  Tipo de ordenação: {selected_sequence['type']}")
-                    print(f"  Total de arquivos na sequência: {selected_sequence['count']}")
-                    if file_info['number']:
-                        print(f"  Número do arquivo: {file_info['number']}")
-                    
-                    file_from_sequence = next_file
-                    tracker.mark_as_read(next_file)
-            
-            if not file_from_sequence:
-                # Sem sequência detectada ou sem arquivos não lidos
-                # Faz busca recursiva normal (aleatória)
-                print(f"Nenhuma sequência detectada - seleção aleatória dentro do ZIP")
-                result = pick_random_file_with_zip_support(
-                    folders=[temp_dir],
-                    exclude_prefix=exclude_prefix,
-                    check_accessibility=check_accessibility,
-                    keywords=keywords,
-                    keywords_match_all=keywords_match_all,
-                    process_zip=process_zip,  # Mantém habilitado para processar ZIPs dentro de ZIPs
-                    use_cache=False,  # NÃO cacheia arquivos temporários
-                    ignored_extensions=ignored_extensions,
-                    zip_recursion_level=zip_recursion_level + 1  # Incrementa nível de recursão
-                )
-            else:
-                # Arquivo selecionado pela análise de sequência
-                # Verifica se este arquivo também é um ZIP (recursão)
-                file_ext_selected = file_from_sequence.lower()
-                is_nested_archive = file_ext_selected.endswith('.zip') or file_ext_selected.endswith('.rar')
-                
-                if process_zip and is_nested_archive and zip_recursion_level < 2:
-                    # É um ZIP/RAR dentro do ZIP - processa recursivamente
-                    result = pick_random_file_with_zip_support(
-                        folders=[os.path.dirname(file_from_sequence)],
-                        exclude_prefix=exclude_prefix,
-                        check_accessibility=check_accessibility,
-                        keywords=keywords,
-                        keywords_match_all=keywords_match_all,
-                        process_zip=process_zip,
-                        use_cache=False,
-                        ignored_extensions=ignored_extensions,
-                        zip_recursion_level=zip_recursion_level + 1
-                    )
-                else:
-                    # Arquivo final selecionado
-                    result = {
-                        'file_path': file_from_sequence,
-                        'is_from_zip': False,
-                        'zip_path': None,
-                        'file_in_zip': None,
-                        'temp_dir': None
-                    }
-            
-            # Se a busca recursiva retornou um arquivo de dentro de um ZIP aninhado,
-            # precisamos manter a referência do ZIP original
-            if result['is_from_zip']:
-                # ZIP dentro de ZIP - mantém temp_dir do original
-                return {
-                    'file_path': result['file_path'],
-                    'is_from_zip': True,
-                    'zip_path': selected_file,  # ZIP original (o que foi passado para esta função)
-                    'file_in_zip': os.path.relpath(result['file_path'], temp_dir),
-                    'temp_dir': temp_dir  # Mantém o diretório temporário do ZIP original
-                }
-            else:
-                # Arquivo encontrado diretamente no ZIP
-                return {
-                    'file_path': result['file_path'],
-                    'is_from_zip': True,
-                    'zip_path': selected_file,
-                    'file_in_zip': os.path.relpath(result['file_path'], temp_dir),
-                    'temp_dir': temp_dir
-                }
-                
-        except Exception as e:
-            # Limpa o diretório temporário em caso de erro
-            cleanup_temp_dir(temp_dir)
-            raise
+            # Sorteia uma posição da tabela (um único sorteio, sem embaralhar a lista)
+            if valid_files:
+                selected_file = valid_files.path(choose_index(len(valid_files), secure_random))
+    
+    if selected_file is None:
+        if keywords:
+            raise ValueError(f"Nenhum arquivo válido encontrado com as palavras-chave: {', '.join(keywords)}")
+        raise ValueError("Nenhum arquivo válido encontrado nas pastas informadas.")
+    
+    # Membro já indexado: extrai só ele
+    if is_archive_member_path(selected_file):
+        return open_archive_member_path(
+            selected_file,
+            exclude_prefix=exclude_prefix,
+            keywords=keywords,
+            keywords_match_all=keywords_match_all,
+            ignored_extensions=ignored_extensions,
+            process_zip=process_zip,
+            zip_recursion_level=zip_recursion_level,
+            tracker_backend=tracker_backend,
+            extraction_cache=extraction_cache,
+            rng=secure_random
+        )
+    
+    # Arquivo ZIP/RAR: escolhe um membro pela listagem e extrai só ele
+    if process_zip and is_archive_file(selected_file):
+        return select_archive_member(
+            selected_file,
+            exclude_prefix=exclude_prefix,
+            keywords=keywords,
+            keywords_match_all=keywords_match_all,
+            ignored_extensions=ignored_extensions,
+            process_zip=process_zip,
+            zip_recursion_level=zip_recursion_level,
+            tracker_backend=tracker_backend,
+            extraction_cache=extraction_cache,
+            rng=secure_random
+        )
     
     # Arquivo normal (não-ZIP)
     return {
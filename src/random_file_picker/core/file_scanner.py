@@ -0,0 +1,255 @@
+"""Varredura paralela de diretórios baseada em os.scandir."""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Número padrão de threads para varredura (I/O bound - NAS/cloud se beneficiam de mais threads)
+DEFAULT_SCAN_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+
+def _scan_directory(dir_path: str, exclude_prefix: str) -> Dict[str, Any]:
+    """Lista um único diretório (não recursivo) usando os.scandir.
+
+    Reaproveita o tipo e os dados de stat do DirEntry, evitando chamadas
+    extras a is_file()/stat() por arquivo.
+
+    Args:
+        dir_path: Caminho do diretório a listar.
+        exclude_prefix: Prefixo de arquivos a excluir.
+
+    Returns:
+        Nó da árvore: {'mtime', 'files', 'subdirs'}.
+    """
+    files = []
+    subdirs = []
+
+    # mtime lido ANTES da listagem: mudanças durante a varredura são detectadas na próxima
+    mtime = os.stat(dir_path).st_mtime
+
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            name = entry.name
+
+            try:
+                # Mesmo comportamento do rglob: não segue links simbólicos de pastas
+                if entry.is_dir() and not entry.is_symlink():
+                    # Ignora pastas ocultas (começam com '.')
+                    if not name.startswith('.'):
+                        subdirs.append(entry.path)
+                    continue
+
+                # Verifica se é um arquivo (mesmo que esteja só na nuvem)
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+
+            # Ignora arquivos ocultos e com prefixo de exclusão
+            if name.startswith('.') or name.startswith(exclude_prefix):
+                continue
+
+            try:
+                file_stat = entry.stat()
+                files.append({
+                    'path': entry.path,
+                    'size': file_stat.st_size,
+                    'mtime': file_stat.st_mtime,
+                    'name': name
+                })
+            except OSError:
+                # Se não conseguir stat, adiciona só o path
+                files.append({
+                    'path': entry.path,
+                    'name': name
+                })
+
+    return {'mtime': mtime, 'files': files, 'subdirs': subdirs}
+
+
+def _scan_directory_safe(dir_path: str, exclude_prefix: str) -> Optional[Dict[str, Any]]:
+    """Versão de _scan_directory que ignora subpastas inacessíveis (como o rglob)."""
+    try:
+        return _scan_directory(dir_path, exclude_prefix)
+    except OSError:
+        return None
+
+
+def _get_directory_mtime(dir_path: str) -> Optional[float]:
+    """Obtém o mtime de um diretório ou None se não existir mais."""
+    try:
+        return os.stat(dir_path).st_mtime
+    except OSError:
+        return None
+
+
+def scan_tree(folder: str, exclude_prefix: str = "_L_",
+              max_workers: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """Percorre recursivamente uma pasta distribuindo subpastas em um pool de threads.
+
+    Aplica os filtros estruturais de collect_files (pastas/arquivos ocultos e
+    prefixo de exclusão). Filtros de keywords e extensões ficam com o chamador.
+
+    Args:
+        folder: Pasta raiz a percorrer.
+        exclude_prefix: Prefixo de arquivos a excluir.
+        max_workers: Número máximo de threads (padrão: DEFAULT_SCAN_WORKERS).
+
+    Returns:
+        Árvore {caminho_da_pasta: {'mtime', 'files', 'subdirs'}} com todas as
+        pastas visitadas. Os registros de 'files' seguem o formato
+        {'path', 'size', 'mtime', 'name'} esperado por CacheManager.save_cache.
+
+    Raises:
+        OSError: Se a pasta raiz não puder ser listada.
+    """
+    root = str(Path(folder))
+
+    # A raiz é listada na thread atual para que erros de acesso sejam propagados
+    tree = {root: _scan_directory(root, exclude_prefix)}
+    subdirs = tree[root]['subdirs']
+    if not subdirs:
+        return tree
+
+    with ThreadPoolExecutor(max_workers=max_workers or DEFAULT_SCAN_WORKERS) as executor:
+        pending = {
+            executor.submit(_scan_directory_safe, subdir, exclude_prefix): subdir
+            for subdir in subdirs
+        }
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                dir_path = pending.pop(future)
+                node = future.result()
+                if node is None:
+                    # Pasta inacessível: some da árvore e da lista do pai
+                    continue
+                tree[dir_path] = node
+                for child in node['subdirs']:
+                    pending[executor.submit(_scan_directory_safe, child, exclude_prefix)] = child
+
+    # Mantém apenas subpastas efetivamente listadas
+    for node in tree.values():
+        node['subdirs'] = [d for d in node['subdirs'] if d in tree]
+
+    return tree
+
+
+def flatten_tree(tree: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Concatena os registros de arquivos de todas as pastas da árvore.
+
+    Args:
+        tree: Árvore retornada por scan_tree.
+
+    Returns:
+        Lista com todos os registros de arquivos.
+    """
+    records = []
+    for node in tree.values():
+        records.extend(node['files'])
+    return records
+
+
+def scan_folder(folder: str, exclude_prefix: str = "_L_",
+                max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Percorre recursivamente uma pasta e retorna a lista plana de arquivos.
+
+    Args:
+        folder: Pasta raiz a percorrer.
+        exclude_prefix: Prefixo de arquivos a excluir.
+        max_workers: Número máximo de threads (padrão: DEFAULT_SCAN_WORKERS).
+
+    Returns:
+        Lista de registros {'path', 'size', 'mtime', 'name'}.
+
+    Raises:
+        OSError: Se a pasta raiz não puder ser listada.
+    """
+    return flatten_tree(scan_tree(folder, exclude_prefix, max_workers))
+
+
+def find_changed_directories(tree: Dict[str, Dict[str, Any]],
+                             max_workers: Optional[int] = None) -> Dict[str, Optional[float]]:
+    """Identifica pastas da árvore cujo mtime mudou desde a varredura.
+
+    Faz apenas um stat() por pasta (em paralelo), sem listar conteúdo.
+
+    Args:
+        tree: Árvore retornada por scan_tree.
+        max_workers: Número máximo de threads (padrão: DEFAULT_SCAN_WORKERS).
+
+    Returns:
+        Dicionário {pasta: mtime_atual} das pastas alteradas
+        (mtime_atual é None se a pasta não existe mais).
+    """
+    dirs = list(tree)
+    if len(dirs) == 1:
+        mtimes = [_get_directory_mtime(dirs[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers or DEFAULT_SCAN_WORKERS) as executor:
+            mtimes = list(executor.map(_get_directory_mtime, dirs))
+
+    return {
+        dir_path: mtime
+        for dir_path, mtime in zip(dirs, mtimes)
+        if mtime != tree[dir_path]['mtime']
+    }
+
+
+def _remove_subtree(tree: Dict[str, Dict[str, Any]], dir_path: str):
+    """Remove uma pasta e todas as suas subpastas da árvore."""
+    stack = [dir_path]
+    while stack:
+        node = tree.pop(stack.pop(), None)
+        if node:
+            stack.extend(node['subdirs'])
+
+
+def refresh_tree(tree: Dict[str, Dict[str, Any]], exclude_prefix: str = "_L_",
+                 max_workers: Optional[int] = None) -> bool:
+    """Atualiza a árvore no lugar, relistando apenas pastas com mtime alterado.
+
+    Pastas novas são varridas por completo; pastas removidas saem da árvore
+    junto com suas subpastas.
+
+    Args:
+        tree: Árvore retornada por scan_tree (modificada no lugar).
+        exclude_prefix: Prefixo de arquivos a excluir.
+        max_workers: Número máximo de threads (padrão: DEFAULT_SCAN_WORKERS).
+
+    Returns:
+        True se alguma pasta foi alterada, False se a árvore já estava atualizada.
+    """
+    changed = find_changed_directories(tree, max_workers)
+    if not changed:
+        return False
+
+    for dir_path in changed:
+        # Já removida junto com uma pasta pai
+        if dir_path not in tree:
+            continue
+
+        old_subdirs = set(tree[dir_path]['subdirs'])
+        node = _scan_directory_safe(dir_path, exclude_prefix)
+        if node is None:
+            _remove_subtree(tree, dir_path)
+            continue
+
+        new_subdirs = set(node['subdirs'])
+        for gone in old_subdirs - new_subdirs:
+            _remove_subtree(tree, gone)
+
+        tree[dir_path] = node
+        for added in new_subdirs - old_subdirs:
+            try:
+                tree.update(scan_tree(added, exclude_prefix, max_workers))
+            except OSError:
+                node['subdirs'].remove(added)
+
+    # Remove referências a pastas que sumiram durante a atualização
+    for node in tree.values():
+        node['subdirs'] = [d for d in node['subdirs'] if d in tree]
+
+    return True
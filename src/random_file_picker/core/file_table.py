@@ -0,0 +1,254 @@
+"""Tabela colunar de arquivos em memória."""
+
+import os
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Valor das colunas numéricas para arquivos sem stat (ex: nuvem, membros de arquivos compactados)
+MISSING_SIZE = -1
+MISSING_MTIME = -1.0
+
+
+class FileTable:
+    """Arquivos guardados em colunas, em vez de um dicionário por arquivo:
+    - Tabela de diretórios compartilhada (prefixo do caminho, com o separador final)
+    - Por arquivo: ID do diretório (array('I')), nome, tamanho (array('q')) e mtime (array('d'))
+    - O caminho é montado como prefixo + nome (não é guardado por arquivo)
+    - Registros {'path', 'size', 'mtime', 'name'} são montados só sob demanda
+      (record, __getitem__, __iter__) para quem ainda espera dicionários
+    """
+
+    def __init__(self):
+        """Cria uma tabela vazia."""
+        self.prefixes: List[str] = []
+        self.dir_ids = array('I')
+        self.names: List[str] = []
+        self.sizes = array('q')
+        self.mtimes = array('d')
+
+        # Índice prefixo -> ID (None: lista de prefixos compartilhada com outra tabela)
+        self._prefix_ids: Optional[Dict[str, int]] = {}
+        self._dirnames: Optional[List[str]] = None
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> 'FileTable':
+        """Cria uma tabela a partir de registros {'path', 'size', 'mtime', 'name'}.
+
+        Args:
+            records: Registros (size/mtime/name são opcionais).
+
+        Returns:
+            Nova tabela.
+        """
+        table = cls()
+        table.extend(records)
+        return table
+
+    @classmethod
+    def concat(cls, tables: Iterable['FileTable']) -> 'FileTable':
+        """Concatena tabelas, unificando a tabela de diretórios.
+
+        Args:
+            tables: Tabelas a concatenar (na ordem).
+
+        Returns:
+            Nova tabela; a posição de cada arquivo segue a ordem das tabelas.
+        """
+        result = cls()
+        for table in tables:
+            remap = [result._get_prefix_id(prefix) for prefix in table.prefixes]
+            result.dir_ids.extend(remap[dir_id] for dir_id in table.dir_ids)
+            result.names.extend(table.names)
+            result.sizes.extend(table.sizes)
+            result.mtimes.extend(table.mtimes)
+        return result
+
+    def __getstate__(self):
+        """Estado serializado: só as colunas (o índice de prefixos é reconstruído)."""
+        return self.prefixes, self.dir_ids, self.names, self.sizes, self.mtimes
+
+    def __setstate__(self, state):
+        """Restaura a tabela serializada por __getstate__."""
+        self.prefixes, self.dir_ids, self.names, self.sizes, self.mtimes = state
+        self._prefix_ids = None
+        self._dirnames = None
+
+    def _get_prefix_id(self, prefix: str) -> int:
+        """Obtém (ou cria) o ID de um prefixo de diretório."""
+        if self._prefix_ids is None:
+            # Lista compartilhada ou restaurada: cria cópia própria antes de alterar
+            self.prefixes = list(self.prefixes)
+            self._prefix_ids = {p: i for i, p in enumerate(self.prefixes)}
+
+        prefix_id = self._prefix_ids.get(prefix)
+        if prefix_id is None:
+            prefix_id = len(self.prefixes)
+            self.prefixes.append(prefix)
+            self._prefix_ids[prefix] = prefix_id
+            self._dirnames = None
+        return prefix_id
+
+    def append(self, path: str, name: Optional[str] = None,
+               size: Optional[int] = None, mtime: Optional[float] = None):
+        """Adiciona um arquivo.
+
+        Args:
+            path: Caminho completo (real ou virtual "arquivo.zip!/membro").
+            name: Nome do arquivo (padrão: parte final do caminho).
+            size: Tamanho em bytes (None se desconhecido).
+            mtime: Data de modificação (None se desconhecida).
+        """
+        if not name or not path.endswith(name):
+            # Aceita '/' (membros de arquivos compactados) e o separador do sistema
+            cut = max(path.rfind('/'), path.rfind(os.sep)) + 1
+            name = path[cut:]
+
+        self.dir_ids.append(self._get_prefix_id(path[:len(path) - len(name)]))
+        self.names.append(name)
+        self.sizes.append(MISSING_SIZE if size is None else size)
+        self.mtimes.append(MISSING_MTIME if mtime is None else mtime)
+
+    def extend(self, records: Iterable[Dict[str, Any]]):
+        """Adiciona registros {'path', 'size', 'mtime', 'name'}."""
+        for file_info in records:
+            self.append(file_info['path'], file_info.get('name'),
+                        file_info.get('size'), file_info.get('mtime'))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def path(self, file_id: int) -> str:
+        """Retorna o caminho completo de um arquivo."""
+        return self.prefixes[self.dir_ids[file_id]] + self.names[file_id]
+
+    def paths(self) -> List[str]:
+        """Retorna os caminhos de todos os arquivos, em ordem."""
+        prefixes = self.prefixes
+        return [prefixes[dir_id] + name for dir_id, name in zip(self.dir_ids, self.names)]
+
+    def _get_dirnames(self) -> List[str]:
+        """Retorna a pasta de cada prefixo (mesma posição de prefixes)."""
+        if self._dirnames is None:
+            # O nome não tem separadores: a pasta só depende do prefixo
+            self._dirnames = [os.path.dirname(prefix + "_") for prefix in self.prefixes]
+        return self._dirnames
+
+    def dirname(self, file_id: int) -> str:
+        """Retorna a pasta de um arquivo (mesmo resultado de os.path.dirname do caminho)."""
+        return self._get_dirnames()[self.dir_ids[file_id]]
+
+    def group_by_dir(self) -> Dict[str, array]:
+        """Agrupa os IDs dos arquivos por pasta (mesma chave de dirname).
+
+        Returns:
+            Dicionário {pasta: array('I') de IDs em ordem crescente}.
+        """
+        groups: Dict[int, array] = {}
+        for file_id, dir_id in enumerate(self.dir_ids):
+            file_ids = groups.get(dir_id)
+            if file_ids is None:
+                file_ids = groups[dir_id] = array('I')
+            file_ids.append(file_id)
+
+        dirnames = self._get_dirnames()
+        by_dirname: Dict[str, array] = {}
+        for dir_id, file_ids in groups.items():
+            dirname = dirnames[dir_id]
+            if dirname in by_dirname:
+                # Prefixos diferentes para a mesma pasta (ex: separadores misturados)
+                by_dirname[dirname] = array('I', sorted(by_dirname[dirname] + file_ids))
+            else:
+                by_dirname[dirname] = file_ids
+        return by_dirname
+
+    def dir_runs(self) -> Dict[str, List[Tuple[int, int]]]:
+        """Resume as posições de cada pasta em intervalos contíguos.
+
+        Arquivos de uma mesma pasta costumam estar juntos na tabela: o resumo
+        tem o tamanho do número de pastas, não do número de arquivos.
+
+        Returns:
+            Dicionário {pasta: [(início, quantidade), ...]} em ordem crescente.
+        """
+        runs: Dict[str, List[List[int]]] = {}
+        dirnames = self._get_dirnames()
+        current = None
+        previous_id = None
+        for file_id, dir_id in enumerate(self.dir_ids):
+            if dir_id == previous_id:
+                current[1] += 1
+                continue
+            current = [file_id, 1]
+            dirname = dirnames[dir_id]
+            dir_runs = runs.setdefault(dirname, [])
+            if dir_runs and dir_runs[-1][0] + dir_runs[-1][1] == file_id:
+                # Prefixos diferentes para a mesma pasta, lado a lado
+                current = dir_runs[-1]
+                current[1] += 1
+            else:
+                dir_runs.append(current)
+            previous_id = dir_id
+        return {dirname: [tuple(run) for run in dir_runs] for dirname, dir_runs in runs.items()}
+
+    def record(self, file_id: int) -> Dict[str, Any]:
+        """Monta o registro {'path', 'size', 'mtime', 'name'} de um arquivo."""
+        record = {'path': self.path(file_id)}
+        size = self.sizes[file_id]
+        if size != MISSING_SIZE:
+            record['size'] = size
+            record['mtime'] = self.mtimes[file_id]
+        record['name'] = self.names[file_id]
+        return record
+
+    def __getitem__(self, file_id: int) -> Dict[str, Any]:
+        return self.record(file_id)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (self.record(file_id) for file_id in range(len(self.names)))
+
+    def take(self, file_ids: Iterable[int]) -> 'FileTable':
+        """Cria uma tabela com os arquivos informados, na ordem informada.
+
+        A tabela de diretórios é compartilhada (copiada só se a nova tabela
+        receber diretórios novos): o custo é proporcional ao resultado.
+
+        Args:
+            file_ids: Posições dos arquivos nesta tabela.
+
+        Returns:
+            Nova tabela.
+        """
+        file_ids = file_ids if isinstance(file_ids, (list, range, array)) else list(file_ids)
+        result = FileTable()
+        result.prefixes = self.prefixes
+        result._prefix_ids = None
+        result.dir_ids = array('I', (self.dir_ids[i] for i in file_ids))
+        result.names = [self.names[i] for i in file_ids]
+        result.sizes = array('q', (self.sizes[i] for i in file_ids))
+        result.mtimes = array('d', (self.mtimes[i] for i in file_ids))
+        return result
+
+    def exclude_extensions(self, ignored_extensions: Iterable[str]) -> 'FileTable':
+        """Remove arquivos cujas extensões estão na lista (sem ponto, minúsculas).
+
+        Returns:
+            Nova tabela (ou a própria, se a lista for vazia).
+        """
+        ignored = set(ignored_extensions)
+        if not ignored:
+            return self
+        return self.take([
+            file_id for file_id, name in enumerate(self.names)
+            if os.path.splitext(name)[1].lower().lstrip('.') not in ignored
+        ])
+
+    def keep_dirs(self, dirnames: Iterable[str]) -> 'FileTable':
+        """Mantém apenas os arquivos das pastas informadas.
+
+        Returns:
+            Nova tabela.
+        """
+        dirnames = set(dirnames)
+        return self.take([
+            file_id for file_id in range(len(self.names)) if self.dirname(file_id) in dirnames
+        ])
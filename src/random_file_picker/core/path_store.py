@@ -0,0 +1,116 @@
+"""Arquivo de caminhos com acesso direto via mmap (sorteio sem desserializar o cache)."""
+
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Iterable, Optional
+
+from .cache_storage import atomic_write
+
+# Cabeçalho: assinatura, quantidade de caminhos e identificador do shard de origem
+_MAGIC = b"RFPPATH1"
+_HEADER = struct.Struct("<8sQ32s")
+_OFFSET = struct.Struct("<Q")
+_RECORD = struct.Struct("<QQ")
+
+
+def write_path_store(target: Path, paths: Iterable[str], token: str):
+    """Grava um arquivo de caminhos: cabeçalho, tabela de offsets e heap de strings.
+
+    A tabela tem quantidade + 1 offsets (uint64) para o heap: o caminho i
+    ocupa heap[offsets[i]:offsets[i + 1]] em UTF-8.
+
+    Args:
+        target: Arquivo a gravar.
+        paths: Caminhos, na ordem dos IDs.
+        token: Identificador do shard de origem (até 32 bytes em UTF-8),
+               usado para detectar um arquivo de caminhos desatualizado.
+
+    Raises:
+        OSError: Se o arquivo não puder ser gravado.
+    """
+    encoded = [path.encode('utf-8', 'surrogateescape') for path in paths]
+
+    offsets = [0]
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+
+    with atomic_write(target) as f:
+        f.write(_HEADER.pack(_MAGIC, len(encoded), token.encode('utf-8')[:32]))
+        f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+        f.write(b"".join(encoded))
+
+
+class PathStore:
+    """Leitor de um arquivo gravado por write_path_store.
+
+    O arquivo é mapeado em memória: ler um caminho custa dois offsets e uma
+    fatia do heap, sem carregar os demais.
+    """
+
+    def __init__(self, source: Path):
+        """Abre e mapeia o arquivo.
+
+        Args:
+            source: Arquivo de caminhos.
+
+        Raises:
+            OSError: Se o arquivo não existe, não pode ser mapeado ou é inválido.
+        """
+        with open(source, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < _HEADER.size:
+                raise OSError(f"Arquivo de caminhos inválido: {source}")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self._count, token = _HEADER.unpack_from(self._map, 0)
+        heap_start = _HEADER.size + _OFFSET.size * (self._count + 1)
+        if magic != _MAGIC or heap_start > size:
+            self._map.close()
+            raise OSError(f"Arquivo de caminhos inválido: {source}")
+
+        self.token = token.rstrip(b"\0").decode('utf-8')
+        self._heap_start = heap_start
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, file_id: int) -> str:
+        """Lê o caminho de um arquivo pelo ID (posição na ordem gravada)."""
+        if not 0 <= file_id < self._count:
+            raise IndexError(file_id)
+        start, end = _RECORD.unpack_from(self._map, _HEADER.size + _OFFSET.size * file_id)
+        data = self._map[self._heap_start + start:self._heap_start + end]
+        return data.decode('utf-8', 'surrogateescape')
+
+    def close(self):
+        """Libera o mapeamento."""
+        self._map.close()
+
+    def __enter__(self) -> 'PathStore':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_path_store(source: Path, token: Optional[str] = None) -> Optional[PathStore]:
+    """Abre um arquivo de caminhos, se existir e corresponder ao shard.
+
+    Args:
+        source: Arquivo de caminhos.
+        token: Identificador esperado (None: não verifica).
+
+    Returns:
+        PathStore aberto ou None se ausente, inválido ou desatualizado.
+    """
+    try:
+        store = PathStore(source)
+    except (OSError, ValueError, struct.error):
+        return None
+
+    if token is not None and store.token != token[:32]:
+        store.close()
+        return None
+    return store
@@ -0,0 +1,104 @@
+"""Sorteio de arquivos sem embaralhar a lista de candidatos."""
+
+import math
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar('T')
+
+_END = object()
+
+
+def choose_index(count: int, rng) -> int:
+    """Sorteia uma posição em [0, count) com um único sorteio.
+
+    Args:
+        count: Quantidade de candidatos.
+        rng: Gerador com randrange (ex: random.SystemRandom()).
+
+    Returns:
+        Posição sorteada.
+
+    Raises:
+        ValueError: Se não houver candidatos.
+    """
+    if count <= 0:
+        raise ValueError("Nenhum candidato para sortear")
+    return rng.randrange(count)
+
+
+def choose_from_groups(groups: Dict[str, Sequence[T]], rng) -> Optional[Tuple[str, T]]:
+    """Sorteia um item entre grupos (ex: arquivos por pasta) sem concatená-los.
+
+    Cada item tem a mesma chance, independente do tamanho do seu grupo.
+
+    Args:
+        groups: Dicionário {chave: itens}.
+        rng: Gerador com randrange.
+
+    Returns:
+        Tupla (chave do grupo, item) ou None se não houver itens.
+    """
+    total = sum(len(items) for items in groups.values())
+    if total == 0:
+        return None
+
+    position = rng.randrange(total)
+    for key, items in groups.items():
+        if position < len(items):
+            return key, items[position]
+        position -= len(items)
+    return None
+
+
+def _open_uniform(rng) -> float:
+    """Sorteia um número em (0, 1) (random() pode retornar 0.0)."""
+    value = rng.random()
+    while value == 0.0:
+        value = rng.random()
+    return value
+
+
+def reservoir_sample(items: Iterable[T], k: int, rng) -> List[T]:
+    """Amostra k itens de uma sequência de tamanho desconhecido em uma passada.
+
+    Usa o Algoritmo L (Li, 1994): em vez de um sorteio por item, sorteia
+    quantos itens pular até a próxima troca, o que faz o número de sorteios
+    crescer com log(n/k) e não com n. Útil com SystemRandom, em que cada
+    sorteio lê do os.urandom.
+
+    Args:
+        items: Itens (ex: gerador de uma varredura de pastas).
+        k: Tamanho da amostra.
+        rng: Gerador com random e randrange.
+
+    Returns:
+        Lista com até k itens (menos se a sequência for menor), em ordem qualquer.
+    """
+    iterator = iter(items)
+    reservoir = list(islice(iterator, k))
+    if k <= 0 or len(reservoir) < k:
+        return reservoir
+
+    weight = math.exp(math.log(_open_uniform(rng)) / k)
+    while True:
+        skip = int(math.log(_open_uniform(rng)) / math.log1p(-weight))
+        item = next(islice(iterator, skip, None), _END)
+        if item is _END:
+            return reservoir
+        reservoir[rng.randrange(k)] = item
+        weight *= math.exp(math.log(_open_uniform(rng)) / k)
+
+
+def choose_streaming(items: Iterable[T], rng) -> Optional[T]:
+    """Sorteia um item de uma sequência de tamanho desconhecido, sem montar a lista.
+
+    Args:
+        items: Itens a sortear.
+        rng: Gerador com random e randrange.
+
+    Returns:
+        Item sorteado ou None se a sequência estiver vazia.
+    """
+    sample = reservoir_sample(items, 1, rng)
+    return sample[0] if sample else None
@@ -0,0 +1,266 @@
+"""Índice persistente de coleções sequenciais com arquivos não lidos."""
+
+import hashlib
+import pickle
+import random
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from random_file_picker.core.cache_storage import atomic_write
+from random_file_picker.core.sequential_selector import (
+    SequentialFileTracker,
+    analyze_folder_sequence,
+    build_sequences_from_index,
+    get_next_unread_file,
+)
+
+
+class SequenceIndex:
+    """Índice de sequências usado pela seleção sequencial:
+    - Sequências montadas do índice pré-processado do cache (sem regex nem listagem)
+    - Lista global de pastas com coleções não lidas (sorteio em O(1))
+    - Persistido junto ao cache enquanto shards, filtros e rastreador não mudarem
+    """
+
+    INDEX_VERSION = 1
+
+    def __init__(self, cache_dir: Path, files_by_folder: Dict[str, List[str]],
+                 entries_by_folder: Dict[str, List[Dict[str, Any]]], exclude_prefix: str = "_L_"):
+        """Inicializa o índice.
+
+        Args:
+            cache_dir: Diretório do cache onde o índice é persistido.
+            files_by_folder: Arquivos válidos por pasta (de collect_files_by_folder).
+            entries_by_folder: Entradas pré-processadas por pasta
+                               (CacheManager.get_sequence_entries).
+            exclude_prefix: Prefixos de arquivos a ignorar (separados por vírgula).
+        """
+        self.index_file = Path(cache_dir) / "sequence_index.pkl"
+        self.files_by_folder = files_by_folder
+        self.entries_by_folder = entries_by_folder
+        self.exclude_prefix = exclude_prefix
+
+        # Estado persistido
+        self.signature: Optional[str] = None
+        self.tracker_stamp: Optional[Tuple] = None
+        self.unread: Dict[str, List[str]] = {}  # pasta -> coleções com arquivos não lidos
+        self.unread_folders: List[str] = []
+
+        self._positions: Dict[str, int] = {}
+        self._dirty = False
+
+    @staticmethod
+    def make_signature(folders: List[str], shard_stamp: Optional[tuple], exclude_prefix: str,
+                       keywords: Optional[List[str]], keywords_match_all: bool,
+                       ignored_extensions: Optional[List[str]],
+                       index_archives: bool = False) -> str:
+        """Gera a assinatura que identifica o conjunto de arquivos indexado.
+
+        Args:
+            folders: Pastas configuradas.
+            shard_stamp: Versão dos shards (CacheManager.get_shard_stamp).
+            exclude_prefix: Prefixos de arquivos a ignorar.
+            keywords: Palavras-chave do filtro.
+            keywords_match_all: AND ou OR.
+            ignored_extensions: Extensões ignoradas.
+            index_archives: Se membros de arquivos compactados estão indexados.
+
+        Returns:
+            Hash MD5 da combinação.
+        """
+        parts = [
+            str(SequenceIndex.INDEX_VERSION),
+            repr(sorted(folders)),
+            repr(shard_stamp),
+            exclude_prefix,
+            repr(sorted(kw.lower() for kw in keywords or [])),
+            str(keywords_match_all),
+            repr(sorted(ext.lower().lstrip('.') for ext in ignored_extensions or [])),
+            str(index_archives),
+        ]
+        return hashlib.md5("|".join(parts).encode()).hexdigest()
+
+    @staticmethod
+    def _get_tracker_stamp(tracker: SequentialFileTracker) -> Optional[Tuple]:
+        """Obtém a versão em disco do rastreador (snapshot + journal), ou None se não existir."""
+        return tracker.get_state_stamp()
+
+    def folder_sequences(self, folder: str) -> Optional[List[Dict]]:
+        """Monta as sequências de uma pasta sem acessar o sistema de arquivos.
+
+        Args:
+            folder: Caminho da pasta (chave de files_by_folder).
+
+        Returns:
+            Lista de sequências válidas, ou None se não houver.
+        """
+        file_paths = self.files_by_folder.get(folder)
+        if not file_paths:
+            return None
+
+        entries = self.entries_by_folder.get(folder)
+        if entries is None:
+            # Pasta sem índice no cache: analisa a partir da lista já coletada
+            return analyze_folder_sequence(Path(folder), self.exclude_prefix, file_paths=file_paths)
+
+        return build_sequences_from_index(folder, entries, file_paths, self.exclude_prefix)
+
+    @staticmethod
+    def _has_unread(sequence: Dict, tracker: SequentialFileTracker) -> bool:
+        """Verifica se uma sequência ainda tem arquivos não lidos."""
+        return tracker.get_next_unread_index(sequence) is not None
+
+    def _add_folder(self, folder: str, collections: List[str]):
+        """Adiciona uma pasta à lista global de pastas com não lidos."""
+        self.unread[folder] = collections
+        self._positions[folder] = len(self.unread_folders)
+        self.unread_folders.append(folder)
+
+    def _discard_folder(self, folder: str):
+        """Remove uma pasta da lista global em O(1) (troca com a última)."""
+        position = self._positions.pop(folder, None)
+        self.unread.pop(folder, None)
+        if position is None:
+            return
+
+        last = self.unread_folders.pop()
+        if last != folder:
+            self.unread_folders[position] = last
+            self._positions[last] = position
+        self._dirty = True
+
+    def _rebuild_unread(self, tracker: SequentialFileTracker):
+        """Recalcula a lista de pastas/coleções com arquivos não lidos."""
+        self.unread = {}
+        self.unread_folders = []
+        self._positions = {}
+
+        for folder in self.files_by_folder:
+            sequences = self.folder_sequences(folder)
+            if not sequences:
+                continue
+
+            collections = [seq['collection'] for seq in sequences if self._has_unread(seq, tracker)]
+            if collections:
+                self._add_folder(folder, collections)
+
+        self.tracker_stamp = self._get_tracker_stamp(tracker)
+        self._dirty = True
+
+    def _load(self, signature: str) -> bool:
+        """Carrega o índice persistido se a assinatura corresponder.
+
+        Returns:
+            True se carregou, False caso contrário.
+        """
+        if not self.index_file.exists():
+            return False
+
+        try:
+            with open(self.index_file, 'rb') as f:
+                data = pickle.load(f)
+        except (pickle.PickleError, OSError, EOFError):
+            return False
+
+        if data.get('signature') != signature:
+            return False
+
+        self.tracker_stamp = data.get('tracker_stamp')
+        self.unread = data.get('unread', {})
+        self.unread_folders = data.get('unread_folders', [])
+        self._positions = {folder: i for i, folder in enumerate(self.unread_folders)}
+        return True
+
+    def load_or_build(self, signature: Optional[str], tracker: SequentialFileTracker):
+        """Carrega o índice persistido ou o reconstrói.
+
+        Args:
+            signature: Assinatura atual (None desativa a persistência).
+            tracker: Rastreador de arquivos lidos.
+        """
+        self.signature = signature
+
+        if signature is not None and self._load(signature):
+            # Outro processo marcou arquivos como lidos: recalcula só a lista de não lidos
+            if self.tracker_stamp != self._get_tracker_stamp(tracker):
+                self._rebuild_unread(tracker)
+        else:
+            self._rebuild_unread(tracker)
+
+        self.save()
+
+    def save(self) -> bool:
+        """Persiste o índice se houve alterações.
+
+        Returns:
+            True se salvou (ou não havia o que salvar), False em caso de erro.
+        """
+        if not self._dirty or self.signature is None:
+            return True
+
+        data = {
+            'signature': self.signature,
+            'tracker_stamp': self.tracker_stamp,
+            'unread': self.unread,
+            'unread_folders': self.unread_folders,
+        }
+
+        try:
+            with atomic_write(self.index_file) as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except (OSError, pickle.PickleError):
+            return False
+
+        self._dirty = False
+        return True
+
+    def pick_next_unread(self, tracker: SequentialFileTracker,
+                         keywords: List[str] = None, keywords_match_all: bool = False,
+                         ) -> Optional[Tuple[str, Tuple[str, Dict, Dict]]]:
+        """Sorteia uma pasta com coleções não lidas e retorna seu próximo arquivo.
+
+        Args:
+            tracker: Rastreador de arquivos lidos.
+            keywords: Lista de palavras-chave para filtrar arquivos.
+            keywords_match_all: Se True usa AND, se False usa OR.
+
+        Returns:
+            Tupla (pasta, resultado de get_next_unread_file) ou None se tudo foi lido.
+        """
+        while self.unread_folders:
+            folder = random.choice(self.unread_folders)
+            collections = set(self.unread[folder])
+            sequences = [seq for seq in self.folder_sequences(folder) or []
+                         if seq['collection'] in collections]
+
+            result = None
+            if sequences:
+                result = get_next_unread_file(sequences, tracker, keywords, keywords_match_all)
+            if result:
+                return folder, result
+
+            # Índice desatualizado (ex: tudo já lido): remove a pasta e tenta outra
+            self._discard_folder(folder)
+
+        # Pastas descartadas ficam gravadas: o próximo processo não as verifica de novo
+        self.save()
+        return None
+
+    def update_after_read(self, folder: str, sequence: Dict, tracker: SequentialFileTracker):
+        """Atualiza o índice após marcar um arquivo da sequência como lido.
+
+        Args:
+            folder: Pasta da sequência.
+            sequence: Sequência de onde o arquivo foi lido.
+            tracker: Rastreador (já atualizado).
+        """
+        collections = self.unread.get(folder)
+        if collections is not None and not self._has_unread(sequence, tracker):
+            if sequence['collection'] in collections:
+                collections.remove(sequence['collection'])
+            if not collections:
+                self._discard_folder(folder)
+
+        self.tracker_stamp = self._get_tracker_stamp(tracker)
+        self._dirty = True
+        self.save()
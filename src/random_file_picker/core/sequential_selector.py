@@ -2,58 +2,187 @@ import re
 import json
 import random
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Set, Tuple
 import os
+from random_file_picker.core.cache_manager import create_cache_manager
+from random_file_picker.core.cache_storage import FileLock, atomic_write
+from random_file_picker.core.extraction_cache import ExtractionCache
 from random_file_picker.core.file_picker import (
     pick_random_file_with_zip_support,
     list_files_in_zip,
     extract_file_from_zip,
-    collect_files,
-    get_temp_extraction_dir,
+    collect_files_by_folder,
+    create_extraction_cache,
+    is_archive_file,
+    is_archive_member_path,
+    open_archive_member_path,
+    select_archive_member,
 )
+from random_file_picker.core.random_selection import choose_from_groups
 
 
 class SequentialFileTracker:
-    """Rastreador de arquivos lidos em sequência."""
+    """Rastreador de arquivos lidos em sequência.
+    
+    Armazenamento em duas partes:
+    - Snapshot JSON ({pasta: [arquivos]}) no arquivo de rastreamento
+    - Journal append-only (<arquivo>.journal) com uma operação JSON por linha
+    
+    Marcar como lido é um append de uma linha; o journal é compactado no
+    snapshot quando passa de JOURNAL_COMPACT_THRESHOLD operações. Appends e
+    compactação usam a trava <arquivo>.lock, para que nenhuma operação de
+    outro processo se perca entre a releitura e o esvaziamento do journal.
+    
+    Mantém em memória um conjunto de arquivos lidos por pasta (is_read em O(1))
+    e um cursor "próximo não lido" por (pasta, coleção), que avança sobre os
+    arquivos marcados como lidos e é reconstruído quando a sequência muda.
+    """
+    
+    JOURNAL_COMPACT_THRESHOLD = 1000
     
     def __init__(self, tracker_file: str = "read_files_tracker.json"):
         self.tracker_file = Path(tracker_file)
-        self.data = self._load_tracker()
-    
-    def _load_tracker(self) -> Dict:
-        """Carrega o arquivo de rastreamento."""
+        self.journal_file = self.tracker_file.with_name(self.tracker_file.name + ".journal")
+        self.lock_file = self.tracker_file.with_name(self.tracker_file.name + ".lock")
+        self.data: Dict[str, List[str]] = {}
+        self._read_sets: Dict[str, Set[str]] = {}
+        self._cursors: Dict[Tuple[str, str], Dict] = {}
+        self._journal_entries = 0
+        self._load_tracker()
+    
+    def _load_tracker(self):
+        """Carrega o snapshot e reaplica as operações do journal."""
+        data = {}
         if self.tracker_file.exists():
             try:
                 with open(self.tracker_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    data = json.load(f)
             except:
-                return {}
-        return {}
-    
-    def _save_tracker(self):
-        """Salva o arquivo de rastreamento."""
+                data = {}
+        
+        self.data = {folder: list(dict.fromkeys(files)) for folder, files in data.items()}
+        self._read_sets = {folder: set(files) for folder, files in self.data.items()}
+        self._cursors = {}
+        self._journal_entries = 0
+        
+        if not self.journal_file.exists():
+            return
+        
+        try:
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Linha incompleta (escrita interrompida): ignora
+                        continue
+                    self._apply_entry(entry)
+                    self._journal_entries += 1
+        except OSError as e:
+            print(f"Erro ao ler journal de rastreamento: {e}")
+    
+    def _apply_entry(self, entry: Dict):
+        """Aplica uma operação do journal ao estado em memória."""
+        folder = entry.get('folder')
+        if folder is None:
+            return
+        
+        if entry.get('op') == 'read':
+            filename = entry.get('file')
+            if folder not in self.data:
+                self.data[folder] = []
+                self._read_sets[folder] = set()
+            if filename not in self._read_sets[folder]:
+                self.data[folder].append(filename)
+                self._read_sets[folder].add(filename)
+        elif entry.get('op') == 'reset':
+            self.data.pop(folder, None)
+            self._read_sets.pop(folder, None)
+            self._cursors = {key: cursor for key, cursor in self._cursors.items() if key[0] != folder}
+    
+    def _append_journal(self, entry: Dict):
+        """Registra uma operação no journal e compacta se necessário."""
+        lock = FileLock(self.lock_file)
+        try:
+            lock.acquire()
+        except OSError:
+            # Sem suporte a travas (ex: sistema de arquivos somente leitura): grava sem coordenação
+            pass
         try:
-            with open(self.tracker_file, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, indent=2, ensure_ascii=False)
+            with open(self.journal_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
         except Exception as e:
             print(f"Erro ao salvar rastreamento: {e}")
+            return
+        finally:
+            lock.release()
+        
+        self._journal_entries += 1
+        if self._journal_entries >= self.JOURNAL_COMPACT_THRESHOLD:
+            self.compact()
+    
+    def compact(self) -> bool:
+        """Grava o estado atual no snapshot e esvazia o journal.
+        
+        O estado é recarregado do disco antes, para incluir operações
+        registradas por outros processos; a trava fica com este processo da
+        releitura até o journal ser esvaziado.
+        
+        Returns:
+            True se compactou, False se a trava ou os arquivos não puderam ser
+            usados (o journal fica intacto e a compactação é tentada de novo depois).
+        """
+        lock = FileLock(self.lock_file)
+        try:
+            lock.acquire()
+        except OSError:
+            return False
+        
+        try:
+            self._load_tracker()
+            snapshot = json.dumps(self.data, indent=2, ensure_ascii=False).encode('utf-8')
+            with atomic_write(self.tracker_file) as f:
+                f.write(snapshot)
+            # Snapshot já contém tudo: o journal pode ser descartado
+            with open(self.journal_file, 'w', encoding='utf-8'):
+                pass
+        except OSError:
+            return False
+        finally:
+            lock.release()
+        
+        self._journal_entries = 0
+        return True
+    
+    def get_state_stamp(self) -> Optional[Tuple]:
+        """Retorna (mtime_ns, tamanho) do snapshot e do journal para detectar mudanças.
+        
+        Returns:
+            Tupla com os dados dos dois arquivos, ou None se nenhum existir.
+        """
+        stamp = []
+        for path in (self.tracker_file, self.journal_file):
+            try:
+                stat = path.stat()
+                stamp.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp) if any(stamp) else None
     
     def mark_as_read(self, file_path: str):
         """Marca um arquivo como lido."""
-        folder = str(Path(file_path).parent)
-        if folder not in self.data:
-            self.data[folder] = []
-        
-        filename = Path(file_path).name
-        if filename not in self.data[folder]:
-            self.data[folder].append(filename)
-            self._save_tracker()
+        path = Path(file_path)
+        folder = str(path.parent)
+        filename = path.name
+        if filename not in self._read_sets.get(folder, ()):
+            entry = {'op': 'read', 'folder': folder, 'file': filename}
+            self._apply_entry(entry)
+            self._append_journal(entry)
     
     def is_read(self, file_path: str) -> bool:
         """Verifica se um arquivo já foi lido."""
-        folder = str(Path(file_path).parent)
-        filename = Path(file_path).name
-        return folder in self.data and filename in self.data[folder]
+        path = Path(file_path)
+        return path.name in self._read_sets.get(str(path.parent), ())
     
     def get_read_files(self, folder: str) -> List[str]:
         """Retorna lista de arquivos lidos em uma pasta."""
@@ -63,8 +192,79 @@ class SequentialFileTracker:
         """Reseta o rastreamento de uma pasta."""
         folder_str = str(folder)
         if folder_str in self.data:
-            del self.data[folder_str]
-            self._save_tracker()
+            entry = {'op': 'reset', 'folder': folder_str}
+            self._apply_entry(entry)
+            self._append_journal(entry)
+    
+    def get_next_unread_index(self, sequence: Dict) -> Optional[int]:
+        """Retorna a posição do primeiro arquivo não lido de uma sequência.
+        
+        Usa o cursor da coleção: arquivos antes dele já foram lidos, então só
+        os arquivos marcados desde a última consulta são pulados (O(1) amortizado).
+        O cursor é reconstruído se a sequência mudou (arquivos adicionados/removidos).
+        
+        Args:
+            sequence: Sequência (de analyze_folder_sequence) com 'folder', 'collection' e 'files'
+            
+        Returns:
+            Índice em sequence['files'] ou None se todos foram lidos
+        """
+        files = sequence['files']
+        folder = str(Path(sequence['folder']))
+        key = (folder, sequence['collection'])
+        read_names = self._read_sets.get(folder, ())
+        
+        cursor = self._cursors.get(key)
+        index = 0
+        if cursor and cursor['count'] == len(files):
+            position = cursor['index']
+            # O arquivo antes do cursor deve continuar o mesmo; senão a sequência mudou
+            if position == 0 or (position <= len(files) and files[position - 1]['filename'] == cursor['anchor']):
+                index = position
+        
+        while index < len(files) and files[index]['filename'] in read_names:
+            index += 1
+        
+        self._cursors[key] = {
+            'index': index,
+            'count': len(files),
+            'anchor': files[index - 1]['filename'] if index else None
+        }
+        
+        return index if index < len(files) else None
+    
+    def close(self):
+        """Libera o rastreador (nada a fechar: cada operação abre e fecha os arquivos)."""
+    
+    def __enter__(self) -> 'SequentialFileTracker':
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+TRACKER_BACKENDS = ("json", "sqlite")
+
+
+def create_tracker(backend: str = "json", tracker_file: Optional[str] = None):
+    """Cria o rastreador de arquivos lidos do backend escolhido.
+    
+    Args:
+        backend: "json" (snapshot + journal) ou "sqlite" (WAL, seguro para vários processos)
+        tracker_file: Caminho do arquivo (padrão: read_files_tracker.json / .db)
+        
+    Returns:
+        SequentialFileTracker ou SQLiteFileTracker (fechar com close() ou usar com with)
+        
+    Raises:
+        ValueError: Se o backend não for suportado
+    """
+    if backend == "sqlite":
+        from random_file_picker.core.sqlite_tracker import SQLiteFileTracker
+        return SQLiteFileTracker(tracker_file or "read_files_tracker.db")
+    if backend == "json":
+        return SequentialFileTracker(tracker_file or "read_files_tracker.json")
+    raise ValueError(f"Backend de rastreamento desconhecido: {backend}")
 
 
 def extract_number_from_filename(filename: str) -> Optional[Tuple[float, str]]:
@@ -210,7 +410,7 @@ def extract_collection_name(filename: str) -> str:
     return collection_name if collection_name else name_without_ext
 
 
-def analyze_folder_sequence(folder_path: Path, exclude_prefix: str = "_L_", keywords: List[str] = None, keywords_match_all: bool = False, ignored_extensions: List[str] = None) -> Optional[List[Dict]]:
+def analyze_folder_sequence(folder_path: Path, exclude_prefix: str = "_L_", keywords: List[str] = None, keywords_match_all: bool = False, ignored_extensions: List[str] = None, file_paths: Optional[List[str]] = None) -> Optional[List[Dict]]:
     """
     Analisa se os arquivos em uma pasta seguem uma sequência ordenada.
     Agrupa arquivos por coleção (nome base) para suportar múltiplas coleções na mesma pasta.
@@ -221,6 +421,8 @@ def analyze_folder_sequence(folder_path: Path, exclude_prefix: str = "_L_", keyw
         keywords: Lista de palavras-chave para filtrar arquivos
         keywords_match_all: Se True, todas as keywords devem estar presentes (AND); se False, ao menos uma (OR)
         ignored_extensions: Lista de extensões a ignorar (ex: ['srt', 'sub'])
+        file_paths: Arquivos da pasta já conhecidos (ex: de collect_files_by_folder).
+                    Se fornecido, a pasta não é listada novamente.
         
     Returns:
         Lista de dicionários com informações das sequências por coleção, ou None se não houver padrão
@@ -236,12 +438,12 @@ def analyze_folder_sequence(folder_path: Path, exclude_prefix: str = "_L_", keyw
         ignored_ext_set = {ext.lower().lstrip('.') for ext in ignored_extensions}
     
     try:
-        # Lista todos os arquivos da pasta (não recursivo)
-        for file_path in folder_path.iterdir():
-            if not file_path.is_file():
-                continue
-            
-            filename = file_path.name
+        # Lista todos os arquivos da pasta (não recursivo), a menos que já tenham sido coletados
+        if file_paths is None:
+            file_paths = [str(p) for p in folder_path.iterdir() if p.is_file()]
+        
+        for file_path in file_paths:
+            filename = os.path.basename(file_path)
             
             # Ignora arquivos com prefixos de exclusão
             if any(filename.startswith(prefix) for prefix in exclude_prefixes):
@@ -249,7 +451,7 @@ def analyze_folder_sequence(folder_path: Path, exclude_prefix: str = "_L_", keyw
             
             # Ignora arquivos com extensões da lista de ignorados
             if ignored_ext_set:
-                file_ext = file_path.suffix.lower().lstrip('.')
+                file_ext = os.path.splitext(filename)[1].lower().lstrip('.')
                 if file_ext in ignored_ext_set:
                     continue
             
@@ -273,78 +475,137 @@ def analyze_folder_sequence(folder_path: Path, exclude_prefix: str = "_L_", keyw
                 collection_name = extract_collection_name(filename)
                 
                 files_with_numbers.append({
-                    'path': str(file_path),
+                    'path': file_path,
                     'filename': filename,
                     'number': number,
                     'type': num_type,
                     'collection': collection_name
                 })
         
-        # Precisa ter pelo menos 2 arquivos para considerar uma sequência
-        if len(files_with_numbers) < 2:
-            print(f"[Análise de Sequência] Pasta '{folder_path.name}': {len(files_with_numbers)} arquivo(s) com numeração - insuficiente para sequência")
-            return None
+        return _group_folder_sequences(folder_path, files_with_numbers)
         
-        print(f"[Análise de Sequência] Pasta '{folder_path.name}': {len(files_with_numbers)} arquivos com numeração detectada")
-        
-        # Agrupa arquivos por coleção
-        collections = {}
-        for item in files_with_numbers:
-            collection_name = item['collection']
-            if collection_name not in collections:
-                collections[collection_name] = []
-            collections[collection_name].append(item)
+    except Exception as e:
+        print(f"Erro ao analisar pasta {folder_path}: {e}")
+    
+    return None
+
+
+def _group_folder_sequences(folder_path: Path, files_with_numbers: List[Dict], verbose: bool = True) -> Optional[List[Dict]]:
+    """
+    Agrupa arquivos numerados de uma pasta em sequências por coleção.
+    
+    Args:
+        folder_path: Caminho da pasta
+        files_with_numbers: Arquivos com 'path', 'filename', 'number', 'type' e 'collection'
+        verbose: Se True, imprime o detalhamento da análise
         
+    Returns:
+        Lista de sequências válidas, ou None se não houver
+    """
+    folder_name = os.path.basename(str(folder_path))
+    
+    # Precisa ter pelo menos 2 arquivos para considerar uma sequência
+    if len(files_with_numbers) < 2:
+        if verbose:
+            print(f"[Análise de Sequência] Pasta '{folder_name}': {len(files_with_numbers)} arquivo(s) com numeração - insuficiente para sequência")
+        return None
+    
+    if verbose:
+        print(f"[Análise de Sequência] Pasta '{folder_name}': {len(files_with_numbers)} arquivos com numeração detectada")
+    
+    # Agrupa arquivos por coleção
+    collections = {}
+    for item in files_with_numbers:
+        collection_name = item['collection']
+        if collection_name not in collections:
+            collections[collection_name] = []
+        collections[collection_name].append(item)
+    
+    if verbose:
         print(f"[Análise de Sequência] {len(collections)} coleção(ões) encontrada(s): {list(collections.keys())}")
+    
+    # Analisa cada coleção separadamente
+    valid_sequences = []
+    
+    for collection_name, collection_files in collections.items():
+        # Precisa ter pelo menos 2 arquivos na coleção
+        if len(collection_files) < 2:
+            if verbose:
+                print(f"[Análise de Sequência] Coleção '{collection_name}': apenas {len(collection_files)} arquivo - ignorando")
+            continue
         
-        # Analisa cada coleção separadamente
-        valid_sequences = []
+        # Verifica se há um tipo dominante de numeração na coleção
+        type_counts = {}
+        for item in collection_files:
+            num_type = item['type']
+            type_counts[num_type] = type_counts.get(num_type, 0) + 1
         
-        for collection_name, collection_files in collections.items():
-            # Precisa ter pelo menos 2 arquivos na coleção
-            if len(collection_files) < 2:
-                print(f"[Análise de Sequência] Coleção '{collection_name}': apenas {len(collection_files)} arquivo - ignorando")
-                continue
-            
-            # Verifica se há um tipo dominante de numeração na coleção
-            type_counts = {}
-            for item in collection_files:
-                num_type = item['type']
-                type_counts[num_type] = type_counts.get(num_type, 0) + 1
-            
-            # Tipo mais comum
-            dominant_type = max(type_counts.items(), key=lambda x: x[1])[0]
+        # Tipo mais comum
+        dominant_type = max(type_counts.items(), key=lambda x: x[1])[0]
+        if verbose:
             print(f"[Análise de Sequência] Coleção '{collection_name}': tipo de ordenação dominante = {dominant_type}")
-            
-            # Filtra apenas arquivos do tipo dominante
-            sequence_files = [f for f in collection_files if f['type'] == dominant_type]
-            
-            # Ordena por número
-            sequence_files.sort(key=lambda x: x['number'])
-            
-            # Adiciona a sequência válida
-            if len(sequence_files) >= 2:
-                print(f"[Análise de Sequência] Coleção '{collection_name}': ✓ Sequência válida com {len(sequence_files)} arquivos ({sequence_files[0]['number']} a {sequence_files[-1]['number']})")
-                valid_sequences.append({
-                    'folder': str(folder_path),
-                    'collection': collection_name,
-                    'type': dominant_type,
-                    'files': sequence_files,
-                    'count': len(sequence_files)
-                })
         
-        # Retorna as sequências válidas (pode haver múltiplas coleções)
+        # Filtra apenas arquivos do tipo dominante
+        sequence_files = [f for f in collection_files if f['type'] == dominant_type]
+        
+        # Ordena por número
+        sequence_files.sort(key=lambda x: x['number'])
+        
+        # Adiciona a sequência válida
+        if len(sequence_files) >= 2:
+            if verbose:
+                print(f"[Análise de Sequência] Coleção '{collection_name}': ✓ Sequência válida com {len(sequence_files)} arquivos ({sequence_files[0]['number']} a {sequence_files[-1]['number']})")
+            valid_sequences.append({
+                'folder': str(folder_path),
+                'collection': collection_name,
+                'type': dominant_type,
+                'files': sequence_files,
+                'count': len(sequence_files)
+            })
+    
+    # Retorna as sequências válidas (pode haver múltiplas coleções)
+    if verbose:
         if valid_sequences:
             print(f"[Análise de Sequência] Resultado: {len(valid_sequences)} sequência(s) válida(s) identificada(s)")
         else:
             print(f"[Análise de Sequência] Resultado: Nenhuma sequência válida identificada")
+    
+    return valid_sequences if valid_sequences else None
+
+
+def build_sequences_from_index(folder: str, entries: List[Dict], file_paths: List[str], exclude_prefix: str = "_L_") -> Optional[List[Dict]]:
+    """
+    Monta as sequências de uma pasta a partir do índice persistido no cache,
+    sem listar a pasta nem aplicar regex novamente.
+    
+    Equivale a analyze_folder_sequence(folder, exclude_prefix, file_paths=file_paths)
+    quando file_paths já vem filtrado por keywords e extensões.
+    
+    Args:
+        folder: Caminho da pasta
+        entries: Entradas pré-processadas (CacheManager.get_sequence_entries)
+        file_paths: Arquivos válidos da pasta (ex: de collect_files_by_folder)
+        exclude_prefix: Prefixos de arquivos a ignorar (separados por vírgula)
         
-        return valid_sequences if valid_sequences else None
-        
-    except Exception as e:
-        print(f"Erro ao analisar pasta {folder_path}: {e}")
+    Returns:
+        Lista de sequências válidas, ou None se não houver
+    """
+    exclude_prefixes = tuple(p.strip() for p in exclude_prefix.split(',')) if exclude_prefix else ()
+    valid_names = {os.path.basename(file_path) for file_path in file_paths}
+    
+    files_with_numbers = [
+        {
+            'path': os.path.join(folder, entry['filename']),
+            'filename': entry['filename'],
+            'number': entry['number'],
+            'type': entry['type'],
+            'collection': entry['collection']
+        }
+        for entry in entries
+        if entry['filename'] in valid_names and not entry['filename'].startswith(exclude_prefixes)
+    ]
     
-    return None
+    return _group_folder_sequences(folder, files_with_numbers, verbose=False)
 
 
 def get_next_unread_file(sequences: List[Dict], tracker: SequentialFileTracker, keywords: List[str] = None, keywords_match_all: bool = False) -> Optional[Tuple[str, Dict, Dict]]:
@@ -370,8 +631,13 @@ def get_next_unread_file(sequences: List[Dict], tracker: SequentialFileTracker,
     collections_with_unread = []
     
     for sequence in sequences:
+        # Cursor da coleção: todos os arquivos antes dele já foram lidos
+        start = tracker.get_next_unread_index(sequence)
+        if start is None:
+            continue
+        
         # Procura o primeiro arquivo não lido nesta coleção
-        for file_info in sequence['files']:
+        for file_info in sequence['files'][start:]:
             file_path = file_info['path']
             
             # Verifica se já foi lido
@@ -410,9 +676,22 @@ def get_next_unread_file(sequences: List[Dict], tracker: SequentialFileTracker,
     return selected['next_file'], selected['sequence'], selected['file_info']
 
 
+def _build_sequence_info(sequence: Dict, file_info: Dict) -> Dict:
+    """Monta o resumo da sequência selecionada para o dicionário de informações."""
+    return {
+        'type': sequence['type'],
+        'collection': sequence['collection'],
+        'total_files': sequence['count'],
+        'file_number': file_info['number']
+    }
+
+
 def select_file_with_sequence_logic(folders: List[str], exclude_prefix: str = "_L_", 
                                     use_sequence: bool = True, keywords: List[str] = None,
-                                    keywords_match_all: bool = False, process_zip: bool = True, use_cache: bool = True, ignored_extensions: List[str] = None, zip_recursion_level: int = 0) -> Tuple[Dict, Dict]:
+                                    keywords_match_all: bool = False, process_zip: bool = True, use_cache: bool = True, ignored_extensions: List[str] = None, zip_recursion_level: int = 0,
+                                    tracker_backend: str = "json", index_archives: bool = False,
+                                    extraction_cache_mb: Optional[int] = None, cache_backend: str = "pickle",
+                                    stale_cache: bool = False) -> Tuple[Dict, Dict]:
     """
     Seleciona um arquivo considerando lógica de sequência, com suporte a ZIP.
     
@@ -424,6 +703,13 @@ def select_file_with_sequence_logic(folders: List[str], exclude_prefix: str = "_
         keywords_match_all: Se True, todas as keywords devem estar presentes (AND); se False, ao menos uma (OR)
         process_zip: Se True, processa arquivos ZIP; se False, trata ZIPs como arquivos normais
         use_cache: Se True, usa cache para acelerar busca (padrão: True)
+        tracker_backend: Backend do rastreamento de lidos ("json" ou "sqlite")
+        index_archives: Se True (e process_zip), membros de ZIP/RAR entram na busca e na
+                        detecção de sequência como caminhos virtuais ("arquivo.zip!/membro")
+        extraction_cache_mb: Limite do cache de extração em MB (só usado com use_cache)
+        cache_backend: Backend do cache de arquivos ("pickle" ou "sqlite")
+        stale_cache: Se True, usa o último cache gravado sem verificar as pastas
+                     e o revalida em segundo plano
         
     Returns:
         Tupla (dicionário com info do arquivo, informações sobre a seleção)
@@ -432,9 +718,9 @@ def select_file_with_sequence_logic(folders: List[str], exclude_prefix: str = "_
             - is_from_zip: True se veio de um ZIP
             - zip_path: Caminho do ZIP original (se aplicável)
             - file_in_zip: Nome do arquivo dentro do ZIP (se aplicável)
-            - temp_dir: Diretório temporário (se aplicável)
+            - temp_dir: Diretório temporário (se aplicável; None se veio do cache de extração)
     """
-    tracker = SequentialFileTracker()
+    tracker = create_tracker(tracker_backend)
     info = {
         'method': 'random',
         'sequence_detected': False,
@@ -443,127 +729,148 @@ def select_file_with_sequence_logic(folders: List[str], exclude_prefix: str = "_
         'total_files_found': 0
     }
     
-    # Coleta todas as pastas únicas (não recursivo para lógica de sequência)
-    unique_folders = set()
+    # UMA única varredura (ou cache): mapa pasta -> arquivos, compartilhado pela
+    # análise de sequência e pelo fallback aleatório
+    index_archives = index_archives and process_zip
+    cache_manager = create_cache_manager(cache_backend) if use_cache else None
+    extraction_cache = create_extraction_cache(extraction_cache_mb) if use_cache else None
+    try:
+        files_by_folder = collect_files_by_folder(
+            folders=folders,
+            exclude_prefix=exclude_prefix,
+            check_accessibility=False,
+            keywords=keywords,
+            keywords_match_all=keywords_match_all,
+            use_cache=use_cache,
+            process_zip=False,  # Não processa ZIP aqui, faz depois
+            ignored_extensions=ignored_extensions,
+            cache_manager=cache_manager,
+            index_archives=index_archives,
+            stale_cache=stale_cache
+        )
+    
+        if not files_by_folder:
+            return {'file_path': None, 'is_from_zip': False, 'zip_path': None, 'file_in_zip': None, 'temp_dir': None}, info
+    
+        # Converte para lista e embaralha
+        folder_list = list(files_by_folder)
+        random.shuffle(folder_list)
+    
+        info['total_files_found'] = sum(len(folder_files) for folder_files in files_by_folder.values())
+    
+        # Com cache, as sequências vêm do índice pré-processado nos shards (sem regex nem listagem)
+        sequence_index = None
+        if cache_manager is not None:
+            from random_file_picker.core.sequence_index import SequenceIndex
+            sequence_index = SequenceIndex(
+                cache_manager.cache_dir, files_by_folder, cache_manager.get_sequence_entries(), exclude_prefix
+            )
     
-    for base_folder in folders:
-        base_path = Path(base_folder)
-        if not base_path.exists() or not base_path.is_dir():
-            continue
-        
-        # Adiciona a pasta base
-        unique_folders.add(base_path)
+        # Se usar lógica de sequência, tenta encontrar pastas com sequências e arquivos não lidos
+        if use_sequence and sequence_index is not None:
+            # Lista global de pastas com coleções não lidas: sorteio em O(1)
+            shard_stamp = cache_manager.get_shard_stamp(folders)
+            signature = None
+            if shard_stamp is not None:
+                signature = SequenceIndex.make_signature(
+                    folders, shard_stamp, exclude_prefix, keywords, keywords_match_all, ignored_extensions,
+                    index_archives
+                )
+            sequence_index.load_or_build(signature, tracker)
         
-        # Adiciona subpastas
-        try:
-            for item in base_path.rglob('*'):
-                if item.is_dir() and not any(part.startswith('.') for part in item.parts):
-                    unique_folders.add(item)
-        except (OSError, PermissionError):
-            continue
-    
-    if not unique_folders:
-        return {'file_path': None, 'is_from_zip': False, 'zip_path': None, 'file_in_zip': None, 'temp_dir': None}, info
-    
-    # Converte para lista e embaralha
-    folder_list = list(unique_folders)
-    random.shuffle(folder_list)
-    
-    # SEMPRE coleta arquivos usando collect_files (para aproveitar cache)
-    # Converte folder_list para strings (caminho das pastas BASE originais)
-    all_files = collect_files(
-        folders=folders,  # Usa pastas originais
-        exclude_prefix=exclude_prefix,
-        check_accessibility=False,
-        keywords=keywords,
-        keywords_match_all=keywords_match_all,
-        use_cache=use_cache,
-        process_zip=False,  # Não processa ZIP aqui, faz depois
-        ignored_extensions=ignored_extensions
-    )
-    
-    info['total_files_found'] = len(all_files)
-    
-    # Se usar lógica de sequência, tenta encontrar pastas com sequências e arquivos não lidos
-    if use_sequence:
-        for folder in folder_list:
-            sequences = analyze_folder_sequence(folder, exclude_prefix, keywords, keywords_match_all, ignored_extensions)
+            picked = sequence_index.pick_next_unread(tracker, keywords, keywords_match_all)
+            if picked:
+                folder, (next_file, selected_sequence, file_info) = picked
+            
+                info['method'] = 'sequential'
+                info['sequence_detected'] = True
+                info['folder'] = folder
+                info['sequence_info'] = _build_sequence_info(selected_sequence, file_info)
+            
+                # Verifica se é um arquivo ZIP
+                file_result = _process_file_selection(next_file, exclude_prefix, keywords, keywords_match_all, is_zip_check=process_zip, ignored_extensions=ignored_extensions, zip_recursion_level=zip_recursion_level, tracker_backend=tracker_backend, extraction_cache=extraction_cache)
             
-            if sequences:
-                # Há sequências detectadas (pode haver múltiplas coleções)
-                result = get_next_unread_file(sequences, tracker, keywords, keywords_match_all)
+                if file_result:
+                    tracker.mark_as_read(next_file)
+                    sequence_index.update_after_read(folder, selected_sequence, tracker)
+                    return file_result, info
+        elif use_sequence:
+            for folder in folder_list:
+                sequences = analyze_folder_sequence(Path(folder), exclude_prefix, keywords, keywords_match_all, ignored_extensions, file_paths=files_by_folder[folder])
+            
+                if sequences:
+                    # Há sequências detectadas (pode haver múltiplas coleções)
+                    result = get_next_unread_file(sequences, tracker, keywords, keywords_match_all)
                 
-                if result:
-                    # Encontrou próximo arquivo não lido em alguma coleção
-                    next_file, selected_sequence, file_info = result
+                    if result:
+                        # Encontrou próximo arquivo não lido em alguma coleção
+                        next_file, selected_sequence, file_info = result
                     
-                    info['method'] = 'sequential'
-                    info['sequence_detected'] = True
-                    info['folder'] = str(folder)
-                    info['sequence_info'] = {
-                        'type': selected_sequence['type'],
-                        'collection': selected_sequence['collection'],
-                        'total_files': selected_sequence['count'],
-                        'file_number': file_info['number']
-                    }
+                        info['method'] = 'sequential'
+                        info['sequence_detected'] = True
+                        info['folder'] = str(folder)
+                        info['sequence_info'] = _build_sequence_info(selected_sequence, file_info)
                     
-                    # Verifica se é um arquivo ZIP
-                    file_result = _process_file_selection(next_file, exclude_prefix, keywords, keywords_match_all, is_zip_check=process_zip, ignored_extensions=ignored_extensions, zip_recursion_level=zip_recursion_level)
+                        # Verifica se é um arquivo ZIP
+                        file_result = _process_file_selection(next_file, exclude_prefix, keywords, keywords_match_all, is_zip_check=process_zip, ignored_extensions=ignored_extensions, zip_recursion_level=zip_recursion_level, tracker_backend=tracker_backend, extraction_cache=extraction_cache)
                     
-                    if file_result:
-                        tracker.mark_as_read(next_file)
-                        return file_result, info
-    
-    # Se não encontrou com lógica de sequência, seleciona aleatoriamente
-    info['method'] = 'random'
-    
-    if all_files:
-        selected = random.choice(all_files)
-        info['folder'] = str(Path(selected).parent)
-        
-        # IMPORTANTE: Verifica se o arquivo aleatório faz parte de uma sequência
-        # e se há um arquivo anterior não lido
-        selected_folder = Path(selected).parent
-        folder_sequences = analyze_folder_sequence(selected_folder, exclude_prefix, keywords, keywords_match_all, ignored_extensions)
-        
-        if folder_sequences:
-            # O arquivo aleatório faz parte de uma sequência!
-            # Vamos buscar o primeiro não lido da sequência
-            temp_tracker = SequentialFileTracker()
-            seq_result = get_next_unread_file(folder_sequences, temp_tracker, keywords)
+                        if file_result:
+                            tracker.mark_as_read(next_file)
+                            return file_result, info
+    
+        # Se não encontrou com lógica de sequência, seleciona aleatoriamente
+        info['method'] = 'random'
+    
+        # Sorteia direto entre as pastas (sem concatenar as listas de arquivos)
+        picked_file = choose_from_groups(files_by_folder, random)
+        if picked_file:
+            selected = picked_file[1]
+            info['folder'] = os.path.dirname(selected)
+        
+            # IMPORTANTE: Verifica se o arquivo aleatório faz parte de uma sequência
+            # e se há um arquivo anterior não lido
+            selected_folder = os.path.dirname(selected)
+            if sequence_index is not None:
+                folder_sequences = sequence_index.folder_sequences(selected_folder)
+            else:
+                folder_sequences = analyze_folder_sequence(Path(selected_folder), exclude_prefix, keywords, keywords_match_all, ignored_extensions, file_paths=files_by_folder[selected_folder])
+        
+            if folder_sequences:
+                # O arquivo aleatório faz parte de uma sequência!
+                # Vamos buscar o primeiro não lido da sequência
+                seq_result = get_next_unread_file(folder_sequences, tracker, keywords)
             
-            if seq_result:
-                # Encontrou um arquivo não lido anterior na sequência
-                next_file, selected_sequence, file_info = seq_result
+                if seq_result:
+                    # Encontrou um arquivo não lido anterior na sequência
+                    next_file, selected_sequence, file_info = seq_result
                 
-                # Atualiza info para indicar que sequência foi detectada
-                info['method'] = 'sequential'
-                info['sequence_detected'] = True
-                info['sequence_info'] = {
-                    'type': selected_sequence['type'],
-                    'collection': selected_sequence['collection'],
-                    'total_files': selected_sequence['count'],
-                    'file_number': file_info['number']
-                }
+                    # Atualiza info para indicar que sequência foi detectada
+                    info['method'] = 'sequential'
+                    info['sequence_detected'] = True
+                    info['sequence_info'] = _build_sequence_info(selected_sequence, file_info)
                 
-                print(f"Arquivo aleatório '{Path(selected).name}' faz parte de sequência '{selected_sequence['collection']}'")
-                print(f"Selecionando primeiro não lido: '{Path(next_file).name}'")
+                    print(f"Arquivo aleatório '{Path(selected).name}' faz parte de sequência '{selected_sequence['collection']}'")
+                    print(f"Selecionando primeiro não lido: '{Path(next_file).name}'")
                 
-                # Usa o arquivo da sequência em vez do aleatório
-                selected = next_file
+                    # Usa o arquivo da sequência em vez do aleatório
+                    selected = next_file
         
-        # Verifica se é um arquivo ZIP
-        file_result = _process_file_selection(selected, exclude_prefix, keywords, keywords_match_all, is_zip_check=process_zip, ignored_extensions=ignored_extensions, zip_recursion_level=zip_recursion_level)
+            # Verifica se é um arquivo ZIP
+            file_result = _process_file_selection(selected, exclude_prefix, keywords, keywords_match_all, is_zip_check=process_zip, ignored_extensions=ignored_extensions, zip_recursion_level=zip_recursion_level, tracker_backend=tracker_backend, extraction_cache=extraction_cache)
         
-        if file_result:
-            return file_result, info
+            if file_result:
+                return file_result, info
     
-    return {'file_path': None, 'is_from_zip': False, 'zip_path': None, 'file_in_zip': None, 'temp_dir': None}, info
+        return {'file_path': None, 'is_from_zip': False, 'zip_path': None, 'file_in_zip': None, 'temp_dir': None}, info
+    finally:
+        tracker.close()
+        if cache_manager is not None:
+            cache_manager.close()
 
 
-def _process_file_selection(file_path: str, exclude_prefix: str, keywords: List[str], keywords_match_all: bool = False, is_zip_check: bool = True, ignored_extensions: List[str] = None, zip_recursion_level: int = 0) -> Optional[Dict]:
+def _process_file_selection(file_path: str, exclude_prefix: str, keywords: List[str], keywords_match_all: bool = False, is_zip_check: bool = True, ignored_extensions: List[str] = None, zip_recursion_level: int = 0, tracker_backend: str = "json", extraction_cache: Optional[ExtractionCache] = None) -> Optional[Dict]:
     """
-    Processa a seleção de um arquivo, verificando se é ZIP e fazendo busca recursiva se necessário.
+    Processa a seleção de um arquivo, verificando se é ZIP e selecionando um membro se necessário.
     
     Args:
         file_path: Caminho do arquivo selecionado
@@ -572,16 +879,28 @@ def _process_file_selection(file_path: str, exclude_prefix: str, keywords: List[
         keywords_match_all: Se True, todas as keywords devem estar presentes (AND)
         is_zip_check: Se True, verifica se é ZIP e processa
         ignored_extensions: Lista de extensões a ignorar
+        tracker_backend: Backend do rastreamento de lidos usado na busca recursiva
+        extraction_cache: Cache de extração para membros de arquivos compactados
         
     Returns:
         Dicionário com informações do arquivo ou None se não for válido
     """
-    # Verifica se é arquivo compactado
-    file_ext = file_path.lower()
-    is_archive = file_ext.endswith('.zip') or file_ext.endswith('.rar')
+    # Membro de arquivo compactado já indexado (caminho virtual): extrai só ele
+    if is_archive_member_path(file_path):
+        return open_archive_member_path(
+            file_path,
+            exclude_prefix=exclude_prefix,
+            keywords=keywords,
+            keywords_match_all=keywords_match_all,
+            ignored_extensions=ignored_extensions,
+            process_zip=is_zip_check,
+            zip_recursion_level=zip_recursion_level,
+            tracker_backend=tracker_backend,
+            extraction_cache=extraction_cache
+        )
     
     # Se não for arquivo compactado ou não devemos verificar, retorna arquivo normal
-    if not is_zip_check or not is_archive:
+    if not is_zip_check or not is_archive_file(file_path):
         return {
             'file_path': file_path,
             'is_from_zip': False,
@@ -590,111 +909,16 @@ def _process_file_selection(file_path: str, exclude_prefix: str, keywords: List[
             'temp_dir': None
         }
     
-    # Verifica limite de recursão (máximo 3 níveis)
-    if zip_recursion_level >= 3:
-        print(f"Limite de recursão atingido (3 níveis). Retornando arquivo: {os.path.basename(file_path)}")
-        return {
-            'file_path': file_path,
-            'is_from_zip': False,
-            'zip_path': None,
-            'file_in_zip': None,
-            'temp_dir': None
-        }
-    
-    # É um arquivo ZIP/RAR, faz busca recursiva completa
-    archive_type = "ZIP" if file_ext.endswith('.zip') else "RAR"
-    print(f"Arquivo {archive_type} detectado: {os.path.basename(file_path)} (Nível de recursão: {zip_recursion_level + 1}/3)")
-    print(f"Explorando conteúdo do {archive_type}...")
-    
-    # Cria diretório temporário e extrai TODO o conteúdo do ZIP
-    temp_dir = get_temp_extraction_dir()
-    
-    try:
-            print(f"Extraindo TODO o conteúdo do {archive_type} para pasta temporária...")
-            
-            # Extrai todos os arquivos do arquivo compactado
-            if file_ext.endswith('.zip'):
-                import zipfile
-                with zipfile.ZipFile(file_path, 'r') as zip_file:
-                    zip_file.extractall(temp_dir)
-            else:  # .rar
-                try:
-                    import rarfile
-                    with rarfile.RarFile(file_path, 'r') as rar_file:
-                        rar_file.extractall(temp_dir)
-                except ImportError:
-                    print("Aviso: Biblioteca 'rarfile' não instalada. Instale com: pip install rarfile")
-                    print("Tratando RAR como arquivo normal.")
-                    cleanup_temp_dir(temp_dir)
-                    return {
-                        'file_path': file_path,
-                        'is_from_zip': False,
-                        'zip_path': None,
-                        'file_in_zip': None,
-                        'temp_dir': None
-                    }
-            
-            print(f"✓ {archive_type} extraído completamente")
-            print(f"Iniciando busca recursiva dentro do {archive_type} (aplicando todas as regras)...")
-            
-            # BUSCA RECURSIVA SEQUENCIAL: Trata a pasta temporária como se fosse a única pasta configurada
-            # Chama recursivamente com a pasta temp (use_cache=False para não cachear temp)
-            result, result_info = select_file_with_sequence_logic(
-                folders=[temp_dir],
-                exclude_prefix=exclude_prefix,
-                use_sequence=True,  # Mantém lógica de sequência
-                keywords=keywords,
-                keywords_match_all=keywords_match_all,
-                process_zip=is_zip_check,  # Mantém habilitado para processar ZIPs dentro de ZIPs
-                use_cache=False,  # NÃO cacheia arquivos temporários
-                ignored_extensions=ignored_extensions,
-                zip_recursion_level=zip_recursion_level + 1  # Incrementa nível de recursão
-            )
-        
-            # Se a busca recursiva retornou um arquivo
-            if result and result['file_path']:
-                if result['is_from_zip']:
-                    # ZIP dentro de ZIP - mantém temp_dir do original
-                    return {
-                        'file_path': result['file_path'],
-                        'is_from_zip': True,
-                        'zip_path': file_path,  # ZIP original
-                        'file_in_zip': os.path.relpath(result['file_path'], temp_dir),
-                        'temp_dir': temp_dir  # Mantém o diretório temporário do ZIP original
-                    }
-                else:
-                    # Arquivo encontrado diretamente no ZIP
-                    return {
-                        'file_path': result['file_path'],
-                        'is_from_zip': True,
-                        'zip_path': file_path,
-                        'file_in_zip': os.path.relpath(result['file_path'], temp_dir),
-                        'temp_dir': temp_dir
-                    }
-            else:
-                # Nenhum arquivo válido encontrado
-                cleanup_temp_dir(temp_dir)
-                if keywords:
-                    print(f"Nenhum arquivo válido encontrado no ZIP com as palavras-chave especificadas.")
-                else:
-                    print(f"Nenhum arquivo válido encontrado no ZIP.")
-                # Retorna o próprio ZIP
-                return {
-                    'file_path': file_path,
-                    'is_from_zip': False,
-                'zip_path': None,
-                'file_in_zip': None,
-                'temp_dir': None
-            }
-            
-    except Exception as e:
-        print(f"Erro ao processar ZIP: {e}")
-        cleanup_temp_dir(temp_dir)
-        # Retorna o próprio ZIP em caso de erro
-        return {
-            'file_path': file_path,
-            'is_from_zip': False,
-            'zip_path': None,
-            'file_in_zip': None,
-            'temp_dir': None
-        }
+    # É um arquivo ZIP/RAR: escolhe pela listagem (com sequência) e extrai só o membro escolhido
+    return select_archive_member(
+        file_path,
+        exclude_prefix=exclude_prefix,
+        keywords=keywords,
+        keywords_match_all=keywords_match_all,
+        ignored_extensions=ignored_extensions,
+        process_zip=is_zip_check,
+        use_sequence=True,
+        zip_recursion_level=zip_recursion_level,
+        tracker_backend=tracker_backend,
+        extraction_cache=extraction_cache
+    )
@@ -0,0 +1,269 @@
+"""Sacola de sorteio persistente: modo aleatório sem repetição até esgotar os arquivos."""
+
+import hashlib
+import pickle
+from array import array
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .cache_storage import atomic_write
+
+
+class ShuffleBag:
+    """Permutação dos IDs da tabela de arquivos consumida aos poucos:
+    - Fisher-Yates preguiçoso: só as posições já trocadas são guardadas (sorteio em O(1))
+    - Cursor implícito: 'remaining' IDs ainda não sorteados neste ciclo
+    - Persistida junto ao cache; se a biblioteca ou os filtros mudarem, a sacola
+      é refeita sem os arquivos já sorteados no ciclo atual
+    - Persistência incremental: shuffle_bag.pkl só guarda assinatura e tamanho;
+      os IDs sorteados no ciclo (array('I')) e os caminhos deles vão para
+      shuffle_bag.ids e shuffle_bag.drawn com append, e a permutação é
+      remontada a partir dos IDs ao carregar
+    """
+
+    BAG_VERSION = 2
+
+    # Arquivos já lidos (rastreador) pulados por sorteio antes de aceitar um lido
+    MAX_READ_SKIPS = 32
+
+    def __init__(self, cache_dir: Path):
+        """Inicializa a sacola.
+
+        Args:
+            cache_dir: Diretório do cache onde a sacola é persistida.
+        """
+        self.bag_file = Path(cache_dir) / "shuffle_bag.pkl"
+        self.ids_file = self.bag_file.with_suffix(".ids")
+        self.drawn_file = self.bag_file.with_suffix(".drawn")
+
+        # Estado persistido
+        self.signature: Optional[str] = None
+        self.size = 0
+        self.drawn_ids = array('I')  # IDs sorteados no ciclo atual, em ordem
+
+        # Estado em memória (remontado a partir de drawn_ids)
+        self.remaining = 0
+        self.slots: Dict[int, int] = {}  # posição -> ID, só para posições já trocadas
+
+        # Sorteios ainda não gravados: a partir de drawn_ids[_saved_ids] e os caminhos deles
+        self._saved_ids = 0
+        self._new_paths: List[str] = []
+        # Ciclo recomeçado ou sacola refeita: cabeçalho e logs são regravados por inteiro
+        self._rewrite = False
+
+    @staticmethod
+    def make_signature(folders: List[str], shard_stamp: Optional[tuple], exclude_prefix: str,
+                       keywords: Optional[List[str]], keywords_match_all: bool,
+                       ignored_extensions: Optional[List[str]],
+                       index_archives: bool = False) -> str:
+        """Gera a assinatura que identifica a tabela de arquivos sorteada.
+
+        Args:
+            folders: Pastas configuradas.
+            shard_stamp: Versão dos shards (CacheManager.get_shard_stamp).
+            exclude_prefix: Prefixos de arquivos a ignorar.
+            keywords: Palavras-chave do filtro.
+            keywords_match_all: AND ou OR.
+            ignored_extensions: Extensões ignoradas.
+            index_archives: Se membros de arquivos compactados estão indexados.
+
+        Returns:
+            Hash MD5 da combinação.
+        """
+        parts = [
+            str(ShuffleBag.BAG_VERSION),
+            repr(list(folders)),
+            repr(shard_stamp),
+            exclude_prefix,
+            repr(sorted(kw.lower() for kw in keywords or [])),
+            str(keywords_match_all),
+            repr(sorted(ext.lower().lstrip('.') for ext in ignored_extensions or [])),
+            str(index_archives),
+        ]
+        return hashlib.md5("|".join(parts).encode()).hexdigest()
+
+    def _load(self) -> bool:
+        """Carrega a sacola persistida (de qualquer assinatura) e remonta a permutação.
+
+        Returns:
+            True se carregou, False se não existe ou é inválida.
+        """
+        try:
+            with open(self.bag_file, 'rb') as f:
+                data = pickle.load(f)
+            with open(self.ids_file, 'rb') as f:
+                raw = f.read()
+        except (pickle.PickleError, OSError, EOFError):
+            return False
+
+        if not isinstance(data, dict) or data.get('version') != self.BAG_VERSION:
+            return False
+
+        # Append interrompido pode deixar um ID pela metade no fim
+        ids = array('I')
+        ids.frombytes(raw[:len(raw) - len(raw) % ids.itemsize])
+        size = data['size']
+        if len(set(ids)) != len(ids) or any(file_id >= size for file_id in ids):
+            return False
+
+        self.signature = data['signature']
+        self._new_cycle(size)
+        self._remove_ids(ids)
+        self.drawn_ids = ids
+        self._saved_ids = len(ids)
+        self._rewrite = False
+        return True
+
+    def _load_drawn_paths(self) -> List[str]:
+        """Lê os caminhos sorteados no ciclo persistido (só ao refazer a sacola)."""
+        try:
+            with open(self.drawn_file, 'rb') as f:
+                raw = f.read()
+        except OSError:
+            return []
+        # Cada caminho termina em \0; um append interrompido deixa o último sem terminador
+        return [path.decode('utf-8', errors='surrogateescape') for path in raw.split(b'\0')[:-1]]
+
+    def _take_position(self, position: int) -> int:
+        """Retira o ID de uma posição, trocando-a com a última posição restante."""
+        last = self.remaining - 1
+        file_id = self.slots.pop(position, position)
+        if position != last:
+            self.slots[position] = self.slots.pop(last, last)
+        self.remaining = last
+        return file_id
+
+    def _new_cycle(self, size: int):
+        """Recomeça o ciclo com todos os IDs."""
+        self.size = size
+        self.remaining = size
+        self.slots = {}
+        self.drawn_ids = array('I')
+        self._saved_ids = 0
+        self._new_paths = []
+        self._rewrite = True
+
+    def load_or_build(self, signature: Optional[str], size: int,
+                      get_paths: Callable[[], List[str]]):
+        """Carrega a sacola persistida ou a refaz para a tabela atual.
+
+        Args:
+            signature: Assinatura atual (None: a tabela não pode ser identificada,
+                       a sacola é refeita a partir dos caminhos a cada uso).
+            size: Quantidade de arquivos da tabela atual.
+            get_paths: Retorna os caminhos da tabela na ordem dos IDs
+                       (só chamado quando a sacola precisa ser refeita).
+        """
+        loaded = self._load()
+        if loaded and signature is not None and self.signature == signature and self.size == size:
+            return
+
+        # Biblioteca ou filtros mudaram: nova permutação, sem o que já saiu neste ciclo
+        drawn = self._load_drawn_paths() if loaded and self.drawn_ids else []
+        self._new_cycle(size)
+        self.signature = signature
+
+        if drawn:
+            drawn_set = set(drawn)
+            ids = array('I')
+            still_drawn = []
+            for file_id, path in enumerate(get_paths()):
+                if path in drawn_set:
+                    ids.append(file_id)
+                    still_drawn.append(path)
+            if len(ids) < size:
+                # Mantém o ciclo só se ainda sobrar algo para sortear
+                self.drawn_ids = ids
+                self._new_paths = still_drawn
+                self._remove_ids(ids)
+
+    def _remove_ids(self, file_ids):
+        """Retira IDs ainda não sorteados da sacola (recém-refeita, sem sorteios)."""
+        positions = {}  # ID -> posição, para IDs que mudaram de lugar
+        for file_id in file_ids:
+            position = positions.pop(file_id, file_id)
+            last_id = self.slots.get(self.remaining - 1, self.remaining - 1)
+            self._take_position(position)
+            if last_id != file_id:
+                positions[last_id] = position
+
+    def draw(self, rng) -> Optional[int]:
+        """Sorteia o próximo ID sem repetição; recomeça o ciclo quando a sacola esvazia.
+
+        Args:
+            rng: Gerador com randrange (ex: random.SystemRandom()).
+
+        Returns:
+            ID sorteado ou None se a tabela estiver vazia.
+        """
+        if self.size == 0:
+            return None
+        if self.remaining == 0:
+            self._new_cycle(self.size)
+
+        file_id = self._take_position(rng.randrange(self.remaining))
+        self.drawn_ids.append(file_id)
+        return file_id
+
+    def mark_drawn(self, path: str):
+        """Registra o caminho do último ID sorteado (preserva o ciclo se a tabela for refeita)."""
+        self._new_paths.append(path)
+
+    def draw_path(self, get_path: Callable[[int], str], rng,
+                  is_read: Optional[Callable[[str], bool]] = None) -> Optional[str]:
+        """Sorteia o próximo arquivo, pulando os já marcados como lidos.
+
+        Arquivos lidos (ex: pela seleção sequencial) saem da sacola sem ser
+        escolhidos; após MAX_READ_SKIPS, o arquivo sorteado é aceito mesmo lido.
+
+        Args:
+            get_path: Retorna o caminho de um ID (ex: FileTable.path).
+            rng: Gerador com randrange.
+            is_read: Consulta ao rastreador (ex: SequentialFileTracker.is_read).
+
+        Returns:
+            Caminho sorteado ou None se a tabela estiver vazia.
+        """
+        path = None
+        for _ in range(self.MAX_READ_SKIPS + 1):
+            file_id = self.draw(rng)
+            if file_id is None:
+                return None
+            path = get_path(file_id)
+            self.mark_drawn(path)
+            if is_read is None or not is_read(path):
+                break
+        return path
+
+    def save(self) -> bool:
+        """Persiste os sorteios novos (append) ou, após recomeçar o ciclo, a sacola inteira.
+
+        Returns:
+            True se salvou (ou não havia o que salvar), False em caso de erro.
+        """
+        new_ids = self.drawn_ids[self._saved_ids:]
+        paths = b"".join(path.encode('utf-8', errors='surrogateescape') + b"\0"
+                         for path in self._new_paths)
+
+        try:
+            if self._rewrite:
+                # Logs antes do cabeçalho: o cabeçalho novo nunca aponta para logs antigos
+                with atomic_write(self.ids_file) as f:
+                    f.write(new_ids.tobytes())
+                with atomic_write(self.drawn_file) as f:
+                    f.write(paths)
+                data = {'version': self.BAG_VERSION, 'signature': self.signature, 'size': self.size}
+                with atomic_write(self.bag_file) as f:
+                    pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            elif new_ids:
+                with open(self.ids_file, 'ab') as f:
+                    f.write(new_ids.tobytes())
+                with open(self.drawn_file, 'ab') as f:
+                    f.write(paths)
+        except (OSError, pickle.PickleError):
+            return False
+
+        self._saved_ids = len(self.drawn_ids)
+        self._new_paths = []
+        self._rewrite = False
+        return True
@@ -0,0 +1,770 @@
+"""Índice de arquivos em SQLite com busca de keywords por FTS5 (trigramas)."""
+
+import pickle
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache_manager import CacheManager
+from .file_scanner import find_changed_directories, refresh_tree
+from .file_table import FileTable
+
+
+class SQLiteCacheManager(CacheManager):
+    """Implementação da API de CacheManager sobre SQLite:
+    - Tabela files com índices em pasta, extensão, tamanho e mtime
+    - Tabela FTS5 (tokenizador trigram) para keywords: a consulta só lê as linhas que casam
+    - Árvore de mtimes na tabela dirs: revalidação incremental sem carregar os arquivos
+    - Listagens de arquivos compactados continuam no archive_index.pkl (herdado)
+    - Retenção herdada: o manifesto estima o tamanho de cada pasta pela sua parte das linhas
+    """
+
+    DB_NAME = "file_index.db"
+    BUSY_TIMEOUT_MS = 5000
+    INSERT_FILE_SQL = (
+        "INSERT INTO files (root, dir, path, name, ext, size, mtime) VALUES (?, ?, ?, ?, ?, ?, ?)"
+    )
+
+    def __init__(self, cache_dir: Optional[str] = None, max_cache_mb: Optional[int] = None):
+        """Inicializa o índice SQLite.
+
+        Args:
+            cache_dir: Diretório para armazenar o banco (padrão: diretório de cache do usuário).
+            max_cache_mb: Limite de tamanho do banco em MB (padrão: MAX_CACHE_MB).
+        """
+        super().__init__(cache_dir, max_cache_mb)
+        self.db_file = self.cache_dir / self.DB_NAME
+        self._conn = sqlite3.connect(
+            str(self.db_file), timeout=self.BUSY_TIMEOUT_MS / 1000, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # lower() do SQLite só trata ASCII: usa o mesmo lower() do filtro em Python
+        self._conn.create_function("py_lower", 1, lambda value: value.lower() if value else value,
+                                   deterministic=True)
+        self._has_fts = False
+        self._create_schema()
+
+        # Pastas consultadas por get_dir_counts (escopo de get_dir_path)
+        self._dir_scope: List[str] = []
+
+    def _create_schema(self):
+        """Cria tabelas, índices e a tabela FTS (se o SQLite suportar trigram)."""
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS roots ("
+                " folder TEXT PRIMARY KEY,"
+                " config_hash TEXT NOT NULL,"
+                " created_at TEXT NOT NULL,"
+                " file_count INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS dirs ("
+                " path TEXT PRIMARY KEY,"
+                " root TEXT NOT NULL,"
+                " mtime REAL,"
+                " subdirs BLOB NOT NULL,"
+                " sequence_entries BLOB)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " id INTEGER PRIMARY KEY,"
+                " root TEXT NOT NULL,"
+                " dir TEXT NOT NULL,"
+                " path TEXT NOT NULL,"
+                " name TEXT NOT NULL,"
+                " ext TEXT NOT NULL,"
+                " size INTEGER,"
+                " mtime REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS dirs_root ON dirs (root)")
+            for column in ("root", "dir", "ext", "size", "mtime"):
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS files_{column} ON files ({column})")
+
+        try:
+            with self._conn:
+                self._conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5("
+                    "name, content='files', content_rowid='id', tokenize='trigram')"
+                )
+                self._conn.execute(
+                    "CREATE TRIGGER IF NOT EXISTS files_ai AFTER INSERT ON files BEGIN"
+                    " INSERT INTO files_fts (rowid, name) VALUES (new.id, new.name); END"
+                )
+                self._conn.execute(
+                    "CREATE TRIGGER IF NOT EXISTS files_ad AFTER DELETE ON files BEGIN"
+                    " INSERT INTO files_fts (files_fts, rowid, name)"
+                    " VALUES ('delete', old.id, old.name); END"
+                )
+            self._has_fts = True
+        except sqlite3.OperationalError:
+            # SQLite sem FTS5/trigram (< 3.34): keywords usam varredura da tabela
+            self._has_fts = False
+
+    @staticmethod
+    def _file_row(root: str, file_info: Dict[str, Any]) -> tuple:
+        """Converte um registro de arquivo em linha da tabela files."""
+        path = file_info['path']
+        name = file_info.get('name') or Path(path).name
+        return (
+            root, str(Path(path).parent), path, name, Path(name).suffix.lower().lstrip('.'),
+            file_info.get('size'), file_info.get('mtime')
+        )
+
+    def _load_skeleton(self, folder: str) -> Dict[str, Dict[str, Any]]:
+        """Carrega a árvore de mtimes de uma pasta, sem os arquivos.
+
+        Returns:
+            Árvore {pasta: {'mtime', 'subdirs'}} (vazia se não há árvore gravada).
+        """
+        rows = self._conn.execute("SELECT path, mtime, subdirs FROM dirs WHERE root = ?", (folder,))
+        return {path: {'mtime': mtime, 'subdirs': pickle.loads(subdirs)}
+                for path, mtime, subdirs in rows}
+
+    def _get_root_metadata(self, folder: str) -> Dict[str, Any]:
+        """Obtém os metadados de uma pasta raiz no formato dos shards.
+
+        Returns:
+            Dicionário {'file_count', 'created_at'}.
+        """
+        file_count, created_at = self._conn.execute(
+            "SELECT file_count, created_at FROM roots WHERE folder = ?", (folder,)
+        ).fetchone()
+        return {'file_count': file_count, 'created_at': created_at}
+
+    def _get_root(self, folder: str) -> Optional[tuple]:
+        """Obtém (config_hash, created_at) de uma pasta raiz ou None."""
+        return self._conn.execute(
+            "SELECT config_hash, created_at FROM roots WHERE folder = ?", (folder,)
+        ).fetchone()
+
+    def is_cache_valid(self, folders: List[str], read_prefix: str,
+                       ignore_prefix: str, keywords: List[str],
+                       process_zip: bool, keywords_match_all: bool = False) -> bool:
+        """Verifica se o índice é válido (só lê a tabela dirs, sem arquivos).
+
+        Args:
+            Mesmos argumentos de CacheManager.is_cache_valid.
+
+        Returns:
+            True se o índice é válido, False caso contrário.
+        """
+        config_hash = self._get_config_hash(read_prefix, ignore_prefix, process_zip)
+        valid = True
+        self._start_lookup()
+
+        for folder in folders:
+            try:
+                miss = self._check_root(folder, config_hash)
+                if miss is None:
+                    changed = find_changed_directories(self._load_skeleton(folder))
+                    if changed.get(folder, 0.0) is None:
+                        miss = ('folder_missing', None)
+                    elif changed:
+                        miss = ('folder_changed', f"{len(changed)} pasta(s), ex: {min(changed)}")
+            except (sqlite3.Error, pickle.PickleError):
+                miss = ('unreadable_shard', None)
+
+            if miss is None:
+                self._record_lookup(folder, "hit")
+            else:
+                self._record_lookup(folder, "miss", *miss)
+                valid = False
+
+        return valid
+
+    def _check_root(self, folder: str, config_hash: str) -> Optional[Tuple[str, Optional[str]]]:
+        """Verifica se uma pasta raiz está no índice com a configuração atual.
+
+        Returns:
+            None se está, senão (motivo, detalhe) da falha (ver CACHE_MISS_REASONS).
+        """
+        root = self._get_root(folder)
+        if root is None:
+            return 'missing_shard', None
+        if root[0] != config_hash:
+            # O banco guarda só o hash: não há como dizer quais campos mudaram
+            return 'config_changed', None
+        if not self._conn.execute(
+            "SELECT 1 FROM dirs WHERE root = ? LIMIT 1", (folder,)
+        ).fetchone():
+            return 'legacy_shard', None
+        return None
+
+    def refresh_cache(self, folders: List[str], read_prefix: str,
+                      ignore_prefix: str, process_zip: bool) -> bool:
+        """Revalida o índice de forma incremental usando a árvore de mtimes.
+
+        Só as pastas alteradas são relistadas; suas linhas são substituídas
+        em uma transação.
+
+        Args:
+            Mesmos argumentos de CacheManager.refresh_cache.
+
+        Returns:
+            True se o índice pôde ser usado, False se é necessária uma varredura completa.
+        """
+        config_hash = self._get_config_hash(read_prefix, ignore_prefix, process_zip)
+        written = {}
+        self._set_scope(folders)
+        self._start_lookup()
+
+        for folder in folders:
+            try:
+                # Pastas sem árvore ou com outra configuração exigem varredura completa
+                miss = self._check_root(folder, config_hash)
+                if miss is not None:
+                    self._record_lookup(folder, "miss", *miss)
+                    return False
+
+                skeleton = self._load_skeleton(folder)
+                before = {path: node['subdirs'] for path, node in skeleton.items()}
+                if not refresh_tree(skeleton, read_prefix):
+                    self._record_lookup(folder, "hit")
+                    continue
+                if not skeleton:
+                    # A própria pasta raiz sumiu
+                    self._record_lookup(folder, "miss", 'folder_missing')
+                    return False
+
+                self._apply_refresh(folder, config_hash, before, skeleton)
+                written[folder] = self._get_root_metadata(folder)
+                rescanned = sum(1 for node in skeleton.values() if 'files' in node)
+                self._record_lookup(folder, "refreshed",
+                                    detail=f"{rescanned} pasta(s) relistada(s)")
+            except (sqlite3.Error, pickle.PickleError, OSError):
+                self._record_lookup(folder, "miss", 'unreadable_shard')
+                return False
+
+        self._update_manifest(folders, written, validated=True)
+        return True
+
+    def use_stale_cache(self, folders: List[str], read_prefix: str,
+                        ignore_prefix: str, process_zip: bool) -> bool:
+        """Usa as linhas gravadas sem revalidar as pastas (só confere a configuração).
+
+        Args:
+            Mesmos argumentos de CacheManager.use_stale_cache.
+
+        Returns:
+            True se todas as pastas estão no índice, False se é preciso revalidar antes.
+        """
+        config_hash = self._get_config_hash(read_prefix, ignore_prefix, process_zip)
+        self._set_scope(folders)
+        self._start_lookup()
+        self._manifest = self._load_manifest()
+        now = time.time()
+
+        for folder in folders:
+            try:
+                miss = self._check_root(folder, config_hash)
+            except sqlite3.Error:
+                miss = ('unreadable_shard', None)
+            if miss is not None:
+                self._record_lookup(folder, "miss", *miss)
+                return False
+            self._record_stale(folder, self._manifest['shards'], now)
+
+        return True
+
+    def _apply_refresh(self, folder: str, config_hash: str, before: Dict[str, List[str]],
+                       tree: Dict[str, Dict[str, Any]]):
+        """Grava no banco as pastas relistadas por refresh_tree.
+
+        Args:
+            folder: Pasta raiz.
+            config_hash: Hash das configurações de busca.
+            before: Subpastas de cada pasta antes da atualização.
+            tree: Árvore atualizada (nós relistados contêm 'files').
+        """
+        rescanned = {path: node for path, node in tree.items() if 'files' in node}
+        self._index_tree_sequences(rescanned)
+
+        with self._conn:
+            for path in (set(before) - set(tree)) | set(rescanned):
+                self._conn.execute("DELETE FROM files WHERE dir = ?", (path,))
+                self._conn.execute("DELETE FROM dirs WHERE path = ?", (path,))
+
+            self._insert_nodes(folder, rescanned)
+            # Subpastas que sumiram durante a atualização saem também de nós não relistados
+            self._conn.executemany(
+                "UPDATE dirs SET subdirs = ? WHERE path = ?",
+                [(pickle.dumps(node['subdirs']), path) for path, node in tree.items()
+                 if path not in rescanned and node['subdirs'] != before.get(path)]
+            )
+            self._update_root(folder, config_hash)
+
+    def _insert_nodes(self, folder: str, tree: Dict[str, Dict[str, Any]]):
+        """Insere pastas e arquivos de uma árvore (dentro de uma transação)."""
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO dirs (path, root, mtime, subdirs, sequence_entries)"
+            " VALUES (?, ?, ?, ?, ?)",
+            [
+                (path, folder, node['mtime'], pickle.dumps(node['subdirs']),
+                 pickle.dumps(node.get('sequence_entries', []), protocol=pickle.HIGHEST_PROTOCOL))
+                for path, node in tree.items()
+            ]
+        )
+        self._conn.executemany(
+            self.INSERT_FILE_SQL,
+            (self._file_row(folder, file_info)
+             for node in tree.values() for file_info in node['files'])
+        )
+
+    def _update_root(self, folder: str, config_hash: str):
+        """Grava os metadados de uma pasta raiz (dentro de uma transação)."""
+        file_count = self._conn.execute(
+            "SELECT COUNT(*) FROM files WHERE root = ?", (folder,)
+        ).fetchone()[0]
+        self._conn.execute(
+            "INSERT OR REPLACE INTO roots (folder, config_hash, created_at, file_count)"
+            " VALUES (?, ?, ?, ?)",
+            (folder, config_hash, datetime.now().isoformat(), file_count)
+        )
+
+    def save_cache(self, files: List[Dict[str, Any]], folders: List[str],
+                   read_prefix: str, ignore_prefix: str, keywords: List[str],
+                   process_zip: bool, keywords_match_all: bool = False,
+                   trees: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None) -> bool:
+        """Substitui as linhas das pastas varridas.
+
+        Args:
+            Mesmos argumentos de CacheManager.save_cache.
+
+        Returns:
+            True se salvou com sucesso, False caso contrário.
+        """
+        config_hash = self._get_config_hash(read_prefix, ignore_prefix, process_zip)
+        trees = trees or {}
+        self._set_scope(folders)
+
+        written = []
+
+        try:
+            with self._conn:
+                for folder in folders:
+                    tree = trees.get(folder)
+                    if tree is None:
+                        folder_files = [f for f in files if self._is_inside(f['path'], folder)]
+                        if not folder_files:
+                            continue
+
+                    self._conn.execute("DELETE FROM files WHERE root = ?", (folder,))
+                    self._conn.execute("DELETE FROM dirs WHERE root = ?", (folder,))
+
+                    if tree is not None:
+                        self._index_tree_sequences(tree)
+                        self._insert_nodes(folder, tree)
+                    else:
+                        # Sem árvore não há revalidação incremental (refresh exige varredura)
+                        self._conn.executemany(
+                            self.INSERT_FILE_SQL,
+                            (self._file_row(folder, file_info) for file_info in folder_files)
+                        )
+                    self._update_root(folder, config_hash)
+                    written.append(folder)
+            self._update_manifest(
+                folders, {folder: self._get_root_metadata(folder) for folder in written}
+            )
+        except (sqlite3.Error, OSError, TypeError, pickle.PickleError):
+            return False
+
+        self._loaded = True
+        return True
+
+    @staticmethod
+    def _is_inside(file_path: str, folder: str) -> bool:
+        """Verifica se um arquivo está dentro de uma pasta."""
+        try:
+            Path(file_path).relative_to(folder)
+            return True
+        except ValueError:
+            return False
+
+    def _keyword_condition(self, keyword: str) -> tuple:
+        """Monta a condição SQL de uma keyword (substring no nome, sem diferenciar caixa).
+
+        Returns:
+            Tupla (sql, parâmetro).
+        """
+        if self._has_fts and len(keyword) >= 3:
+            # Trigramas só indexam termos com 3+ caracteres
+            return ("id IN (SELECT rowid FROM files_fts WHERE files_fts MATCH ?)",
+                    '"' + keyword.replace('"', '""') + '"')
+        return "instr(py_lower(name), ?) > 0", keyword
+
+    def get_cached_table(self, keywords: Optional[List[str]] = None,
+                         keywords_match_all: bool = False,
+                         folders: Optional[List[str]] = None) -> FileTable:
+        """Obtém os arquivos do índice; keywords viram consulta no FTS.
+
+        Args:
+            keywords: Lista de palavras-chave para filtrar (opcional).
+            keywords_match_all: Se True usa AND, se False usa OR.
+            folders: Pastas configuradas (padrão: as da última revalidação/gravação,
+                     ou todas as pastas do índice se nenhuma foi definida).
+
+        Returns:
+            Tabela com os arquivos encontrados.
+        """
+        if folders is not None:
+            self._set_scope(folders)
+
+        sql = "SELECT path, name, size, mtime FROM files"
+        conditions = []
+        params = []
+        keywords_lower = [kw.lower() for kw in keywords or [] if kw]
+
+        if self._scope is not None:
+            # Só as pastas configuradas (pastas antigas continuam no banco)
+            conditions.append(f"root IN ({', '.join('?' * len(self._scope))})")
+            params.extend(self._scope)
+
+        if keywords_lower:
+            keyword_conditions = []
+            for keyword in keywords_lower:
+                condition, param = self._keyword_condition(keyword)
+                keyword_conditions.append(condition)
+                params.append(param)
+            joiner = " AND " if keywords_match_all else " OR "
+            conditions.append("(" + joiner.join(keyword_conditions) + ")")
+
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+
+        table = FileTable()
+        try:
+            rows = self._conn.execute(sql + " ORDER BY id", params)
+        except sqlite3.Error as e:
+            print(f"Aviso: Erro ao consultar índice SQLite: {e}")
+            return table
+
+        # Garante a mesma semântica da busca linear (dobra de caixa do FTS pode diferir)
+        match = all if keywords_match_all else any
+        for path, name, size, mtime in rows:
+            if not keywords_lower or match(kw in name.lower() for kw in keywords_lower):
+                table.append(path, name, size, mtime)
+        return table
+
+    def load_cache(self, folders: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """Retorna os arquivos das pastas configuradas em um único dicionário.
+
+        Args:
+            folders: Pastas configuradas (ver get_cached_table).
+
+        Returns:
+            Dicionário com metadados e arquivos ('files' é uma FileTable).
+        """
+        files = self.get_cached_table(folders=folders)
+        self._loaded = True
+        return {
+            'metadata': {
+                'folder_count': (len(self._scope) if self._scope is not None
+                                 else self._count("roots")),
+                'file_count': len(files),
+                'cache_size': self._get_db_size()
+            },
+            'files': files
+        }
+
+    def _count(self, table: str) -> int:
+        """Conta as linhas de uma tabela."""
+        return self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def _get_db_size(self) -> int:
+        """Retorna o tamanho do banco (incluindo o WAL)."""
+        total = 0
+        for path in (self.db_file, self.db_file.with_name(self.db_file.name + "-wal")):
+            try:
+                total += path.stat().st_size
+            except OSError:
+                continue
+        return total
+
+    def get_sequence_entries(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Obtém o índice de sequências gravado na tabela dirs.
+
+        Returns:
+            Dicionário {pasta: [entradas com 'filename', 'number', 'type', 'collection']},
+            restrito às pastas configuradas (ver get_cached_table).
+        """
+        sql = "SELECT path, sequence_entries FROM dirs WHERE sequence_entries IS NOT NULL"
+        params = []
+        if self._scope is not None:
+            sql += f" AND root IN ({', '.join('?' * len(self._scope))})"
+            params.extend(self._scope)
+        rows = self._conn.execute(sql, params)
+        return {path: pickle.loads(entries) for path, entries in rows}
+
+    def get_shard_stamp(self, folders: List[str]) -> Optional[tuple]:
+        """Identifica a versão atual das pastas indexadas.
+
+        Args:
+            folders: Lista de pastas configuradas.
+
+        Returns:
+            Tupla ((pasta, created_at), ...) ou None se alguma pasta não está no índice.
+        """
+        stamp = []
+        for folder in folders:
+            root = self._get_root(folder)
+            if root is None:
+                return None
+            stamp.append((folder, root[1]))
+        return tuple(stamp)
+
+    def _check_index(self, folders: List[str], read_prefix: str, ignore_prefix: str,
+                     process_zip: bool, stale: bool) -> bool:
+        """Verifica se o índice responde pelas pastas (sem carregar a tabela).
+
+        Returns:
+            True se as pastas estão indexadas com a configuração atual.
+        """
+        if stale:
+            valid = self.use_stale_cache(folders, read_prefix, ignore_prefix, process_zip)
+        else:
+            valid = self.is_cache_valid(folders, read_prefix, ignore_prefix, [], process_zip)
+        if valid:
+            self._update_manifest(folders)
+        return valid
+
+    def pick_random_path(self, folders: List[str], read_prefix: str, ignore_prefix: str,
+                         process_zip: bool, rng, accept=None, stale: bool = False) -> Optional[str]:
+        """Sorteia um arquivo com uma consulta por sorteio (sem carregar a tabela).
+
+        Cada sorteio escolhe uma pasta (peso = tamanho do intervalo MIN(id)..MAX(id)
+        dela) e um id nesse intervalo, buscado pela chave primária: todo id tem a
+        mesma chance, então um acerto é um arquivo uniforme. Pastas atualizadas
+        incrementalmente têm lacunas (ids de outras pastas no meio); se nenhum
+        sorteio acertar, sorteia a posição na pasta com OFFSET (uniforme, O(posição)).
+
+        Args:
+            Mesmos argumentos de CacheManager.pick_random_path.
+
+        Returns:
+            Caminho sorteado ou None se o índice não está válido ou nenhum caminho foi aceito.
+        """
+        if not self._check_index(folders, read_prefix, ignore_prefix, process_zip, stale):
+            return None
+
+        try:
+            ranges = []
+            for folder in folders:
+                count, low, high = self._conn.execute(
+                    "SELECT COUNT(*), MIN(id), MAX(id) FROM files WHERE root = ?", (folder,)
+                ).fetchone()
+                if count:
+                    ranges.append((folder, count, low, high))
+            if not ranges:
+                return None
+
+            # Acerto exato de id: uniforme entre todos os arquivos das pastas
+            span = sum(high - low + 1 for _, _, low, high in ranges)
+            for _ in range(self.MAX_PICK_ATTEMPTS):
+                target = rng.randrange(span)
+                for folder, _, low, high in ranges:
+                    if target <= high - low:
+                        break
+                    target -= high - low + 1
+                row = self._conn.execute(
+                    "SELECT path FROM files WHERE id = ? AND root = ?", (low + target, folder)
+                ).fetchone()
+                if row is not None and (accept is None or accept(row[0])):
+                    return row[0]
+
+            # Intervalos com muitas lacunas: posição uniforme dentro da pasta
+            total = sum(count for _, count, _, _ in ranges)
+            for _ in range(self.MAX_PICK_ATTEMPTS):
+                offset = rng.randrange(total)
+                for folder, count, _, _ in ranges:
+                    if offset < count:
+                        break
+                    offset -= count
+                row = self._conn.execute(
+                    "SELECT path FROM files WHERE root = ? ORDER BY id LIMIT 1 OFFSET ?",
+                    (folder, offset)
+                ).fetchone()
+                if row is not None and (accept is None or accept(row[0])):
+                    return row[0]
+        except sqlite3.Error:
+            return None
+        return None
+
+    def get_dir_counts(self, folders: List[str], read_prefix: str, ignore_prefix: str,
+                       process_zip: bool, stale: bool = False) -> Optional[Dict[str, int]]:
+        """Conta os arquivos de cada pasta com uma consulta agrupada (sem carregar a tabela).
+
+        Args:
+            Mesmos argumentos de CacheManager.get_dir_counts.
+
+        Returns:
+            Dicionário {pasta: quantidade de arquivos} ou None se o índice não está válido.
+        """
+        if not self._check_index(folders, read_prefix, ignore_prefix, process_zip, stale):
+            return None
+
+        self._dir_scope = list(folders)
+        placeholders = ', '.join('?' * len(folders))
+        try:
+            rows = self._conn.execute(
+                f"SELECT dir, COUNT(*) FROM files WHERE root IN ({placeholders}) GROUP BY dir",
+                folders
+            ).fetchall()
+        except sqlite3.Error:
+            return None
+        return dict(rows)
+
+    def get_dir_path(self, dirname: str, position: int) -> Optional[str]:
+        """Lê o caminho de um arquivo pela posição dentro da pasta (após get_dir_counts).
+
+        Args:
+            dirname: Pasta (chave de get_dir_counts).
+            position: Posição do arquivo na pasta (ordem dos ids).
+
+        Returns:
+            Caminho do arquivo ou None se a posição não existe.
+        """
+        placeholders = ', '.join('?' * len(self._dir_scope))
+        try:
+            row = self._conn.execute(
+                f"SELECT path FROM files WHERE dir = ? AND root IN ({placeholders})"
+                " ORDER BY id LIMIT 1 OFFSET ?",
+                (dirname, *self._dir_scope, position)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        return row[0] if row else None
+
+    def clear_cache(self) -> bool:
+        """Remove todas as linhas do índice e os demais arquivos de cache.
+
+        Returns:
+            True se removeu com sucesso, False caso contrário.
+        """
+        try:
+            with self._conn:
+                for table in ("files", "dirs", "roots"):
+                    self._conn.execute(f"DELETE FROM {table}")
+        except sqlite3.Error:
+            return False
+        return super().clear_cache()
+
+    def get_cache_info(self) -> Optional[Dict[str, Any]]:
+        """Obtém informações sobre o índice.
+
+        Returns:
+            Dicionário com metadados do índice ou None se vazio.
+        """
+        rows = self._conn.execute("SELECT folder, file_count, created_at FROM roots").fetchall()
+        if not rows:
+            return None
+        shards = self._get_manifest()['shards']
+
+        return {
+            'folder_count': len(rows),
+            'file_count': sum(row[1] for row in rows),
+            'file_size': self._get_db_size(),
+            'has_keyword_index': self._has_fts,
+            'indexed_words': 0,
+            'folders': [{'folder': folder, 'files': count, 'updated': created_at,
+                         'last_access': shards.get(folder, {}).get('last_access')}
+                        for folder, count, created_at in rows]
+        }
+
+    def _get_manifest_file(self) -> Path:
+        """Obtém caminho do manifesto de retenção do banco."""
+        return self.cache_dir / "file_index.manifest.pkl"
+
+    def _adopt_shards(self, manifest: Dict[str, Any]) -> int:
+        """Registra no manifesto as pastas raiz do banco que não estão nele.
+
+        O último acesso começa como a data de gravação da pasta.
+
+        Args:
+            manifest: Manifesto a completar.
+
+        Returns:
+            Quantidade de pastas registradas.
+        """
+        adopted = 0
+        for folder, file_count, created_at in self._conn.execute(
+                "SELECT folder, file_count, created_at FROM roots").fetchall():
+            if folder in manifest['shards']:
+                continue
+            metadata = {'file_count': file_count, 'created_at': created_at}
+            manifest['shards'][folder] = self._manifest_entry(
+                folder, metadata, datetime.fromisoformat(created_at).timestamp()
+            )
+            adopted += 1
+        return adopted
+
+    def _manifest_entry(self, folder: str, metadata: Dict[str, Any],
+                        last_access: float) -> Dict[str, Any]:
+        """Monta a entrada do manifesto de uma pasta raiz.
+
+        O banco é um arquivo só: o tamanho da pasta é estimado pela sua parte das linhas.
+
+        Args:
+            Mesmos argumentos de CacheManager._manifest_entry.
+
+        Returns:
+            Dicionário {'size', 'file_count', 'created_at', 'last_access'}.
+        """
+        file_count = metadata.get('file_count', 0)
+        total_rows = self._conn.execute("SELECT SUM(file_count) FROM roots").fetchone()[0] or 0
+        size = self._get_db_size() * file_count // total_rows if total_rows else 0
+        return {
+            'size': size,
+            'file_count': file_count,
+            'created_at': metadata.get('created_at'),
+            'last_access': last_access,
+            'validated_at': last_access,
+        }
+
+    def _evict_folder(self, folder: str):
+        """Remove as linhas de uma pasta raiz.
+
+        Args:
+            folder: Pasta raiz.
+        """
+        with self._conn:
+            for table, column in (("files", "root"), ("dirs", "root"), ("roots", "folder")):
+                self._conn.execute(f"DELETE FROM {table} WHERE {column} = ?", (folder,))
+
+    def _sync_manifest(self, manifest: Dict[str, Any]):
+        """Alinha o manifesto às pastas raiz do banco.
+
+        Args:
+            manifest: Manifesto (alterado no lugar).
+        """
+        roots = {row[0] for row in self._conn.execute("SELECT folder FROM roots")}
+        for folder in [folder for folder in manifest['shards'] if folder not in roots]:
+            del manifest['shards'][folder]
+        self._adopt_shards(manifest)
+
+    def _compact_storage(self, manifest: Dict[str, Any], evicted: List[str], now: float) -> int:
+        """Compacta o cache: temporários, listagens de pastas removidas e VACUUM do banco.
+
+        Args:
+            Mesmos argumentos de CacheManager._compact_storage.
+
+        Returns:
+            Quantidade de arquivos removidos.
+        """
+        removed = self._remove_stale_temp_files(now)
+        self._sync_manifest(manifest)
+        self._prune_archive_index(evicted)
+        if evicted:
+            # Devolve ao sistema as páginas liberadas pelas linhas removidas
+            try:
+                self._conn.execute("VACUUM")
+            except sqlite3.OperationalError:
+                # Banco em uso por outro processo: fica para a próxima retenção
+                pass
+        return removed
+
+    def close(self):
+        """Fecha a conexão com o banco."""
+        self._conn.close()
@@ -0,0 +1,207 @@
+"""Rastreador de arquivos lidos em SQLite (modo WAL), seguro para vários processos."""
+
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class SQLiteFileTracker:
+    """Implementação da API de SequentialFileTracker sobre SQLite.
+
+    - Modo WAL: GUI e CLI podem ler e gravar ao mesmo tempo sem perder marcações
+    - Índice único (pasta, arquivo) para is_read
+    - Gravações em lote com mark_many_as_read (usada na migração do JSON)
+    - Conexão fechada com close() ou ao sair de um bloco with
+    - Migração automática do read_files_tracker.json (snapshot + journal)
+    """
+
+    BUSY_TIMEOUT_MS = 5000
+
+    def __init__(self, tracker_file: str = "read_files_tracker.db",
+                 json_file: Optional[str] = None):
+        """Abre (ou cria) o banco de rastreamento.
+
+        Args:
+            tracker_file: Caminho do banco SQLite.
+            json_file: Rastreador JSON a migrar na primeira abertura
+                (padrão: mesmo nome com extensão .json).
+        """
+        self.tracker_file = Path(tracker_file)
+        self.json_file = Path(json_file) if json_file else self.tracker_file.with_suffix(".json")
+        self._cursors: Dict[Tuple[str, str], Dict] = {}
+        self._data_version: Optional[int] = None
+
+        self.tracker_file.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(self.tracker_file), timeout=self.BUSY_TIMEOUT_MS / 1000, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+        self._migrate_from_json()
+
+    def _create_schema(self):
+        """Cria as tabelas e índices se não existirem."""
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS read_files ("
+                " folder TEXT NOT NULL,"
+                " filename TEXT NOT NULL,"
+                " read_at REAL NOT NULL,"
+                " UNIQUE (folder, filename))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+
+    def _migrate_from_json(self):
+        """Importa o rastreador JSON existente uma única vez."""
+        if self._conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+            return
+
+        paths = []
+        journal_file = self.json_file.with_name(self.json_file.name + ".journal")
+        if self.json_file.exists() or journal_file.exists():
+            from random_file_picker.core.sequential_selector import SequentialFileTracker
+
+            legacy = SequentialFileTracker(str(self.json_file))
+            paths = [str(Path(folder) / filename)
+                     for folder, files in legacy.data.items() for filename in files]
+
+        # Uma transação para todas as marcações; se falhar, é refeita na próxima abertura
+        if not self.mark_many_as_read(paths):
+            return
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)",
+                (str(len(paths)),)
+            )
+
+        if paths:
+            print(f"Rastreador migrado de {self.json_file.name}: {len(paths)} arquivo(s)")
+
+    @staticmethod
+    def _split(file_path: str) -> Tuple[str, str]:
+        """Separa (pasta, nome) com a mesma normalização do rastreador JSON."""
+        path = Path(file_path)
+        return str(path.parent), path.name
+
+    def mark_as_read(self, file_path: str):
+        """Marca um arquivo como lido."""
+        self.mark_many_as_read([file_path])
+
+    def mark_many_as_read(self, file_paths: Iterable[str]) -> bool:
+        """Marca vários arquivos como lidos em uma única transação.
+
+        Args:
+            file_paths: Caminhos dos arquivos.
+
+        Returns:
+            True se gravou, False em caso de erro.
+        """
+        now = time.time()
+        rows = [(*self._split(file_path), now) for file_path in file_paths]
+        try:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO read_files (folder, filename, read_at) VALUES (?, ?, ?)",
+                    rows
+                )
+        except sqlite3.Error as e:
+            print(f"Erro ao salvar rastreamento: {e}")
+            return False
+        return True
+
+    def is_read(self, file_path: str) -> bool:
+        """Verifica se um arquivo já foi lido."""
+        folder, filename = self._split(file_path)
+        row = self._conn.execute(
+            "SELECT 1 FROM read_files WHERE folder = ? AND filename = ?", (folder, filename)
+        ).fetchone()
+        return row is not None
+
+    def get_read_files(self, folder: str) -> List[str]:
+        """Retorna lista de arquivos lidos em uma pasta (em ordem de leitura)."""
+        rows = self._conn.execute(
+            "SELECT filename FROM read_files WHERE folder = ? ORDER BY rowid", (str(folder),)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def reset_folder(self, folder: str):
+        """Reseta o rastreamento de uma pasta."""
+        folder_str = str(folder)
+        try:
+            with self._conn:
+                self._conn.execute("DELETE FROM read_files WHERE folder = ?", (folder_str,))
+        except sqlite3.Error as e:
+            print(f"Erro ao salvar rastreamento: {e}")
+        self._cursors = {key: cursor for key, cursor in self._cursors.items()
+                         if key[0] != folder_str}
+
+    def get_next_unread_index(self, sequence: Dict) -> Optional[int]:
+        """Retorna a posição do primeiro arquivo não lido de uma sequência.
+
+        Mesma lógica de cursor de SequentialFileTracker. Os cursores são
+        descartados quando outro processo altera o banco (PRAGMA data_version).
+
+        Args:
+            sequence: Sequência (de analyze_folder_sequence) com 'folder', 'collection'
+                e 'files'
+
+        Returns:
+            Índice em sequence['files'] ou None se todos foram lidos
+        """
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            self._cursors = {}
+            self._data_version = data_version
+
+        files = sequence['files']
+        folder = str(Path(sequence['folder']))
+        key = (folder, sequence['collection'])
+
+        cursor = self._cursors.get(key)
+        index = 0
+        if cursor and cursor['count'] == len(files):
+            position = cursor['index']
+            if position == 0 or (position <= len(files)
+                                 and files[position - 1]['filename'] == cursor['anchor']):
+                index = position
+
+        while index < len(files) and self.is_read(str(Path(folder) / files[index]['filename'])):
+            index += 1
+
+        self._cursors[key] = {
+            'index': index,
+            'count': len(files),
+            'anchor': files[index - 1]['filename'] if index else None
+        }
+
+        return index if index < len(files) else None
+
+    def get_state_stamp(self) -> Optional[Tuple]:
+        """Retorna (mtime_ns, tamanho) do banco e do WAL para detectar mudanças.
+
+        Returns:
+            Tupla com os dados dos dois arquivos, ou None se nenhum existir.
+        """
+        stamp = []
+        wal_file = self.tracker_file.with_name(self.tracker_file.name + "-wal")
+        for path in (self.tracker_file, wal_file):
+            try:
+                stat = path.stat()
+                stamp.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp) if any(stamp) else None
+
+    def close(self):
+        """Fecha a conexão com o banco."""
+        self._conn.close()
+
+    def __enter__(self) -> 'SQLiteFileTracker':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,420 @@
+"""Sorteio em dois níveis: primeiro a pasta (com peso), depois o arquivo dentro dela."""
+
+import hashlib
+import math
+import os
+import pickle
+from array import array
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from .cache_storage import atomic_write
+
+# Pesos de pasta: "uniform" (todas iguais), "sqrt" (raiz da contagem)
+# e "unread" (arquivos não lidos)
+FOLDER_WEIGHTINGS = ("uniform", "sqrt", "unread")
+
+
+class AliasTable:
+    """Tabela de alias (método de Vose): sorteio com pesos em O(1).
+
+    Cada posição guarda uma probabilidade e uma posição alternativa; um sorteio
+    usa uma posição uniforme e uma moeda com essa probabilidade.
+    """
+
+    def __init__(self, weights: Sequence[float]):
+        """Monta a tabela em O(n).
+
+        Args:
+            weights: Pesos não negativos (ao menos um positivo).
+
+        Raises:
+            ValueError: Se não houver peso positivo.
+        """
+        count = len(weights)
+        total = float(sum(weights))
+        if count == 0 or total <= 0:
+            raise ValueError("Nenhum peso positivo para sortear")
+
+        self.prob = array('d', [1.0]) * count
+        self.alias = array('I', range(count))
+
+        scaled = [weight * count / total for weight in weights]
+        small = [i for i, value in enumerate(scaled) if value < 1.0]
+        large = [i for i, value in enumerate(scaled) if value >= 1.0]
+
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] += scaled[less] - 1.0
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Sobras (arredondamento) ficam com probabilidade 1.0 e alias em si mesmas
+
+    def __len__(self) -> int:
+        return len(self.prob)
+
+    def sample(self, rng) -> int:
+        """Sorteia uma posição com probabilidade proporcional ao peso.
+
+        Args:
+            rng: Gerador com randrange e random.
+
+        Returns:
+            Posição sorteada.
+        """
+        position = rng.randrange(len(self.prob))
+        return position if rng.random() < self.prob[position] else self.alias[position]
+
+
+class FenwickTree:
+    """Árvore de Fenwick (somas de prefixos): sorteio com pesos em O(log n).
+
+    Ao contrário da tabela de alias, o peso de uma posição muda em O(log n)
+    (add), sem remontar a estrutura.
+    """
+
+    def __init__(self, weights: Sequence[float]):
+        """Monta a árvore em O(n).
+
+        Args:
+            weights: Pesos não negativos (podem ser todos zero).
+        """
+        count = len(weights)
+        self.weights = array('d', weights)
+        self.tree = array('d', [0.0]) * (count + 1)
+        self.total = float(sum(weights))
+
+        for index, weight in enumerate(weights, 1):
+            self.tree[index] += weight
+            parent = index + (index & -index)
+            if parent <= count:
+                self.tree[parent] += self.tree[index]
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    def add(self, position: int, delta: float):
+        """Soma delta ao peso de uma posição."""
+        self.weights[position] += delta
+        self.total += delta
+        index = position + 1
+        while index < len(self.tree):
+            self.tree[index] += delta
+            index += index & -index
+
+    def sample(self, rng) -> int:
+        """Sorteia uma posição com probabilidade proporcional ao peso.
+
+        Args:
+            rng: Gerador com random.
+
+        Returns:
+            Posição sorteada.
+
+        Raises:
+            ValueError: Se não houver peso positivo.
+        """
+        if self.total <= 0:
+            raise ValueError("Nenhum peso positivo para sortear")
+
+        # Desce pela árvore: maior prefixo com soma <= alvo
+        target = rng.random() * self.total
+        position = 0
+        step = 1 << (len(self.weights).bit_length() - 1)
+        while step:
+            index = position + step
+            if index < len(self.tree) and self.tree[index] <= target:
+                position = index
+                target -= self.tree[index]
+            step >>= 1
+        return min(position, len(self.weights) - 1)
+
+
+def folder_weight(weighting: str, count: int) -> float:
+    """Calcula o peso de uma pasta.
+
+    Args:
+        weighting: Regra de FOLDER_WEIGHTINGS.
+        count: Arquivos candidatos da pasta (não lidos, com "unread").
+
+    Returns:
+        Peso da pasta (0 se não houver candidatos).
+
+    Raises:
+        ValueError: Se a regra não for suportada.
+    """
+    if weighting not in FOLDER_WEIGHTINGS:
+        raise ValueError(f"Peso de pasta desconhecido: {weighting}")
+    if count <= 0:
+        return 0.0
+    if weighting == "uniform":
+        return 1.0
+    if weighting == "sqrt":
+        return math.sqrt(count)
+    return float(count)
+
+
+class FolderSampler:
+    """Sorteio em dois níveis sobre os arquivos agrupados por pasta:
+    - Arquivos de cada pasta: IDs da tabela (FileTable.group_by_dir) ou, sem
+      filtros, só a contagem guardada no cache (CacheManager.get_dir_counts)
+    - Pasta sorteada pelo peso: tabela de alias (O(1)); com "unread", árvore de
+      Fenwick, e um arquivo lido só desconta o peso da sua pasta (mark_read)
+    - Arquivo sorteado dentro da pasta em O(1)
+    - Persistido junto ao cache enquanto shards, filtros e regra não mudarem
+    """
+
+    SAMPLER_VERSION = 2
+
+    # Posições sorteadas numa pasta ("unread") antes de listar os não lidos dela
+    FOLDER_ATTEMPTS = 8
+
+    def __init__(self, cache_dir: Path):
+        """Inicializa o sorteador.
+
+        Args:
+            cache_dir: Diretório do cache onde os grupos e os pesos são persistidos.
+        """
+        self.index_file = Path(cache_dir) / "folder_sampler.pkl"
+
+        # Estado persistido
+        self.signature: Optional[str] = None
+        self.folders: List[str] = []
+        self.groups: List[Sequence[int]] = []
+        self.table: Optional[Union[AliasTable, FenwickTree]] = None
+        self.read: List[Set[str]] = []  # "unread": nomes já descontados do peso de cada pasta
+
+        self._positions: Dict[str, int] = {}
+        self._dirty = False
+
+    @staticmethod
+    def make_signature(folders: List[str], shard_stamp: Optional[tuple], exclude_prefix: str,
+                       keywords: Optional[List[str]], keywords_match_all: bool,
+                       ignored_extensions: Optional[List[str]], index_archives: bool,
+                       weighting: str, by_dir_counts: bool = False) -> str:
+        """Gera a assinatura que identifica os grupos e pesos montados.
+
+        Args:
+            folders: Pastas configuradas.
+            shard_stamp: Versão dos shards (CacheManager.get_shard_stamp).
+            exclude_prefix: Prefixos de arquivos a ignorar.
+            keywords: Palavras-chave do filtro.
+            keywords_match_all: AND ou OR.
+            ignored_extensions: Extensões ignoradas.
+            index_archives: Se membros de arquivos compactados estão indexados.
+            weighting: Regra de peso das pastas.
+            by_dir_counts: Se os grupos são posições nas pastas (get_dir_counts)
+                           em vez de IDs da tabela.
+
+        Returns:
+            Hash MD5 da combinação.
+        """
+        parts = [
+            str(FolderSampler.SAMPLER_VERSION),
+            repr(list(folders)),
+            repr(shard_stamp),
+            exclude_prefix,
+            repr(sorted(kw.lower() for kw in keywords or [])),
+            str(keywords_match_all),
+            repr(sorted(ext.lower().lstrip('.') for ext in ignored_extensions or [])),
+            str(index_archives),
+            weighting,
+            str(by_dir_counts),
+        ]
+        return hashlib.md5("|".join(parts).encode()).hexdigest()
+
+    def _load(self, signature: str) -> bool:
+        """Carrega o sorteador persistido se a assinatura corresponder.
+
+        Returns:
+            True se carregou, False caso contrário.
+        """
+        try:
+            with open(self.index_file, 'rb') as f:
+                data = pickle.load(f)
+        except (pickle.PickleError, OSError, EOFError):
+            return False
+
+        if not isinstance(data, dict) or data.get('signature') != signature:
+            return False
+
+        self.folders = data['folders']
+        self.groups = data['groups']
+        self.table = data['table']
+        self.read = data['read']
+        return True
+
+    def _build(self, groups: Dict[str, Sequence[int]], weighting: str,
+               get_read_files: Optional[Callable[[str], Iterable[str]]]):
+        """Monta os grupos e os pesos das pastas.
+
+        Com "unread", o peso parte da contagem menos os arquivos que o
+        rastreador já tem como lidos na pasta (sem consultar arquivo a arquivo).
+        """
+        self.folders = []
+        self.groups = []
+        self.read = []
+        weights = []
+
+        for folder, file_ids in groups.items():
+            if not file_ids:
+                continue
+            self.folders.append(folder)
+            self.groups.append(file_ids)
+            if weighting == "unread":
+                read = set(get_read_files(folder)) if get_read_files is not None else set()
+                self.read.append(read)
+                weights.append(folder_weight(weighting, len(file_ids) - len(read)))
+            else:
+                weights.append(folder_weight(weighting, len(file_ids)))
+
+        if not weights:
+            self.table = None
+        elif weighting == "unread":
+            self.table = FenwickTree(weights)
+        else:
+            self.table = AliasTable(weights)
+        self._dirty = True
+
+    def load_or_build(self, signature: Optional[str],
+                      get_groups: Callable[[], Dict[str, Sequence[int]]], weighting: str,
+                      get_read_files: Optional[Callable[[str], Iterable[str]]] = None):
+        """Carrega o sorteador persistido ou o monta a partir dos grupos.
+
+        Arquivos lidos depois da montagem não exigem remontar: pick e
+        mark_read descontam só o peso da pasta afetada.
+
+        Args:
+            signature: Assinatura atual (None desativa a persistência).
+            get_groups: Retorna {pasta: IDs dos arquivos} (só chamada ao montar).
+            weighting: Regra de FOLDER_WEIGHTINGS.
+            get_read_files: Nomes dos arquivos lidos de uma pasta (usado com "unread").
+
+        Raises:
+            ValueError: Se a regra não for suportada.
+        """
+        if weighting not in FOLDER_WEIGHTINGS:
+            raise ValueError(f"Peso de pasta desconhecido: {weighting}")
+
+        self.signature = signature
+        if signature is None or not self._load(signature):
+            self._build(get_groups(), weighting, get_read_files)
+        self._positions = {folder: i for i, folder in enumerate(self.folders)}
+        self.save()
+
+    def save(self) -> bool:
+        """Persiste grupos e pesos se houve alterações.
+
+        Returns:
+            True se salvou (ou não havia o que salvar), False em caso de erro.
+        """
+        if not self._dirty or self.signature is None:
+            return True
+
+        data = {
+            'signature': self.signature,
+            'folders': self.folders,
+            'groups': self.groups,
+            'table': self.table,
+            'read': self.read,
+        }
+
+        try:
+            with atomic_write(self.index_file) as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except (OSError, pickle.PickleError):
+            return False
+
+        self._dirty = False
+        return True
+
+    def _set_read(self, group: int, name: str, read: bool):
+        """Desconta (ou devolve) um arquivo do peso de uma pasta em O(log n)."""
+        names = self.read[group]
+        if read == (name in names):
+            return
+        if read:
+            names.add(name)
+            if self.table.weights[group] > 0:
+                self.table.add(group, -1)
+        else:
+            names.discard(name)
+            self.table.add(group, 1)
+        self._dirty = True
+
+    def mark_read(self, path: str):
+        """Desconta um arquivo lido do peso da sua pasta ("unread"), sem remontar.
+
+        Args:
+            path: Caminho do arquivo marcado como lido.
+        """
+        if not isinstance(self.table, FenwickTree):
+            return
+        group = self._positions.get(os.path.dirname(path))
+        if group is not None:
+            self._set_read(group, os.path.basename(path), True)
+
+    def _pick_unread(self, rng, get_path: Callable[[str, int], str],
+                     is_read: Callable[[str], bool]) -> Optional[Tuple[str, str]]:
+        """Sorteia pelo número de não lidos, descontando os lidos encontrados pelo caminho."""
+        while self.table.total > 0:
+            group = self.table.sample(rng)
+            folder, file_ids = self.folders[group], self.groups[group]
+
+            for _ in range(self.FOLDER_ATTEMPTS):
+                path = get_path(folder, file_ids[rng.randrange(len(file_ids))])
+                read = is_read(path)
+                # Lido por outro processo (ou desmarcado): corrige só o peso desta pasta
+                self._set_read(group, os.path.basename(path), read)
+                if not read:
+                    return folder, path
+
+            # Pasta quase toda lida: lista os não lidos dela e acerta o peso
+            unread = []
+            for file_id in file_ids:
+                path = get_path(folder, file_id)
+                read = is_read(path)
+                self._set_read(group, os.path.basename(path), read)
+                if not read:
+                    unread.append(path)
+            delta = len(unread) - self.table.weights[group]
+            if delta:
+                self.table.add(group, delta)
+                self._dirty = True
+            if unread:
+                return folder, unread[rng.randrange(len(unread))]
+        return None
+
+    def pick(self, rng, get_path: Callable[[str, int], str],
+             is_read: Optional[Callable[[str], bool]] = None) -> Optional[Tuple[str, str]]:
+        """Sorteia uma pasta pelo peso e um arquivo dentro dela.
+
+        Com "unread", só arquivos não lidos são devolvidos; se tudo já foi
+        lido, as pastas passam a ter o mesmo peso ("uniform").
+
+        Args:
+            rng: Gerador com randrange e random.
+            get_path: Caminho de um arquivo a partir de (pasta, ID do grupo).
+            is_read: Consulta ao rastreador (usada com "unread").
+
+        Returns:
+            Tupla (pasta, caminho) ou None se não houver arquivos.
+        """
+        if self.table is None:
+            return None
+
+        if isinstance(self.table, FenwickTree):
+            if is_read is not None:
+                picked = self._pick_unread(rng, get_path, is_read)
+                if picked is not None:
+                    return picked
+            if self.table.total > 0:
+                group = self.table.sample(rng)
+            else:
+                group = rng.randrange(len(self.groups))
+        else:
+            group = self.table.sample(rng)
+
+        folder, file_ids = self.folders[group], self.groups[group]
+        return folder, get_path(folder, file_ids[rng.randrange(len(file_ids))])
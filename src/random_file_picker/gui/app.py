@@ -14,7 +14,7 @@ import traceback
 from random_file_picker.core.file_picker import pick_random_file, open_folder, pick_random_file_with_zip_support, cleanup_temp_dir
 from random_file_picker.core.sequential_selector import (
     select_file_with_sequence_logic,
-    SequentialFileTracker,
+    create_tracker,
     analyze_folder_sequence,
     get_next_unread_file,
 )
@@ -22,6 +22,7 @@ from random_file_picker.utils.system_utils import get_default_app_info, format_a
 
 # Módulos refatorados (agora em core)
 from random_file_picker.core.config_manager import ConfigManager
+from random_file_picker.core.cache_manager import format_cache_diagnostics, get_last_cache_diagnostics
 from random_file_picker.core.file_loader import FileLoader
 from random_file_picker.core.archive_extractor import ArchiveExtractor
 from random_file_picker.core.thumbnail_generator import ThumbnailGenerator
@@ -86,6 +87,13 @@ class RandomFilePickerGUI:
         self.process_zip_var = tk.BooleanVar(value=True)
         self.use_cache_var = tk.BooleanVar(value=True)
         self.enable_cloud_hydration_var = tk.BooleanVar(value=False)
+        self.tracker_backend = "json"  # Sem opção na interface: definido no config.json
+        self.index_archives = False  # Sem opção na interface: definido no config.json
+        self.extraction_cache_mb = 1024  # Sem opção na interface: definido no config.json
+        self.cache_backend = "pickle"  # Sem opção na interface: definido no config.json
+        self.no_repeat = False  # Sem opção na interface: definido no config.json
+        self.folder_weighting = None  # Sem opção na interface: definido no config.json
+        self.stale_cache = False  # Sem opção na interface: definido no config.json
         
         # Módulos refatorados
         self.config_manager = ConfigManager(self.config_file)
@@ -724,7 +732,7 @@ class RandomFilePickerGUI:
             cache_manager = CacheManager()
             
             try:
-                cache_path = cache_manager.cache_file.parent
+                cache_path = cache_manager.cache_dir
                 if cache_path.exists():
                     import shutil
                     shutil.rmtree(cache_path)
@@ -1683,7 +1691,10 @@ class RandomFilePickerGUI:
                 file_result, selection_info = select_file_with_sequence_logic(
                     folders, exclude_prefix, use_sequence=True, keywords=keywords,
                     keywords_match_all=self.keywords_match_all_var.get(),
-                    process_zip=process_zip, use_cache=use_cache, ignored_extensions=ignored_extensions
+                    process_zip=process_zip, use_cache=use_cache, ignored_extensions=ignored_extensions,
+                    tracker_backend=self.tracker_backend, index_archives=self.index_archives,
+                    extraction_cache_mb=self.extraction_cache_mb, cache_backend=self.cache_backend,
+                    stale_cache=self.stale_cache
                 )
                 
                 # Log do total de arquivos encontrados
@@ -1726,7 +1737,11 @@ class RandomFilePickerGUI:
                 file_result = pick_random_file_with_zip_support(
                     folders, exclude_prefix, check_accessibility=False, 
                     keywords=keywords, keywords_match_all=self.keywords_match_all_var.get(),
-                    process_zip=process_zip, use_cache=use_cache, ignored_extensions=ignored_extensions
+                    process_zip=process_zip, use_cache=use_cache, ignored_extensions=ignored_extensions,
+                    index_archives=self.index_archives, extraction_cache_mb=self.extraction_cache_mb,
+                    cache_backend=self.cache_backend, no_repeat=self.no_repeat,
+                    tracker_backend=self.tracker_backend, folder_weighting=self.folder_weighting,
+                    stale_cache=self.stale_cache
                 )
                 
                 if not file_result or not file_result['file_path']:
@@ -1759,24 +1774,24 @@ class RandomFilePickerGUI:
                     
                     if sequences:
                         # Arquivo faz parte de uma sequência
-                        tracker = SequentialFileTracker()
-                        result = get_next_unread_file(sequences, tracker, keywords)
+                        with create_tracker(self.tracker_backend) as tracker:
+                            result = get_next_unread_file(sequences, tracker, keywords)
                         
-                        if result:
-                            next_file, selected_sequence, file_info = result
-                            self.log_message(f"\n✓ Arquivo aleatório faz parte de uma sequência!", "success")
-                            self.log_message(f"  Selecionando primeiro arquivo não lido da sequência", "info")
-                            self.log_message(f"  Coleção: {selected_sequence['collection']}", "info")
-                            self.log_message(f"  Tipo de ordenação: {selected_sequence['type']}", "info")
-                            self.log_message(f"  Total de arquivos na sequência: {selected_sequence['count']}", "info")
-                            if file_info['number']:
-                                self.log_message(f"  Número do arquivo: {file_info['number']}", "info")
+                            if result:
+                                next_file, selected_sequence, file_info = result
+                                self.log_message(f"\n✓ Arquivo aleatório faz parte de uma sequência!", "success")
+                                self.log_message(f"  Selecionando primeiro arquivo não lido da sequência", "info")
+                                self.log_message(f"  Coleção: {selected_sequence['collection']}", "info")
+                                self.log_message(f"  Tipo de ordenação: {selected_sequence['type']}", "info")
+                                self.log_message(f"  Total de arquivos na sequência: {selected_sequence['count']}", "info")
+                                if file_info['number']:
+                                    self.log_message(f"  Número do arquivo: {file_info['number']}", "info")
                             
-                            # Substitui pelo primeiro não lido da sequência
-                            selected_file = next_file
-                            tracker.mark_as_read(selected_file)
-                        else:
-                            self.log_message(f"\nArquivo faz parte de sequência, mas todos já foram lidos", "info")
+                                # Substitui pelo primeiro não lido da sequência
+                                selected_file = next_file
+                                tracker.mark_as_read(selected_file)
+                            else:
+                                self.log_message(f"\nArquivo faz parte de sequência, mas todos já foram lidos", "info")
                     else:
                         self.log_message(f"\nArquivo isolado (não faz parte de sequência)", "info")
             
@@ -1789,6 +1804,11 @@ class RandomFilePickerGUI:
             
             self.log_message(f"\nTempo de busca: {elapsed_time:.2f} segundos", "success")
             
+            # Resultado do cache por pasta (acerto, atualização ou motivo da falha)
+            if use_cache:
+                for line in format_cache_diagnostics(get_last_cache_diagnostics()):
+                    self.log_message(line, "info")
+            
             # Obtém informações do arquivo
             file_path = Path(selected_file)
             
@@ -1907,6 +1927,13 @@ class RandomFilePickerGUI:
             "process_zip": self.process_zip_var.get(),
             "use_cache": self.use_cache_var.get(),
             "enable_cloud_hydration": self.enable_cloud_hydration_var.get(),
+            "index_archives": self.index_archives,
+            "tracker_backend": self.tracker_backend,
+            "extraction_cache_mb": self.extraction_cache_mb,
+            "cache_backend": self.cache_backend,
+            "no_repeat": self.no_repeat,
+            "folder_weighting": self.folder_weighting,
+            "stale_cache": self.stale_cache,
             "file_history": self.file_history,
             "last_opened_folder": self.last_opened_folder
         }
@@ -1939,6 +1966,13 @@ class RandomFilePickerGUI:
             self.use_cache_var.set(config.get("use_cache", True))
             
             self.enable_cloud_hydration_var.set(config.get("enable_cloud_hydration", False))
+            self.tracker_backend = config.get("tracker_backend", "json")
+            self.index_archives = config.get("index_archives", False)
+            self.extraction_cache_mb = config.get("extraction_cache_mb", 1024)
+            self.cache_backend = config.get("cache_backend", "pickle")
+            self.no_repeat = config.get("no_repeat", False)
+            self.folder_weighting = config.get("folder_weighting")
+            self.stale_cache = config.get("stale_cache", False)
             self.keywords_var.set(config.get("keywords", ""))
             self.keywords_match_all_var.set(config.get("keywords_match_all", False))
             self.history_limit_var.set(config.get("history_limit", 5))
@@ -47,3 +47,9 @@ def mock_config_file(tmp_path):
     config_file.write_text(json.dumps(config, indent=2))
     
     return config_file
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(tmp_path, monkeypatch):
+    """Keep the per-user file cache inside the test's temporary folder."""
+    monkeypatch.setenv("RANDOM_FILE_PICKER_CACHE_DIR", str(tmp_path / ".file_cache"))
@@ -0,0 +1,487 @@
+"""Unit tests for the CacheManager keyword index."""
+
+import os
+import random
+import time
+from array import array
+
+import pytest
+
+from random_file_picker.core.cache_manager import (
+    CacheManager,
+    format_cache_diagnostics,
+    get_last_cache_diagnostics,
+    wait_for_background_refreshes,
+)
+from random_file_picker.core.file_picker import collect_files_by_folder
+from random_file_picker.core.file_scanner import flatten_tree, scan_tree
+from random_file_picker.core.file_table import FileTable
+
+NAMES = [
+    "Spider-Man 001.cbz",
+    "Spider-Man 002.cbz",
+    "Amazing Spider_Girl 01.cbr",
+    "Batman Year One.cbr",
+    "Superman.vs.Batman.pdf",
+    "Wonder Woman 1984.mkv",
+    "notes.txt",
+]
+
+
+@pytest.fixture
+def library(tmp_path):
+    """Create a flat library with the sample names."""
+    root = tmp_path / "library"
+    root.mkdir()
+    for name in NAMES:
+        (root / name).write_text(name)
+    return root
+
+
+@pytest.fixture
+def cache(tmp_path, library):
+    """Create a cache with the sample library saved in it."""
+    cache = CacheManager(str(tmp_path / "cache"))
+    tree = scan_tree(str(library))
+    cache.save_cache(flatten_tree(tree), [str(library)], "_L_", ".", [], False, trees={str(library): tree})
+    return cache
+
+
+def brute_force(cache, keywords, match_all):
+    """Answer a query by scanning the whole vocabulary (previous behaviour)."""
+    all_files = cache._get_all_files()
+    matches = []
+    for keyword in keywords:
+        paths = set()
+        for word, file_ids in cache._keyword_index.items():
+            if keyword in word:
+                paths.update(all_files[file_id]['path'] for file_id in file_ids)
+        matches.append(paths)
+    result = set.intersection(*matches) if match_all else set.union(*matches)
+    return sorted(result)
+
+
+class TestTrigramIndex:
+    """Tests for the trigram posting index."""
+
+    @pytest.mark.parametrize("keywords, match_all", [
+        (["spider"], False),
+        (["man"], False),
+        (["pide"], False),
+        (["an"], False),
+        (["spider", "girl"], True),
+        (["batman", "wonder"], False),
+        (["batman", "superman"], True),
+        (["spider man"], False),
+        (["xyz"], False),
+    ])
+    def test_matches_vocabulary_scan(self, cache, keywords, match_all):
+        """Test that trigram lookups keep the partial word semantics."""
+        result = sorted(f['path'] for f in cache.get_cached_files(keywords, match_all))
+
+        assert result == brute_force(cache, keywords, match_all)
+
+    def test_postings_are_sorted_file_ids(self, cache):
+        """Test that postings are compact arrays of ascending file IDs."""
+        all_files = cache._get_all_files()
+
+        for word, file_ids in cache._keyword_index.items():
+            assert isinstance(file_ids, array)
+            assert list(file_ids) == sorted(set(file_ids))
+            assert all(word in all_files[file_id]['name'].lower() for file_id in file_ids)
+
+    def test_index_is_persisted(self, cache, library, monkeypatch):
+        """Test that a new manager reuses the saved index instead of rebuilding it."""
+        def fail(*args):
+            raise AssertionError("keyword index rebuilt")
+
+        reloaded = CacheManager(str(cache.cache_dir))
+        monkeypatch.setattr(reloaded, "_build_keyword_index", fail)
+
+        paths = [f['path'] for f in reloaded.get_cached_files(["batman"])]
+
+        assert sorted(paths) == [str(library / "Batman Year One.cbr"), str(library / "Superman.vs.Batman.pdf")]
+        assert reloaded.get_cache_info()['indexed_trigrams'] > 0
+
+    def test_stale_index_is_rebuilt(self, cache, library):
+        """Test that the saved index is ignored once the shards change."""
+        (library / "Batgirl 01.cbz").write_text("new")
+        tree = scan_tree(str(library))
+        cache._write_folder_cache(str(library), flatten_tree(tree), cache._get_cache_key("_L_", ".", False), tree)
+
+        reloaded = CacheManager(str(cache.cache_dir))
+        paths = [f['path'] for f in reloaded.get_cached_files(["batgirl"])]
+
+        assert paths == [str(library / "Batgirl 01.cbz")]
+
+
+class TestPickRandomPath:
+    """Tests for random picks served from the path store."""
+
+    def test_pick_without_loading_shards(self, cache, library):
+        """Test that a fresh manager picks a cached path without unpickling shards."""
+        reloaded = CacheManager(str(cache.cache_dir))
+
+        path = reloaded.pick_random_path([str(library)], "_L_", ".", False, random.Random(1))
+
+        assert path in {str(library / name) for name in NAMES}
+        assert reloaded._folder_caches == {}
+
+    def test_every_file_can_be_picked(self, cache, library):
+        """Test that positions map to every file across the store."""
+        rng = random.Random(7)
+        picks = {cache.pick_random_path([str(library)], "_L_", ".", False, rng) for _ in range(300)}
+
+        assert picks == {str(library / name) for name in NAMES}
+
+    def test_accept_filter_retries(self, cache, library):
+        """Test that rejected paths are drawn again."""
+        path = cache.pick_random_path([str(library)], "_L_", ".", False, random.Random(3),
+                                      accept=lambda p: p.endswith(".txt"))
+        assert path == str(library / "notes.txt")
+
+        assert cache.pick_random_path([str(library)], "_L_", ".", False, random.Random(3),
+                                      accept=lambda p: False) is None
+
+    def test_stale_cache_is_not_used(self, cache, library):
+        """Test that a changed folder or a missing store falls back to None."""
+        cache._get_paths_file(str(library)).unlink()
+        assert cache.pick_random_path([str(library)], "_L_", ".", False, random.Random()) is None
+
+        # refresh_cache recreates the store for an unchanged shard
+        assert cache.refresh_cache([str(library)], "_L_", ".", False)
+        assert cache.pick_random_path([str(library)], "_L_", ".", False, random.Random()) is not None
+
+        (library / "new.txt").write_text("new")
+        stat = library.stat()
+        os.utime(library, (stat.st_atime, stat.st_mtime + 10))
+        assert cache.pick_random_path([str(library)], "_L_", ".", False, random.Random()) is None
+
+
+class TestFolderScope:
+    """Tests for loading only the configured folders."""
+
+    @pytest.fixture
+    def other(self, tmp_path, cache):
+        """Save a second, unrelated library in the same cache."""
+        root = tmp_path / "other"
+        root.mkdir()
+        (root / "Spider-Man Other.cbz").write_text("x")
+        tree = scan_tree(str(root))
+        cache.save_cache(flatten_tree(tree), [str(root)], "_L_", ".", [], False, trees={str(root): tree})
+        return root
+
+    def test_refresh_loads_only_configured_shards(self, cache, library, other):
+        """Test that files from other cached folders are neither loaded nor returned."""
+        reloaded = CacheManager(str(cache.cache_dir))
+
+        assert reloaded.refresh_cache([str(library)], "_L_", ".", False)
+        paths = {f['path'] for f in reloaded.get_cached_files(["spider"])}
+
+        assert paths == {str(library / name) for name in NAMES if "Spider" in name}
+        assert set(reloaded._folder_caches) == {str(library)}
+
+    def test_explicit_folders_change_scope(self, cache, library, other):
+        """Test that passing folders switches the combined view and keyword index."""
+        reloaded = CacheManager(str(cache.cache_dir))
+
+        paths = [f['path'] for f in reloaded.get_cached_files(["spider"], folders=[str(other)])]
+        assert paths == [str(other / "Spider-Man Other.cbz")]
+
+        assert len(reloaded.get_cached_table(folders=[str(library)])) == len(NAMES)
+
+    def test_cold_load_builds_no_records(self, cache, library, monkeypatch):
+        """Test that loading the cache keeps the columnar table instead of per-file dicts."""
+        reloaded = CacheManager(str(cache.cache_dir))
+
+        def fail(self, file_id):
+            raise AssertionError("record built")
+
+        monkeypatch.setattr(FileTable, "record", fail)
+
+        assert reloaded.refresh_cache([str(library)], "_L_", ".", False)
+        assert len(reloaded.load_cache()['files']) == len(NAMES)
+        assert len(reloaded.get_cached_table()) == len(NAMES)
+        assert reloaded.get_cache_info()['file_count'] == len(NAMES)
+
+    def test_without_scope_all_shards_are_used(self, cache, library, other):
+        """Test that the legacy call without folders still sees every shard."""
+        reloaded = CacheManager(str(cache.cache_dir))
+
+        assert len(reloaded.get_cached_table()) == len(NAMES) + 1
+        assert reloaded.load_cache()['metadata']['folder_count'] == 2
+
+
+class TestCacheDiagnostics:
+    """Tests for the versioned cache key and hit/miss diagnostics."""
+
+    def test_zip_mode_does_not_invalidate(self, cache, library):
+        """Test that a cache saved without ZIP processing is reused with it."""
+        assert cache.refresh_cache([str(library)], "_L_", ".", True)
+        assert cache.get_diagnostics() == [
+            {'folder': str(library), 'status': "hit", 'reason': None, 'detail': None, 'age': None}
+        ]
+
+    def test_config_change_names_changed_fields(self, cache, library):
+        """Test that a different exclude prefix is reported field by field."""
+        assert not cache.is_cache_valid([str(library)], "_X_", ".", [], False)
+
+        [entry] = cache.get_diagnostics()
+        assert entry['reason'] == 'config_changed'
+        assert entry['detail'] == "exclude_prefix: '_L_' → '_X_'"
+
+    def test_old_key_schema_is_a_miss(self, cache, library):
+        """Test that shards saved with the previous unversioned hash are rebuilt."""
+        tree = scan_tree(str(library))
+        cache._write_folder_cache(str(library), flatten_tree(tree), {'exclude_prefix': "_L_"}, tree)
+
+        assert not cache.refresh_cache([str(library)], "_L_", ".", False)
+        assert cache.get_diagnostics()[0]['detail'] == "chave de cache de versão anterior"
+
+    def test_missing_and_changed_folders(self, cache, library, tmp_path):
+        """Test the reasons reported for a missing shard and a changed folder."""
+        (library / "new.txt").write_text("new")
+        stat = library.stat()
+        os.utime(library, (stat.st_atime, stat.st_mtime + 10))
+        missing = str(tmp_path / "missing")
+
+        assert not cache.is_cache_valid([str(library), missing], "_L_", ".", [], False)
+        assert [e['reason'] for e in cache.get_diagnostics()] == ['folder_changed', 'missing_shard']
+
+        assert cache.refresh_cache([str(library)], "_L_", ".", False)
+        assert cache.get_diagnostics()[0]['status'] == "refreshed"
+        assert get_last_cache_diagnostics() == cache.get_diagnostics()
+
+    def test_pick_reports_missing_path_store(self, cache, library):
+        """Test that the direct pick explains why it fell back."""
+        cache._get_paths_file(str(library)).unlink()
+
+        assert cache.pick_random_path([str(library)], "_L_", ".", False, random.Random()) is None
+        assert cache.get_diagnostics()[0]['reason'] == 'missing_path_store'
+
+    def test_collect_with_zip_reuses_cache(self, tmp_path, library):
+        """Test that collecting with ZIP processing hits the cache it saved."""
+        cache = CacheManager(str(tmp_path / "cache"))
+        collect_files_by_folder([str(library)], process_zip=True, cache_manager=cache)
+        collect_files_by_folder([str(library)], process_zip=False, cache_manager=cache)
+
+        assert [e['status'] for e in cache.get_diagnostics()] == ["hit"]
+
+    def test_format(self, library):
+        """Test the summary line and the per-folder lines."""
+        lines = format_cache_diagnostics([
+            {'folder': "a", 'status': "hit", 'reason': None, 'detail': None},
+            {'folder': "b", 'status': "refreshed", 'reason': None, 'detail': "2 pasta(s) relistada(s)"},
+            {'folder': "c", 'status': "miss", 'reason': 'config_changed', 'detail': "x: 1 → 2"},
+        ])
+
+        assert lines == [
+            "Cache: 1 pasta(s) válida(s), 1 atualizada(s), 1 com falha",
+            "  ↻ b: 2 pasta(s) relistada(s)",
+            "  ✗ c: configuração alterada (x: 1 → 2)",
+        ]
+        assert format_cache_diagnostics([]) == []
+
+
+class TestRetention:
+    """Tests for the cache manifest, eviction and compaction."""
+
+    @pytest.fixture
+    def other(self, tmp_path, cache):
+        """Save a second library that is then left out of the configuration."""
+        root = tmp_path / "other"
+        root.mkdir()
+        (root / "Other.cbz").write_text("x")
+        tree = scan_tree(str(root))
+        cache.save_cache(flatten_tree(tree), [str(root)], "_L_", ".", [], False, trees={str(root): tree})
+        return root
+
+    @staticmethod
+    def set_last_access(cache, folder, last_access):
+        """Backdate the last access of a shard in the saved manifest."""
+        manifest = cache._load_manifest()
+        manifest['shards'][str(folder)]['last_access'] = last_access
+        cache._save_manifest(manifest)
+
+    def test_manifest_tracks_saved_shards(self, cache, library):
+        """Test that saving records the shard size and file count."""
+        entry = cache._load_manifest()['shards'][str(library)]
+
+        assert entry['file_count'] == len(NAMES)
+        assert entry['size'] == (cache._get_cache_file(str(library)).stat().st_size
+                                 + cache._get_paths_file(str(library)).stat().st_size)
+
+    def test_expired_unreferenced_shard_is_evicted(self, cache, library, other):
+        """Test that a shard outside the configuration is removed after the max age."""
+        self.set_last_access(cache, other, time.time() - 31 * 24 * 3600)
+
+        stats = cache.enforce_retention([str(library)])
+
+        assert stats['evicted'] == 1
+        assert not cache._get_cache_file(str(other)).exists()
+        assert not cache._get_paths_file(str(other)).exists()
+        assert cache._get_cache_file(str(library)).exists()
+        assert set(cache._load_manifest()['shards']) == {str(library)}
+
+    def test_referenced_shards_are_kept(self, cache, library, other):
+        """Test that configured folders are never evicted, however old."""
+        self.set_last_access(cache, library, 0)
+
+        assert cache.enforce_retention([str(library), str(other)])['evicted'] == 0
+        assert cache._get_cache_file(str(library)).exists()
+
+    def test_size_budget_evicts_least_recently_used(self, tmp_path, cache, library, other):
+        """Test that going over the budget evicts idle unreferenced shards first."""
+        self.set_last_access(cache, other, time.time() - 2 * 3600)
+        limited = CacheManager(str(cache.cache_dir), max_cache_mb=0)
+
+        assert limited.refresh_cache([str(library)], "_L_", ".", False)
+
+        assert not limited._get_cache_file(str(other)).exists()
+        assert limited._get_cache_file(str(library)).exists()
+
+    def test_recently_used_shard_survives_budget(self, cache, library, other):
+        """Test that a shard used within the last hour is not evicted for size."""
+        limited = CacheManager(str(cache.cache_dir), max_cache_mb=0)
+
+        assert limited.enforce_retention([str(library)])['evicted'] == 0
+
+    def test_compaction_removes_orphans_and_stale_temps(self, cache, library):
+        """Test that orphan path stores and old temporaries are deleted."""
+        orphan = cache.cache_dir / "folder_deadbeef.paths"
+        orphan.write_bytes(b"x")
+        stale = cache.cache_dir / "folder_x.pkl.abc.tmp"
+        stale.write_bytes(b"x")
+        os.utime(stale, (0, 0))
+        fresh = cache.cache_dir / "folder_y.pkl.abc.tmp"
+        fresh.write_bytes(b"x")
+
+        assert cache.enforce_retention([str(library)])['removed_files'] == 2
+        assert not orphan.exists() and not stale.exists()
+        assert fresh.exists()
+
+    def test_cache_info_does_not_glob(self, cache, library, monkeypatch):
+        """Test that cache info sizes come from the manifest."""
+        reloaded = CacheManager(str(cache.cache_dir))
+        reloaded.refresh_cache([str(library)], "_L_", ".", False)
+
+        def fail(*args):
+            raise AssertionError("glob called")
+
+        monkeypatch.setattr(type(reloaded.cache_dir), "glob", fail)
+        info = reloaded.get_cache_info()
+
+        assert info['file_size'] >= cache._load_manifest()['shards'][str(library)]['size']
+        assert info['folders'][0]['last_access'] is not None
+
+    def test_missing_manifest_is_rebuilt(self, cache, library):
+        """Test that the manifest is rebuilt from the shard headers."""
+        cache._get_manifest_file().unlink()
+
+        manifest = CacheManager(str(cache.cache_dir))._load_manifest()
+
+        assert manifest['shards'][str(library)]['file_count'] == len(NAMES)
+
+    def test_picks_update_manifest_at_most_once_per_interval(self, monkeypatch, cache, library):
+        """Test that repeated picks do not read or rewrite the manifest."""
+        reloaded = CacheManager(str(cache.cache_dir))
+        self.set_last_access(cache, library, 0)
+        assert reloaded.pick_random_path([str(library)], "_L_", ".", False, random.Random())
+        assert cache._load_manifest()['shards'][str(library)]['last_access'] > 0
+
+        def fail(*args):
+            raise AssertionError("manifest touched on the pick path")
+
+        monkeypatch.setattr(reloaded, "_load_manifest", fail)
+        monkeypatch.setattr(reloaded, "_save_manifest", fail)
+        for _ in range(5):
+            assert reloaded.pick_random_path([str(library)], "_L_", ".", False, random.Random())
+
+    def test_manifest_update_waits_for_lock(self, cache, library):
+        """Test that the manifest read-modify-write runs under the manifest lock."""
+        import threading
+        from random_file_picker.core.cache_storage import FileLock
+
+        manifest_file = cache._get_manifest_file()
+        lock = FileLock(manifest_file.with_name(manifest_file.name + ".lock"))
+        lock.acquire()
+        self.set_last_access(cache, library, 0)
+        worker = threading.Thread(target=cache._update_manifest, args=([str(library)],), kwargs={'validated': True})
+        worker.start()
+        worker.join(0.2)
+        assert worker.is_alive()
+        assert cache._load_manifest()['shards'][str(library)]['last_access'] == 0
+
+        lock.release()
+        worker.join(5)
+        assert cache._load_manifest()['shards'][str(library)]['last_access'] > 0
+
+
+class TestStaleWhileRevalidate:
+    """Tests for answering from the saved cache and revalidating in the background."""
+
+    @staticmethod
+    def touch(folder):
+        """Add a file and move the folder mtime forward."""
+        (folder / "Spider-Man 003.cbz").write_text("new")
+        stat = folder.stat()
+        os.utime(folder, (stat.st_atime, stat.st_mtime + 10))
+
+    def test_answers_from_saved_cache_then_swaps(self, cache, library):
+        """Test that a stale answer is served and the next one sees the refresh."""
+        self.touch(library)
+        reader = CacheManager(str(cache.cache_dir))
+
+        stale = collect_files_by_folder([str(library)], cache_manager=reader, stale_cache=True)
+        assert len(stale[str(library)]) == len(NAMES)
+        assert [e['status'] for e in reader.get_diagnostics()] == ["stale"]
+
+        assert wait_for_background_refreshes(10)
+        fresh = collect_files_by_folder([str(library)], cache_manager=reader, stale_cache=True)
+
+        assert str(library / "Spider-Man 003.cbz") in fresh[str(library)]
+        assert len(reader.get_cached_files(["spider"])) == 4
+
+    def test_diagnostics_record_index_age(self, cache, library):
+        """Test that stale entries carry the time since the last validation."""
+        manifest = cache._load_manifest()
+        manifest['shards'][str(library)]['validated_at'] = time.time() - 600
+        cache._save_manifest(manifest)
+
+        assert cache.use_stale_cache([str(library)], "_L_", ".", False)
+
+        [entry] = get_last_cache_diagnostics()
+        assert entry['status'] == "stale"
+        assert 600 <= entry['age'] < 660
+        assert format_cache_diagnostics([entry])[1] == f"  ⧗ {library}: verificada há 10 min"
+
+    def test_background_refresh_records_validation(self, cache, library):
+        """Test that the worker refreshes the shard without publishing its diagnostics."""
+        self.touch(library)
+        cache.use_stale_cache([str(library)], "_L_", ".", False)
+        before = get_last_cache_diagnostics()
+
+        cache.revalidate_in_background([str(library)], "_L_", ".", False).join(10)
+
+        assert get_last_cache_diagnostics() == before
+        assert time.time() - cache._load_manifest()['shards'][str(library)]['validated_at'] < 60
+        assert cache.refresh_cache([str(library)], "_L_", ".", False)
+        assert cache.get_diagnostics()[0]['status'] == "hit"
+
+    def test_config_change_is_not_served_stale(self, cache, library):
+        """Test that a shard saved with another configuration is never used stale."""
+        assert not cache.use_stale_cache([str(library)], "_X_", ".", False)
+        assert cache.get_diagnostics()[0]['reason'] == 'config_changed'
+
+    def test_direct_pick_skips_folder_check(self, cache, library):
+        """Test that the direct pick answers from the saved path store."""
+        self.touch(library)
+
+        path = cache.pick_random_path([str(library)], "_L_", ".", False, random.Random(), stale=True)
+
+        assert path in {str(library / name) for name in NAMES}
+        assert cache.get_diagnostics()[0]['status'] == "stale"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,137 @@
+"""Unit tests for the per-user cache directory, atomic writes and locking."""
+
+import os
+import threading
+
+import pytest
+
+from random_file_picker.core.cache_manager import CacheManager
+from random_file_picker.core.cache_storage import (
+    CACHE_DIR_ENV,
+    FileLock,
+    atomic_write,
+    get_default_cache_dir,
+)
+from random_file_picker.core.file_picker import collect_files_by_folder
+from random_file_picker.core.file_scanner import flatten_tree, scan_tree
+
+
+class TestDefaultCacheDir:
+    """Tests for get_default_cache_dir."""
+
+    def test_env_override(self, tmp_path, monkeypatch):
+        """Test that the environment variable wins over the platform default."""
+        monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "custom"))
+
+        assert get_default_cache_dir() == tmp_path / "custom"
+        assert CacheManager().cache_dir == tmp_path / "custom"
+
+    @pytest.mark.skipif(os.name == "nt", reason="XDG only applies to POSIX systems")
+    def test_xdg_cache_home(self, tmp_path, monkeypatch):
+        """Test that XDG_CACHE_HOME is used and relative values are ignored."""
+        monkeypatch.delenv(CACHE_DIR_ENV)
+        monkeypatch.setattr("sys.platform", "linux")
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "xdg"))
+        assert get_default_cache_dir() == tmp_path / "xdg" / "random_file_picker"
+
+        monkeypatch.setenv("XDG_CACHE_HOME", "relative")
+        assert get_default_cache_dir().parent.name == ".cache"
+
+    def test_independent_of_cwd(self, tmp_path, monkeypatch):
+        """Test that changing the working folder keeps the same cache."""
+        first = CacheManager().cache_dir
+        monkeypatch.chdir(tmp_path)
+
+        assert CacheManager().cache_dir == first
+
+
+class TestAtomicWrite:
+    """Tests for atomic_write."""
+
+    def test_replaces_target(self, tmp_path):
+        """Test that the new content replaces the file and no temp file remains."""
+        target = tmp_path / "data.bin"
+        target.write_bytes(b"old")
+
+        with atomic_write(target) as f:
+            f.write(b"new")
+
+        assert target.read_bytes() == b"new"
+        assert os.listdir(tmp_path) == ["data.bin"]
+
+    def test_failure_keeps_old_content(self, tmp_path):
+        """Test that an interrupted write leaves the previous file intact."""
+        target = tmp_path / "data.bin"
+        target.write_bytes(b"old")
+
+        with pytest.raises(RuntimeError):
+            with atomic_write(target) as f:
+                f.write(b"partial")
+                raise RuntimeError("crash")
+
+        assert target.read_bytes() == b"old"
+        assert os.listdir(tmp_path) == ["data.bin"]
+
+
+class TestFileLock:
+    """Tests for FileLock and CacheManager.writer_lock."""
+
+    def test_exclusive(self, tmp_path):
+        """Test that a held lock cannot be taken again until released."""
+        first = FileLock(tmp_path / "test.lock")
+        second = FileLock(tmp_path / "test.lock")
+
+        with first:
+            assert not second.acquire(blocking=False)
+        assert second.acquire(blocking=False)
+        second.release()
+
+    def test_writer_lock_waits_for_other_writer(self, tmp_path):
+        """Test that a second writer waits and is told to revalidate."""
+        cache = CacheManager(str(tmp_path / "cache"))
+        holder = FileLock(cache.cache_dir / "writer.lock")
+        holder.acquire()
+        result = {}
+
+        def write():
+            with cache.writer_lock() as waited:
+                result['waited'] = waited
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        thread.join(0.3)
+        assert thread.is_alive()
+
+        holder.release()
+        thread.join(5)
+        assert result == {'waited': True}
+
+        with cache.writer_lock() as waited:
+            assert not waited
+
+    def test_waiting_collector_reuses_other_writers_cache(self, tmp_path):
+        """Test that a collector blocked by another writer uses its cache instead of rescanning."""
+        library = tmp_path / "library"
+        library.mkdir()
+        (library / "a.txt").write_text("a")
+        writer = CacheManager(str(tmp_path / "cache"))
+        reader = CacheManager(str(tmp_path / "cache"))
+        result = {}
+
+        with writer.writer_lock():
+            thread = threading.Thread(target=lambda: result.update(
+                collect_files_by_folder([str(library)], cache_manager=reader)
+            ))
+            thread.start()
+            thread.join(0.3)
+            tree = scan_tree(str(library))
+            writer.save_cache(flatten_tree(tree), [str(library)], "_L_", ".", [], False,
+                              trees={str(library): tree})
+        thread.join(5)
+
+        assert result == {str(library): [str(library / "a.txt")]}
+        assert [e['status'] for e in reader.get_diagnostics()] == ["hit"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
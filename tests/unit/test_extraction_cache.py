@@ -0,0 +1,162 @@
+"""Unit tests for the archive extraction cache."""
+
+import os
+import time
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from random_file_picker.core.extraction_cache import ExtractionCache
+from random_file_picker.core.file_picker import extract_file_from_zip, select_archive_member
+
+
+def write_bytes(content):
+    """Return a write_file callback that writes the given bytes."""
+    def write_file(target):
+        with open(target, 'wb') as f:
+            f.write(content)
+    return write_file
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Create an extraction cache in a temporary folder."""
+    return ExtractionCache(cache_dir=str(tmp_path / "extracted"), max_bytes=100)
+
+
+class TestExtractionCache:
+    """Tests for ExtractionCache class."""
+
+    def test_put_and_get(self, cache):
+        """Test that a stored member is served from the cache."""
+        key = ExtractionCache.make_key("a.zip", "page.txt", 10, 1.0)
+        assert cache.get(key) is None
+
+        path = cache.put(key, "page.txt", write_bytes(b"data"))
+
+        assert Path(path).read_bytes() == b"data"
+        assert cache.get(key) == path
+
+    def test_lru_eviction(self, cache):
+        """Test that the least recently used entries are evicted over budget."""
+        keys = [ExtractionCache.make_key("a.zip", f"m{i}", 1, 1.0) for i in range(3)]
+        first = cache.put(keys[0], "m0", write_bytes(b"x" * 40))
+        cache.put(keys[1], "m1", write_bytes(b"x" * 40))
+
+        # Touch the first entry so the second becomes the oldest
+        assert cache.get(keys[0]) == first
+        cache.put(keys[2], "m2", write_bytes(b"x" * 40))
+
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[0]) is not None
+        assert cache.get(keys[2]) is not None
+        assert cache.get_total_size() <= cache.max_bytes
+
+    def test_index_persisted(self, cache):
+        """Test that a new instance sees entries stored by another one."""
+        key = ExtractionCache.make_key("a.zip", "page.txt", 10, 1.0)
+        path = cache.put(key, "page.txt", write_bytes(b"data"))
+
+        reopened = ExtractionCache(cache_dir=str(cache.cache_dir), max_bytes=100)
+        assert reopened.get(key) == path
+
+    def test_failed_write_leaves_no_entry(self, cache):
+        """Test that an interrupted extraction is not cached."""
+        key = ExtractionCache.make_key("a.zip", "page.txt", 10, 1.0)
+
+        def failing_write(target):
+            raise OSError("disk full")
+
+        with pytest.raises(OSError):
+            cache.put(key, "page.txt", failing_write)
+
+        assert cache.get(key) is None
+        assert not (cache.cache_dir / key).exists()
+
+    def test_recent_orphan_dirs_are_kept(self, cache):
+        """Test that an extraction in progress in another process survives a new instance."""
+        key = ExtractionCache.make_key("a.zip", "page.txt", 10, 1.0)
+        in_progress = cache.cache_dir / key
+        in_progress.mkdir()
+        (in_progress / "page.txt.part").write_bytes(b"da")
+        old = cache.cache_dir / "interrupted"
+        old.mkdir()
+        (old / "page.txt.part").write_bytes(b"da")
+        past = time.time() - 2 * ExtractionCache.ORPHAN_GRACE_SECONDS
+        os.utime(old / "page.txt.part", (past, past))
+        os.utime(old, (past, past))
+
+        ExtractionCache(cache_dir=str(cache.cache_dir), max_bytes=100).get_total_size()
+
+        assert in_progress.exists()
+        assert not old.exists()
+
+    def test_entries_from_other_instances_are_merged(self, cache):
+        """Test that concurrent instances do not drop each other's index entries."""
+        other = ExtractionCache(cache_dir=str(cache.cache_dir), max_bytes=100)
+        first = ExtractionCache.make_key("a.zip", "m0", 1, 1.0)
+        second = ExtractionCache.make_key("a.zip", "m1", 1, 1.0)
+        cache.get_total_size()
+        other.get_total_size()
+
+        cache.put(first, "m0", write_bytes(b"x"))
+        other.put(second, "m1", write_bytes(b"y"))
+
+        reopened = ExtractionCache(cache_dir=str(cache.cache_dir), max_bytes=100)
+        assert reopened.get(first) is not None
+        assert reopened.get(second) is not None
+
+    def test_hits_do_not_rewrite_index(self, cache):
+        """Test that a recently used entry is served without rewriting the index."""
+        key = ExtractionCache.make_key("a.zip", "page.txt", 10, 1.0)
+        cache.put(key, "page.txt", write_bytes(b"data"))
+        index_mtime = cache._get_index_file().stat().st_mtime_ns
+
+        for _ in range(3):
+            assert cache.get(key) is not None
+
+        assert cache._get_index_file().stat().st_mtime_ns == index_mtime
+
+
+class TestCachedExtraction:
+    """Tests for archive extraction through the cache."""
+
+    @pytest.fixture
+    def archive(self, tmp_path, monkeypatch):
+        """Create a ZIP with a single member."""
+        monkeypatch.chdir(tmp_path)
+        zip_path = tmp_path / "pack.zip"
+        with zipfile.ZipFile(zip_path, 'w') as zf:
+            zf.writestr("page.txt", "v1")
+        return zip_path
+
+    def test_repeat_pick_served_from_cache(self, archive, tmp_path):
+        """Test that picking the same member twice extracts it only once."""
+        cache = ExtractionCache(cache_dir=str(tmp_path / "extracted"))
+
+        first = select_archive_member(str(archive), use_sequence=False, extraction_cache=cache)
+        second = select_archive_member(str(archive), use_sequence=False, extraction_cache=cache)
+
+        assert first['temp_dir'] is None
+        assert first['file_path'] == second['file_path']
+        assert Path(first['file_path']).read_text() == "v1"
+
+    def test_changed_archive_is_extracted_again(self, archive, tmp_path):
+        """Test that a modified archive does not reuse the old extraction."""
+        cache = ExtractionCache(cache_dir=str(tmp_path / "extracted"))
+        first = extract_file_from_zip(str(archive), "page.txt", extraction_cache=cache)
+
+        with zipfile.ZipFile(archive, 'w') as zf:
+            zf.writestr("page.txt", "version 2")
+        stat = archive.stat()
+        os.utime(archive, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        second = extract_file_from_zip(str(archive), "page.txt", extraction_cache=cache)
+
+        assert second != first
+        assert Path(second).read_text() == "version 2"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -9,9 +9,14 @@ import os
 from random_file_picker.core.file_picker import (
     is_file_accessible,
     collect_files,
+    collect_files_by_folder,
     pick_random_file,
+    pick_random_file_with_zip_support,
     list_files_in_zip,
+    select_archive_member,
+    open_archive_member_path,
 )
+from random_file_picker.core.cache_manager import CacheManager
 
 
 class TestIsFileAccessible:
@@ -96,6 +101,22 @@ class TestCollectFiles:
         assert len(files) == 2
         assert any("root_file.txt" in f for f in files)
         assert any("sub_file.txt" in f for f in files)
+    
+    def test_collect_files_by_folder(self, tmp_path):
+        """Test that files are grouped by their containing folder."""
+        sub_folder = tmp_path / "subfolder"
+        sub_folder.mkdir()
+        (tmp_path / "root_file.txt").write_text("content")
+        (sub_folder / "sub_1.txt").write_text("content")
+        (sub_folder / "sub_2.txt").write_text("content")
+        
+        files_by_folder = collect_files_by_folder([str(tmp_path)], use_cache=False)
+        
+        assert set(files_by_folder) == {str(tmp_path), str(sub_folder)}
+        assert sorted(files_by_folder[str(sub_folder)]) == [
+            str(sub_folder / "sub_1.txt"),
+            str(sub_folder / "sub_2.txt"),
+        ]
 
 
 class TestPickRandomFile:
@@ -126,6 +147,23 @@ class TestPickRandomFile:
         selected = pick_random_file([str(tmp_path)], keywords=["important"])
         
         assert "important.txt" in selected
+    
+    @pytest.mark.parametrize("use_cache", [False, True])
+    def test_pick_does_not_shuffle(self, tmp_path, monkeypatch, use_cache):
+        """Test that a pick draws one position instead of shuffling the list."""
+        library = tmp_path / "library"
+        library.mkdir()
+        for i in range(5):
+            (library / f"file{i}.txt").write_text("content")
+        (library / "subtitle.srt").write_text("content")
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr("random.SystemRandom.shuffle", Mock(side_effect=AssertionError("shuffled")))
+        
+        for _ in range(5):
+            result = pick_random_file_with_zip_support(
+                [str(library)], use_cache=use_cache, ignored_extensions=["srt"]
+            )
+            assert Path(result['file_path']).suffix == ".txt"
 
 
 class TestListFilesInZip:
@@ -165,5 +203,168 @@ class TestListFilesInZip:
         assert "important_doc.txt" in files[0]
 
 
+
+class TestSelectArchiveMember:
+    """Tests for select_archive_member function."""
+    
+    @pytest.fixture(autouse=True)
+    def temp_dir(self, tmp_path, monkeypatch):
+        """Create extraction folders under tmp_path instead of the system temp dir."""
+        monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    
+    @pytest.fixture
+    def comic_zip(self, tmp_path, monkeypatch):
+        """Create a ZIP with a numbered sequence and a nested ZIP."""
+        import io
+        import zipfile
+        
+        # The default tracker is created in the current directory
+        monkeypatch.chdir(tmp_path)
+        
+        nested = io.BytesIO()
+        with zipfile.ZipFile(nested, 'w') as zf:
+            zf.writestr("inner page.txt", "inner")
+        
+        zip_path = tmp_path / "pack.zip"
+        with zipfile.ZipFile(zip_path, 'w') as zf:
+            for i in range(1, 4):
+                zf.writestr(f"issues/Series {i:02d}.cbz", f"issue{i}")
+            zf.writestr("extras/nested.zip", nested.getvalue())
+        
+        return zip_path
+    
+    def test_extracts_only_selected_member(self, comic_zip):
+        """Test that only the chosen member is written to disk."""
+        result = select_archive_member(str(comic_zip), keywords=["series"])
+        
+        assert result['is_from_zip'] is True
+        assert result['file_in_zip'] == "issues/Series 01.cbz"
+        extracted = [p for p in Path(result['temp_dir']).rglob('*') if p.is_file()]
+        assert extracted == [Path(result['file_path'])]
+    
+    def test_sequence_inside_archive_is_tracked(self, comic_zip):
+        """Test that picks inside the archive follow the sequence across calls."""
+        picked = [
+            select_archive_member(str(comic_zip), keywords=["series"])['file_in_zip']
+            for _ in range(3)
+        ]
+        
+        assert picked == [f"issues/Series {i:02d}.cbz" for i in range(1, 4)]
+    
+    def test_member_choice_uses_given_rng(self, comic_zip):
+        """Test that folder order and random member choice come from the rng argument."""
+        import random
+        
+        rng = Mock(wraps=random.Random(0))
+        with patch("random.shuffle", side_effect=AssertionError("module PRNG used")):
+            select_archive_member(str(comic_zip), keywords=["series"], rng=rng)
+            result = select_archive_member(str(comic_zip), use_sequence=False, process_zip=False, rng=rng)
+        
+        rng.shuffle.assert_called_once()
+        rng.choice.assert_called_once()
+        assert result['file_in_zip'] in rng.choice.call_args[0][0]
+    
+    def test_nested_archive(self, comic_zip):
+        """Test that a nested archive is opened and its member returned."""
+        result = select_archive_member(str(comic_zip), keywords=["nested", "inner"])
+        
+        assert result['file_in_zip'] == "extras/nested.zip!/inner page.txt"
+        assert Path(result['file_path']).read_text() == "inner"
+        # The nested ZIP is read in memory: only the final file reaches the disk
+        extracted = [p for p in Path(result['temp_dir']).rglob('*') if p.is_file()]
+        assert extracted == [Path(result['file_path'])]
+    
+    def test_pick_tracks_members_with_sqlite_backend(self, tmp_path, monkeypatch):
+        """Test that archive picks record read state in the selected tracker backend."""
+        import zipfile
+        from random_file_picker.core.sequential_selector import create_tracker
+        
+        monkeypatch.chdir(tmp_path)
+        library = tmp_path / "library"
+        library.mkdir()
+        zip_path = library / "Series pack.zip"
+        with zipfile.ZipFile(zip_path, 'w') as zf:
+            for i in range(1, 4):
+                zf.writestr(f"issues/Series {i:02d}.cbz", f"issue{i}")
+        
+        picked = [
+            pick_random_file_with_zip_support([str(library)], keywords=["series"], use_cache=False,
+                                              tracker_backend="sqlite")['file_in_zip']
+            for _ in range(2)
+        ]
+        
+        assert picked == ["issues/Series 01.cbz", "issues/Series 02.cbz"]
+        assert not list(tmp_path.glob("read_files_tracker.json*"))
+        tracker = create_tracker("sqlite")
+        assert tracker.is_read(f"{zip_path}!/issues/Series 01.cbz")
+    
+    def test_empty_archive_returns_archive(self, comic_zip):
+        """Test that an archive without valid members is returned as is."""
+        result = select_archive_member(str(comic_zip), keywords=["missing"])
+        
+        assert result['is_from_zip'] is False
+        assert result['file_path'] == str(comic_zip)
+
+
+class TestIndexArchives:
+    """Tests for archive members indexed as virtual paths."""
+    
+    @pytest.fixture
+    def library(self, tmp_path):
+        """Create a folder with a plain file and a ZIP of numbered pages."""
+        import zipfile
+        
+        library = tmp_path / "library"
+        library.mkdir()
+        (library / "loose page.txt").write_text("loose")
+        with zipfile.ZipFile(library / "pack.zip", 'w') as zf:
+            zf.writestr("pages/page 01.txt", "one")
+            zf.writestr("pages/page 02.txt", "two")
+            zf.writestr("pages/_L_page 03.txt", "read")
+        return library
+    
+    @pytest.mark.parametrize("use_cache", [False, True])
+    def test_members_replace_archive(self, library, tmp_path, monkeypatch, use_cache):
+        """Test that archive members are listed as virtual paths."""
+        monkeypatch.chdir(tmp_path)
+        for _ in range(2):  # Second call hits the cache (when enabled)
+            files = collect_files([str(library)], use_cache=use_cache, index_archives=True)
+        
+        zip_path = str(library / "pack.zip")
+        assert sorted(files) == sorted([
+            str(library / "loose page.txt"),
+            f"{zip_path}!/pages/page 01.txt",
+            f"{zip_path}!/pages/page 02.txt",
+        ])
+    
+    def test_keywords_match_member_names(self, library, tmp_path, monkeypatch):
+        """Test that keywords are applied to member names."""
+        monkeypatch.chdir(tmp_path)
+        files = collect_files([str(library)], keywords=["02"], use_cache=False, index_archives=True)
+        
+        assert files == [f"{library / 'pack.zip'}!/pages/page 02.txt"]
+    
+    def test_listing_is_cached_by_size_and_mtime(self, library, tmp_path, monkeypatch):
+        """Test that an unchanged archive is not reopened."""
+        import random_file_picker.core.file_picker as file_picker
+        
+        cache = CacheManager(str(tmp_path / "cache"))
+        zip_path = str(library / "pack.zip")
+        members = cache.get_archive_members(zip_path)
+        cache.save_archive_index()
+        
+        monkeypatch.setattr(file_picker, "open_archive", Mock(side_effect=AssertionError))
+        reloaded = CacheManager(str(tmp_path / "cache"))
+        assert reloaded.get_archive_members(zip_path) == members
+    
+    def test_open_member_path_extracts_member(self, library, tmp_path, monkeypatch):
+        """Test that a virtual path is resolved to the extracted member."""
+        monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+        result = open_archive_member_path(f"{library / 'pack.zip'}!/pages/page 02.txt")
+        
+        assert result['is_from_zip'] is True
+        assert result['file_in_zip'] == "pages/page 02.txt"
+        assert Path(result['file_path']).read_text() == "two"
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
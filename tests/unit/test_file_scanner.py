@@ -0,0 +1,175 @@
+"""Unit tests for the os.scandir based directory scanner."""
+
+import os
+import pickle
+import shutil
+
+import pytest
+from pathlib import Path
+
+from random_file_picker.core.cache_manager import CacheManager
+from random_file_picker.core.file_scanner import (
+    flatten_tree,
+    refresh_tree,
+    scan_folder,
+    scan_tree,
+)
+
+
+@pytest.fixture
+def library(tmp_path):
+    """Create a nested library with hidden folders and excluded files."""
+    (tmp_path / "root.txt").write_text("root")
+    (tmp_path / "_L_read.txt").write_text("read")
+    (tmp_path / ".hidden_file.txt").write_text("hidden")
+
+    hidden_dir = tmp_path / ".hidden"
+    hidden_dir.mkdir()
+    (hidden_dir / "inside.txt").write_text("hidden")
+
+    deep = tmp_path / "a" / "b" / "c"
+    deep.mkdir(parents=True)
+    (tmp_path / "a" / "a1.txt").write_text("a1")
+    (deep / "c1.txt").write_text("c1")
+    (deep / "c2.txt").write_text("c2")
+
+    return tmp_path
+
+
+class TestScanFolder:
+    """Tests for scan_folder function."""
+
+    def test_matches_rglob_result(self, library):
+        """Test that the scanner finds the same files as the rglob walker."""
+        expected = {
+            str(p) for p in library.rglob('*')
+            if p.is_file()
+            and not any(part.startswith('.') for part in p.relative_to(library).parts[:-1])
+            and not p.name.startswith('.')
+            and not p.name.startswith('_L_')
+        }
+
+        records = scan_folder(str(library), "_L_", max_workers=2)
+
+        assert {r['path'] for r in records} == expected
+
+    def test_records_have_cache_fields(self, library):
+        """Test that records carry path/size/mtime/name from the DirEntry stat."""
+        records = scan_folder(str(library), "_L_")
+
+        for record in records:
+            file_stat = Path(record['path']).stat()
+            assert record['name'] == Path(record['path']).name
+            assert record['size'] == file_stat.st_size
+            assert record['mtime'] == file_stat.st_mtime
+
+    def test_missing_root_raises(self, tmp_path):
+        """Test that an unreadable root is reported to the caller."""
+        with pytest.raises(OSError):
+            scan_folder(str(tmp_path / "missing"))
+
+
+def _bump_mtime(path):
+    """Force a directory mtime change (filesystem granularity may be coarse)."""
+    stat = path.stat()
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+
+class TestRefreshTree:
+    """Tests for incremental tree revalidation."""
+
+    def test_unchanged_tree(self, library):
+        """Test that an untouched tree is reported as unchanged."""
+        tree = scan_tree(str(library))
+
+        assert refresh_tree(tree) is False
+
+    def test_deep_change_is_patched(self, library):
+        """Test that a file added deep in the tree is picked up."""
+        tree = scan_tree(str(library))
+        deep = library / "a" / "b" / "c"
+        (deep / "c3.txt").write_text("c3")
+        _bump_mtime(deep)
+
+        assert refresh_tree(tree) is True
+        assert str(deep / "c3.txt") in {r['path'] for r in flatten_tree(tree)}
+
+    def test_removed_folder_is_pruned(self, library):
+        """Test that removing a subfolder drops its whole subtree."""
+        tree = scan_tree(str(library))
+        shutil.rmtree(library / "a" / "b")
+        _bump_mtime(library / "a")
+
+        assert refresh_tree(tree) is True
+        assert str(library / "a" / "b") not in tree
+        assert str(library / "a" / "b" / "c") not in tree
+        assert tree[str(library / "a")]['subdirs'] == []
+
+
+class TestCacheManagerRefresh:
+    """Tests for CacheManager.refresh_cache."""
+
+    def test_refresh_patches_shard(self, library, tmp_path_factory):
+        """Test that refresh_cache patches the shard instead of failing."""
+        cache = CacheManager(str(tmp_path_factory.mktemp("cache")))
+        folder = str(library)
+        tree = scan_tree(folder)
+        cache.save_cache(flatten_tree(tree), [folder], "_L_", ".", [], False, trees={folder: tree})
+
+        new_dir = library / "a" / "new"
+        new_dir.mkdir()
+        (new_dir / "n1.txt").write_text("n1")
+        _bump_mtime(library / "a")
+
+        assert cache.is_cache_valid([folder], "_L_", ".", [], False) is False
+        assert cache.refresh_cache([folder], "_L_", ".", False) is True
+        assert cache.is_cache_valid([folder], "_L_", ".", [], False) is True
+
+        reloaded = CacheManager(str(cache.cache_dir))
+        paths = {f['path'] for f in reloaded.get_cached_files()}
+        assert str(new_dir / "n1.txt") in paths
+
+    def test_validation_reads_only_header(self, library, tmp_path_factory):
+        """Test that is_cache_valid never deserializes the file payload."""
+        cache = CacheManager(str(tmp_path_factory.mktemp("cache")))
+        folder = str(library)
+        tree = scan_tree(folder)
+        cache.save_cache(flatten_tree(tree), [folder], "_L_", ".", [], False, trees={folder: tree})
+
+        # Cut the shard right after the header: only the payload is lost
+        shard = cache._get_cache_file(folder)
+        header_size = len(pickle.dumps(cache._read_shard(shard, header_only=True),
+                                       protocol=pickle.HIGHEST_PROTOCOL))
+        with open(shard, 'r+b') as f:
+            f.truncate(header_size)
+
+        assert cache.is_cache_valid([folder], "_L_", ".", [], False) is True
+        assert CacheManager(str(cache.cache_dir)).refresh_cache([folder], "_L_", ".", False) is False
+
+    def test_legacy_shard_is_upgraded(self, library, tmp_path_factory):
+        """Test that single-pickle shards are still read and rewritten with a header."""
+        cache = CacheManager(str(tmp_path_factory.mktemp("cache")))
+        folder = str(library)
+        tree = scan_tree(folder)
+        shard = cache._get_cache_file(folder)
+        legacy = {
+            'metadata': {'folder_path': folder, 'created_at': "old",
+                         'config_hash': cache._get_config_hash("_L_", ".", False)},
+            'files': flatten_tree(tree),
+            'tree': tree,
+        }
+        with open(shard, 'wb') as f:
+            pickle.dump(legacy, f)
+
+        assert cache.is_cache_valid([folder], "_L_", ".", [], False) is True
+        assert cache.refresh_cache([folder], "_L_", ".", False) is True
+
+        header = cache._read_shard(shard, header_only=True)
+        assert header['shard_format'] == CacheManager.SHARD_FORMAT
+        assert set(header['dir_mtimes']) == set(tree)
+        paths = {f['path'] for f in CacheManager(str(cache.cache_dir)).get_cached_files()}
+        assert str(library / "a" / "b" / "c" / "c1.txt") in paths
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
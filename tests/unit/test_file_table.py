@@ -0,0 +1,114 @@
+"""Unit tests for the columnar FileTable."""
+
+import os
+import pickle
+
+import pytest
+
+from random_file_picker.core.file_table import MISSING_SIZE, FileTable
+
+RECORDS = [
+    {'path': os.path.join("lib", "Series A", "Alpha 01.cbz"), 'size': 10, 'mtime': 1.5, 'name': "Alpha 01.cbz"},
+    {'path': os.path.join("lib", "Series A", "Alpha 02.cbz"), 'size': 20, 'mtime': 2.5, 'name': "Alpha 02.cbz"},
+    {'path': os.path.join("lib", "Series B", "Beta.PDF"), 'size': 30, 'mtime': 3.5, 'name': "Beta.PDF"},
+    {'path': os.path.join("lib", "pack.zip") + "!/inner/member.txt", 'name': "member.txt"},
+]
+
+
+@pytest.fixture
+def table():
+    """Create a table with real files and an archive member."""
+    return FileTable.from_records(RECORDS)
+
+
+class TestFileTable:
+    """Tests for FileTable class."""
+
+    def test_records_round_trip(self, table):
+        """Test that records are rebuilt exactly, without stat for members."""
+        assert list(table) == RECORDS
+        assert table[3] == RECORDS[3]
+        assert table.sizes[3] == MISSING_SIZE
+
+    def test_directories_are_shared(self, table):
+        """Test that files in the same folder share one prefix entry."""
+        assert len(table.prefixes) == 3
+        assert table.dir_ids[0] == table.dir_ids[1]
+
+    def test_paths_and_dirname(self, table):
+        """Test that paths and folders match the os.path results."""
+        assert table.paths() == [r['path'] for r in RECORDS]
+        for file_id, record in enumerate(RECORDS):
+            assert table.dirname(file_id) == os.path.dirname(record['path'])
+
+    def test_name_is_derived_from_path(self):
+        """Test that appending without a name splits the path."""
+        table = FileTable()
+        table.append(os.path.join("lib", "a.txt"))
+        table.append("lib/pack.zip!/dir/m.txt")
+
+        assert table.names == ["a.txt", "m.txt"]
+        assert table.paths() == [os.path.join("lib", "a.txt"), "lib/pack.zip!/dir/m.txt"]
+
+    def test_take_shares_prefixes_until_extended(self, table):
+        """Test that a taken table does not modify the source directories."""
+        subset = table.take([2, 0])
+        assert subset.paths() == [RECORDS[2]['path'], RECORDS[0]['path']]
+        assert subset.prefixes is table.prefixes
+
+        subset.append(os.path.join("other", "new.txt"))
+
+        assert len(table.prefixes) == 3
+        assert subset.path(2) == os.path.join("other", "new.txt")
+
+    def test_concat(self, table):
+        """Test that concatenation keeps order and unifies folders."""
+        other = FileTable.from_records(RECORDS[:2] + [{'path': os.path.join("x", "y.txt")}])
+
+        result = FileTable.concat([table, other])
+
+        assert result.paths() == table.paths() + other.paths()
+        assert len(result.prefixes) == 4
+
+    def test_exclude_extensions(self, table):
+        """Test that extensions are compared without dot and case."""
+        assert [r['name'] for r in table.exclude_extensions({"pdf", "txt"})] == ["Alpha 01.cbz", "Alpha 02.cbz"]
+        assert table.exclude_extensions(set()) is table
+
+    def test_keep_dirs(self, table):
+        """Test filtering by folder."""
+        kept = table.keep_dirs({os.path.join("lib", "Series B")})
+
+        assert kept.paths() == [RECORDS[2]['path']]
+
+    def test_group_by_dir(self, table):
+        """Test that IDs are grouped under the dirname of their files."""
+        groups = table.group_by_dir()
+
+        assert {folder: list(ids) for folder, ids in groups.items()} == {
+            os.path.join("lib", "Series A"): [0, 1],
+            os.path.join("lib", "Series B"): [2],
+            os.path.join("lib", "pack.zip") + "!/inner": [3],
+        }
+
+    def test_dir_runs(self, table):
+        """Test that positions are summarised as contiguous runs per folder."""
+        table.append(RECORDS[0]['path'])
+
+        assert table.dir_runs() == {
+            os.path.join("lib", "Series A"): [(0, 2), (4, 1)],
+            os.path.join("lib", "Series B"): [(2, 1)],
+            os.path.join("lib", "pack.zip") + "!/inner": [(3, 1)],
+        }
+
+    def test_pickle_round_trip(self, table):
+        """Test that a restored table can still be read and extended."""
+        restored = pickle.loads(pickle.dumps(table))
+        restored.append(RECORDS[0]['path'], size=1, mtime=1.0)
+
+        assert list(restored)[:4] == RECORDS
+        assert len(restored.prefixes) == 3
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,64 @@
+"""Unit tests for the memory-mapped path store."""
+
+import pytest
+
+from random_file_picker.core.path_store import PathStore, open_path_store, write_path_store
+
+PATHS = [
+    "/lib/Series A/Alpha 01.cbz",
+    "/lib/Édition Spéciale.epub",
+    "",
+    "/lib/pack.zip!/inner/member.txt",
+]
+
+
+class TestPathStore:
+    """Tests for write_path_store and PathStore."""
+
+    def test_round_trip(self, tmp_path):
+        """Test that every record is read back by position."""
+        target = tmp_path / "paths.bin"
+        write_path_store(target, PATHS, "2026-01-01T00:00:00")
+
+        with PathStore(target) as store:
+            assert len(store) == len(PATHS)
+            assert [store[i] for i in range(len(store))] == PATHS
+            assert store.token == "2026-01-01T00:00:00"
+            with pytest.raises(IndexError):
+                store[len(PATHS)]
+
+    def test_undecodable_names_survive(self, tmp_path):
+        """Test that surrogate-escaped names from os.scandir are preserved."""
+        target = tmp_path / "paths.bin"
+        name = b"/lib/caf\xe9.txt".decode("utf-8", "surrogateescape")
+        write_path_store(target, [name], "t")
+
+        with PathStore(target) as store:
+            assert store[0] == name
+
+    def test_empty_store(self, tmp_path):
+        """Test that an empty store can be opened."""
+        target = tmp_path / "paths.bin"
+        write_path_store(target, [], "t")
+
+        with PathStore(target) as store:
+            assert len(store) == 0
+
+    def test_stale_or_invalid_files_are_rejected(self, tmp_path):
+        """Test that open_path_store ignores other shards' files and garbage."""
+        target = tmp_path / "paths.bin"
+        write_path_store(target, PATHS, "current")
+        garbage = tmp_path / "garbage.bin"
+        garbage.write_bytes(b"not a path store at all, just some bytes")
+
+        assert open_path_store(target, "other") is None
+        assert open_path_store(garbage) is None
+        assert open_path_store(tmp_path / "missing.bin") is None
+
+        store = open_path_store(target, "current")
+        assert store is not None
+        store.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,87 @@
+"""Unit tests for shuffle-free random selection."""
+
+import random
+from collections import Counter
+
+import pytest
+
+from random_file_picker.core.random_selection import (
+    choose_from_groups,
+    choose_index,
+    choose_streaming,
+    reservoir_sample,
+)
+
+
+class CountingRandom(random.Random):
+    """Random generator that counts how many draws were made."""
+
+    def __init__(self, seed):
+        super().__init__(seed)
+        self.calls = 0
+
+    def random(self):
+        self.calls += 1
+        return super().random()
+
+
+class TestChooseIndex:
+    """Tests for choose_index and choose_from_groups."""
+
+    def test_index_in_range(self):
+        """Test that indices stay within bounds."""
+        rng = random.Random(0)
+        assert all(0 <= choose_index(5, rng) < 5 for _ in range(100))
+
+    def test_empty_raises(self):
+        """Test that an empty candidate list is reported."""
+        with pytest.raises(ValueError):
+            choose_index(0, random.Random(0))
+
+    def test_groups_are_weighted_by_size(self):
+        """Test that every item is equally likely regardless of its group."""
+        groups = {"big": list(range(9)), "small": [9], "empty": []}
+        rng = random.Random(1)
+
+        counts = Counter(choose_from_groups(groups, rng)[1] for _ in range(10000))
+
+        assert set(counts) == set(range(10))
+        assert all(800 < count < 1200 for count in counts.values())
+        assert choose_from_groups({"empty": []}, rng) is None
+
+
+class TestReservoirSample:
+    """Tests for reservoir_sample and choose_streaming."""
+
+    def test_short_stream_returns_everything(self):
+        """Test that streams smaller than k are returned whole."""
+        assert sorted(reservoir_sample(iter(range(3)), 5, random.Random(0))) == [0, 1, 2]
+        assert choose_streaming(iter([]), random.Random(0)) is None
+
+    def test_sample_is_uniform(self):
+        """Test that each position is selected with the same frequency."""
+        rng = random.Random(2)
+
+        counts = Counter(choose_streaming(iter(range(20)), rng) for _ in range(20000))
+
+        assert set(counts) == set(range(20))
+        assert all(800 < count < 1200 for count in counts.values())
+
+    def test_sample_of_k_has_distinct_items(self):
+        """Test that a k-sample holds k distinct stream items."""
+        sample = reservoir_sample(iter(range(1000)), 10, random.Random(3))
+
+        assert len(set(sample)) == 10
+        assert all(0 <= item < 1000 for item in sample)
+
+    def test_draws_grow_sublinearly(self):
+        """Test that skipping ahead avoids one draw per item."""
+        rng = CountingRandom(4)
+
+        choose_streaming(iter(range(100000)), rng)
+
+        assert rng.calls < 200
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
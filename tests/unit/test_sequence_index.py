@@ -0,0 +1,115 @@
+"""Unit tests for the persistent sequence index."""
+
+import os
+import pickle
+
+import pytest
+
+from random_file_picker.core.cache_manager import CacheManager
+from random_file_picker.core.file_scanner import flatten_tree, scan_tree
+from random_file_picker.core.sequence_index import SequenceIndex
+from random_file_picker.core.sequential_selector import (
+    SequentialFileTracker,
+    analyze_folder_sequence,
+    build_sequences_from_index,
+)
+
+
+@pytest.fixture
+def comics(tmp_path):
+    """Create a library with two numbered collections and a loose file."""
+    library = tmp_path / "library"
+    series = library / "series"
+    series.mkdir(parents=True)
+    for i in range(1, 4):
+        (series / f"Batman {i:03d}.cbz").write_text("page")
+        (series / f"Robin {i:03d}.cbz").write_text("page")
+    (library / "loose.txt").write_text("loose")
+    return library
+
+
+@pytest.fixture
+def cache(comics, tmp_path):
+    """Create a cache with the library already scanned."""
+    cache_manager = CacheManager(str(tmp_path / "cache"))
+    folder = str(comics)
+    tree = scan_tree(folder)
+    cache_manager.save_cache(flatten_tree(tree), [folder], "_L_", ".", [], False, trees={folder: tree})
+    return cache_manager
+
+
+def _files_by_folder(cache_manager):
+    """Group the cached files by folder, like collect_files_by_folder."""
+    files_by_folder = {}
+    for file_info in cache_manager.get_cached_files():
+        files_by_folder.setdefault(os.path.dirname(file_info['path']), []).append(file_info['path'])
+    return files_by_folder
+
+
+class TestBuildSequencesFromIndex:
+    """Tests for build_sequences_from_index function."""
+
+    def test_matches_analyze_folder_sequence(self, comics, cache):
+        """Test that the cached index gives the same sequences as a live analysis."""
+        folder = str(comics / "series")
+        file_paths = [str(p) for p in (comics / "series").iterdir()]
+
+        entries = cache.get_sequence_entries()[folder]
+        from_index = build_sequences_from_index(folder, entries, file_paths)
+        from_disk = analyze_folder_sequence(comics / "series", file_paths=file_paths)
+
+        def normalize(sequences):
+            return sorted((s['collection'], [f['path'] for f in s['files']]) for s in sequences)
+
+        assert normalize(from_index) == normalize(from_disk)
+
+
+class TestSequenceIndex:
+    """Tests for SequenceIndex class."""
+
+    def test_picks_in_order_and_exhausts(self, comics, cache, tmp_path):
+        """Test that picks follow each collection order until everything is read."""
+        tracker = SequentialFileTracker(str(tmp_path / "tracker.json"))
+        files_by_folder = _files_by_folder(cache)
+        signature = SequenceIndex.make_signature(
+            [str(comics)], cache.get_shard_stamp([str(comics)]), "_L_", None, False, None
+        )
+
+        picked = []
+        for _ in range(6):
+            index = SequenceIndex(cache.cache_dir, files_by_folder, cache.get_sequence_entries())
+            index.load_or_build(signature, tracker)
+            folder, (next_file, sequence, _) = index.pick_next_unread(tracker)
+            tracker.mark_as_read(next_file)
+            index.update_after_read(folder, sequence, tracker)
+            picked.append(next_file)
+
+        batman = [p for p in picked if "Batman" in p]
+        assert batman == sorted(batman)
+        assert len(set(picked)) == 6
+
+        index = SequenceIndex(cache.cache_dir, files_by_folder, cache.get_sequence_entries())
+        index.load_or_build(signature, tracker)
+        assert index.pick_next_unread(tracker) is None
+
+    def test_exhausted_folders_are_saved(self, comics, cache, tmp_path):
+        """Test that folders found exhausted are persisted even when nothing is left."""
+        tracker = SequentialFileTracker(str(tmp_path / "tracker.json"))
+        files_by_folder = _files_by_folder(cache)
+        signature = SequenceIndex.make_signature(
+            [str(comics)], cache.get_shard_stamp([str(comics)]), "_L_", None, False, None
+        )
+        index = SequenceIndex(cache.cache_dir, files_by_folder, cache.get_sequence_entries())
+        index.load_or_build(signature, tracker)
+
+        # Everything is read behind the index's back
+        for path in files_by_folder[str(comics / "series")]:
+            tracker.mark_as_read(path)
+
+        assert index.pick_next_unread(tracker) is None
+        with open(index.index_file, 'rb') as f:
+            assert pickle.load(f)['unread_folders'] == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -122,6 +122,95 @@ class TestSequentialFileTracker:
         tracker.reset_folder(str(tmp_path))
         assert not tracker.is_read(str(test_file))
 
+    def _sequence(self, folder, names):
+        """Build a sequence dict like analyze_folder_sequence does."""
+        return {
+            'collection': 'series',
+            'folder': str(folder),
+            'files': [{'filename': name, 'path': str(folder / name)} for name in names],
+        }
+
+    def test_next_unread_cursor_advances(self, tracker, tmp_path):
+        """Test that the collection cursor follows files marked as read."""
+        names = [f"series {i:03d}.cbz" for i in range(1, 4)]
+        sequence = self._sequence(tmp_path, names)
+
+        assert tracker.get_next_unread_index(sequence) == 0
+        tracker.mark_as_read(str(tmp_path / names[0]))
+        assert tracker.get_next_unread_index(sequence) == 1
+        tracker.mark_as_read(str(tmp_path / names[1]))
+        tracker.mark_as_read(str(tmp_path / names[2]))
+        assert tracker.get_next_unread_index(sequence) is None
+
+        tracker.reset_folder(str(tmp_path))
+        assert tracker.get_next_unread_index(sequence) == 0
+
+    def test_next_unread_cursor_rebuilt_on_new_files(self, tracker, tmp_path):
+        """Test that the cursor is rebuilt when a file is inserted before it."""
+        tracker.mark_as_read(str(tmp_path / "series 002.cbz"))
+        tracker.mark_as_read(str(tmp_path / "series 003.cbz"))
+        sequence = self._sequence(tmp_path, ["series 002.cbz", "series 003.cbz"])
+        assert tracker.get_next_unread_index(sequence) is None
+
+        sequence = self._sequence(tmp_path, ["series 001.cbz", "series 002.cbz", "series 003.cbz"])
+        assert tracker.get_next_unread_index(sequence) == 0
+
+    def test_journal_is_replayed(self, tracker, tmp_path):
+        """Test that reads and resets survive a reload through the journal."""
+        other = tmp_path / "other"
+        tracker.mark_as_read(str(tmp_path / "a.txt"))
+        tracker.mark_as_read(str(other / "b.txt"))
+        tracker.reset_folder(str(tmp_path))
+
+        assert not tracker.tracker_file.exists()
+        reloaded = SequentialFileTracker(str(tracker.tracker_file))
+        assert not reloaded.is_read(str(tmp_path / "a.txt"))
+        assert reloaded.is_read(str(other / "b.txt"))
+
+    def test_journal_compaction(self, tmp_path, monkeypatch):
+        """Test that the journal is folded into the snapshot past the threshold."""
+        monkeypatch.setattr(SequentialFileTracker, "JOURNAL_COMPACT_THRESHOLD", 3)
+        tracker = SequentialFileTracker(str(tmp_path / "tracker.json"))
+        for i in range(4):
+            tracker.mark_as_read(str(tmp_path / f"file{i}.txt"))
+
+        assert tracker.tracker_file.exists()
+        assert len(tracker.journal_file.read_text().splitlines()) == 1
+
+        reloaded = SequentialFileTracker(str(tracker.tracker_file))
+        assert reloaded.get_read_files(str(tmp_path)) == [f"file{i}.txt" for i in range(4)]
+
+    def test_compaction_keeps_entries_appended_by_other_process(self, tmp_path):
+        """Test that compaction reloads the journal under the lock before truncating it."""
+        tracker = SequentialFileTracker(str(tmp_path / "tracker.json"))
+        other = SequentialFileTracker(str(tmp_path / "tracker.json"))
+        tracker.mark_as_read(str(tmp_path / "mine.txt"))
+        other.mark_as_read(str(tmp_path / "theirs.txt"))
+
+        assert tracker.compact()
+
+        reloaded = SequentialFileTracker(str(tracker.tracker_file))
+        assert reloaded.get_read_files(str(tmp_path)) == ["mine.txt", "theirs.txt"]
+        assert not list(tmp_path.glob("*.tmp"))
+
+    def test_compaction_waits_for_lock(self, tmp_path):
+        """Test that compaction does not run while another process holds the lock."""
+        import threading
+        from random_file_picker.core.cache_storage import FileLock
+
+        tracker = SequentialFileTracker(str(tmp_path / "tracker.json"))
+        tracker.mark_as_read(str(tmp_path / "a.txt"))
+        lock = FileLock(tracker.lock_file)
+        lock.acquire()
+        worker = threading.Thread(target=tracker.compact)
+        worker.start()
+        worker.join(0.2)
+        assert worker.is_alive() and not tracker.tracker_file.exists()
+
+        lock.release()
+        worker.join(5)
+        assert tracker.tracker_file.exists()
+
 
 class TestAnalyzeFolderSequence:
     """Tests for analyze_folder_sequence function."""
@@ -161,6 +250,16 @@ class TestAnalyzeFolderSequence:
         
         # Should return None or empty list if no sequence detected
         assert sequences is None or len(sequences) == 0
+    
+    def test_uses_given_file_paths(self, tmp_path):
+        """Test that known file paths are analyzed without listing the folder."""
+        file_paths = [str(tmp_path / f"Series A - {i:02d}.txt") for i in range(1, 4)]
+        
+        # Files do not exist on disk: only the given list may be used
+        sequences = analyze_folder_sequence(tmp_path, file_paths=file_paths)
+        
+        assert sequences is not None
+        assert [f['path'] for f in sequences[0]['files']] == file_paths
 
 
 if __name__ == "__main__":
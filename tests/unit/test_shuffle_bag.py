@@ -0,0 +1,134 @@
+"""Unit tests for the persistent no-repeat shuffle bag."""
+
+import random
+
+import pytest
+
+from random_file_picker.core.file_picker import pick_random_file_with_zip_support
+from random_file_picker.core.shuffle_bag import ShuffleBag
+
+PATHS = [f"/lib/file{i:02d}.txt" for i in range(10)]
+
+
+def remaining_ids(bag):
+    """Return the IDs still in the bag (positions 0..remaining-1)."""
+    return {bag.slots.get(position, position) for position in range(bag.remaining)}
+
+
+class TestShuffleBag:
+    """Tests for ShuffleBag class."""
+
+    def test_cycle_has_no_repeats(self, tmp_path):
+        """Test that a cycle yields every ID once, then starts over."""
+        bag = ShuffleBag(tmp_path)
+        bag.load_or_build("sig", len(PATHS), lambda: PATHS)
+        rng = random.Random(0)
+
+        first_cycle = [bag.draw(rng) for _ in PATHS]
+        next_draw = bag.draw(rng)
+
+        assert sorted(first_cycle) == list(range(len(PATHS)))
+        assert bag.remaining == len(PATHS) - 1
+        assert 0 <= next_draw < len(PATHS)
+
+    def test_state_is_persisted(self, tmp_path):
+        """Test that a new bag continues the saved cycle."""
+        rng = random.Random(1)
+        bag = ShuffleBag(tmp_path)
+        bag.load_or_build("sig", len(PATHS), lambda: PATHS)
+        drawn = [bag.draw_path(PATHS.__getitem__, rng) for _ in range(4)]
+        assert bag.save()
+
+        reloaded = ShuffleBag(tmp_path)
+        reloaded.load_or_build("sig", len(PATHS), lambda: pytest.fail("bag rebuilt"))
+        rest = [reloaded.draw_path(PATHS.__getitem__, rng) for _ in range(6)]
+
+        assert sorted(drawn + rest) == PATHS
+
+    def test_picks_are_appended(self, tmp_path):
+        """Test that saving a pick appends its ID instead of rewriting the bag."""
+        rng = random.Random(4)
+        bag = ShuffleBag(tmp_path)
+        bag.load_or_build("sig", len(PATHS), lambda: PATHS)
+        bag.draw_path(PATHS.__getitem__, rng)
+        assert bag.save()
+        header_mtime = bag.bag_file.stat().st_mtime_ns
+
+        for count in range(2, 5):
+            reloaded = ShuffleBag(tmp_path)
+            reloaded.load_or_build("sig", len(PATHS), lambda: pytest.fail("bag rebuilt"))
+            reloaded.draw_path(PATHS.__getitem__, rng)
+            assert reloaded.save()
+            assert reloaded.ids_file.stat().st_size == count * reloaded.drawn_ids.itemsize
+
+        assert bag.bag_file.stat().st_mtime_ns == header_mtime
+        assert reloaded.remaining == len(PATHS) - 4
+
+    def test_library_change_keeps_drawn_files_out(self, tmp_path):
+        """Test that a rebuilt bag skips files already drawn in the cycle."""
+        rng = random.Random(2)
+        bag = ShuffleBag(tmp_path)
+        bag.load_or_build("old", len(PATHS), lambda: PATHS)
+        drawn = {bag.draw_path(PATHS.__getitem__, rng) for _ in range(5)}
+        bag.save()
+
+        new_paths = ["/lib/new.txt"] + PATHS[::-1]
+        rebuilt = ShuffleBag(tmp_path)
+        rebuilt.load_or_build("new", len(new_paths), lambda: new_paths)
+        rest = {rebuilt.draw_path(new_paths.__getitem__, rng) for _ in range(rebuilt.remaining)}
+
+        assert rest == set(new_paths) - drawn
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_remove_ids(self, tmp_path, seed):
+        """Test that removing IDs from a fresh bag leaves exactly the others."""
+        rng = random.Random(seed)
+        bag = ShuffleBag(tmp_path)
+        bag.load_or_build(None, 50, lambda: [])
+        removed = rng.sample(range(50), 20)
+
+        bag._remove_ids(removed)
+
+        assert bag.remaining == 30
+        assert remaining_ids(bag) == set(range(50)) - set(removed)
+
+    def test_read_files_are_skipped(self, tmp_path):
+        """Test that files marked as read are consumed without being chosen."""
+        bag = ShuffleBag(tmp_path)
+        bag.load_or_build("sig", len(PATHS), lambda: PATHS)
+        unread = PATHS[3]
+
+        path = bag.draw_path(PATHS.__getitem__, random.Random(3), lambda p: p != unread)
+
+        assert path == unread
+
+    def test_empty_table(self, tmp_path):
+        """Test that an empty table yields nothing."""
+        bag = ShuffleBag(tmp_path)
+        bag.load_or_build("sig", 0, lambda: [])
+
+        assert bag.draw_path(PATHS.__getitem__, random.Random(0)) is None
+
+
+class TestNoRepeatPick:
+    """Tests for pick_random_file_with_zip_support(no_repeat=True)."""
+
+    @pytest.mark.parametrize("use_cache", [True, False])
+    def test_picks_do_not_repeat(self, tmp_path, monkeypatch, use_cache):
+        """Test that consecutive picks cover the library before repeating."""
+        library = tmp_path / "library"
+        library.mkdir()
+        for i in range(6):
+            (library / f"file{i}.txt").write_text("content")
+        monkeypatch.chdir(tmp_path)
+
+        picks = [
+            pick_random_file_with_zip_support([str(library)], use_cache=use_cache, no_repeat=True)['file_path']
+            for _ in range(6)
+        ]
+
+        assert sorted(picks) == sorted(str(p) for p in library.iterdir())
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
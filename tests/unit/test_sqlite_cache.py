@@ -0,0 +1,289 @@
+"""Unit tests for the SQLite file index backend."""
+
+import os
+import random
+
+import pytest
+
+from random_file_picker.core.cache_manager import CacheManager, create_cache_manager
+from random_file_picker.core.file_picker import collect_files
+from random_file_picker.core.file_scanner import flatten_tree, scan_tree
+from random_file_picker.core.sqlite_cache import SQLiteCacheManager
+
+
+@pytest.fixture
+def library(tmp_path):
+    """Create a small library with nested folders."""
+    root = tmp_path / "library"
+    (root / "Series A").mkdir(parents=True)
+    (root / "Series B").mkdir()
+    for i in range(1, 4):
+        (root / "Series A" / f"Alpha {i:02d}.cbz").write_text("a")
+        (root / "Series B" / f"Beta {i:02d}.pdf").write_text("b")
+    (root / "Édition Spéciale.epub").write_text("e")
+    return root
+
+
+def build_index(cache, folder):
+    """Scan a folder and save it in the given cache manager."""
+    tree = scan_tree(str(folder), "_L_")
+    assert cache.save_cache(flatten_tree(tree), [str(folder)], "_L_", ".", [], False, trees={str(folder): tree})
+    return tree
+
+
+class TestSQLiteCacheManager:
+    """Tests for SQLiteCacheManager class."""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        """Create a SQLite cache in a temporary folder."""
+        cache = SQLiteCacheManager(str(tmp_path / "cache"))
+        yield cache
+        cache.close()
+
+    @pytest.mark.parametrize("keywords, match_all", [
+        (None, False),
+        (["alpha"], False),
+        (["alpha", "beta"], False),
+        (["alpha", "02"], True),
+        (["ph"], False),
+        (["édition"], False),
+        (["missing"], False),
+    ])
+    def test_keywords_match_pickle_backend(self, cache, tmp_path, library, keywords, match_all):
+        """Test that keyword queries return the same files as the pickle backend."""
+        build_index(cache, library)
+        pickle_cache = CacheManager(str(tmp_path / "pickle_cache"))
+        build_index(pickle_cache, library)
+
+        expected = sorted(f['path'] for f in pickle_cache.get_cached_files(keywords, match_all))
+        result = sorted(f['path'] for f in cache.get_cached_files(keywords, match_all))
+
+        assert result == expected
+
+    def test_refresh_picks_up_changes(self, cache, library):
+        """Test that only changed folders are rescanned into the index."""
+        build_index(cache, library)
+        assert cache.is_cache_valid([str(library)], "_L_", ".", [], False)
+
+        new_file = library / "Series A" / "Alpha 04.cbz"
+        new_file.write_text("a")
+        os.utime(library / "Series A", (1, 1))
+        (library / "Series B" / "Beta 01.pdf").unlink()
+        os.utime(library / "Series B", (2, 2))
+
+        assert not cache.is_cache_valid([str(library)], "_L_", ".", [], False)
+        assert cache.refresh_cache([str(library)], "_L_", ".", False)
+        assert cache.is_cache_valid([str(library)], "_L_", ".", [], False)
+
+        paths = {f['path'] for f in cache.get_cached_files(["alpha", "beta"])}
+        assert str(new_file) in paths
+        assert str(library / "Series B" / "Beta 01.pdf") not in paths
+        assert len(paths) == 6
+
+    def test_sequence_entries_and_stamp(self, cache, library):
+        """Test that sequence entries and shard stamps are served from the index."""
+        build_index(cache, library)
+
+        entries = cache.get_sequence_entries()
+        assert [e['filename'] for e in entries[str(library / "Series A")]] == [
+            f"Alpha {i:02d}.cbz" for i in range(1, 4)
+        ]
+        assert cache.get_shard_stamp([str(library)]) is not None
+        assert cache.get_shard_stamp([str(library / "other")]) is None
+
+    def test_pick_random_path(self, cache, library):
+        """Test that random picks are answered by a query per draw."""
+        build_index(cache, library)
+        rng = random.Random(5)
+
+        picks = {cache.pick_random_path([str(library)], "_L_", ".", False, rng) for _ in range(200)}
+
+        assert picks == {str(p) for p in library.rglob("*") if p.is_file()}
+        assert cache.pick_random_path([str(library)], "_X_", ".", False, rng) is None
+
+    def test_pick_random_path_with_id_gaps(self, cache, tmp_path, library):
+        """Test that picks reach every file when a folder's ids are not contiguous."""
+        build_index(cache, library)
+        other = tmp_path / "other"
+        other.mkdir()
+        (other / "Other.cbz").write_text("x")
+        build_index(cache, other)
+        (library / "Series A" / "Alpha 04.cbz").write_text("a")
+        stat = (library / "Series A").stat()
+        os.utime(library / "Series A", (stat.st_atime, stat.st_mtime + 10))
+        assert cache.refresh_cache([str(library)], "_L_", ".", False)
+        rng = random.Random(7)
+
+        picks = {cache.pick_random_path([str(library)], "_L_", ".", False, rng) for _ in range(300)}
+
+        assert picks == {str(p) for p in library.rglob("*") if p.is_file()}
+
+    def test_picks_stay_uniform_after_refresh(self, cache, tmp_path):
+        """Test that a refreshed folder's file is not favoured by the id gap before it."""
+        library = tmp_path / "uniform"
+        (library / "big").mkdir(parents=True)
+        (library / "small").mkdir()
+        for i in range(200):
+            (library / "big" / f"file{i:03d}.txt").write_text("x")
+        (library / "small" / "moved.txt").write_text("x")
+        build_index(cache, library)
+        other = tmp_path / "other"
+        other.mkdir()
+        for i in range(1000):
+            (other / f"other{i:04d}.txt").write_text("x")
+        build_index(cache, other)
+        stat = (library / "small").stat()
+        os.utime(library / "small", (stat.st_atime, stat.st_mtime + 10))
+        assert cache.refresh_cache([str(library)], "_L_", ".", False)
+        # A single exact-id attempt: most draws land in the gap, as in a very sparse folder
+        cache.MAX_PICK_ATTEMPTS = 1
+        rng = random.Random(11)
+
+        picks = [cache.pick_random_path([str(library)], "_L_", ".", False, rng) for _ in range(2000)]
+
+        # Uniform: about 10 of 2000 (the row after the gap used to get most picks)
+        assert picks.count(str(library / "small" / "moved.txt")) < 40
+        assert len(set(picks)) > 190
+
+    def test_config_change_requires_rescan(self, cache, library):
+        """Test that a different exclude prefix invalidates the index."""
+        build_index(cache, library)
+
+        assert not cache.refresh_cache([str(library)], "_X_", ".", False)
+
+    def test_queries_are_scoped_to_configured_folders(self, cache, tmp_path, library):
+        """Test that rows of other indexed folders are left out of the results."""
+        build_index(cache, library)
+        other = tmp_path / "other"
+        other.mkdir()
+        (other / "Alpha Other.cbz").write_text("x")
+        build_index(cache, other)
+
+        assert cache.refresh_cache([str(library)], "_L_", ".", False)
+        paths = {f['path'] for f in cache.get_cached_files(["alpha"])}
+        assert paths == {str(library / "Series A" / f"Alpha {i:02d}.cbz") for i in range(1, 4)}
+
+        assert [f['path'] for f in cache.get_cached_files(["alpha"], folders=[str(other)])] == [
+            str(other / "Alpha Other.cbz")
+        ]
+
+    def test_sequence_entries_are_scoped_to_configured_folders(self, cache, tmp_path, library):
+        """Test that sequence entries of other indexed folders are left out."""
+        build_index(cache, library)
+        other = tmp_path / "other"
+        other.mkdir()
+        for i in range(1, 3):
+            (other / f"Gamma {i:02d}.cbz").write_text("x")
+        build_index(cache, other)
+
+        assert cache.refresh_cache([str(library)], "_L_", ".", False)
+        assert str(other) not in cache.get_sequence_entries()
+        assert str(library / "Series A") in cache.get_sequence_entries()
+
+        assert cache.refresh_cache([str(other)], "_L_", ".", False)
+        assert set(cache.get_sequence_entries()) == {str(other)}
+
+    def test_diagnostics(self, cache, tmp_path, library):
+        """Test that lookups report hits, refreshed folders and misses."""
+        build_index(cache, library)
+        (library / "Series A" / "Alpha 04.cbz").write_text("a")
+        stat = (library / "Series A").stat()
+        os.utime(library / "Series A", (stat.st_atime, stat.st_mtime + 10))
+
+        assert not cache.is_cache_valid([str(library)], "_L_", ".", [], False)
+        assert cache.get_diagnostics()[0]['reason'] == 'folder_changed'
+
+        assert cache.refresh_cache([str(library)], "_L_", ".", True)
+        assert cache.get_diagnostics()[0]['status'] == "refreshed"
+
+        assert not cache.refresh_cache([str(library), str(tmp_path / "other")], "_L_", ".", False)
+        assert [e['status'] for e in cache.get_diagnostics()] == ["hit", "miss"]
+        assert cache.get_diagnostics()[1]['reason'] == 'missing_shard'
+
+    def test_retention_evicts_unreferenced_roots(self, cache, tmp_path, library):
+        """Test that an expired folder outside the configuration loses its rows."""
+        build_index(cache, library)
+        other = tmp_path / "other"
+        other.mkdir()
+        (other / "Alpha Other.cbz").write_text("x")
+        build_index(cache, other)
+        manifest = cache._load_manifest()
+        manifest['shards'][str(other)]['last_access'] = 0
+        cache._save_manifest(manifest)
+
+        assert cache.enforce_retention([str(library)])['evicted'] == 1
+        assert cache._get_root(str(other)) is None
+        assert cache.get_cached_files(["alpha"], folders=[str(other)]) == []
+        assert set(cache._load_manifest()['shards']) == {str(library)}
+
+    def test_stale_cache(self, cache, library):
+        """Test that a changed folder is served stale and refreshed in the background."""
+        build_index(cache, library)
+        (library / "Series A" / "Alpha 04.cbz").write_text("a")
+        stat = (library / "Series A").stat()
+        os.utime(library / "Series A", (stat.st_atime, stat.st_mtime + 10))
+
+        assert cache.pick_random_path([str(library)], "_L_", ".", False, random.Random(), stale=True)
+        assert cache.get_diagnostics()[0]['status'] == "stale"
+        assert len(cache.get_cached_files(["alpha"])) == 3
+
+        cache.revalidate_in_background([str(library)], "_L_", ".", False).join(10)
+
+        assert len(cache.get_cached_files(["alpha"])) == 4
+
+
+class TestCacheBackendSelection:
+    """Tests for the cache backend factory and collect_files integration."""
+
+    def test_create_cache_manager(self, tmp_path):
+        """Test that the factory returns the requested backend."""
+        assert type(create_cache_manager("pickle", str(tmp_path / "p"))) is CacheManager
+        assert isinstance(create_cache_manager("sqlite", str(tmp_path / "s")), SQLiteCacheManager)
+        with pytest.raises(ValueError):
+            create_cache_manager("redis")
+
+    def test_collect_files_with_sqlite_backend(self, tmp_path, library, monkeypatch):
+        """Test that repeated collections are served from the SQLite index."""
+        monkeypatch.chdir(tmp_path)
+
+        first = collect_files([str(library)], keywords=["beta"], cache_backend="sqlite")
+        second = collect_files([str(library)], keywords=["beta"], cache_backend="sqlite")
+
+        assert sorted(first) == sorted(second)
+        assert len(second) == 3
+        assert (tmp_path / ".file_cache" / SQLiteCacheManager.DB_NAME).exists()
+
+    @pytest.mark.parametrize("options", [
+        {}, {'keywords': ["beta"]}, {'no_repeat': True}, {'folder_weighting': "uniform"},
+    ])
+    def test_pick_closes_index(self, tmp_path, library, monkeypatch, options):
+        """Test that every SQLite index opened by a pick is closed again."""
+        from random_file_picker.core.file_picker import pick_random_file_with_zip_support
+        from random_file_picker.core.sequential_selector import select_file_with_sequence_logic
+
+        monkeypatch.chdir(tmp_path)
+        opened = []
+        original_init = SQLiteCacheManager.__init__
+        original_close = SQLiteCacheManager.close
+
+        def init(self, *args, **kwargs):
+            original_init(self, *args, **kwargs)
+            opened.append(self)
+
+        def close(self):
+            original_close(self)
+            opened.remove(self)
+
+        monkeypatch.setattr(SQLiteCacheManager, "__init__", init)
+        monkeypatch.setattr(SQLiteCacheManager, "close", close)
+
+        for _ in range(2):
+            assert pick_random_file_with_zip_support([str(library)], cache_backend="sqlite", **options)
+            select_file_with_sequence_logic([str(library)], cache_backend="sqlite")
+
+        assert opened == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
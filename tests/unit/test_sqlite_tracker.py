@@ -0,0 +1,147 @@
+"""Unit tests for the SQLite tracker backend."""
+
+import pytest
+
+from random_file_picker.core.sequential_selector import SequentialFileTracker, create_tracker
+from random_file_picker.core.sqlite_tracker import SQLiteFileTracker
+
+
+@pytest.fixture
+def tracker(tmp_path):
+    """Create a SQLite tracker in a temporary folder."""
+    tracker = SQLiteFileTracker(str(tmp_path / "tracker.db"))
+    yield tracker
+    tracker.close()
+
+
+class TestSQLiteFileTracker:
+    """Tests for SQLiteFileTracker class."""
+
+    def test_mark_and_check_read(self, tracker, tmp_path):
+        """Test marking files as read and checking status."""
+        test_file = tmp_path / "test.txt"
+
+        assert not tracker.is_read(str(test_file))
+        tracker.mark_as_read(str(test_file))
+        tracker.mark_as_read(str(test_file))
+
+        assert tracker.is_read(str(test_file))
+        assert tracker.get_read_files(str(tmp_path)) == ["test.txt"]
+
+    def test_batch_and_reset(self, tracker, tmp_path):
+        """Test batched writes and folder reset."""
+        tracker.mark_many_as_read([str(tmp_path / f"file{i}.txt") for i in range(3)])
+        assert tracker.get_read_files(str(tmp_path)) == ["file0.txt", "file1.txt", "file2.txt"]
+
+        tracker.reset_folder(str(tmp_path))
+        assert tracker.get_read_files(str(tmp_path)) == []
+
+    def test_wal_mode(self, tracker):
+        """Test that the database runs in WAL mode."""
+        assert tracker._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    def test_sees_writes_from_other_connection(self, tracker, tmp_path):
+        """Test that cursors notice reads marked by another process."""
+        sequence = {
+            'collection': 'series',
+            'folder': str(tmp_path),
+            'files': [{'filename': f"series {i}.cbz"} for i in range(1, 3)],
+        }
+        assert tracker.get_next_unread_index(sequence) == 0
+
+        other = SQLiteFileTracker(str(tracker.tracker_file))
+        other.mark_as_read(str(tmp_path / "series 1.cbz"))
+        assert tracker.get_next_unread_index(sequence) == 1
+
+        other.reset_folder(str(tmp_path))
+        other.close()
+        assert tracker.get_next_unread_index(sequence) == 0
+
+    def test_migrates_json_tracker(self, tmp_path):
+        """Test that an existing JSON tracker is imported once."""
+        legacy = SequentialFileTracker(str(tmp_path / "read_files_tracker.json"))
+        legacy.mark_as_read(str(tmp_path / "old.txt"))
+
+        tracker = create_tracker("sqlite", str(tmp_path / "read_files_tracker.db"))
+        assert tracker.is_read(str(tmp_path / "old.txt"))
+
+        tracker.reset_folder(str(tmp_path))
+        tracker.close()
+        reopened = SQLiteFileTracker(str(tmp_path / "read_files_tracker.db"))
+        assert not reopened.is_read(str(tmp_path / "old.txt"))
+        reopened.close()
+
+    def test_migration_is_retried_after_failed_write(self, tmp_path, monkeypatch):
+        """Test that a failed batched import does not mark the JSON tracker as migrated."""
+        legacy = SequentialFileTracker(str(tmp_path / "read_files_tracker.json"))
+        legacy.mark_as_read(str(tmp_path / "old.txt"))
+        monkeypatch.setattr(SQLiteFileTracker, "mark_many_as_read", lambda self, paths: False)
+        create_tracker("sqlite", str(tmp_path / "read_files_tracker.db")).close()
+        monkeypatch.undo()
+
+        with create_tracker("sqlite", str(tmp_path / "read_files_tracker.db")) as tracker:
+            assert tracker.is_read(str(tmp_path / "old.txt"))
+
+
+class TestTrackerIsClosed:
+    """Tests that picks close the trackers they open."""
+
+    @pytest.fixture
+    def open_trackers(self, monkeypatch):
+        """Record the SQLite trackers that are opened and not closed yet."""
+        opened = []
+        original_init = SQLiteFileTracker.__init__
+        original_close = SQLiteFileTracker.close
+
+        def init(self, *args, **kwargs):
+            original_init(self, *args, **kwargs)
+            opened.append(self)
+
+        def close(self):
+            original_close(self)
+            opened.remove(self)
+
+        monkeypatch.setattr(SQLiteFileTracker, "__init__", init)
+        monkeypatch.setattr(SQLiteFileTracker, "close", close)
+        return opened
+
+    @pytest.fixture
+    def library(self, tmp_path, monkeypatch):
+        """Create a numbered series and a ZIP with another one."""
+        import zipfile
+
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+        library = tmp_path / "library"
+        library.mkdir()
+        for i in range(1, 4):
+            (library / f"Series {i:02d}.txt").write_text("x")
+        with zipfile.ZipFile(library / "pack.zip", 'w') as zf:
+            for i in range(1, 4):
+                zf.writestr(f"issues/Pack {i:02d}.txt", "x")
+        return library
+
+    @pytest.mark.parametrize("options", [
+        {'use_cache': False}, {'no_repeat': True}, {'folder_weighting': "unread"},
+    ])
+    def test_picks_close_tracker(self, library, open_trackers, options):
+        """Test that random picks (including archive members) leave no tracker open."""
+        from random_file_picker.core.file_picker import pick_random_file_with_zip_support
+
+        for _ in range(4):
+            pick_random_file_with_zip_support([str(library)], tracker_backend="sqlite", **options)
+
+        assert open_trackers == []
+
+    def test_sequence_pick_closes_tracker(self, library, open_trackers):
+        """Test that sequential selection leaves no tracker open."""
+        from random_file_picker.core.sequential_selector import select_file_with_sequence_logic
+
+        for _ in range(4):
+            select_file_with_sequence_logic([str(library)], tracker_backend="sqlite")
+
+        assert open_trackers == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,246 @@
+"""Unit tests for two-level weighted sampling."""
+
+import math
+import os
+import random
+from collections import Counter
+
+import pytest
+
+from random_file_picker.core import file_picker
+from random_file_picker.core.file_picker import pick_random_file_with_zip_support
+from random_file_picker.core.file_table import FileTable
+from random_file_picker.core.weighted_selection import (
+    AliasTable,
+    FenwickTree,
+    FolderSampler,
+    folder_weight,
+)
+
+
+def make_table(sizes):
+    """Create a table with one folder per entry of sizes."""
+    table = FileTable()
+    for folder, size in sizes.items():
+        for i in range(size):
+            table.append(os.path.join("lib", folder, f"file{i:03d}.txt"))
+    return table
+
+
+def table_path(table):
+    """Resolve (folder, file id) pairs against a table."""
+    return lambda folder, file_id: table.path(file_id)
+
+
+def read_files(read):
+    """Return the read file names of a folder, like the trackers do."""
+    return lambda folder: [
+        os.path.basename(path) for path in read if os.path.dirname(path) == folder
+    ]
+
+
+class TestAliasTable:
+    """Tests for AliasTable class."""
+
+    def test_frequencies_follow_weights(self):
+        """Test that positions are drawn proportionally to their weights."""
+        weights = [1, 2, 3, 0, 4]
+        table = AliasTable(weights)
+        rng = random.Random(0)
+
+        counts = Counter(table.sample(rng) for _ in range(50000))
+
+        assert 3 not in counts
+        for position, weight in enumerate(weights):
+            assert counts[position] / 50000 == pytest.approx(weight / 10, abs=0.01)
+
+    def test_requires_positive_weight(self):
+        """Test that an empty or all-zero table is rejected."""
+        with pytest.raises(ValueError):
+            AliasTable([])
+        with pytest.raises(ValueError):
+            AliasTable([0, 0])
+
+
+class TestFenwickTree:
+    """Tests for FenwickTree class."""
+
+    def test_frequencies_follow_weights(self):
+        """Test that positions are drawn proportionally to their weights."""
+        weights = [1, 2, 3, 0, 4]
+        tree = FenwickTree(weights)
+        rng = random.Random(0)
+
+        counts = Counter(tree.sample(rng) for _ in range(50000))
+
+        assert 3 not in counts
+        for position, weight in enumerate(weights):
+            assert counts[position] / 50000 == pytest.approx(weight / 10, abs=0.01)
+
+    def test_add_changes_one_weight(self):
+        """Test that a weight update is reflected in the following draws."""
+        tree = FenwickTree([5, 5, 5])
+        tree.add(1, -5)
+        rng = random.Random(1)
+
+        assert tree.total == 10
+        assert 1 not in {tree.sample(rng) for _ in range(2000)}
+
+    def test_requires_positive_weight(self):
+        """Test that an all-zero tree cannot be sampled."""
+        with pytest.raises(ValueError):
+            FenwickTree([0, 0]).sample(random.Random(0))
+
+
+class TestFolderWeight:
+    """Tests for folder_weight function."""
+
+    def test_rules(self):
+        """Test the supported weighting rules."""
+        assert folder_weight("uniform", 50) == 1.0
+        assert folder_weight("sqrt", 49) == 7.0
+        assert folder_weight("unread", 12) == 12.0
+        assert folder_weight("sqrt", 0) == 0.0
+        with pytest.raises(ValueError):
+            folder_weight("log", 3)
+
+
+class TestFolderSampler:
+    """Tests for FolderSampler class."""
+
+    def test_sqrt_weighting(self, tmp_path):
+        """Test that folders are drawn by sqrt(count) and files uniformly inside."""
+        table = make_table({"big": 100, "small": 4})
+        sampler = FolderSampler(tmp_path)
+        sampler.load_or_build(None, table.group_by_dir, "sqrt")
+        rng = random.Random(1)
+
+        picks = [sampler.pick(rng, table_path(table)) for _ in range(12000)]
+        folders = Counter(folder for folder, _ in picks)
+
+        big_share = math.sqrt(100) / (math.sqrt(100) + math.sqrt(4))
+        assert folders[os.path.join("lib", "big")] / 12000 == pytest.approx(big_share, abs=0.02)
+        assert all(os.path.dirname(path) == folder for folder, path in picks)
+
+    def test_unread_weighting_skips_read_files(self, tmp_path):
+        """Test that only unread files are candidates with the unread rule."""
+        table = make_table({"a": 3, "b": 3})
+        read = {table.path(i) for i in range(5)}
+        sampler = FolderSampler(tmp_path)
+        sampler.load_or_build(None, table.group_by_dir, "unread", read_files(read))
+
+        picks = {sampler.pick(random.Random(seed), table_path(table), read.__contains__)[1]
+                 for seed in range(20)}
+
+        assert picks == {table.path(5)}
+
+    def test_all_read_falls_back_to_uniform(self, tmp_path):
+        """Test that a fully read library can still be sampled."""
+        table = make_table({"a": 2, "b": 1})
+        read = set(table.paths())
+        sampler = FolderSampler(tmp_path)
+        sampler.load_or_build(None, table.group_by_dir, "unread", read_files(read))
+
+        assert sampler.pick(random.Random(0), table_path(table), read.__contains__) is not None
+
+    def test_reads_after_build_only_update_their_folder(self, tmp_path, monkeypatch):
+        """Test that files read after the build discount their folder without a rebuild."""
+        table = make_table({"a": 4, "b": 4})
+        read = set()
+        FolderSampler(tmp_path).load_or_build("sig", table.group_by_dir, "unread", read_files(read))
+
+        # Another process reads every file of "a" but one
+        read.update(table.path(i) for i in range(3))
+        sampler = FolderSampler(tmp_path)
+        monkeypatch.setattr(sampler, "_build", lambda *args: pytest.fail("rebuilt"))
+        sampler.load_or_build("sig", table.group_by_dir, "unread", read_files(read))
+        rng = random.Random(2)
+
+        picks = [sampler.pick(rng, table_path(table), read.__contains__)[1] for _ in range(200)]
+
+        assert not read.intersection(picks)
+        assert list(sampler.table.weights) == [1.0, 4.0]
+        # The corrected weights are saved for the next process
+        sampler.save()
+        reloaded = FolderSampler(tmp_path)
+        reloaded.load_or_build("sig", table.group_by_dir, "unread", read_files(read))
+        assert list(reloaded.table.weights) == [1.0, 4.0]
+
+    def test_mark_read(self, tmp_path):
+        """Test that marking a file as read decrements only its folder once."""
+        table = make_table({"a": 3, "b": 3})
+        sampler = FolderSampler(tmp_path)
+        sampler.load_or_build(None, table.group_by_dir, "unread", read_files(set()))
+
+        sampler.mark_read(table.path(4))
+        sampler.mark_read(table.path(4))
+
+        assert list(sampler.table.weights) == [3.0, 2.0]
+
+    def test_state_is_persisted(self, tmp_path, monkeypatch):
+        """Test that a matching signature reuses the saved groups."""
+        table = make_table({"a": 2, "b": 5})
+        FolderSampler(tmp_path).load_or_build("sig", table.group_by_dir, "uniform")
+
+        reloaded = FolderSampler(tmp_path)
+        monkeypatch.setattr(reloaded, "_build", lambda *args: pytest.fail("rebuilt"))
+        reloaded.load_or_build("sig", lambda: pytest.fail("grouped"), "uniform")
+
+        assert sorted(len(group) for group in reloaded.groups) == [2, 5]
+
+
+class TestWeightedPick:
+    """Tests for pick_random_file_with_zip_support(folder_weighting=...)."""
+
+    def test_small_folder_is_not_drowned(self, tmp_path, monkeypatch):
+        """Test that uniform folder weighting gives a single-file folder half of the picks."""
+        library = tmp_path / "library"
+        (library / "big").mkdir(parents=True)
+        (library / "small").mkdir()
+        for i in range(30):
+            (library / "big" / f"file{i}.txt").write_text("content")
+        (library / "small" / "only.txt").write_text("content")
+        monkeypatch.chdir(tmp_path)
+
+        picks = [
+            pick_random_file_with_zip_support(
+                [str(library)], folder_weighting="uniform"
+            )['file_path']
+            for _ in range(60)
+        ]
+
+        assert 15 <= picks.count(str(library / "small" / "only.txt")) <= 45
+
+    @pytest.mark.parametrize("cache_backend", ["pickle", "sqlite"])
+    @pytest.mark.parametrize("folder_weighting", ["uniform", "unread"])
+    def test_pick_does_not_load_table(self, tmp_path, monkeypatch, cache_backend, folder_weighting):
+        """Test that an unfiltered weighted pick reads the folder counts from the cache."""
+        library = tmp_path / "library"
+        (library / "big").mkdir(parents=True)
+        (library / "small").mkdir()
+        for i in range(30):
+            (library / "big" / f"file{i}.txt").write_text("content")
+        (library / "small" / "only.txt").write_text("content")
+        monkeypatch.chdir(tmp_path)
+        pick_random_file_with_zip_support([str(library)], cache_backend=cache_backend)
+
+        monkeypatch.setattr(file_picker, "_collect_file_table",
+                            lambda *args, **kwargs: pytest.fail("table loaded"))
+        picks = [
+            pick_random_file_with_zip_support([str(library)], cache_backend=cache_backend,
+                                              folder_weighting=folder_weighting)['file_path']
+            for _ in range(40)
+        ]
+
+        assert set(picks) <= {str(path) for path in library.rglob("*.txt")}
+        if folder_weighting == "uniform":
+            assert 8 <= picks.count(str(library / "small" / "only.txt")) <= 32
+
+    def test_unknown_weighting(self, tmp_path):
+        """Test that an unknown rule is reported."""
+        with pytest.raises(ValueError):
+            pick_random_file_with_zip_support([str(tmp_path)], folder_weighting="log")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])